@@ -12,6 +12,7 @@ from app.adaptive.bandit.thompson_sampling import create_routing_bandit
 from app.adaptive.rewards.calculator import RewardTracker, create_mvp_reward_calculator
 from app.adaptive.shadow.shadow_router import ShadowRouter
 from app.cache.redis_client import CacheManager
+from app.dependencies import get_semantic_cache
 from app.graphs.base import GraphState, GraphType
 from app.graphs.chat_graph import ChatGraph
 from app.graphs.search_graph import SearchGraph
@@ -66,8 +67,8 @@ class AdaptiveIntelligentRouter:
 
         # Initialize graphs for shadow testing
         self.graphs = {
-            GraphType.CHAT: ChatGraph(model_manager, cache_manager),
-            GraphType.SEARCH: SearchGraph(model_manager, cache_manager),
+            GraphType.CHAT: ChatGraph(model_manager, cache_manager, get_semantic_cache()),
+            GraphType.SEARCH: SearchGraph(model_manager, cache_manager, get_semantic_cache()),
         }
 
         logger.info(
@@ -23,6 +23,7 @@ from app.adaptive.validation.ab_testing import (
     get_experiment_manager,
 )
 from app.cache.redis_client import CacheManager
+from app.dependencies import get_semantic_cache
 from app.graphs.base import GraphState, GraphType
 from app.graphs.chat_graph import ChatGraph
 from app.graphs.search_graph import SearchGraph
@@ -105,8 +106,8 @@ class EnhancedAdaptiveRouter:
 
         # Initialize graphs for routing
         self.graphs = {
-            GraphType.CHAT: ChatGraph(model_manager),
-            GraphType.SEARCH: SearchGraph(model_manager, cache_manager),
+            GraphType.CHAT: ChatGraph(model_manager, semantic_cache=get_semantic_cache()),
+            GraphType.SEARCH: SearchGraph(model_manager, cache_manager, get_semantic_cache()),
         }
 
         # Performance tracking
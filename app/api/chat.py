@@ -14,6 +14,7 @@ from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
 from app.api.security import User, check_content_policy, get_current_user
+from app.cache.conversation_store import ConversationStore
 from app.cache.redis_client import CacheManager
 from app.core.async_utils import (
     coroutine_safe,
@@ -77,7 +78,8 @@ async def initialize_chat_dependencies():
             # logger.warning("CacheManager initialization failed")
             cache_manager = None
     if not chat_graph:
-        chat_graph = ChatGraph(model_manager, cache_manager)
+        from app.dependencies import get_semantic_cache
+        chat_graph = ChatGraph(model_manager, cache_manager, get_semantic_cache())
         # logger.info("ChatGraph initialized for chat API")
 
 
@@ -181,23 +183,12 @@ async def chat_complete(
         conversation_history = []
         if cache_manager_app and session_id:
             try:
-                # Try to get existing conversation history with enhanced cache manager
-                # Use the appropriate cache manager (app or global enhanced)
-                if hasattr(cache_manager, 'get_from_l1_or_l2'):
-                    cached_history = await cache_manager.get_from_l1_or_l2(
-                        f"conversation_history:{session_id}"
-                    )
-                else:
-                    # Fallback to basic get method
-                    cached_history = await cache_manager.get(
-                        f"conversation_history:{session_id}"
-                    )
+                # Only the turns prompt building uses are loaded
+                cached_history = await ConversationStore(cache_manager).recent(
+                    session_id, limit=settings.conversation_history_prompt_turns
+                )
                 if cached_history:
-                    conversation_history = (
-                        json.loads(cached_history)
-                        if isinstance(cached_history, str)
-                        else cached_history
-                    )
+                    conversation_history = cached_history
                     logger.info(
                         f"Retrieved conversation history with {len(conversation_history)} messages for session {session_id}"
                     )
@@ -236,6 +227,9 @@ async def chat_complete(
             },
         )
         # Ensure chat_graph is initialized before handling chat requests
+        if chat_graph is None:
+            # The app's graph carries the shared semantic response cache
+            chat_graph = app_state.get("chat_graph")
         if chat_graph is None:
             if model_manager is None:
                 # Use dependency injection to get the properly initialized instance
@@ -245,7 +239,8 @@ async def chat_complete(
                 # Use dependency injection to get the properly initialized instance
                 from app.dependencies import get_cache_manager
                 cache_manager = get_cache_manager()
-            chat_graph = ChatGraph(model_manager, cache_manager)
+            from app.dependencies import get_semantic_cache
+            chat_graph = ChatGraph(model_manager, cache_manager, get_semantic_cache())
         chat_graph_instance = chat_graph
         if chat_graph_instance is None:
             return create_error_response(
@@ -401,8 +396,7 @@ async def chat_complete(
             # Fallback: try to fetch from cache if available
             try:
                 if cache_manager:
-                    history_key = f"conversation_history:{session_id}"
-                    updated_history = await cache_manager.get(history_key, [])
+                    updated_history = await ConversationStore(cache_manager).recent(session_id)
             except Exception as e:
                 logger.warning(f"Could not fetch conversation history for response: {e}")
         chat_data.conversation_history = updated_history or conversation_history or []
@@ -435,6 +429,8 @@ async def chat_complete(
         except Exception as e:
             logger.warning(f"Error calculating cost: {e}")
         execution_time = time.time() - start_time
+        response_cache = getattr(chat_result, "response_metadata", {}).get("response_cache", {})
+        cache_hit = response_cache.get("kind") if response_cache.get("kind") in ("exact", "semantic") else None
         metadata = ResponseMetadata(
             query_id=query_id,
             correlation_id=correlation_id,  # Ensure this is always set
@@ -442,7 +438,8 @@ async def chat_complete(
             cost=total_cost,
             models_used=list(getattr(chat_result, "models_used", set())),
             confidence=(chat_result.get_avg_confidence() if hasattr(chat_result, "get_avg_confidence") else 1.0),
-            cached=False,
+            cached=cache_hit is not None,
+            cache_hit=cache_hit,
             timestamp=datetime.utcnow().isoformat(),
         )
         cost_prediction = None
@@ -642,10 +639,12 @@ async def chat_stream(
         cache_manager = cache_manager  # Fallback to global enhanced cache manager
 
     if chat_graph is None:
-        chat_graph = ChatGraph(model_manager, cache_manager_app)
+        from app.dependencies import get_semantic_cache
+        chat_graph = ChatGraph(model_manager, cache_manager_app, get_semantic_cache())
 
     async def generate_safe_stream():
-        global chat_graph, model_manager, cache_manager
+        global model_manager, cache_manager
+        nonlocal chat_graph
         
         # Get user message first for caching and routing
         user_message = ""
@@ -754,7 +753,8 @@ async def chat_stream(
                 if cache_manager is None:
                     from app.dependencies import get_cache_manager
                     cache_manager = get_cache_manager()
-                chat_graph = ChatGraph(model_manager, cache_manager)
+                from app.dependencies import get_semantic_cache
+                chat_graph = ChatGraph(model_manager, cache_manager, get_semantic_cache())
             
             # Use simple streaming approach: execute graph then stream the response
             chat_result = await safe_graph_execute(
@@ -2,18 +2,22 @@
 Native ultra-fast search API - fully integrated search engine
 """
 
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, BackgroundTasks
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, BackgroundTasks, Request
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
 import time
-import tempfile
-import os
 from datetime import datetime, timezone
 import asyncio
+import json
 
+from app.search.calibration import calibrate_on_benchmark_corpus
+from app.search.ingestion import ingest_ndjson
 from app.search.ultra_fast_engine import UltraFastSearchEngine, SearchResult
+from app.search.sharded_engine import ShardedSearchEngine
+from app.document_processing.extractors import READ_BLOCK_BYTES
 from app.document_processing.processor import DocumentProcessor, ProcessedDocument
+from app.document_processing.spool import SpooledUpload, UploadMetrics, UploadTooLarge
 from app.core.logging import get_logger
 from app.core.config import get_settings
 
@@ -22,15 +26,23 @@ settings = get_settings()
 
 router = APIRouter(prefix="/api/v1/native-search", tags=["native-search"])
 
+# Upper bound on queries accepted by a single batch search request
+MAX_BATCH_QUERIES = 1000
+# Text an uploaded document's own record keeps; the full text lives in its chunk records
+UPLOAD_PREVIEW_CHARS = 1000
+
 # Global search engine instance
 search_engine: Optional[UltraFastSearchEngine] = None
 document_processor: Optional[DocumentProcessor] = None
+upload_metrics = UploadMetrics()
 
 class SearchRequest(BaseModel):
     query: str
     num_results: int = 10
     filters: Optional[Dict] = None
     search_type: str = "hybrid"
+    latency_budget_ms: Optional[float] = None
+    recall_target: Optional[float] = None
 
 class SearchResponse(BaseModel):
     success: bool
@@ -40,12 +52,27 @@ class SearchResponse(BaseModel):
     search_type: str
     metadata: Optional[Dict] = None
 
+class BatchSearchRequest(BaseModel):
+    queries: List[str]
+    num_results: int = 10
+    filters: Optional[Dict] = None
+    latency_budget_ms: Optional[float] = None
+    recall_target: Optional[float] = None
+
+class BatchSearchResponse(BaseModel):
+    success: bool
+    results: List[List[Dict]]
+    total_queries: int
+    response_time_ms: float
+    metadata: Optional[Dict] = None
+
 class DocumentUploadResponse(BaseModel):
     success: bool
     document_id: str
     message: str
     chunks_created: int
     processing_time_ms: float
+    upload_bytes: Optional[int] = None
 
 class DocumentInfo(BaseModel):
     document_id: str
@@ -66,30 +93,22 @@ async def native_search(request: SearchRequest):
     
     try:
         logger.info(f"Native search request: {request.query[:100]}")
+
+        profile = search_engine.select_profile(request.num_results, request.latency_budget_ms,
+                                               request.recall_target)
         
         # Perform search using native engine
         results = await search_engine.search(
             query=request.query,
             num_results=request.num_results,
-            filters=request.filters
+            filters=request.filters,
+            profile=profile
         )
         
         response_time = (time.time() - start_time) * 1000
         
         # Format results
-        formatted_results = []
-        for result in results:
-            formatted_result = {
-                "id": result.doc_id,
-                "title": result.metadata.get('title', result.metadata.get('name', 'Untitled')),
-                "content": result.metadata.get('content', '')[:500] + "..." if len(result.metadata.get('content', '')) > 500 else result.metadata.get('content', ''),
-                "score": result.combined_score,
-                "similarity_score": result.similarity_score,
-                "bm25_score": result.bm25_score,
-                "metadata": result.metadata,
-                "source": "native_search"
-            }
-            formatted_results.append(formatted_result)
+        formatted_results = [_format_result(result) for result in results]
         
         logger.info(f"Native search completed in {response_time:.2f}ms with {len(results)} results")
         
@@ -102,14 +121,165 @@ async def native_search(request: SearchRequest):
             metadata={
                 "engine": "native_ultra_fast",
                 "algorithm": "FAISS+HNSW+LSH+BM25",
-                "embedding_model": settings.EMBEDDING_MODEL_NAME or "all-MiniLM-L6-v2"
+                "embedding_model": settings.EMBEDDING_MODEL_NAME or "all-MiniLM-L6-v2",
+                "search_profile": profile.to_dict(),
+                "search_calibrated": search_engine.calibration is not None
             }
         )
         
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Native search failed: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
 
+@router.post("/search/batch", response_model=BatchSearchResponse)
+async def native_search_batch(request: BatchSearchRequest):
+    """Batched native search: one encoder pass and one ANN call for all queries"""
+    if search_engine is None:
+        raise HTTPException(status_code=503, detail="Search engine not initialized")
+
+    if not request.queries:
+        raise HTTPException(status_code=400, detail="queries cannot be empty")
+    if len(request.queries) > MAX_BATCH_QUERIES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_QUERIES} queries per batch")
+
+    start_time = time.time()
+
+    try:
+        logger.info(f"Native batch search request: {len(request.queries)} queries")
+
+        profile = search_engine.select_profile(request.num_results, request.latency_budget_ms,
+                                               request.recall_target)
+        batch_results = await search_engine.search_batch(
+            queries=request.queries,
+            num_results=request.num_results,
+            filters=request.filters,
+            profile=profile
+        )
+
+        response_time = (time.time() - start_time) * 1000
+        logger.info(f"Native batch search completed in {response_time:.2f}ms for {len(request.queries)} queries")
+
+        return BatchSearchResponse(
+            success=True,
+            results=[[_format_result(result) for result in results] for results in batch_results],
+            total_queries=len(request.queries),
+            response_time_ms=response_time,
+            metadata={
+                "engine": "native_ultra_fast",
+                "algorithm": "FAISS+HNSW+LSH+BM25",
+                "embedding_model": settings.EMBEDDING_MODEL_NAME or "all-MiniLM-L6-v2",
+                "search_profile": profile.to_dict(),
+                "search_calibrated": search_engine.calibration is not None
+            }
+        )
+
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Native batch search failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Batch search failed: {str(e)}")
+
+def _format_result(result: SearchResult) -> Dict:
+    """Format a search result for API responses"""
+    content = result.metadata.get('content', '')
+    return {
+        "id": result.doc_id,
+        "title": result.metadata.get('title', result.metadata.get('name', 'Untitled')),
+        "content": content[:500] + "..." if len(content) > 500 else content,
+        "score": result.combined_score,
+        "similarity_score": result.similarity_score,
+        "bm25_score": result.bm25_score,
+        "metadata": result.metadata,
+        "source": "native_search"
+    }
+
+async def _index_upload(upload: SpooledUpload, title: str, content_type: Optional[str],
+                        filename: Optional[str], start_time: float) -> DocumentUploadResponse:
+    """
+    Extract, chunk and index a received upload, recording its size and latency.
+    Chunks are indexed in batches of INGEST_BATCH_SIZE as they are extracted,
+    each as a search document of its own, and the upload's record keeps only
+    a preview, so memory does not grow with the size of the file.
+    """
+    doc_id = document_processor.new_document_id()
+    upload_time = datetime.now(timezone.utc).isoformat()
+    preview = ""
+    chunks_count = 0
+    batch = []
+
+    async for chunk in document_processor.stream_upload(upload, content_type=content_type,
+                                                        filename=filename, doc_id=doc_id):
+        if chunks_count == 0:
+            preview = chunk.content[:UPLOAD_PREVIEW_CHARS]
+        chunks_count += 1
+        batch.append({
+            'id': chunk.id,
+            'title': title,
+            'name': title,
+            'content': chunk.content,
+            'skills': [],
+            'technologies': [],
+            'experience_years': 0,
+            'seniority_level': 'unknown',
+            'metadata': {
+                **chunk.metadata,
+                'upload_time': upload_time,
+                'original_filename': filename,
+                'parent_document_id': doc_id
+            }
+        })
+        if len(batch) >= settings.INGEST_BATCH_SIZE:
+            await search_engine.add_documents(batch)
+            batch = []
+    if batch:
+        await search_engine.add_documents(batch)
+
+    # The upload's own record, listed and fetched by its id; its chunks carry the text
+    search_doc = {
+        'id': doc_id,
+        'title': title,
+        'name': title,
+        'content': preview,
+        'description': preview[:200] + "..." if len(preview) > 200 else preview,
+        'skills': [],
+        'technologies': [],
+        'experience_years': 0,
+        'seniority_level': 'unknown',
+        'metadata': {
+            **document_processor.upload_metadata(upload, content_type, filename),
+            'upload_time': upload_time,
+            'file_size': upload.size,
+            'original_filename': filename,
+            'chunks_count': chunks_count,
+            'chunks_indexed': True
+        }
+    }
+    await search_engine.add_document(doc_id, search_doc)
+
+    processing_time = upload_metrics.record(upload.size, start_time, upload.on_disk)
+    logger.info(f"Document uploaded and indexed: {doc_id}", extra={
+        'upload_bytes': upload.size,
+        'spooled_to_disk': upload.on_disk,
+        'chunks': chunks_count,
+        'latency_ms': round(processing_time, 2),
+    })
+
+    return DocumentUploadResponse(
+        success=True,
+        document_id=doc_id,
+        message=f"Document '{title}' uploaded and indexed successfully",
+        chunks_created=chunks_count,
+        processing_time_ms=processing_time,
+        upload_bytes=upload.size
+    )
+
+def _new_spool() -> SpooledUpload:
+    return SpooledUpload(max_memory_bytes=settings.UPLOAD_SPOOL_MAX_MEMORY,
+                         max_bytes=settings.UPLOAD_MAX_BYTES,
+                         directory=settings.UPLOAD_SPOOL_DIR or None)
+
 @router.post("/documents/upload", response_model=DocumentUploadResponse)
 async def upload_document(
     file: UploadFile = File(...),
@@ -119,66 +289,106 @@ async def upload_document(
     if search_engine is None or document_processor is None:
         raise HTTPException(status_code=503, detail="Search engine not initialized")
     
-    start_time = time.time()
+    start_time = time.perf_counter()
+    upload = _new_spool()
     
     try:
-        # Save uploaded file temporarily
-        with tempfile.NamedTemporaryFile(delete=False, suffix=f"_{file.filename}") as tmp_file:
-            content = await file.read()
-            tmp_file.write(content)
-            tmp_file_path = tmp_file.name
-        
-        try:
-            # Process document
-            doc_title = title or file.filename or "Untitled Document"
-            processed_doc = await document_processor.process_file(
-                tmp_file_path, 
-                title=doc_title,
-                content_type=file.content_type
-            )
-            
-            # Create document for search engine
-            search_doc = {
-                'id': processed_doc.id,
-                'title': processed_doc.title,
-                'name': processed_doc.title,
-                'content': processed_doc.content,
-                'description': processed_doc.content[:200] + "..." if len(processed_doc.content) > 200 else processed_doc.content,
-                'skills': [],
-                'technologies': [],
-                'experience_years': 0,
-                'seniority_level': 'unknown',
-                'metadata': {
-                    **processed_doc.metadata,
-                    'upload_time': datetime.now(timezone.utc).isoformat(),
-                    'file_size': len(content),
-                    'original_filename': file.filename,
-                    'chunks_count': len(processed_doc.chunks)
-                }
-            }
-            
-            # Add to search engine
-            await search_engine.add_document(processed_doc.id, search_doc)
-            
-            processing_time = (time.time() - start_time) * 1000
-            
-            logger.info(f"Document uploaded and indexed: {processed_doc.id}")
-            
-            return DocumentUploadResponse(
-                success=True,
-                document_id=processed_doc.id,
-                message=f"Document '{doc_title}' uploaded and indexed successfully",
-                chunks_created=len(processed_doc.chunks),
-                processing_time_ms=processing_time
-            )
-            
-        finally:
-            # Clean up temporary file
-            os.unlink(tmp_file_path)
-            
+        # Move the form part into the spool block by block instead of reading it whole
+        while True:
+            block = await file.read(READ_BLOCK_BYTES)
+            if not block:
+                break
+            await upload.write(block)
+        await upload.finish()
+
+        return await _index_upload(upload, title or file.filename or "Untitled Document",
+                                   file.content_type, file.filename, start_time)
+
+    except UploadTooLarge as e:
+        upload_metrics.record(upload.size, start_time, upload.on_disk, success=False)
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
+        upload_metrics.record(upload.size, start_time, upload.on_disk, success=False)
         logger.error(f"Document upload failed: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
+    finally:
+        upload.close()
+
+@router.post("/documents/upload-stream", response_model=DocumentUploadResponse)
+async def upload_document_stream(
+    request: Request,
+    filename: Optional[str] = None,
+    title: Optional[str] = None
+):
+    """
+    Upload and index a document sent as the raw request body. The body is
+    received once into a spool (memory below UPLOAD_SPOOL_MAX_MEMORY, a temp
+    file above) and extracted from there, with no multipart parsing or extra
+    copy. The Content-Type header gives the format; ``filename`` is used to
+    detect it when the header is generic.
+    """
+    if search_engine is None or document_processor is None:
+        raise HTTPException(status_code=503, detail="Search engine not initialized")
+
+    content_length = request.headers.get('content-length')
+    if settings.UPLOAD_MAX_BYTES and content_length and content_length.isdigit() \
+            and int(content_length) > settings.UPLOAD_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=f"Upload exceeds {settings.UPLOAD_MAX_BYTES} bytes")
+
+    content_type = request.headers.get('content-type', '').split(';')[0].strip().lower()
+    if content_type in ('', 'application/octet-stream'):
+        content_type = None
+
+    start_time = time.perf_counter()
+    upload = _new_spool()
+
+    try:
+        async for block in request.stream():
+            await upload.write(block)
+        await upload.finish()
+
+        return await _index_upload(upload, title or filename or "Untitled Document",
+                                   content_type, filename, start_time)
+
+    except UploadTooLarge as e:
+        upload_metrics.record(upload.size, start_time, upload.on_disk, success=False)
+        raise HTTPException(status_code=413, detail=str(e))
+    except Exception as e:
+        upload_metrics.record(upload.size, start_time, upload.on_disk, success=False)
+        logger.error(f"Document upload failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
+    finally:
+        upload.close()
+
+@router.post("/documents/ingest")
+async def ingest_documents(request: Request, batch_size: Optional[int] = None, persist: bool = True):
+    """
+    Bulk-index an NDJSON body (one document object with an ``id`` per line).
+    Documents are encoded and indexed in batches while the body streams in;
+    the response streams one JSON progress line per batch and a final line
+    with ``done`` set. With ``persist`` the indexes are saved at the end.
+    """
+    if search_engine is None:
+        raise HTTPException(status_code=503, detail="Search engine not initialized")
+    if batch_size is not None and not 1 <= batch_size <= 10000:
+        raise HTTPException(status_code=400, detail="batch_size must be between 1 and 10000")
+
+    async def progress_lines():
+        try:
+            async for progress in ingest_ndjson(
+                search_engine, request.stream(),
+                batch_size=batch_size or settings.INGEST_BATCH_SIZE,
+                max_pending_batches=settings.INGEST_MAX_PENDING_BATCHES
+            ):
+                if progress['done'] and persist and progress['indexed']:
+                    await calibrate_native_search()
+                    await search_engine.save_snapshot()
+                yield json.dumps(progress) + "\n"
+        except Exception as e:
+            logger.error(f"Document ingestion failed: {str(e)}")
+            yield json.dumps({'done': True, 'error': str(e)}) + "\n"
+
+    return StreamingResponse(progress_lines(), media_type="application/x-ndjson")
 
 @router.post("/documents/upload-text", response_model=DocumentUploadResponse)
 async def upload_text_document(
@@ -247,7 +457,11 @@ async def list_documents():
     try:
         documents = []
         
-        for doc_id, metadata in search_engine.document_metadata.items():
+        records = await search_engine.document_records()
+        for doc_id, metadata in records.items():
+            if metadata.get('metadata', {}).get('parent_document_id'):
+                # Chunks of an upload are listed through the upload's record
+                continue
             doc_info = DocumentInfo(
                 document_id=doc_id,
                 title=metadata.get('title', metadata.get('name', 'Untitled')),
@@ -272,6 +486,11 @@ async def delete_document(document_id: str):
         raise HTTPException(status_code=503, detail="Search engine not initialized")
     
     try:
+        records = await search_engine.document_records([document_id])
+        upload_metadata = records.get(document_id, {}).get('metadata', {})
+        if upload_metadata.get('chunks_indexed'):
+            for chunk_index in range(upload_metadata.get('chunks_count', 0)):
+                await search_engine.remove_document(f"{document_id}_chunk_{chunk_index}")
         await search_engine.remove_document(document_id)
         logger.info(f"Document deleted: {document_id}")
         return {"message": f"Document {document_id} deleted successfully"}
@@ -287,10 +506,11 @@ async def get_document(document_id: str):
         raise HTTPException(status_code=503, detail="Search engine not initialized")
     
     try:
-        if document_id not in search_engine.document_metadata:
+        records = await search_engine.document_records([document_id])
+        if document_id not in records:
             raise HTTPException(status_code=404, detail="Document not found")
         
-        metadata = search_engine.document_metadata[document_id]
+        metadata = records[document_id]
         
         return {
             "document_id": document_id,
@@ -314,13 +534,15 @@ async def get_search_stats():
         raise HTTPException(status_code=503, detail="Search engine not initialized")
     
     try:
-        stats = search_engine.get_performance_stats()
+        stats = await search_engine.performance_stats()
         return {
             "engine_type": "native_ultra_fast",
             "algorithms": ["FAISS", "HNSW", "LSH", "BM25"],
             "embedding_model": settings.EMBEDDING_MODEL_NAME or "all-MiniLM-L6-v2",
             "embedding_dimension": search_engine.embedding_dim,
-            **stats
+            **stats,
+            "uploads": upload_metrics.get_stats(),
+            "search_calibration": search_engine.calibration.to_dict() if search_engine.calibration else None
         }
         
     except Exception as e:
@@ -336,13 +558,16 @@ async def rebuild_index(background_tasks: BackgroundTasks):
     try:
         async def rebuild_task():
             documents = []
-            for doc_id, metadata in search_engine.document_metadata.items():
+            records = await search_engine.document_records()
+            for doc_id, metadata in records.items():
                 documents.append({
                     'id': doc_id,
                     **metadata
                 })
             
             if documents:
+                # Measured first so the rebuilt snapshot carries the table
+                await calibrate_native_search()
                 await search_engine.build_indexes(documents)
                 logger.info(f"Index rebuilt with {len(documents)} documents")
         
@@ -360,7 +585,7 @@ async def health_check():
         return {"status": "unhealthy", "message": "Search engine not initialized"}
     
     try:
-        stats = search_engine.get_performance_stats()
+        stats = await search_engine.performance_stats()
         return {
             "status": "healthy",
             "message": "Native search engine is running",
@@ -380,7 +605,10 @@ def initialize_native_search(embedding_dim: int = 384, use_gpu: bool = False):
     global search_engine, document_processor
     
     try:
-        search_engine = UltraFastSearchEngine(embedding_dim=embedding_dim, use_gpu=use_gpu)
+        if settings.SEARCH_SHARDS > 1:
+            search_engine = ShardedSearchEngine(settings.SEARCH_SHARDS, embedding_dim=embedding_dim, use_gpu=use_gpu)
+        else:
+            search_engine = UltraFastSearchEngine(embedding_dim=embedding_dim, use_gpu=use_gpu)
         document_processor = DocumentProcessor()
         logger.info("Native search engine initialized successfully")
         return search_engine, document_processor
@@ -389,6 +617,33 @@ def initialize_native_search(embedding_dim: int = 384, use_gpu: bool = False):
         logger.error(f"Failed to initialize native search engine: {str(e)}")
         raise
 
+async def calibrate_native_search(on_startup: bool = False):
+    """
+    Measure the search profiles on the benchmark corpus in a worker thread
+    and hand the table to the engine, unless it already has one (restored
+    with its index snapshot or measured before). Rebuilds and ingestion run
+    this before saving, so the table ships with the snapshot; at startup it
+    only runs with SEARCH_CALIBRATE_ON_STARTUP. Without a table, searches
+    with a latency budget or recall target use the default profile and say
+    so in the response metadata.
+    """
+    if search_engine is None:
+        return None
+    if search_engine.calibration is not None:
+        return search_engine.calibration
+    if settings.SEARCH_CALIBRATION_SIZE <= 0 or (on_startup and not settings.SEARCH_CALIBRATE_ON_STARTUP):
+        return None
+    try:
+        table = await asyncio.to_thread(
+            calibrate_on_benchmark_corpus, settings.SEARCH_CALIBRATION_SIZE,
+            num_queries=settings.SEARCH_CALIBRATION_QUERIES, embedding_dim=search_engine.embedding_dim
+        )
+        search_engine.calibration = table
+        return table
+    except Exception as e:
+        logger.error(f"Search calibration failed: {str(e)}")
+        return None
+
 # Get search engine instance
 def get_search_engine() -> UltraFastSearchEngine:
     """Get the global search engine instance"""
@@ -0,0 +1,261 @@
+"""
+Value codecs for the Redis cache
+
+A stored value is one header byte naming its serializer and compression,
+followed by the payload:
+
+    0xF0 | serializer << 2 | compression
+
+Values written before codecs existed are JSON text, whose first byte is
+always ASCII, so anything starting below 0x80 is decoded as legacy JSON.
+Every format is readable whatever the configured codec is, as long as its
+library is installed, so workers can switch codecs during a rolling deploy.
+"""
+
+import json
+import time
+import zlib
+from typing import Any, Callable, Dict, Tuple
+
+import structlog
+
+logger = structlog.get_logger(__name__)
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ormsgpack
+except ImportError:
+    ormsgpack = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:
+    lz4_frame = None
+
+HEADER_BASE = 0xF0
+
+SERIALIZERS = {"json": 0, "orjson": 1, "msgpack": 2}
+COMPRESSIONS = {"none": 0, "zlib": 1, "zstd": 2, "lz4": 3}
+
+
+def _default(value: Any) -> Any:
+    """Fallback for types the serializers do not handle natively"""
+    if hasattr(value, "model_dump"):
+        return value.model_dump()
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"Cannot cache value of type {type(value).__name__}")
+
+
+def _json_dumps(value: Any) -> bytes:
+    return json.dumps(value, default=_default).encode()
+
+
+def _orjson_dumps(value: Any) -> bytes:
+    return orjson.dumps(
+        value, default=_default, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+    )
+
+
+def _orjson_loads(data: bytes) -> Any:
+    # orjson output is plain JSON, readable without orjson
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+def _msgpack_dumps(value: Any) -> bytes:
+    if ormsgpack is not None:
+        return ormsgpack.packb(
+            value,
+            default=_default,
+            option=ormsgpack.OPT_SERIALIZE_NUMPY | ormsgpack.OPT_NON_STR_KEYS,
+        )
+    return msgpack.packb(value, default=_default, use_bin_type=True)
+
+
+def _msgpack_loads(data: bytes) -> Any:
+    if ormsgpack is not None:
+        return ormsgpack.unpackb(data)
+    if msgpack is not None:
+        return msgpack.unpackb(data, raw=False, strict_map_key=False)
+    raise ValueError("Cached value is msgpack but neither ormsgpack nor msgpack is installed")
+
+
+def _zstd_decompress(data: bytes) -> bytes:
+    if zstandard is None:
+        raise ValueError("Cached value is zstd-compressed but zstandard is not installed")
+    return zstandard.ZstdDecompressor().decompress(data)
+
+
+def _lz4_decompress(data: bytes) -> bytes:
+    if lz4_frame is None:
+        raise ValueError("Cached value is lz4-compressed but lz4 is not installed")
+    return lz4_frame.decompress(data)
+
+
+_DUMPS: Dict[str, Callable[[Any], bytes]] = {
+    "json": _json_dumps,
+    "orjson": _orjson_dumps,
+    "msgpack": _msgpack_dumps,
+}
+_LOADS: Dict[int, Callable[[bytes], Any]] = {
+    SERIALIZERS["json"]: json.loads,
+    SERIALIZERS["orjson"]: _orjson_loads,
+    SERIALIZERS["msgpack"]: _msgpack_loads,
+}
+_DECOMPRESS: Dict[int, Callable[[bytes], bytes]] = {
+    COMPRESSIONS["none"]: lambda data: data,
+    COMPRESSIONS["zlib"]: zlib.decompress,
+    COMPRESSIONS["zstd"]: _zstd_decompress,
+    COMPRESSIONS["lz4"]: _lz4_decompress,
+}
+
+def serializer_available(name: str) -> bool:
+    if name == "orjson":
+        return orjson is not None
+    if name == "msgpack":
+        return ormsgpack is not None or msgpack is not None
+    return name == "json"
+
+
+def compression_available(name: str) -> bool:
+    if name == "zstd":
+        return zstandard is not None
+    if name == "lz4":
+        return lz4_frame is not None
+    return name in ("none", "zlib")
+
+
+class ValueCodec:
+    """
+    Serializes cache values with a configurable serializer and compresses
+    payloads above a size threshold when that makes them smaller. Keeps
+    counts, sizes and timings per stored format for ``get_stats``.
+    """
+
+    def __init__(
+        self,
+        serializer: str = "msgpack",
+        compression: str = "zstd",
+        compression_threshold: int = 1024,
+        compression_level: int = 3,
+    ):
+        """
+        - serializer: ``msgpack``, ``orjson`` or ``json``; falls back to orjson, then json, when not installed.
+        - compression: ``zstd``, ``lz4``, ``zlib`` or ``none``; falls back to zlib when not installed.
+        - compression_threshold: Serialized bytes from which payloads are compressed.
+        """
+        if serializer not in SERIALIZERS:
+            raise ValueError(f"Unknown cache serializer {serializer!r}, expected one of {list(SERIALIZERS)}")
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"Unknown cache compression {compression!r}, expected one of {list(COMPRESSIONS)}")
+        if not serializer_available(serializer):
+            fallback = "orjson" if serializer_available("orjson") else "json"
+            logger.warning(f"Cache serializer {serializer} not installed, using {fallback}")
+            serializer = fallback
+        if not compression_available(compression):
+            logger.warning(f"Cache compression {compression} not installed, using zlib")
+            compression = "zlib"
+
+        self.serializer = serializer
+        self.compression = compression
+        self.compression_threshold = compression_threshold
+        self.compression_level = compression_level
+        self._dumps = _DUMPS[serializer]
+        self._compress = self._compressor(compression, compression_level)
+        self._stats: Dict[str, Dict[str, float]] = {}
+
+    @staticmethod
+    def _compressor(compression: str, level: int) -> Callable[[bytes], bytes]:
+        if compression == "zstd":
+            return zstandard.ZstdCompressor(level=level).compress
+        if compression == "lz4":
+            return lambda data: lz4_frame.compress(data, compression_level=level)
+        if compression == "zlib":
+            return lambda data: zlib.compress(data, level)
+        return lambda data: data
+
+    def encode(self, value: Any) -> bytes:
+        start = time.perf_counter()
+        payload = self._dumps(value)
+        raw_size = len(payload)
+        compression = "none"
+        if self.compression != "none" and raw_size >= self.compression_threshold:
+            compressed = self._compress(payload)
+            if len(compressed) < raw_size:
+                payload, compression = compressed, self.compression
+        header = HEADER_BASE | SERIALIZERS[self.serializer] << 2 | COMPRESSIONS[compression]
+        data = bytes((header,)) + payload
+        self._record(self._format_name(header), "encode", raw_size, len(data), start)
+        return data
+
+    def decode(self, data: Any) -> Any:
+        start = time.perf_counter()
+        value, header, raw_size = self._decode(data)
+        self._record(self._format_name(header), "decode", raw_size, len(data), start)
+        return value
+
+    def _decode(self, data: Any) -> Tuple[Any, int, int]:
+        """Value, header byte (0 for legacy JSON) and serialized size of ``data``"""
+        if isinstance(data, str):
+            return json.loads(data), 0, len(data)
+        if not data or data[0] < 0x80:
+            return json.loads(data), 0, len(data)
+        header = data[0]
+        if header & HEADER_BASE != HEADER_BASE or (header >> 2) & 0b11 not in _LOADS:
+            raise ValueError(f"Unknown cache value header 0x{header:02x}")
+        payload = _DECOMPRESS[header & 0b11](bytes(data[1:]))
+        return _LOADS[(header >> 2) & 0b11](payload), header, len(payload)
+
+    @staticmethod
+    def _format_name(header: int) -> str:
+        if header == 0:
+            return "json-legacy"
+        serializer = next(name for name, number in SERIALIZERS.items() if number == (header >> 2) & 0b11)
+        compression = next(name for name, number in COMPRESSIONS.items() if number == header & 0b11)
+        return serializer if compression == "none" else f"{serializer}+{compression}"
+
+    def _record(self, name: str, operation: str, raw_size: int, stored_size: int, start: float):
+        stats = self._stats.setdefault(name, {
+            "encoded": 0, "decoded": 0, "raw_bytes": 0, "stored_bytes": 0,
+            "encode_seconds": 0.0, "decode_seconds": 0.0,
+        })
+        stats[f"{operation}d"] += 1
+        stats[f"{operation}_seconds"] += time.perf_counter() - start
+        stats["raw_bytes"] += raw_size
+        stats["stored_bytes"] += stored_size
+
+    def get_stats(self) -> Dict[str, Any]:
+        formats = {}
+        for name, stats in self._stats.items():
+            formats[name] = {
+                **stats,
+                "compression_ratio": (
+                    stats["raw_bytes"] / stats["stored_bytes"] if stats["stored_bytes"] else 1.0
+                ),
+                "avg_encode_us": (
+                    stats["encode_seconds"] / stats["encoded"] * 1e6 if stats["encoded"] else 0.0
+                ),
+                "avg_decode_us": (
+                    stats["decode_seconds"] / stats["decoded"] * 1e6 if stats["decoded"] else 0.0
+                ),
+            }
+        return {
+            "serializer": self.serializer,
+            "compression": self.compression,
+            "compression_threshold": self.compression_threshold,
+            "formats": formats,
+        }
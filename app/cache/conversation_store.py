@@ -0,0 +1,62 @@
+"""
+Conversation history store
+
+Each session's turns are a Redis list appended with RPUSH + LTRIM + EXPIRE
+in one atomic pipeline. A turn costs O(1) writes however long the history
+is, and concurrent turns of one session cannot overwrite each other.
+Readers fetch only the last turns they need. Without Redis the list lives
+in CacheManager's local tier.
+"""
+
+import json
+from typing import Any, Dict, List, Optional
+
+from app.cache.redis_client import CacheKey, CacheWriteBatch
+from app.core.config import get_settings
+
+# Sessions written before the list store kept their history as one JSON array here
+LEGACY_HISTORY_PREFIX = "conversation_history:"
+
+
+class ConversationStore:
+    """Append-only, capped conversation history per session"""
+
+    def __init__(self, cache_manager, max_turns: Optional[int] = None, ttl: Optional[int] = None):
+        """
+        - max_turns: Turns kept per session, older ones are trimmed.
+        - ttl: Seconds a session's history outlives its last turn.
+        """
+        settings = get_settings()
+        self.cache_manager = cache_manager
+        self.max_turns = max_turns or settings.conversation_history_max_turns
+        self.ttl = ttl or settings.conversation_history_ttl
+
+    @staticmethod
+    def key(session_id: str) -> str:
+        return CacheKey.conversation_key(session_id)
+
+    async def append(
+        self, session_id: str, turn: Dict[str, Any], batch: Optional[CacheWriteBatch] = None
+    ):
+        """Add ``turn`` to the session, queued on ``batch`` when given"""
+        writes = batch if batch is not None else CacheWriteBatch(self.cache_manager)
+        writes.push(self.key(session_id), turn, self.max_turns, self.ttl)
+        if batch is None:
+            await writes.flush()
+
+    async def recent(self, session_id: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Last ``limit`` turns of the session, oldest first; every kept turn when None"""
+        if hasattr(self.cache_manager, "list_range"):
+            turns = await self.cache_manager.list_range(self.key(session_id), limit)
+        else:
+            turns = await self.cache_manager.get(self.key(session_id))
+            turns = turns if isinstance(turns, list) else []
+        if not turns:
+            turns = await self._legacy_history(session_id)
+        return turns[-limit:] if limit else turns
+
+    async def _legacy_history(self, session_id: str) -> List[Dict[str, Any]]:
+        history = await self.cache_manager.get(f"{LEGACY_HISTORY_PREFIX}{session_id}")
+        if isinstance(history, str):
+            history = json.loads(history)
+        return history if isinstance(history, list) else []
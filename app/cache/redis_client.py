@@ -7,17 +7,25 @@ import asyncio
 import hashlib
 import json
 import threading
-from datetime import datetime, timedelta
-from typing import Any, Dict, Optional
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 import redis.asyncio as redis
 import structlog
 from pydantic import BaseModel
 
+from app.cache.codecs import ValueCodec
 from app.core.config import get_settings
 
 logger = structlog.get_logger(__name__)
 
+# Seconds the invalidation listener waits before resubscribing after a connection error
+INVALIDATION_RETRY_SECONDS = 1.0
+
+_MISSING = object()
+
 
 class CacheKey:
     """Cache key constants and generators"""
@@ -110,38 +118,104 @@ class CacheMetrics(BaseModel):
 
 
 class CacheManager:
-    """Redis-based cache manager for hot layer"""
-
-    def __init__(self, redis_url: str, max_connections: int = 20):
+    """
+    Redis-based cache manager for hot layer
+
+    With the near-cache enabled, reads are served from a per-process LRU copy
+    while it is younger than the consistency window and only then go to
+    Redis. Every set or delete publishes its keys on an invalidation channel
+    that all workers subscribe to, so other workers drop their copies within
+    one pub/sub hop; the window bounds staleness if a message is lost.
+    Without Redis the local copy is the only tier.
+    """
+
+    def __init__(
+        self,
+        redis_url: str,
+        max_connections: int = 20,
+        near_cache: Optional[bool] = None,
+        consistency_window: Optional[float] = None,
+        local_cache_max_size: Optional[int] = None,
+        codec: Optional[ValueCodec] = None,
+    ):
+        """
+        - near_cache: Serve fresh local copies before asking Redis, default from settings.
+        - consistency_window: Seconds a local copy is served without revalidating against Redis.
+        - local_cache_max_size: Entries kept in the per-process tier.
+        - codec: Serializer and compression of stored values, default from settings.
+        """
         self.redis_url = redis_url
         self.max_connections = max_connections
         self.settings = get_settings()
         self.redis: Optional[redis.Redis] = None
         self.redis_pool: Optional[redis.ConnectionPool] = None
         self.metrics = CacheMetrics()
-        self._local_cache: Dict[str, tuple[Any, datetime]] = {}
-        self._local_cache_max_size = 1000
+        self.codec = codec or ValueCodec(
+            serializer=self.settings.cache_serializer,
+            compression=self.settings.cache_compression,
+            compression_threshold=self.settings.cache_compression_threshold,
+            compression_level=self.settings.cache_compression_level,
+        )
+        self.near_cache = (
+            self.settings.cache_near_cache_enabled if near_cache is None else near_cache
+        )
+        self.consistency_window = (
+            self.settings.cache_consistency_window
+            if consistency_window is None
+            else consistency_window
+        )
+        self.invalidation_channel = self.settings.cache_invalidation_channel
+        self.instance_id = uuid.uuid4().hex
+        # key -> (value, expires_at, cached_at) on the monotonic clock, least recently used first
+        self._local_cache: "OrderedDict[str, tuple[Any, float, float]]" = OrderedDict()
+        self._local_cache_max_size = (
+            local_cache_max_size or self.settings.cache_local_max_size
+        )
         self._local_cache_lock = threading.Lock()
+        # Bumped by every local write and received invalidation, so a Redis
+        # read that raced with one does not store a stale local copy
+        self._local_version = 0
+        self._pubsub = None
+        self._listener_task: Optional[asyncio.Task] = None
+        self._listening = False
+        self.tier_stats = {
+            "local_hits": 0,
+            "redis_hits": 0,
+            "misses": 0,
+            "invalidations_published": 0,
+            "invalidations_received": 0,
+        }
+
+    async def initialize(self, client: Optional[redis.Redis] = None):
+        """
+        Initialize Redis connection with proper async handling and fallbacks.
 
-    async def initialize(self):
-        """Initialize Redis connection with proper async handling and fallbacks."""
+        - client: An already created client (e.g. fakeredis) used instead of connecting to
+          redis_url. It must return bytes (decode_responses=False): stored values are binary.
+        """
         try:
-            import redis.asyncio as redis_async
-
-            # Create async Redis connection
-            self.redis = redis_async.from_url(
-                self.redis_url,
-                max_connections=self.max_connections,
-                decode_responses=True,
-                socket_connect_timeout=10,
-                socket_timeout=10,
-                retry_on_timeout=True,
-                health_check_interval=30,
-            )
+            if client is not None:
+                self.redis = client
+            else:
+                import redis.asyncio as redis_async
+
+                # Create async Redis connection
+                self.redis = redis_async.from_url(
+                    self.redis_url,
+                    max_connections=self.max_connections,
+                    decode_responses=False,
+                    socket_connect_timeout=10,
+                    socket_timeout=10,
+                    retry_on_timeout=True,
+                    health_check_interval=30,
+                )
 
             # Test connection with timeout
             await asyncio.wait_for(self.redis.ping(), timeout=10.0)
 
+            if self.near_cache:
+                await self._start_invalidation_listener()
+
             logger.info(
                 f"✅ Redis cache manager initialized successfully: {self.redis_url}"
             )
@@ -161,12 +235,73 @@ class CacheManager:
         logger.warning("⚠️ Redis unavailable - using local cache fallback")
         self.redis = None
         self.redis_pool = None
-        # Ensure local cache is ready
-        if not hasattr(self, "_local_cache"):
-            self._local_cache = {}
+        self._listening = False
         logger.info("📦 Local cache fallback activated")
 
+    async def _start_invalidation_listener(self):
+        """Subscribe to the invalidation channel and drain it in a background task"""
+        self._pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+        await self._pubsub.subscribe(self.invalidation_channel)
+        self._listening = True
+        self._listener_task = asyncio.create_task(self._listen_for_invalidations())
+
+    async def _listen_for_invalidations(self):
+        """Drop local copies of keys other workers changed; resubscribe after connection errors"""
+        while True:
+            try:
+                if not self._listening:
+                    await self._pubsub.subscribe(self.invalidation_channel)
+                    self._listening = True
+                async for message in self._pubsub.listen():
+                    if message.get("type") == "message":
+                        self._apply_invalidation(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Cache invalidation listener error: {e}")
+            # Invalidations may have been missed while disconnected
+            self._listening = False
+            self._clear_local_cache()
+            await asyncio.sleep(INVALIDATION_RETRY_SECONDS)
+
+    def _apply_invalidation(self, data: Any):
+        try:
+            payload = json.loads(data)
+        except (TypeError, ValueError):
+            return
+        if payload.get("origin") == self.instance_id:
+            return
+        with self._local_cache_lock:
+            self._local_version += 1
+            for key in payload.get("keys", []):
+                self._local_cache.pop(key, None)
+        self.tier_stats["invalidations_received"] += 1
+
+    def _queue_invalidation(self, pipe, keys: List[str]):
+        """Add a publish of ``keys`` to ``pipe`` so other workers drop their local copies"""
+        if not self.near_cache:
+            return
+        pipe.publish(
+            self.invalidation_channel,
+            json.dumps({"origin": self.instance_id, "keys": keys}),
+        )
+        self.tier_stats["invalidations_published"] += 1
+
     async def cleanup(self):
+        if self._listener_task:
+            self._listener_task.cancel()
+            try:
+                await self._listener_task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._listener_task = None
+        if self._pubsub:
+            try:
+                await self._pubsub.aclose()
+            except Exception:
+                pass
+            self._pubsub = None
+        self._listening = False
         if self.redis:
             await self.redis.aclose()
         if self.redis_pool:
@@ -181,90 +316,271 @@ class CacheManager:
         except Exception:
             return False
 
+    def _local_reads_allowed(self) -> bool:
+        """Local copies may answer before Redis only while invalidations are being received"""
+        return self.near_cache and self._listening and self.consistency_window > 0
+
     async def get(self, key: str, default: Any = None) -> Any:
-        start_time = datetime.now()
+        return (await self.get_many([key], default))[key]
+
+    async def get_many(self, keys: List[str], default: Any = None) -> Dict[str, Any]:
+        """
+        Values of ``keys`` with one MGET for those not answered by the local tier.
+
+        - default: Value reported for keys that are not cached.
+        """
+        start_time = time.perf_counter()
+        results: Dict[str, Any] = {}
+        remote: List[str] = []
+        for key in dict.fromkeys(keys):
+            if self.redis is None or self._local_reads_allowed():
+                max_age = None if self.redis is None else self.consistency_window
+                value = self._get_local(key, max_age)
+                if value is not _MISSING:
+                    results[key] = self._record_hit("local_hits", start_time, value)
+                    continue
+                if self.redis is None:
+                    results[key] = self._record_miss(start_time, default)
+                    continue
+            remote.append(key)
+        if not remote:
+            return results
+
+        version = self._local_version
         try:
-            if self.redis:
-                value = await self.redis.get(key)
-                if value is not None:
-                    response_time = (datetime.now() - start_time).total_seconds()
-                    self.metrics.update_hit(response_time)
-                    return json.loads(value)
-            with self._local_cache_lock:
-                if key in self._local_cache:
-                    value, expiry = self._local_cache[key]
-                    if datetime.now() < expiry:
-                        response_time = (datetime.now() - start_time).total_seconds()
-                        self.metrics.update_hit(response_time)
-                        return value
-                    else:
-                        self._local_cache.pop(key, None)
-            response_time = (datetime.now() - start_time).total_seconds()
-            self.metrics.update_miss(response_time)
-            return default
+            raw_values = await self.redis.mget(remote)
         except Exception as e:
-            logger.warning(f"Cache get error for key {key}: {e}")
-            response_time = (datetime.now() - start_time).total_seconds()
-            self.metrics.update_miss(response_time)
-            return default
+            logger.warning(f"Cache get error for keys {remote}: {e}")
+            # Serve local copies regardless of age while Redis is failing
+            for key in remote:
+                value = self._get_local(key, None)
+                results[key] = (
+                    self._record_miss(start_time, default)
+                    if value is _MISSING
+                    else self._record_hit("local_hits", start_time, value)
+                )
+            return results
+
+        for key, raw in zip(remote, raw_values):
+            if raw is None:
+                self._drop_local(key)
+                results[key] = self._record_miss(start_time, default)
+                continue
+            try:
+                value = self.codec.decode(raw)
+            except Exception as e:
+                logger.warning(f"Cache decode error for key {key}: {e}")
+                results[key] = self._record_miss(start_time, default)
+                continue
+            self._store_local(key, value, None, version)
+            results[key] = self._record_hit("redis_hits", start_time, value)
+        return results
 
     async def set(self, key: str, value: Any, ttl: Optional[int] = None) -> bool:
+        return await self.set_many({key: value}, ttl)
+
+    async def set_many(
+        self,
+        values: Dict[str, Any],
+        ttl: Optional[int] = None,
+        ttls: Optional[Dict[str, Optional[int]]] = None,
+    ) -> bool:
+        """
+        Write all ``values`` in one pipelined round trip.
+
+        - ttl: Expiry in seconds for keys without an entry in ``ttls``; None keeps them until evicted.
+        - ttls: Per-key expiry overriding ``ttl``.
+        """
+        ttls = ttls or {}
         try:
-            serialized_value = json.dumps(value)
-            if self.redis:
-                if ttl:
-                    await self.redis.setex(key, ttl, serialized_value)
-                else:
-                    await self.redis.set(key, serialized_value)
-            expiry = datetime.now() + timedelta(seconds=ttl or CacheStrategy.TTL_MEDIUM)
-            with self._local_cache_lock:
-                self._local_cache[key] = (value, expiry)
-            self._cleanup_local_cache()
+            encoded = (
+                {key: self.codec.encode(value) for key, value in values.items()}
+                if self.redis
+                else {}
+            )
+        except Exception as e:
+            logger.warning(f"Cache encode error for keys {list(values)}: {e}")
+            return False
+        try:
+            if encoded:
+                async with self.redis.pipeline(transaction=False) as pipe:
+                    for key, serialized_value in encoded.items():
+                        key_ttl = ttls.get(key, ttl)
+                        if key_ttl:
+                            pipe.setex(key, key_ttl, serialized_value)
+                        else:
+                            pipe.set(key, serialized_value)
+                    self._queue_invalidation(pipe, list(encoded))
+                    await pipe.execute()
+            for key, value in values.items():
+                self._store_local(key, value, ttls.get(key, ttl))
             return True
         except Exception as e:
-            logger.warning(f"Cache set error for key {key}: {e}")
+            logger.warning(f"Cache set error for keys {list(values)}: {e}")
             try:
-                expiry = datetime.now() + timedelta(
-                    seconds=ttl or CacheStrategy.TTL_MEDIUM
-                )
-                with self._local_cache_lock:
-                    self._local_cache[key] = (value, expiry)
-                self._cleanup_local_cache()
+                for key, value in values.items():
+                    self._store_local(key, value, ttls.get(key, ttl))
                 return True
             except Exception as local_e:
                 logger.error(f"Local cache set error: {local_e}")
                 return False
 
-    def _cleanup_local_cache(self):
-        """Thread-safe cleanup of local cache"""
+    async def mutate(
+        self,
+        updates: Dict[str, Callable[[Any], Any]],
+        ttl: Optional[int] = None,
+        ttls: Optional[Dict[str, Optional[int]]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Read every key of ``updates`` in one round trip, apply its function to
+        the current value (None when missing) and write the results in another.
+        Not atomic: a concurrent writer of the same key may be overwritten.
+        """
+        current = await self.get_many(list(updates))
+        values = {key: update(current[key]) for key, update in updates.items()}
+        await self.set_many(values, ttl, ttls)
+        return values
+
+    async def list_append(
+        self,
+        key: str,
+        items: List[Any],
+        max_length: Optional[int] = None,
+        ttl: Optional[int] = None,
+    ) -> bool:
+        """
+        Append ``items`` to the list at ``key``, keep its last ``max_length`` and
+        refresh its expiry in one atomic pipeline (RPUSH + LTRIM + EXPIRE). Lists
+        are not held in the near-cache; without Redis they live in the local tier.
+        """
+        if not items:
+            return True
+        if self.redis:
+            try:
+                encoded = [self.codec.encode(item) for item in items]
+            except Exception as e:
+                logger.warning(f"Cache encode error for list {key}: {e}")
+                return False
+            try:
+                async with self.redis.pipeline(transaction=True) as pipe:
+                    pipe.rpush(key, *encoded)
+                    if max_length:
+                        pipe.ltrim(key, -max_length, -1)
+                    if ttl:
+                        pipe.expire(key, ttl)
+                    await pipe.execute()
+                return True
+            except Exception as e:
+                logger.warning(f"Cache list append error for key {key}: {e}")
+
+        current = self._get_local(key, None)
+        values = (list(current) if isinstance(current, list) else []) + list(items)
+        self._store_local(key, values[-max_length:] if max_length else values, ttl)
+        return True
+
+    async def list_range(self, key: str, count: Optional[int] = None) -> List[Any]:
+        """Last ``count`` items of the list at ``key``, oldest first; the whole list when None"""
+        start = -count if count else 0
+        if self.redis:
+            try:
+                raw_items = await self.redis.lrange(key, start, -1)
+                return [self.codec.decode(raw) for raw in raw_items]
+            except Exception as e:
+                logger.warning(f"Cache list read error for key {key}: {e}")
+
+        current = self._get_local(key, None)
+        if not isinstance(current, list):
+            return []
+        return current[start:]
+
+    def batch(self) -> "CacheWriteBatch":
+        """Queue writes and send them together with ``flush``"""
+        return CacheWriteBatch(self)
+
+    async def delete(self, key: str) -> bool:
+        """Remove ``key`` from Redis and from every worker's local tier"""
+        self._drop_local(key)
+        if not self.redis:
+            return True
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.delete(key)
+                self._queue_invalidation(pipe, [key])
+                await pipe.execute()
+            return True
+        except Exception as e:
+            logger.warning(f"Cache delete error for key {key}: {e}")
+            return False
+
+    def _record_hit(self, tier: str, start_time: float, value: Any) -> Any:
+        self.tier_stats[tier] += 1
+        self.metrics.update_hit(time.perf_counter() - start_time)
+        return value
+
+    def _record_miss(self, start_time: float, default: Any) -> Any:
+        self.tier_stats["misses"] += 1
+        self.metrics.update_miss(time.perf_counter() - start_time)
+        return default
+
+    def _get_local(self, key: str, max_age: Optional[float]) -> Any:
+        """Local copy of ``key`` if unexpired and, when ``max_age`` is given, cached that recently"""
+        now = time.monotonic()
+        with self._local_cache_lock:
+            entry = self._local_cache.get(key)
+            if entry is None:
+                return _MISSING
+            value, expires_at, cached_at = entry
+            if now >= expires_at:
+                del self._local_cache[key]
+                return _MISSING
+            if max_age is not None and now - cached_at > max_age:
+                return _MISSING
+            self._local_cache.move_to_end(key)
+            return value
+
+    def _store_local(
+        self, key: str, value: Any, ttl: Optional[int], version: Optional[int] = None
+    ):
+        """
+        Keep a local copy of ``key``, evicting the least recently used past the size limit.
+
+        - version: ``_local_version`` seen before a Redis read; the copy is skipped if it changed.
+        """
+        now = time.monotonic()
+        with self._local_cache_lock:
+            if version is not None and version != self._local_version:
+                return
+            if version is None:
+                self._local_version += 1
+            self._local_cache.pop(key, None)
+            self._local_cache[key] = (
+                value,
+                now + (ttl or CacheStrategy.TTL_MEDIUM),
+                now,
+            )
+            while len(self._local_cache) > self._local_cache_max_size:
+                self._local_cache.popitem(last=False)
+
+    def _drop_local(self, key: str):
         with self._local_cache_lock:
-            if len(self._local_cache) > self._local_cache_max_size:
-                now = datetime.now()
-                expired_keys = []
-                
-                # Collect expired keys safely
-                for key, (_, expiry) in list(self._local_cache.items()):
-                    if now >= expiry:
-                        expired_keys.append(key)
-                
-                # Remove expired keys
-                for key in expired_keys:
-                    self._local_cache.pop(key, None)
-                
-                # If still over limit, remove oldest entries
-                if len(self._local_cache) > self._local_cache_max_size:
-                    sorted_items = sorted(
-                        self._local_cache.items(),
-                        key=lambda x: x[1][1],  # Sort by expiry time
-                    )
-                    # Keep only the most recent entries
-                    self._local_cache = dict(sorted_items[-self._local_cache_max_size:])
+            self._local_version += 1
+            self._local_cache.pop(key, None)
+
+    def _clear_local_cache(self):
+        with self._local_cache_lock:
+            self._local_version += 1
+            self._local_cache.clear()
 
     async def get_stats(self) -> Dict[str, Any]:
         """Get cache performance statistics"""
         with self._local_cache_lock:
             local_cache_size = len(self._local_cache)
-            
+
+        lookups = (
+            self.tier_stats["local_hits"]
+            + self.tier_stats["redis_hits"]
+            + self.tier_stats["misses"]
+        )
         stats = {
             "local_cache_size": local_cache_size,
             "local_cache_max_size": self._local_cache_max_size,
@@ -276,6 +592,19 @@ class CacheManager:
                 "hit_rate": getattr(self.metrics, "hit_rate", 0.0),
                 "avg_response_time": getattr(self.metrics, "avg_response_time", 0.0),
             },
+            "codecs": self.codec.get_stats(),
+            "near_cache": {
+                "enabled": self.near_cache,
+                "listening": self._listening,
+                "consistency_window": self.consistency_window,
+                **self.tier_stats,
+                "local_hit_rate": (
+                    self.tier_stats["local_hits"] / lookups if lookups else 0.0
+                ),
+                "redis_hit_rate": (
+                    self.tier_stats["redis_hits"] / lookups if lookups else 0.0
+                ),
+            },
         }
 
         # Add Redis-specific stats if connected
@@ -295,3 +624,101 @@ class CacheManager:
                 stats["redis_error"] = str(e)
 
         return stats
+
+
+class CacheWriteBatch:
+    """
+    Cache writes queued during one request and sent together by ``flush``: one
+    read round trip for the keys that are appended to or mutated, then one
+    pipelined write of every key, concurrently with one pipeline per pushed
+    list. Managers without the bulk methods get one get/set per key.
+    """
+
+    def __init__(self, cache_manager):
+        self.cache_manager = cache_manager
+        # (key, new value from current value, ttl, whether it reads the current value)
+        self._ops: List[Tuple[str, Callable[[Any], Any], Optional[int], bool]] = []
+        # key -> (items, max length, ttl) appended to Redis lists
+        self._pushes: Dict[str, Tuple[List[Any], Optional[int], Optional[int]]] = {}
+
+    def set(self, key: str, value: Any, ttl: Optional[int] = None):
+        self._ops.append((key, lambda _current: value, ttl, False))
+
+    def mutate(self, key: str, update: Callable[[Any], Any], ttl: Optional[int] = None):
+        """Queue ``update(current value)``; the current value is None when the key is missing"""
+        self._ops.append((key, update, ttl, True))
+
+    def append(
+        self, key: str, item: Any, max_items: Optional[int] = None, ttl: Optional[int] = None
+    ):
+        """Queue adding ``item`` to the list at ``key``, keeping its last ``max_items``"""
+
+        def add(current: Any) -> List[Any]:
+            items = list(current) if isinstance(current, list) else []
+            items.append(item)
+            return items[-max_items:] if max_items else items
+
+        self.mutate(key, add, ttl)
+
+    def push(
+        self, key: str, item: Any, max_items: Optional[int] = None, ttl: Optional[int] = None
+    ):
+        """
+        Queue appending ``item`` to the list at ``key`` without reading it. Managers
+        without list operations get a read-modify-write ``append`` instead.
+        """
+        if not hasattr(self.cache_manager, "list_append"):
+            self.append(key, item, max_items, ttl)
+            return
+        items = self._pushes.get(key, ([], None, None))[0]
+        items.append(item)
+        self._pushes[key] = (items, max_items, ttl)
+
+    def __len__(self) -> int:
+        return len(self._ops) + sum(len(items) for items, _, _ in self._pushes.values())
+
+    async def flush(self) -> int:
+        """Apply the queued writes in order; returns the number of keys written"""
+        ops, self._ops = self._ops, []
+        pushes, self._pushes = self._pushes, {}
+        if not ops and not pushes:
+            return 0
+
+        # Only keys whose first queued write depends on the cached value are read
+        first_op: Dict[str, bool] = {}
+        for key, _, _, reads_current in ops:
+            first_op.setdefault(key, reads_current)
+        current = await self._read([key for key, reads in first_op.items() if reads])
+
+        values: Dict[str, Any] = {}
+        ttls: Dict[str, Optional[int]] = {}
+        for key, update, ttl, _ in ops:
+            try:
+                values[key] = update(values[key] if key in values else current.get(key))
+                ttls[key] = ttl
+            except Exception as e:
+                logger.warning(f"Queued cache update for key {key} failed: {e}")
+        await asyncio.gather(
+            self._write(values, ttls),
+            *(
+                self.cache_manager.list_append(key, items, max_items, ttl)
+                for key, (items, max_items, ttl) in pushes.items()
+            ),
+        )
+        return len(values) + len(pushes)
+
+    async def _read(self, keys: List[str]) -> Dict[str, Any]:
+        if not keys:
+            return {}
+        if hasattr(self.cache_manager, "get_many"):
+            return await self.cache_manager.get_many(keys)
+        return {key: await self.cache_manager.get(key) for key in keys}
+
+    async def _write(self, values: Dict[str, Any], ttls: Dict[str, Optional[int]]):
+        if not values:
+            return
+        if hasattr(self.cache_manager, "set_many"):
+            await self.cache_manager.set_many(values, ttls=ttls)
+            return
+        for key, value in values.items():
+            await self.cache_manager.set(key, value, ttl=ttls.get(key))
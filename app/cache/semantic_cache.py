@@ -0,0 +1,235 @@
+"""
+Semantic response cache
+
+Answers a prompt with the response cached for the same prompt or for a
+paraphrase of it. A lookup first tries the normalized prompt; on a miss the
+prompt is embedded with the sentence-transformer and the nearest cached
+prompt of the same scope is looked up in a small HNSW index, and served
+when their cosine similarity reaches the threshold.
+
+Scopes (for chat: model, quality level and intent) never share entries, so
+a response is only reused under the conditions it was generated for.
+Entries expire after a TTL, and beyond ``max_entries`` the least recently
+used are evicted. The cache lives in the worker's memory.
+
+Prompts are embedded with the native search engine's query encoder when
+the app provides it (``use_encoder``), so the worker holds one copy of the
+model; only without one does the cache load EMBEDDING_MODEL_NAME itself.
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.config import get_settings
+from app.core.logging import get_logger
+from app.math.hnsw_index import HNSWIndex
+from app.search.query_encoder import BatchingQueryEncoder
+from app.search.result_cache import normalize_query
+
+logger = get_logger(__name__)
+
+# Nearest cached prompts inspected per lookup, so a few expired neighbours do not hide a live one
+SEARCH_NEIGHBOURS = 4
+
+# A scope's graph is rebuilt once this share of its entries has been evicted or replaced
+COMPACTION_THRESHOLD = 0.5
+
+
+@dataclass
+class SemanticCacheHit:
+    response: Any
+    kind: str  # "exact" or "semantic"
+    similarity: float
+    cached_prompt: str
+
+
+@dataclass
+class _Entry:
+    scope: str
+    prompt: str
+    response: Any
+    expires_at: float
+
+
+class SemanticResponseCache:
+    """Exact and embedding-similarity response cache with per-scope HNSW indexes"""
+
+    def __init__(
+        self,
+        model: Optional[Any] = None,
+        threshold: Optional[float] = None,
+        max_entries: Optional[int] = None,
+        ttl_seconds: Optional[float] = None,
+        encoder: Optional[BatchingQueryEncoder] = None,
+    ):
+        """
+        - model: Encoder with a sentence-transformers ``encode``; EMBEDDING_MODEL_NAME
+          is loaded on first use when neither it nor ``encoder`` is given.
+        - threshold: Cosine similarity from which a cached prompt counts as the same question.
+        - max_entries: Cached responses across all scopes.
+        - ttl_seconds: Lifetime of a cached response.
+        - encoder: Existing micro-batching encoder to share, e.g. the search engine's.
+        """
+        settings = get_settings()
+        self.threshold = settings.semantic_cache_threshold if threshold is None else threshold
+        self.max_entries = settings.semantic_cache_max_entries if max_entries is None else max_entries
+        self.ttl = settings.cache_ttl_responses if ttl_seconds is None else ttl_seconds
+        self._model = model
+        self._encoder: Optional[BatchingQueryEncoder] = encoder
+        self._load_lock: Optional[asyncio.Lock] = None
+        # Set when the encoder cannot be loaded; only exact hits are served then
+        self.disabled_reason: Optional[str] = None
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._exact: Dict[Tuple[str, str], str] = {}
+        self._indexes: Dict[str, HNSWIndex] = {}
+        self._next_id = 0
+        self.stats = {
+            'lookups': 0, 'exact_hits': 0, 'semantic_hits': 0, 'misses': 0,
+            'stores': 0, 'evictions': 0, 'expirations': 0,
+        }
+
+    def use_encoder(self, encoder: BatchingQueryEncoder):
+        """Embed prompts with ``encoder`` instead of a model of the cache's own"""
+        self._encoder = encoder
+        self.disabled_reason = None
+
+    @staticmethod
+    def scope_key(scope: Sequence[Any]) -> str:
+        return "|".join(str(getattr(part, "value", part)) for part in scope)
+
+    async def get(self, prompt: str, scope: Sequence[Any]) -> Optional[SemanticCacheHit]:
+        """Cached response for ``prompt`` or a paraphrase of it within ``scope``, or None"""
+        self.stats['lookups'] += 1
+        key, text = self.scope_key(scope), normalize_query(prompt)
+        now = time.monotonic()
+
+        entry_id = self._exact.get((key, text))
+        entry = self._live_entry(entry_id, now) if entry_id is not None else None
+        if entry is not None:
+            self.stats['exact_hits'] += 1
+            return SemanticCacheHit(entry.response, "exact", 1.0, entry.prompt)
+
+        index = self._indexes.get(key)
+        vector = await self._embed(text) if index is not None and len(index) else None
+        if vector is None:
+            self.stats['misses'] += 1
+            return None
+
+        for entry_id, distance in index.search(vector, k=SEARCH_NEIGHBOURS):
+            entry = self._live_entry(entry_id, now)
+            if entry is None:
+                continue
+            # Squared L2 distance between unit vectors is 2 - 2 * cosine
+            similarity = 1.0 - float(distance) / 2.0
+            if similarity >= self.threshold:
+                self.stats['semantic_hits'] += 1
+                return SemanticCacheHit(entry.response, "semantic", similarity, entry.prompt)
+            break
+        self.stats['misses'] += 1
+        return None
+
+    async def put(self, prompt: str, scope: Sequence[Any], response: Any, ttl: Optional[float] = None):
+        """Cache ``response`` for ``prompt`` within ``scope``, replacing an entry for the same prompt"""
+        if self.max_entries <= 0:
+            return
+        key, text = self.scope_key(scope), normalize_query(prompt)
+        vector = await self._embed(text)
+
+        previous = self._exact.get((key, text))
+        if previous is not None:
+            self._remove(previous)
+        entry_id = str(self._next_id)
+        self._next_id += 1
+        self._entries[entry_id] = _Entry(key, text, response, time.monotonic() + (ttl or self.ttl))
+        self._exact[(key, text)] = entry_id
+        if vector is not None:
+            index = self._indexes.get(key)
+            if index is None:
+                index = self._indexes[key] = HNSWIndex(len(vector), max_connections=16, ef_search=32)
+            index.add_documents(vector[np.newaxis, :], [entry_id])
+        self.stats['stores'] += 1
+
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+            self.stats['evictions'] += 1
+
+    def clear(self):
+        self._entries.clear()
+        self._exact.clear()
+        self._indexes.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_stats(self) -> Dict[str, Any]:
+        hits = self.stats['exact_hits'] + self.stats['semantic_hits']
+        return {
+            **self.stats,
+            'hit_rate': hits / self.stats['lookups'] if self.stats['lookups'] else 0.0,
+            'entries': len(self._entries),
+            'scopes': len(self._indexes),
+            'threshold': self.threshold,
+            'semantic_enabled': self.disabled_reason is None,
+        }
+
+    def _live_entry(self, entry_id: str, now: float) -> Optional[_Entry]:
+        entry = self._entries.get(entry_id)
+        if entry is None:
+            return None
+        if entry.expires_at <= now:
+            self._remove(entry_id)
+            self.stats['expirations'] += 1
+            return None
+        self._entries.move_to_end(entry_id)
+        return entry
+
+    def _remove(self, entry_id: str):
+        entry = self._entries.pop(entry_id)
+        self._exact.pop((entry.scope, entry.prompt), None)
+        index = self._indexes.get(entry.scope)
+        if index is None or not index.remove_document(entry_id):
+            return
+        if len(index) == 0:
+            del self._indexes[entry.scope]
+        elif index.tombstone_ratio > COMPACTION_THRESHOLD:
+            index.compact()
+
+    async def _embed(self, text: str) -> Optional[np.ndarray]:
+        """Unit-length embedding of ``text``, or None when no encoder is available"""
+        if self.disabled_reason is not None:
+            return None
+        if self._encoder is None:
+            if self._load_lock is None:
+                self._load_lock = asyncio.Lock()
+            async with self._load_lock:
+                if self._encoder is None and not await self._load_encoder():
+                    return None
+        vector = np.asarray(await self._encoder.encode(text), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else None
+
+    async def _load_encoder(self) -> bool:
+        settings = get_settings()
+        try:
+            if self._model is None:
+                from sentence_transformers import SentenceTransformer
+
+                self._model = await asyncio.to_thread(
+                    SentenceTransformer, settings.EMBEDDING_MODEL_NAME or "all-MiniLM-L6-v2", device="cpu"
+                )
+        except Exception as e:
+            self.disabled_reason = str(e)
+            logger.warning(f"Semantic cache encoder unavailable, serving exact hits only: {e}")
+            return False
+        self._encoder = BatchingQueryEncoder(
+            self._model,
+            max_batch_size=settings.QUERY_BATCH_MAX_SIZE,
+            max_wait_ms=settings.QUERY_BATCH_WAIT_MS,
+            cache_size=settings.QUERY_EMBEDDING_CACHE_SIZE,
+        )
+        return True
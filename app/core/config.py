@@ -127,6 +127,22 @@ class Settings(BaseSettings):
     cache_ttl_default: int = 3600  # 1 hour
     cache_ttl_routing: int = 300  # 5 minutes
     cache_ttl_responses: int = 1800  # 30 minutes
+    cache_near_cache_enabled: bool = True  # serve fresh per-worker copies before Redis, invalidated over pub/sub
+    cache_consistency_window: float = 10.0  # seconds a local copy is served without revalidating against Redis
+    cache_invalidation_channel: str = "cache:invalidate"  # pub/sub channel carrying invalidated keys
+    cache_local_max_size: int = 1000  # entries kept in each worker's local tier
+    cache_serializer: str = "msgpack"  # msgpack, orjson or json; entries of every format stay readable
+    cache_compression: str = "zstd"  # zstd, lz4, zlib or none
+    cache_compression_threshold: int = 1024  # serialized bytes from which cached values are compressed
+    cache_compression_level: int = 3
+    conversation_history_max_turns: int = 50  # turns kept per session
+    conversation_history_ttl: int = 604800  # seconds a session's history outlives its last turn
+    conversation_history_prompt_turns: int = 10  # most recent turns loaded for prompt building
+    semantic_cache_enabled: bool = True  # reuse responses of identical or paraphrased prompts
+    semantic_cache_threshold: float = 0.9  # cosine similarity from which two prompts count as the same question
+    semantic_cache_max_entries: int = 10000  # responses kept per worker, least recently used evicted first
+    single_flight_enabled: bool = True  # concurrent identical generations and searches share one execution
+    single_flight_temperature_step: float = 0.1  # temperatures within one step coalesce
 
     # Performance Targets
     target_response_time: float = 2.5
@@ -136,8 +152,37 @@ class Settings(BaseSettings):
     EMBEDDING_DIM: int = 384
     USE_GPU: bool = False
     INDEX_PATH: str = "indexes"
+    EMBEDDING_CACHE_ENABLED: bool = True  # reuse document embeddings across rebuilds, uploads and restarts
+    EMBEDDING_CACHE_PATH: str = ""  # defaults to <INDEX_PATH>/embedding_cache
+    INDEX_MMAP: bool = True  # memory-map snapshot arrays so workers share pages
+    INDEX_VERIFY_CHECKSUMS: bool = False  # verify every snapshot file's sha256 on load
+    INDEX_COMPACTION_THRESHOLD: float = 0.2  # tombstone ratio that triggers a background graph rebuild
+    VECTOR_INDEX_MODE: str = "hnsw"  # hnsw (float vectors in RAM) or ivfpq (compressed codes)
+    VECTOR_STORAGE: str = "float32"  # document vector and HNSW storage: float32, float16 or int8
+    IVF_NLIST: int = 0  # IVF inverted lists, 0 sizes them from the corpus
+    IVF_NPROBE: int = 16  # IVF lists visited per query
+    PQ_SUBSPACES: int = 16  # PQ code bytes per document in ivfpq mode
+    EXACT_RERANK: int = 100  # ivfpq mode: top candidates re-scored with exact float vectors, 0 disables
+    INGEST_BATCH_SIZE: int = 256  # NDJSON ingestion: documents encoded and indexed together
+    INGEST_MAX_PENDING_BATCHES: int = 2  # parsed batches buffered before the upload stream is paused
+    SEARCH_SHARDS: int = 0  # worker processes the corpus is partitioned across, 0 or 1 keeps one in-process engine
+    SEARCH_CALIBRATION_SIZE: int = 2000  # synthetic documents search profiles are calibrated on when indexes are rebuilt or ingested without a table, which is then saved with the snapshot; 0 disables
+    SEARCH_CALIBRATE_ON_STARTUP: bool = False  # also calibrate at startup when the loaded snapshot holds no table
+    SEARCH_CALIBRATION_QUERIES: int = 50  # queries timed per search profile during calibration
     CHUNK_SIZE: int = 1000
     CHUNK_OVERLAP: int = 100
+    DOCUMENT_PROCESS_WORKERS: int = 2  # processes extracting PDF/DOCX/HTML/JSON text, 0 extracts in a thread
+    UPLOAD_SPOOL_MAX_MEMORY: int = 8 * 1024 * 1024  # uploads up to this size stay in memory, larger ones spool to disk
+    UPLOAD_MAX_BYTES: int = 100 * 1024 * 1024  # larger uploads are rejected with 413, 0 for no limit
+    UPLOAD_SPOOL_DIR: str = ""  # directory for spooled uploads, default temp dir
+    SEARCH_SCORING_MODE: str = "vectorized"  # vectorized or per_candidate
+    BM25_CANDIDATES: int = 100  # BM25 top-k added to the candidate pool, 0 disables
+    QUERY_BATCH_MAX_SIZE: int = 64  # queries encoded together by the micro-batching encoder
+    QUERY_BATCH_WAIT_MS: float = 3.0  # how long the first query of a batch waits for company
+    QUERY_EMBEDDING_CACHE_SIZE: int = 1024  # LRU entries of recent query embeddings
+    SEARCH_RESULT_CACHE_SIZE: int = 1000  # cached result lists, 0 disables the result cache
+    SEARCH_RESULT_CACHE_MAX_BYTES: int = 32 * 1024 * 1024  # estimated bytes the cached results may hold
+    SEARCH_RESULT_CACHE_TTL_SECONDS: float = 300.0  # lifetime of a cached result list
     target_local_processing: float = 0.85
     target_cache_hit_rate: float = 0.80
 
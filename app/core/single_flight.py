@@ -0,0 +1,161 @@
+"""
+Single-flight request coalescing
+
+Concurrent calls with the same key share one execution: the first caller
+starts the work, and callers arriving while it is in flight await the same
+result instead of repeating it. Once it completes the key is released, so
+later calls run afresh; caching finished results is left to the caches.
+
+Streams are shared the same way. Every subscriber receives the complete
+chunk sequence of the one underlying stream, including chunks produced
+before it joined.
+
+The shared work runs in its own task. A caller that is cancelled or times
+out leaves the others waiting, and the work is only cancelled once no
+caller is waiting for it any more.
+"""
+
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, List, Optional
+
+from app.core.config import get_settings
+
+
+def temperature_bucket(temperature: float, step: Optional[float] = None) -> int:
+    """Temperatures within the same ``step`` wide bucket coalesce"""
+    step = step or get_settings().single_flight_temperature_step
+    return int(round(temperature / step))
+
+
+class _Flight:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class _SharedStream:
+    """Pumps one async iterator into a buffer that any number of subscribers replay"""
+
+    def __init__(self, source: AsyncIterator[Any]):
+        self.chunks: List[Any] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self._changed = asyncio.Event()
+        self.task = asyncio.ensure_future(self._pump(source))
+
+    async def _pump(self, source: AsyncIterator[Any]):
+        try:
+            async for chunk in source:
+                self.chunks.append(chunk)
+                self._notify()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done = True
+            self._notify()
+
+    def _notify(self):
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    async def subscribe(self) -> AsyncIterator[Any]:
+        position = 0
+        while True:
+            if position < len(self.chunks):
+                yield self.chunks[position]
+                position += 1
+            elif self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            else:
+                await self._changed.wait()
+
+
+class SingleFlight:
+    """Coalesces concurrent identical calls and streams by key"""
+
+    def __init__(self, name: str, enabled: Optional[bool] = None):
+        """
+        - name: Reported with the stats.
+        - enabled: Defaults to the single_flight_enabled setting; when off every call runs on its own.
+        """
+        self.name = name
+        self.enabled = get_settings().single_flight_enabled if enabled is None else enabled
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._streams: Dict[Hashable, _SharedStream] = {}
+        self.stats = {
+            'calls': 0, 'executions': 0, 'coalesced': 0,
+            'stream_calls': 0, 'stream_executions': 0, 'stream_coalesced': 0,
+        }
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Result of ``fn()``, shared with every concurrent call under ``key``"""
+        self.stats['calls'] += 1
+        if not self.enabled:
+            self.stats['executions'] += 1
+            return await fn()
+
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(fn()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _: self._release(self._flights, key, flight))
+            self.stats['executions'] += 1
+        else:
+            self.stats['coalesced'] += 1
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                # Released now, so a newcomer starts afresh instead of joining the cancelled task
+                self._release(self._flights, key, flight)
+                flight.task.cancel()
+
+    async def stream(self, key: Hashable, factory: Callable[[], AsyncIterator[Any]]) -> AsyncIterator[Any]:
+        """Chunks of ``factory()``, with one underlying stream per concurrent ``key``"""
+        self.stats['stream_calls'] += 1
+        if not self.enabled:
+            self.stats['stream_executions'] += 1
+            async for chunk in factory():
+                yield chunk
+            return
+
+        shared = self._streams.get(key)
+        if shared is None:
+            shared = _SharedStream(factory())
+            self._streams[key] = shared
+            shared.task.add_done_callback(lambda _: self._release(self._streams, key, shared))
+            self.stats['stream_executions'] += 1
+        else:
+            self.stats['stream_coalesced'] += 1
+
+        shared.subscribers += 1
+        try:
+            async for chunk in shared.subscribe():
+                yield chunk
+        finally:
+            shared.subscribers -= 1
+            if shared.subscribers == 0 and not shared.task.done():
+                self._release(self._streams, key, shared)
+                shared.task.cancel()
+
+    @staticmethod
+    def _release(registry: Dict[Hashable, Any], key: Hashable, entry: Any):
+        if registry.get(key) is entry:
+            del registry[key]
+
+    def get_stats(self) -> Dict[str, Any]:
+        calls = self.stats['calls'] + self.stats['stream_calls']
+        coalesced = self.stats['coalesced'] + self.stats['stream_coalesced']
+        return {
+            'name': self.name,
+            'enabled': self.enabled,
+            **self.stats,
+            'coalesce_rate': coalesced / calls if calls else 0.0,
+            'in_flight': len(self._flights) + len(self._streams),
+        }
@@ -1,16 +1,19 @@
 """
-Dependency providers for FastAPI DI: ModelManager and CacheManager singletons.
+Dependency providers for FastAPI DI: ModelManager, CacheManager and
+SemanticResponseCache singletons.
 """
 
 from typing import Any, Optional
 
 from app.cache.redis_client import CacheManager
+from app.cache.semantic_cache import SemanticResponseCache
 from app.core.config import get_settings
 from app.models.manager import ModelManager
 
 # Global references to initialized instances
 _initialized_model_manager: Optional[ModelManager] = None
 _initialized_cache_manager: Optional[CacheManager] = None
+_initialized_semantic_cache: Optional[SemanticResponseCache] = None
 
 
 def set_initialized_model_manager(model_manager: ModelManager) -> None:
@@ -25,6 +28,17 @@ def set_initialized_cache_manager(cache_manager: CacheManager) -> None:
     _initialized_cache_manager = cache_manager
 
 
+def set_initialized_semantic_cache(semantic_cache: Optional[SemanticResponseCache]) -> None:
+    """Set the shared SemanticResponseCache instance for dependency injection."""
+    global _initialized_semantic_cache
+    _initialized_semantic_cache = semantic_cache
+
+
+def get_semantic_cache() -> Optional[SemanticResponseCache]:
+    """Get the shared SemanticResponseCache; None when disabled or not yet initialized."""
+    return _initialized_semantic_cache
+
+
 def get_model_manager(request: Any = None) -> ModelManager:
     """Get the ModelManager instance, preferring the initialized one."""
     global _initialized_model_manager
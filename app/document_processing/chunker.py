@@ -0,0 +1,65 @@
+"""
+Streaming word chunker
+
+Text arrives as arbitrary pieces (a word may straddle two of them) and leaves
+as chunks of ``chunk_size`` whitespace-separated words, consecutive chunks
+sharing ``chunk_overlap`` words. Only the current window is held, so memory
+is O(chunk) however long the text is.
+"""
+
+from collections import deque
+from typing import Iterable, Iterator, List, Tuple
+
+
+class WordChunker:
+    """Incremental chunker: ``feed`` pieces, then ``finish`` for the last partial chunk"""
+
+    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 100):
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be at least 1")
+        self.chunk_size = chunk_size
+        # An overlap of a whole chunk would never advance
+        self.chunk_overlap = max(0, min(chunk_overlap, chunk_size - 1))
+        self._window: deque = deque()
+        self._fresh = 0
+        self._carry = ""
+
+    def feed(self, piece: str) -> List[Tuple[str, int]]:
+        """(chunk text, word count) of every chunk completed by ``piece``"""
+        if not piece:
+            return []
+        text = self._carry + piece
+        words = text.split()
+        # A word running up to the end of the piece may continue in the next one
+        self._carry = words.pop() if words and not text[-1].isspace() else ""
+        return self._add(words)
+
+    def finish(self) -> List[Tuple[str, int]]:
+        """The trailing chunk, if it holds words not already emitted"""
+        chunks = self._add([self._carry] if self._carry else [])
+        self._carry = ""
+        if self._fresh:
+            chunks.append((" ".join(self._window), len(self._window)))
+        self._window.clear()
+        self._fresh = 0
+        return chunks
+
+    def _add(self, words: List[str]) -> List[Tuple[str, int]]:
+        chunks = []
+        for word in words:
+            self._window.append(word)
+            self._fresh += 1
+            if len(self._window) >= self.chunk_size:
+                chunks.append((" ".join(self._window), len(self._window)))
+                for _ in range(len(self._window) - self.chunk_overlap):
+                    self._window.popleft()
+                self._fresh = 0
+        return chunks
+
+
+def iter_chunks(pieces: Iterable[str], chunk_size: int = 1000, chunk_overlap: int = 100) -> Iterator[Tuple[str, int]]:
+    """Chunks of a stream of text pieces, as (text, word count)"""
+    chunker = WordChunker(chunk_size, chunk_overlap)
+    for piece in pieces:
+        yield from chunker.feed(piece)
+    yield from chunker.finish()
@@ -0,0 +1,171 @@
+"""
+Streaming text extractors by content type
+
+Each extractor takes a source (a file path, or the bytes of an in-memory
+upload as a bytes-like object) and yields the document's text in pieces, so
+no extractor needs the whole file in memory unless its format does (JSON).
+They are plain module-level functions so that ``extract_to_file`` can run
+them in a worker process.
+
+PDF and DOCX use ``pypdf`` and ``python-docx`` when installed, and fall back
+to a placeholder text otherwise.
+"""
+
+import codecs
+import io
+import json
+import os
+from html.parser import HTMLParser
+from typing import BinaryIO, Callable, Dict, Iterator, List, Union
+
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Bytes read from a source per step
+READ_BLOCK_BYTES = 1 << 20
+
+# A file path, or document bytes already in memory
+Source = Union[str, bytes, bytearray, memoryview]
+
+
+def source_size(source: Source) -> int:
+    return os.path.getsize(source) if isinstance(source, str) else memoryview(source).nbytes
+
+
+def open_source(source: Source) -> BinaryIO:
+    """Binary file object over a source, for parsers that want one"""
+    return open(source, 'rb') if isinstance(source, str) else io.BytesIO(source)
+
+
+def iter_byte_blocks(source: Source, block_size: int = READ_BLOCK_BYTES) -> Iterator[Union[bytes, memoryview]]:
+    """Blocks of a source; in-memory sources are sliced without copying"""
+    if not isinstance(source, str):
+        view = memoryview(source).cast('B')
+        for start in range(0, len(view), block_size):
+            yield view[start:start + block_size]
+        return
+    with open(source, 'rb') as handle:
+        while True:
+            block = handle.read(block_size)
+            if not block:
+                break
+            yield block
+
+
+def read_text_blocks(source: Source, block_size: int = READ_BLOCK_BYTES) -> Iterator[str]:
+    """UTF-8 text of a source block by block; invalid bytes are dropped"""
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='ignore')
+    for block in iter_byte_blocks(source, block_size):
+        text = decoder.decode(block)
+        if text:
+            yield text
+    tail = decoder.decode(b'', final=True)
+    if tail:
+        yield tail
+
+
+def extract_text(source: Source) -> Iterator[str]:
+    """Plain text and Markdown"""
+    yield from read_text_blocks(source)
+
+
+def extract_json(source: Source) -> Iterator[str]:
+    """JSON pretty-printed; a top-level list yields one item at a time"""
+    with open_source(source) as handle:
+        raw = handle.read()
+    try:
+        data = json.loads(raw.decode('utf-8'))
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        yield raw.decode('utf-8', errors='ignore')
+        return
+    del raw
+    if isinstance(data, dict):
+        yield json.dumps(data, indent=2)
+    elif isinstance(data, list):
+        for i, item in enumerate(data):
+            yield ('\n' if i else '') + json.dumps(item, indent=2)
+    else:
+        yield str(data)
+
+
+class _HTMLTextExtractor(HTMLParser):
+    def __init__(self):
+        super().__init__()
+        self.text: List[str] = []
+
+    def handle_data(self, data):
+        self.text.append(data)
+
+
+def extract_html(source: Source) -> Iterator[str]:
+    """Text nodes of an HTML document, space separated, parsed incrementally"""
+    parser = _HTMLTextExtractor()
+    first = True
+    for block in read_text_blocks(source):
+        parser.feed(block)
+        if parser.text:
+            yield ('' if first else ' ') + ' '.join(parser.text)
+            first = False
+            parser.text.clear()
+    parser.close()
+    if parser.text:
+        yield ('' if first else ' ') + ' '.join(parser.text)
+
+
+def extract_pdf(source: Source) -> Iterator[str]:
+    """Text of a PDF page by page"""
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        yield f"PDF content ({source_size(source)} bytes) - PDF processing not implemented"
+        return
+    with open_source(source) as handle:
+        for page in PdfReader(handle).pages:
+            yield (page.extract_text() or '') + '\n'
+
+
+def extract_doc(source: Source) -> Iterator[str]:
+    """Legacy Word documents"""
+    yield f"DOC content ({source_size(source)} bytes) - DOC processing not implemented"
+
+
+def extract_docx(source: Source) -> Iterator[str]:
+    """Text of a DOCX document paragraph by paragraph"""
+    try:
+        import docx
+    except ImportError:
+        yield f"DOCX content ({source_size(source)} bytes) - DOCX processing not implemented"
+        return
+    with open_source(source) as handle:
+        for paragraph in docx.Document(handle).paragraphs:
+            yield paragraph.text + '\n'
+
+
+EXTRACTORS: Dict[str, Callable[[Source], Iterator[str]]] = {
+    'text/plain': extract_text,
+    'application/json': extract_json,
+    'text/markdown': extract_text,
+    'application/pdf': extract_pdf,
+    'text/html': extract_html,
+    'application/msword': extract_doc,
+    'application/vnd.openxmlformats-officedocument.wordprocessingml.document': extract_docx,
+}
+
+# Formats whose text is the file itself, streamed without a parsing step
+PASSTHROUGH_TYPES = frozenset({'text/plain', 'text/markdown'})
+
+
+def extract_to_file(content_type: str, source: Source, target_path: str) -> int:
+    """
+    Run the extractor for ``content_type`` over ``source`` and write the
+    text to ``target_path`` as UTF-8 as it is produced. Returns the number of
+    characters written. Meant to run in a worker process.
+    """
+    extractor = EXTRACTORS.get(content_type, extract_text)
+    written = 0
+    with open(target_path, 'w', encoding='utf-8') as target:
+        for piece in extractor(source):
+            target.write(piece)
+            written += len(piece)
+    return written
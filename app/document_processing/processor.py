@@ -3,18 +3,24 @@ Document processing pipeline for various file formats
 """
 
 import os
-import json
 import tempfile
 import uuid
-from typing import Dict, List, Optional, Tuple
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import AsyncIterator, Dict, List, Optional
 from dataclasses import dataclass
 from pathlib import Path
 import asyncio
 from datetime import datetime, timezone
 
+from app.core.config import get_settings
 from app.core.logging import get_logger
+from app.document_processing.chunker import WordChunker, iter_chunks
+from app.document_processing.extractors import EXTRACTORS, PASSTHROUGH_TYPES, Source, extract_to_file, read_text_blocks
+from app.document_processing.spool import SpooledUpload
 
 logger = get_logger(__name__)
+settings = get_settings()
 
 @dataclass
 class DocumentChunk:
@@ -37,71 +43,114 @@ class ProcessedDocument:
 class DocumentProcessor:
     """
     Multi-format document processor for ultra-fast search integration
+
+    Files are never read whole: text formats stream from disk, other formats
+    are extracted in a process pool into a temporary text file that is then
+    streamed, and chunks are cut by a streaming chunker. ``stream_file`` and
+    ``stream_upload`` yield chunks with memory bounded by the chunk size;
+    ``process_file`` and ``process_upload`` additionally collect them and the
+    full text into a ProcessedDocument. Uploads are read from the
+    SpooledUpload in place, whether still in memory or spooled to disk.
     """
     
-    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 100):
+    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 100, max_workers: Optional[int] = None):
+        """
+        - max_workers: Extraction processes; 0 extracts in a thread instead.
+          Defaults to DOCUMENT_PROCESS_WORKERS.
+        """
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
-        self.supported_formats = {
-            'text/plain': self._process_text,
-            'application/json': self._process_json,
-            'text/markdown': self._process_markdown,
-            'application/pdf': self._process_pdf,
-            'text/html': self._process_html,
-            'application/msword': self._process_doc,
-            'application/vnd.openxmlformats-officedocument.wordprocessingml.document': self._process_docx
-        }
+        self.max_workers = settings.DOCUMENT_PROCESS_WORKERS if max_workers is None else max_workers
+        self.supported_formats = EXTRACTORS
+        self._pool: Optional[ProcessPoolExecutor] = None
         
     async def process_file(self, file_path: str, title: str = None, content_type: str = None) -> ProcessedDocument:
         """Process a file and return a ProcessedDocument"""
-        start_time = asyncio.get_event_loop().time()
-        
         try:
-            # Determine content type
-            if not content_type:
-                content_type = self._detect_content_type(file_path)
-            
-            # Read file content
-            with open(file_path, 'rb') as f:
-                file_content = f.read()
-            
-            # Process based on content type
-            if content_type in self.supported_formats:
-                processor = self.supported_formats[content_type]
-                content = await processor(file_content)
-            else:
-                # Fallback to text processing
-                content = file_content.decode('utf-8', errors='ignore')
-            
-            # Generate document ID
-            doc_id = f"doc_{uuid.uuid4().hex[:8]}_{int(datetime.now().timestamp())}"
-            
-            # Create metadata
             metadata = {
                 'file_path': file_path,
-                'content_type': content_type,
-                'file_size': len(file_content),
-                'processing_time': asyncio.get_event_loop().time() - start_time,
-                'processed_at': datetime.now(timezone.utc).isoformat()
+                'content_type': content_type or self._detect_content_type(file_path),
+                'file_size': os.path.getsize(file_path),
             }
-            
-            # Create chunks
-            chunks = await self._create_chunks(content, doc_id, metadata)
-            
-            processing_time = asyncio.get_event_loop().time() - start_time
-            
-            return ProcessedDocument(
-                id=doc_id,
-                title=title or os.path.basename(file_path),
-                content=content,
-                chunks=chunks,
-                metadata=metadata,
-                processing_time=processing_time
-            )
-            
+            return await self._process_source(file_path, title or os.path.basename(file_path), metadata)
         except Exception as e:
             logger.error(f"Failed to process file {file_path}: {str(e)}")
             raise
+
+    async def process_upload(self, upload: SpooledUpload, title: str, content_type: str = None,
+                             filename: str = None) -> ProcessedDocument:
+        """Process a received upload where it lies, without copying it to a file first"""
+        try:
+            metadata = self.upload_metadata(upload, content_type, filename)
+            return await self._process_source(upload.source(), title, metadata)
+        except Exception as e:
+            logger.error(f"Failed to process upload {filename or title}: {str(e)}")
+            raise
+
+    async def _process_source(self, source: Source, title: str, metadata: Dict) -> ProcessedDocument:
+        start_time = asyncio.get_event_loop().time()
+        doc_id = self.new_document_id()
+        metadata = {
+            **metadata,
+            'processing_time': 0.0,
+            'processed_at': datetime.now(timezone.utc).isoformat()
+        }
+
+        # Extract and chunk in one pass over the text
+        pieces: List[str] = []
+        chunks = [chunk async for chunk in self._chunk_stream(
+            self._tee(self._text_pieces(source, metadata['content_type']), pieces), doc_id, metadata
+        )]
+
+        processing_time = asyncio.get_event_loop().time() - start_time
+        metadata['processing_time'] = processing_time
+
+        return ProcessedDocument(
+            id=doc_id,
+            title=title,
+            content=''.join(pieces),
+            chunks=chunks,
+            metadata=metadata,
+            processing_time=processing_time
+        )
+
+    async def stream_file(self, file_path: str, content_type: str = None,
+                          doc_id: str = None) -> AsyncIterator[DocumentChunk]:
+        """Chunks of a file as they are extracted, without holding its text"""
+        content_type = content_type or self._detect_content_type(file_path)
+        doc_id = doc_id or self.new_document_id()
+        metadata = {
+            'file_path': file_path,
+            'content_type': content_type,
+            'file_size': os.path.getsize(file_path),
+            'processed_at': datetime.now(timezone.utc).isoformat()
+        }
+        async for chunk in self._chunk_stream(self._text_pieces(file_path, content_type), doc_id, metadata):
+            yield chunk
+
+    async def stream_upload(self, upload: SpooledUpload, content_type: str = None, filename: str = None,
+                            doc_id: str = None) -> AsyncIterator[DocumentChunk]:
+        """Chunks of a received upload as they are extracted, without holding its text"""
+        metadata = {
+            **self.upload_metadata(upload, content_type, filename),
+            'processed_at': datetime.now(timezone.utc).isoformat()
+        }
+        async for chunk in self._chunk_stream(self._text_pieces(upload.source(), metadata['content_type']),
+                                              doc_id or self.new_document_id(), metadata):
+            yield chunk
+
+    def upload_metadata(self, upload: SpooledUpload, content_type: str = None, filename: str = None) -> Dict:
+        """Document metadata of a received upload"""
+        return {
+            'filename': filename,
+            'content_type': content_type or self._detect_content_type(filename or ''),
+            'file_size': upload.size,
+            'spooled_to_disk': upload.on_disk,
+        }
+
+    @staticmethod
+    def new_document_id() -> str:
+        return f"doc_{uuid.uuid4().hex[:8]}_{int(datetime.now().timestamp())}"
     
     async def process_content(self, content: str, title: str, content_type: str = 'text/plain') -> ProcessedDocument:
         """Process content directly without file"""
@@ -109,7 +158,7 @@ class DocumentProcessor:
         
         try:
             # Generate document ID
-            doc_id = f"doc_{uuid.uuid4().hex[:8]}_{int(datetime.now().timestamp())}"
+            doc_id = self.new_document_id()
             
             # Create metadata
             metadata = {
@@ -139,59 +188,105 @@ class DocumentProcessor:
     
     async def _create_chunks(self, content: str, doc_id: str, metadata: Dict) -> List[DocumentChunk]:
         """Create chunks from content"""
-        chunks = []
-        
-        # Simple chunking strategy
-        words = content.split()
-        chunk_words = []
-        chunk_index = 0
-        
-        for word in words:
-            chunk_words.append(word)
-            
-            if len(chunk_words) >= self.chunk_size:
-                # Create chunk
-                chunk_content = ' '.join(chunk_words)
-                chunk_id = f"{doc_id}_chunk_{chunk_index}"
-                
-                chunk = DocumentChunk(
-                    id=chunk_id,
+        return [DocumentChunk(
+                    id=f"{doc_id}_chunk_{chunk_index}",
                     content=chunk_content,
                     metadata={
                         **metadata,
                         'chunk_index': chunk_index,
-                        'chunk_size': len(chunk_words),
+                        'chunk_size': word_count,
                         'document_id': doc_id
                     }
                 )
-                chunks.append(chunk)
-                
-                # Handle overlap
-                if self.chunk_overlap > 0:
-                    chunk_words = chunk_words[-self.chunk_overlap:]
-                else:
-                    chunk_words = []
-                
-                chunk_index += 1
-        
-        # Handle remaining words
-        if chunk_words:
-            chunk_content = ' '.join(chunk_words)
-            chunk_id = f"{doc_id}_chunk_{chunk_index}"
-            
-            chunk = DocumentChunk(
-                id=chunk_id,
+                for chunk_index, (chunk_content, word_count)
+                in enumerate(iter_chunks([content], self.chunk_size, self.chunk_overlap))]
+
+    async def _chunk_stream(self, pieces: AsyncIterator[str], doc_id: str, metadata: Dict) -> AsyncIterator[DocumentChunk]:
+        """Chunks of a stream of text pieces, emitted as soon as they are complete"""
+        chunker = WordChunker(self.chunk_size, self.chunk_overlap)
+        chunk_index = 0
+
+        def make_chunk(chunk_content: str, word_count: int) -> DocumentChunk:
+            return DocumentChunk(
+                id=f"{doc_id}_chunk_{chunk_index}",
                 content=chunk_content,
                 metadata={
                     **metadata,
                     'chunk_index': chunk_index,
-                    'chunk_size': len(chunk_words),
+                    'chunk_size': word_count,
                     'document_id': doc_id
                 }
             )
-            chunks.append(chunk)
-        
-        return chunks
+
+        async for piece in pieces:
+            for chunk_content, word_count in chunker.feed(piece):
+                yield make_chunk(chunk_content, word_count)
+                chunk_index += 1
+        for chunk_content, word_count in chunker.finish():
+            yield make_chunk(chunk_content, word_count)
+            chunk_index += 1
+
+    async def _text_pieces(self, source: Source, content_type: str) -> AsyncIterator[str]:
+        """
+        Text of a file path or in-memory bytes in pieces. Plain text streams
+        straight from the source; other formats are extracted off the event
+        loop into a temporary file first.
+        """
+        if content_type not in self.supported_formats or content_type in PASSTHROUGH_TYPES:
+            async for piece in self._read_blocks(source):
+                yield piece
+            return
+
+        fd, text_path = tempfile.mkstemp(suffix='.txt', prefix='extract_')
+        os.close(fd)
+        try:
+            loop = asyncio.get_running_loop()
+            pool = self._get_pool()
+            if pool is not None:
+                # A memoryview cannot be pickled; worker processes get a copy of the bytes
+                payload = source if isinstance(source, str) else bytes(source)
+                await loop.run_in_executor(pool, extract_to_file, content_type, payload, text_path)
+            else:
+                await asyncio.to_thread(extract_to_file, content_type, source, text_path)
+            async for piece in self._read_blocks(text_path):
+                yield piece
+        finally:
+            os.unlink(text_path)
+
+    @staticmethod
+    async def _read_blocks(source: Source) -> AsyncIterator[str]:
+        """Decoded blocks of a text source, each read in a worker thread"""
+        blocks = read_text_blocks(source)
+        try:
+            while True:
+                block = await asyncio.to_thread(next, blocks, None)
+                if block is None:
+                    break
+                yield block
+        finally:
+            blocks.close()
+
+    @staticmethod
+    async def _tee(pieces: AsyncIterator[str], sink: List[str]) -> AsyncIterator[str]:
+        async for piece in pieces:
+            sink.append(piece)
+            yield piece
+
+    def _get_pool(self) -> Optional[ProcessPoolExecutor]:
+        """Extraction pool, started on first use; None when extraction runs in threads"""
+        if self.max_workers <= 0:
+            return None
+        if self._pool is None:
+            # Spawned workers only import the extractors, not the parent's model and index state
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers,
+                                             mp_context=multiprocessing.get_context('spawn'))
+        return self._pool
+
+    def close(self):
+        """Shut down the extraction pool"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
     
     def _detect_content_type(self, file_path: str) -> str:
         """Detect content type from file extension"""
@@ -209,65 +304,6 @@ class DocumentProcessor:
         }
         
         return ext_to_type.get(ext, 'text/plain')
-    
-    async def _process_text(self, content: bytes) -> str:
-        """Process plain text files"""
-        return content.decode('utf-8', errors='ignore')
-    
-    async def _process_json(self, content: bytes) -> str:
-        """Process JSON files"""
-        try:
-            data = json.loads(content.decode('utf-8'))
-            if isinstance(data, dict):
-                return json.dumps(data, indent=2)
-            elif isinstance(data, list):
-                return '\n'.join([json.dumps(item, indent=2) for item in data])
-            else:
-                return str(data)
-        except json.JSONDecodeError:
-            return content.decode('utf-8', errors='ignore')
-    
-    async def _process_markdown(self, content: bytes) -> str:
-        """Process Markdown files"""
-        return content.decode('utf-8', errors='ignore')
-    
-    async def _process_pdf(self, content: bytes) -> str:
-        """Process PDF files - basic implementation"""
-        # In a production system, you'd use libraries like PyPDF2 or pdfplumber
-        # For now, return placeholder
-        return f"PDF content ({len(content)} bytes) - PDF processing not implemented"
-    
-    async def _process_html(self, content: bytes) -> str:
-        """Process HTML files"""
-        try:
-            # Basic HTML processing - in production, use BeautifulSoup
-            from html.parser import HTMLParser
-            
-            class HTMLTextExtractor(HTMLParser):
-                def __init__(self):
-                    super().__init__()
-                    self.text = []
-                
-                def handle_data(self, data):
-                    self.text.append(data)
-            
-            parser = HTMLTextExtractor()
-            parser.feed(content.decode('utf-8', errors='ignore'))
-            return ' '.join(parser.text)
-            
-        except Exception as e:
-            logger.warning(f"HTML processing failed: {str(e)}")
-            return content.decode('utf-8', errors='ignore')
-    
-    async def _process_doc(self, content: bytes) -> str:
-        """Process DOC files"""
-        # In a production system, you'd use libraries like python-docx
-        return f"DOC content ({len(content)} bytes) - DOC processing not implemented"
-    
-    async def _process_docx(self, content: bytes) -> str:
-        """Process DOCX files"""
-        # In a production system, you'd use libraries like python-docx
-        return f"DOCX content ({len(content)} bytes) - DOCX processing not implemented"
 
 class BatchDocumentProcessor:
     """
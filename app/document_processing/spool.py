@@ -0,0 +1,130 @@
+"""
+Spooled upload buffer and upload metrics
+
+An upload is received exactly once into a ``SpooledUpload``: in memory while
+it stays below ``max_memory_bytes``, in a named temporary file beyond that.
+Extractors then read it in place, through a memoryview of the in-memory bytes
+or the spool file's path. Disk writes run in worker threads, so receiving a
+large upload never blocks the event loop.
+"""
+
+import asyncio
+import os
+import tempfile
+import time
+from typing import AsyncIterable, Dict, Optional, Union
+
+
+class UploadTooLarge(ValueError):
+    """The upload exceeded the configured size limit"""
+
+
+class SpooledUpload:
+    """Write-once upload buffer that rolls over from memory to disk"""
+
+    def __init__(self, max_memory_bytes: int = 8 * 1024 * 1024, max_bytes: int = 0,
+                 directory: Optional[str] = None):
+        """
+        - max_memory_bytes: Size up to which the upload stays in memory.
+        - max_bytes: Largest accepted upload, 0 for no limit.
+        - directory: Where the spool file is created once rolled over.
+        """
+        self.max_memory_bytes = max_memory_bytes
+        self.max_bytes = max_bytes
+        self.directory = directory or None
+        self.size = 0
+        self._buffer: Optional[bytearray] = bytearray()
+        self._file = None
+        self.path: Optional[str] = None
+
+    @property
+    def on_disk(self) -> bool:
+        return self.path is not None
+
+    async def write(self, chunk: bytes):
+        if not chunk:
+            return
+        if self.max_bytes and self.size + len(chunk) > self.max_bytes:
+            raise UploadTooLarge(f"Upload exceeds {self.max_bytes} bytes")
+        self.size += len(chunk)
+        if self._file is None and self.size <= self.max_memory_bytes:
+            self._buffer += chunk
+            return
+        if self._file is None:
+            await asyncio.to_thread(self._roll_over)
+        await asyncio.to_thread(self._file.write, chunk)
+
+    def _roll_over(self):
+        self._file = tempfile.NamedTemporaryFile(prefix='upload_', dir=self.directory, delete=False)
+        self.path = self._file.name
+        self._file.write(self._buffer)
+        self._buffer = None
+
+    async def finish(self):
+        """Flush and close the spool file; the upload becomes readable by extractors"""
+        if self._file is not None:
+            await asyncio.to_thread(self._file.close)
+
+    def source(self) -> Union[str, memoryview]:
+        """What extractors read: the spool file path, or a view of the in-memory bytes"""
+        return self.path if self.on_disk else memoryview(self._buffer)
+
+    def close(self):
+        """Release the buffer and delete the spool file"""
+        if self._file is not None and not self._file.closed:
+            self._file.close()
+        if self.path is not None and os.path.exists(self.path):
+            os.unlink(self.path)
+        self._buffer = bytearray()
+
+    @classmethod
+    async def receive(cls, chunks: AsyncIterable[bytes], **kwargs) -> "SpooledUpload":
+        """Spool an async stream of byte chunks, e.g. a request body"""
+        upload = cls(**kwargs)
+        try:
+            async for chunk in chunks:
+                await upload.write(chunk)
+            await upload.finish()
+        except BaseException:
+            upload.close()
+            raise
+        return upload
+
+
+class UploadMetrics:
+    """Size and latency of uploads since startup"""
+
+    def __init__(self):
+        self.uploads = 0
+        self.failures = 0
+        self.total_bytes = 0
+        self.max_bytes = 0
+        self.spooled_to_disk = 0
+        self.total_latency_ms = 0.0
+        self.max_latency_ms = 0.0
+
+    def record(self, size: int, started_at: float, on_disk: bool, success: bool = True) -> float:
+        """Record one upload that started at ``started_at`` (perf_counter); returns its latency in ms"""
+        latency_ms = (time.perf_counter() - started_at) * 1000
+        if not success:
+            self.failures += 1
+            return latency_ms
+        self.uploads += 1
+        self.total_bytes += size
+        self.max_bytes = max(self.max_bytes, size)
+        self.spooled_to_disk += int(on_disk)
+        self.total_latency_ms += latency_ms
+        self.max_latency_ms = max(self.max_latency_ms, latency_ms)
+        return latency_ms
+
+    def get_stats(self) -> Dict:
+        return {
+            'uploads': self.uploads,
+            'failures': self.failures,
+            'total_bytes': self.total_bytes,
+            'avg_bytes': self.total_bytes / self.uploads if self.uploads else 0,
+            'max_bytes': self.max_bytes,
+            'spooled_to_disk': self.spooled_to_disk,
+            'avg_latency_ms': self.total_latency_ms / self.uploads if self.uploads else 0.0,
+            'max_latency_ms': self.max_latency_ms,
+        }
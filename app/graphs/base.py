@@ -15,6 +15,8 @@ import structlog
 from langgraph.graph import StateGraph, START, END
 from pydantic import BaseModel
 
+from app.cache.redis_client import CacheWriteBatch
+
 logger = structlog.get_logger(__name__)
 
 
@@ -86,6 +88,8 @@ class GraphState:
     # Cache and optimization
     cache_hits: List[str] = field(default_factory=list)
     routing_shortcuts_used: List[str] = field(default_factory=list)
+    # CacheWriteBatch nodes queue writes on; flushed once when the graph finishes
+    cache_writes: Optional[Any] = None
     # Final output
     final_response: str = ""
     response_metadata: Dict[str, Any] = field(default_factory=dict)
@@ -264,6 +268,24 @@ class BaseGraph(ABC):
             raise
 
     async def execute(self, state: GraphState) -> GraphState:
+        """Execute the graph; cache writes its nodes queue are flushed once at the end."""
+        cache_manager = getattr(self, "cache_manager", None)
+        if cache_manager is None or state.cache_writes is not None:
+            return await self._execute_graph(state)
+
+        batch = state.cache_writes = CacheWriteBatch(cache_manager)
+        try:
+            return await self._execute_graph(state)
+        finally:
+            state.cache_writes = None
+            try:
+                await batch.flush()
+            except Exception as e:
+                self.logger.warning(
+                    "Cache write flush failed", graph_name=self.name, error=str(e)
+                )
+
+    async def _execute_graph(self, state: GraphState) -> GraphState:
         """Execute the graph with global timeout and timing diagnostics."""
         if not self.graph:
             raise RuntimeError(f"Graph {self.name} not built. Call build() first.")
@@ -8,6 +8,9 @@ from dataclasses import dataclass
 from datetime import datetime
 from typing import Any, Dict, List, Optional
 
+from app.cache.conversation_store import ConversationStore
+from app.cache.redis_client import CacheWriteBatch
+from app.cache.semantic_cache import SemanticResponseCache
 from app.core.logging import get_logger
 from app.graphs.base import (
     BaseGraph,
@@ -312,9 +315,18 @@ class ResponseGeneratorNode(BaseGraphNode):
     Generates responses using the optimal model based on context and intent.
     """
 
-    def __init__(self, model_manager: ModelManager):
+    def __init__(self, model_manager: ModelManager, semantic_cache: Optional[SemanticResponseCache] = None):
         super().__init__("response_generator", NodeType.PROCESSING)
         self.model_manager = model_manager
+        self.semantic_cache = semantic_cache
+
+    def _cache_scope(self, state: GraphState, model_name: str) -> tuple:
+        """Conditions a cached response must have been generated under to be reused"""
+        return (model_name, state.quality_requirement or "balanced", state.query_intent or "conversation")
+
+    def _cacheable(self, state: GraphState) -> bool:
+        # Follow-up turns depend on the conversation, not only on the query
+        return self.semantic_cache is not None and not state.conversation_history
 
     def _determine_task_type(self, state):
         """
@@ -548,6 +560,25 @@ class ResponseGeneratorNode(BaseGraphNode):
         )
         try:
             model_name = self._select_model(state)
+            query = state.processed_query or state.original_query
+            if self._cacheable(state):
+                hit = await self.semantic_cache.get(query, self._cache_scope(state, model_name))
+                if hit is not None:
+                    state.final_response = hit.response
+                    state.cache_hits.append("semantic_response")
+                    state.response_metadata["response_cache"] = {
+                        "kind": hit.kind,
+                        "similarity": round(hit.similarity, 4),
+                    }
+                    return NodeResult(
+                        success=True,
+                        data={"response": hit.response, "cache_hit": hit.kind},
+                        confidence=0.8,
+                        execution_time=time.time() - start_time,
+                        cost=0.0,
+                        model_used=model_name,
+                    )
+                state.response_metadata["response_cache"] = {"kind": "miss"}
             prompt = self._build_prompt(state)
             max_tokens = self._calculate_max_tokens(state)
             temperature = self._calculate_temperature(state)
@@ -618,6 +649,8 @@ class ResponseGeneratorNode(BaseGraphNode):
                     )
                     response = self._post_process_response(result.text, state)
                     state.final_response = response
+                    if self._cacheable(state):
+                        await self.semantic_cache.put(query, self._cache_scope(state, model_name), response)
                     logger.debug(f"[ResponseGeneratorNode] SUCCESS PATH: state.final_response = '{state.final_response}'")
                     logger.debug(
                         "[ResponseGeneratorNode] Diagnostic: After post-processing",
@@ -752,26 +785,16 @@ class CacheUpdateNode(BaseGraphNode):
                 ],
             }
 
-            # Cache conversation history
-            history_key = f"conversation_history:{session_id}"
-            try:
-                # Get existing history
-                existing_history = await self.cache_manager.get(history_key, [])
-                if not isinstance(existing_history, list):
-                    existing_history = []
-
-                # Add new entry
-                existing_history.append(conversation_entry)
-
-                # Keep only last 50 entries
-                if len(existing_history) > 50:
-                    existing_history = existing_history[-50:]
+            # Writes are queued on the request's batch and flushed together
+            # when the graph finishes: one read and one pipelined write
+            writes = state.cache_writes
+            if writes is None:
+                writes = CacheWriteBatch(self.cache_manager)
 
-                # Save updated history (TTL: 7 days)
-                await self.cache_manager.set(history_key, existing_history, ttl=604800)
-
-            except Exception as cache_error:
-                logger.warning(f"Failed to cache conversation history: {cache_error}")
+            # Append the turn to the session's capped history list
+            await ConversationStore(self.cache_manager).append(
+                session_id, conversation_entry, batch=writes
+            )
 
             # Cache user context and preferences
             context_key = f"user_context:{session_id}"
@@ -787,7 +810,7 @@ class CacheUpdateNode(BaseGraphNode):
                     )
 
                     # Save context (TTL: 30 days)
-                    await self.cache_manager.set(context_key, user_context, ttl=2592000)
+                    writes.set(context_key, user_context, ttl=2592000)
 
             except Exception as context_error:
                 logger.warning(f"Failed to cache user context: {context_error}")
@@ -807,25 +830,15 @@ class CacheUpdateNode(BaseGraphNode):
                     else None,
                 }
 
-                # Get existing patterns
-                existing_patterns = await self.cache_manager.get(pattern_key, [])
-                if not isinstance(existing_patterns, list):
-                    existing_patterns = []
-
-                existing_patterns.append(pattern_data)
-
-                # Keep only last 100 patterns per intent
-                if len(existing_patterns) > 100:
-                    existing_patterns = existing_patterns[-100:]
-
-                # Save patterns (TTL: 90 days)
-                await self.cache_manager.set(
-                    pattern_key, existing_patterns, ttl=7776000
-                )
+                # Keep only last 100 patterns per intent (TTL: 90 days)
+                writes.append(pattern_key, pattern_data, max_items=100, ttl=7776000)
 
             except Exception as pattern_error:
                 logger.warning(f"Failed to cache query patterns: {pattern_error}")
 
+            if writes is not state.cache_writes:
+                await writes.flush()
+
             logger.debug(
                 f"[CacheUpdateNode] Success. state.query_id={getattr(state, 'query_id', None)}"
             )
@@ -917,10 +930,11 @@ class ChatGraph(BaseGraph):
     Fixed to properly use LangGraph START/END constants and correct compilation order.
     """
 
-    def __init__(self, model_manager: ModelManager, cache_manager=None):
+    def __init__(self, model_manager: ModelManager, cache_manager=None, semantic_cache=None):
         super().__init__(GraphType.CHAT, "chat_graph")
         self.model_manager = model_manager
         self.cache_manager = cache_manager
+        self.semantic_cache = semantic_cache
         self.execution_stats = {
             "total_executions": 0,
             "successful_executions": 0,
@@ -969,7 +983,7 @@ class ChatGraph(BaseGraph):
             "start": ContextManagerNode(self.cache_manager),  # Entrypoint for LangGraph
             "context_manager": ContextManagerNode(self.cache_manager),
             "intent_classifier": IntentClassifierNode(self.model_manager),
-            "response_generator": ResponseGeneratorNode(self.model_manager),
+            "response_generator": ResponseGeneratorNode(self.model_manager, self.semantic_cache),
             "cache_update": CacheUpdateNode(self.cache_manager),
             "error_handler": ErrorHandlerNode(),
             "end": EndNode(),  # Add end node for LangGraph termination
@@ -13,7 +13,10 @@ from typing import Any, Dict, List, Optional
 import structlog
 
 from app.cache.redis_client import CacheManager
+from app.cache.semantic_cache import SemanticResponseCache
 from app.core.config import get_settings
+from app.core.single_flight import SingleFlight
+from app.dependencies import get_semantic_cache
 from app.graphs.base import (
     BaseGraph,
     BaseGraphNode,
@@ -33,9 +36,13 @@ from app.providers.brave_search_provider import SearchQuery as BraveSearchQuery
 from app.providers.brave_search_provider import SearchResult as BraveSearchResult
 from app.providers.scrapingbee_provider import ProviderConfig as ScrapingBeeConfig
 from app.providers.scrapingbee_provider import ScrapingBeeProvider, ScrapingQuery
+from app.search.result_cache import normalize_query
 
 logger = structlog.get_logger(__name__)
 
+# Shared by every SearchGraph in the worker, so identical concurrent searches run once
+search_flights = SingleFlight("search")
+
 
 @dataclass
 class EnhancedSearchResult:
@@ -205,9 +212,10 @@ class SmartSearchRouterNode(BaseGraphNode):
 class BraveSearchNode(BaseGraphNode):
     """Brave Search execution with standardized provider"""
 
-    def __init__(self, cache_manager: CacheManager):
+    def __init__(self, cache_manager: CacheManager, semantic_cache: Optional[SemanticResponseCache] = None):
         super().__init__("brave_search", "processing")
         self.cache_manager = cache_manager
+        self.semantic_cache = semantic_cache
         self.settings = get_settings()
 
         # Initialize Brave provider
@@ -249,6 +257,10 @@ class BraveSearchNode(BaseGraphNode):
             query_hash = hashlib.sha256(query.encode('utf-8')).hexdigest()[:16]
             cache_key = f"brave_search:{query_hash}:{max_results}"
             cached_results = await self.cache_manager.get(cache_key)
+            if not cached_results and self.semantic_cache is not None:
+                # A paraphrase of an earlier query reuses its results
+                hit = await self.semantic_cache.get(query, ("brave_search", max_results))
+                cached_results = hit.response if hit is not None else None
 
             if cached_results:
                 # Convert cached results to EnhancedSearchResult
@@ -273,7 +285,10 @@ class BraveSearchNode(BaseGraphNode):
                 text=query, max_results=max_results, language="en", search_type="web"
             )
 
-            provider_result = await self.provider.search(brave_query)
+            provider_result = await search_flights.do(
+                ("brave_search", normalize_query(query), max_results),
+                lambda: self.provider.search(brave_query),
+            )
 
             if not provider_result.success:
                 return NodeResult(
@@ -300,7 +315,12 @@ class BraveSearchNode(BaseGraphNode):
                 }
                 for r in enhanced_results
             ]
-            await self.cache_manager.set(cache_key, cache_data, ttl=1800)  # 30 min
+            if state.cache_writes is not None:
+                state.cache_writes.set(cache_key, cache_data, ttl=1800)  # 30 min
+            else:
+                await self.cache_manager.set(cache_key, cache_data, ttl=1800)
+            if self.semantic_cache is not None:
+                await self.semantic_cache.put(query, ("brave_search", max_results), cache_data, ttl=1800)
 
             # Store results in state
             state.search_results = enhanced_results
@@ -316,6 +336,7 @@ class BraveSearchNode(BaseGraphNode):
                     "cached": False,
                     "provider": "brave_search",
                     "provider_stats": stats,
+                    "coalescing": search_flights.get_stats(),
                 },
                 cost=provider_result.cost,
             )
@@ -773,10 +794,16 @@ Response:"""
 class SearchGraph(BaseGraph):
     """Main search graph implementation with standardized providers"""
 
-    def __init__(self, model_manager: ModelManager, cache_manager: CacheManager):
+    def __init__(
+        self,
+        model_manager: ModelManager,
+        cache_manager: CacheManager,
+        semantic_cache: Optional[SemanticResponseCache] = None,
+    ):
         super().__init__(GraphType.SEARCH, "enhanced_search_graph")
         self.model_manager = model_manager
         self.cache_manager = cache_manager
+        self.semantic_cache = semantic_cache
         self._node_instances = {}
 
     def define_nodes(self) -> Dict[str, BaseGraphNode]:
@@ -785,7 +812,7 @@ class SearchGraph(BaseGraph):
             self._node_instances = {
                 "start": StartNode(),
                 "smart_router": SmartSearchRouterNode(),
-                "brave_search": BraveSearchNode(self.cache_manager),
+                "brave_search": BraveSearchNode(self.cache_manager, self.semantic_cache),
                 "content_enhancement": ContentEnhancementNode(self.cache_manager),
                 "response_synthesis": ResponseSynthesisNode(self.model_manager),
                 "direct_response": DirectResponseNode(self.model_manager),
@@ -1003,9 +1030,25 @@ async def execute_search(
     Returns:
         Dict containing response, citations, and metadata
     """
+    # Concurrent identical searches run the workflow once
+    key = ("execute_search", normalize_query(query), quality, budget, max_results)
+    result = await search_flights.do(
+        key,
+        lambda: _execute_search(query, model_manager, cache_manager, budget, quality, max_results),
+    )
+    return {**result, "query": query}
 
+
+async def _execute_search(
+    query: str,
+    model_manager: ModelManager,
+    cache_manager: CacheManager,
+    budget: float,
+    quality: str,
+    max_results: int,
+) -> Dict[str, Any]:
     # Create and execute search graph
-    search_graph = SearchGraph(model_manager, cache_manager)
+    search_graph = SearchGraph(model_manager, cache_manager, get_semantic_cache())
 
     try:
         # Create initial state
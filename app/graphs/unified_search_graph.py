@@ -21,6 +21,7 @@ except ImportError:
     END = "END"
     ToolNode = None
 
+from app.dependencies import get_semantic_cache
 from app.graphs.base import BaseGraph, GraphState, NodeResult
 from app.graphs.document_search_node import DocumentSearchNode, DocumentUploadNode
 from app.graphs.search_graph import SearchGraph
@@ -47,7 +48,7 @@ class UnifiedSearchGraph(BaseGraph):
         self.upload_node = DocumentUploadNode(document_search_url)
         
         # Initialize existing search graph for web search
-        self.web_search_graph = SearchGraph(model_manager, cache_manager)
+        self.web_search_graph = SearchGraph(model_manager, cache_manager, get_semantic_cache())
         
         # Build the graph
         self.graph = self._build_graph()
@@ -27,6 +27,7 @@ from app.api import models_routes
 from app.api import analytics_routes
 from app.api.security import SecurityMiddleware
 from app.cache.redis_client import CacheManager
+from app.cache.semantic_cache import SemanticResponseCache
 from app.core.config import get_settings
 from app.core.logging import (
     LoggingMiddleware,
@@ -56,7 +57,8 @@ from app.schemas.responses import HealthStatus, create_error_response
 from app.dependencies import (
     get_model_manager,
     set_initialized_model_manager,
-    set_initialized_cache_manager
+    set_initialized_cache_manager,
+    set_initialized_semantic_cache,
 )
 
 # Add project root to Python path
@@ -185,12 +187,18 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
         app_state["cache_manager"] = cache_manager
         # Set the initialized instance for dependency injection
         set_initialized_cache_manager(cache_manager)
+        # Semantic response cache, shared by the chat and search graphs
+        app_state["semantic_cache"] = (
+            SemanticResponseCache() if settings.semantic_cache_enabled else None
+        )
+        set_initialized_semantic_cache(app_state["semantic_cache"])
         # Chat Graph (depends on model_manager and cache_manager)
 
         def init_chat_graph():
             return ChatGraph(
                 app_state["model_manager"],
-                app_state["cache_manager"]
+                app_state["cache_manager"],
+                app_state["semantic_cache"],
             )
 
         chat_graph = await monitor.initialize_component("chat_graph", init_chat_graph)
@@ -200,7 +208,8 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
         def init_search_graph():
             return SearchGraph(
                 app_state["model_manager"],
-                app_state["cache_manager"]
+                app_state["cache_manager"],
+                app_state["semantic_cache"],
             )
 
         search_graph = await monitor.initialize_component(
@@ -288,6 +297,10 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
                     embedding_dim=embedding_dim,
                     use_gpu=use_gpu
                 )
+                # Profiles for latency-budgeted search are calibrated in the background
+                app_state["native_search_calibration"] = asyncio.create_task(
+                    native_search.calibrate_native_search(on_startup=True)
+                )
                 
                 logger.info("✅ Native search engine initialized successfully")
                 return {"search_engine": search_engine, "document_processor": document_processor}
@@ -299,6 +312,11 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
             "native_search", init_native_search
         )
         app_state["native_search"] = native_search_components
+        # The semantic cache embeds prompts with the engine's already loaded model
+        if app_state["semantic_cache"] is not None and native_search_components:
+            app_state["semantic_cache"].use_encoder(
+                native_search_components["search_engine"].query_encoder
+            )
 
         # Initialize API key status for provider health checks
         def init_api_key_status():
@@ -2,8 +2,10 @@
 Mathematical algorithms for ultra-fast search
 """
 
+from .bm25_index import BM25Index, BM25Statistics
 from .hnsw_index import HNSWIndex
-from .lsh_index import LSHIndex
+from .ivfpq_index import IVFPQIndex
+from .lsh_index import LSHIndex, LSHQuery
 from .product_quantization import ProductQuantizer
 
-__all__ = ["HNSWIndex", "LSHIndex", "ProductQuantizer"]
\ No newline at end of file
+__all__ = ["BM25Index", "BM25Statistics", "HNSWIndex", "IVFPQIndex", "LSHIndex", "LSHQuery", "ProductQuantizer"]
\ No newline at end of file
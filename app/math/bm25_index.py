@@ -0,0 +1,390 @@
+import numpy as np
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+
+@dataclass
+class BM25Statistics:
+    """
+    Corpus statistics BM25 depends on. Partitions of one corpus sum theirs
+    (``merge``) so that each partition scores with corpus-wide idf and average
+    document length, exactly as a single index over the whole corpus would.
+    """
+    corpus_size: int = 0
+    total_length: int = 0
+    doc_frequencies: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def avg_doc_length(self) -> float:
+        return self.total_length / self.corpus_size if self.corpus_size > 0 else 0.0
+
+    def merge(self, other: "BM25Statistics") -> "BM25Statistics":
+        doc_frequencies = dict(self.doc_frequencies)
+        for term, df in other.doc_frequencies.items():
+            doc_frequencies[term] = doc_frequencies.get(term, 0) + df
+        return BM25Statistics(self.corpus_size + other.corpus_size, self.total_length + other.total_length,
+                              doc_frequencies)
+
+
+class BM25Index:
+    """
+    Inverted BM25 index with term -> postings arrays stored in CSR form.
+    Build time is linear in the number of tokens, and query cost scales with
+    postings length instead of the number of candidates being rescored.
+
+    Documents are addressed by integer rows supplied by the caller. Removing
+    a document only clears its live bit; its postings are dropped on the
+    next compact(), after which the row may be added again.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75, merge_ratio: float = 0.125):
+        """
+        - k1: Term frequency saturation.
+        - b: Document length normalization strength.
+        - merge_ratio: Pending postings (relative to frozen ones) that trigger a merge.
+        """
+        self.k1 = k1
+        self.b = b
+        self.merge_ratio = merge_ratio
+        self.vocabulary: Dict[str, int] = {}
+
+        # Frozen CSR segment: postings of term t are rows[indptr[t]:indptr[t + 1]]
+        self.indptr = np.zeros(1, dtype=np.int64)
+        self.postings_rows = np.zeros(0, dtype=np.int32)
+        self.postings_tf = np.zeros(0, dtype=np.int32)
+
+        # Postings added since the last merge
+        self._pending: Dict[int, Tuple[List[int], List[int]]] = {}
+        self._pending_count = 0
+
+        # Per-term statistics (df counts removed documents until compact())
+        self.doc_frequencies = np.zeros(0, dtype=np.int64)
+        self._max_tf = np.zeros(0, dtype=np.int32)
+        self._min_length = np.zeros(0, dtype=np.int32)
+
+        # Per-row statistics
+        self.doc_lengths = np.zeros(0, dtype=np.int32)
+        self.live = np.zeros(0, dtype=bool)
+        self.corpus_size = 0
+        self.total_length = 0
+
+        self._idf: Optional[np.ndarray] = None
+        self._length_norms: Optional[Tuple[float, np.ndarray]] = None
+
+    @property
+    def avg_doc_length(self) -> float:
+        return self.total_length / self.corpus_size if self.corpus_size > 0 else 0.0
+
+    def __len__(self) -> int:
+        return self.corpus_size
+
+    def __contains__(self, row: int) -> bool:
+        return 0 <= row < len(self.live) and bool(self.live[row])
+
+    def build(self, rows: Sequence[int], token_lists: Sequence[List[str]]):
+        """Rebuild the index from scratch in a single linear pass."""
+        self.__init__(self.k1, self.b, self.merge_ratio)
+        self.add_documents(rows, token_lists)
+        self._merge_pending()
+
+    def add_document(self, row: int, tokens: List[str]):
+        """Add a single document under the given row."""
+        self.add_documents([row], [tokens])
+
+    def add_documents(self, rows: Sequence[int], token_lists: Sequence[List[str]]):
+        """Add documents in bulk; corpus statistics are updated incrementally."""
+        if not rows:
+            return
+        self._ensure_rows(max(rows) + 1)
+
+        for row, tokens in zip(rows, token_lists):
+            if self.live[row]:
+                raise ValueError(f"Row {row} is already indexed")
+            length = len(tokens)
+            self.doc_lengths[row] = length
+            self.live[row] = True
+            self.corpus_size += 1
+            self.total_length += length
+
+            for term, tf in Counter(tokens).items():
+                term_id = self.vocabulary.get(term)
+                if term_id is None:
+                    term_id = self._add_term(term)
+                pending_rows, pending_tf = self._pending.setdefault(term_id, ([], []))
+                pending_rows.append(row)
+                pending_tf.append(tf)
+                self._pending_count += 1
+                self.doc_frequencies[term_id] += 1
+                if tf > self._max_tf[term_id]:
+                    self._max_tf[term_id] = tf
+                if length < self._min_length[term_id]:
+                    self._min_length[term_id] = length
+
+        self._invalidate()
+        if self._pending_count > max(4096, self.merge_ratio * len(self.postings_rows)):
+            self._merge_pending()
+
+    def remove_document(self, row: int):
+        """Mark a row as deleted; its postings are skipped until compact()."""
+        if row not in self:
+            return
+        self.live[row] = False
+        self.corpus_size -= 1
+        self.total_length -= int(self.doc_lengths[row])
+        self._invalidate()
+
+    def compact(self):
+        """Drop postings of removed rows and recompute document frequencies."""
+        self._merge_pending()
+        keep = self.live[self.postings_rows]
+        term_of_posting = np.repeat(np.arange(len(self.vocabulary)), np.diff(self.indptr))
+        self.postings_rows = self.postings_rows[keep]
+        self.postings_tf = self.postings_tf[keep]
+        self.doc_frequencies = np.bincount(term_of_posting[keep], minlength=len(self.vocabulary)).astype(np.int64)
+        self.indptr = np.concatenate(([0], np.cumsum(self.doc_frequencies)))
+        self._invalidate()
+
+    def statistics(self, terms: Iterable[str]) -> BM25Statistics:
+        """This index's corpus statistics, with document frequencies of ``terms``."""
+        doc_frequencies = {}
+        for term in set(terms):
+            term_id = self.vocabulary.get(term)
+            doc_frequencies[term] = int(self.doc_frequencies[term_id]) if term_id is not None else 0
+        return BM25Statistics(self.corpus_size, self.total_length, doc_frequencies)
+
+    def score(self, query_terms: List[str], rows: np.ndarray,
+              statistics: Optional[BM25Statistics] = None) -> np.ndarray:
+        """
+        BM25 scores of the given rows; repeated query terms count repeatedly.
+        - statistics: Corpus-wide statistics to use instead of this index's own.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        scores = np.zeros(len(rows), dtype=np.float64)
+        if len(rows) == 0 or self.corpus_size == 0:
+            return scores
+
+        idf = self._get_idf(query_terms, statistics)
+        norms = self._get_length_norms(statistics)
+        for term_id, weight in self._query_term_ids(query_terms):
+            postings_rows, postings_tf = self._postings(term_id)
+            positions = np.searchsorted(postings_rows, rows)
+            positions[positions == len(postings_rows)] = 0
+            hits = postings_rows[positions] == rows
+            tf = np.where(hits, postings_tf[positions], 0).astype(np.float64)
+            scores += weight * idf[term_id] * (tf * (self.k1 + 1)) / (tf + norms[np.minimum(rows, len(norms) - 1)])
+        return scores
+
+    def top_k(self, query_terms: List[str], k: int, allowed: Optional[np.ndarray] = None,
+              statistics: Optional[BM25Statistics] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Best k live rows for the query over the whole corpus, using MaxScore
+        pruning: once the k-th best partial score exceeds what the remaining
+        terms could add, their postings are only probed for known candidates.
+        - allowed: Optional boolean mask over rows restricting the result.
+        - statistics: Corpus-wide statistics to use instead of this index's own.
+        Returns (rows, scores) sorted best first.
+        """
+        terms = self._query_term_ids(query_terms)
+        if not terms or k <= 0 or self.corpus_size == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float64)
+
+        idf = self._get_idf(query_terms, statistics)
+        norms = self._get_length_norms(statistics)
+        avg_doc_length = statistics.avg_doc_length if statistics is not None else self.avg_doc_length
+        mask = self.live
+        if allowed is not None:
+            mask = np.zeros(len(self.live), dtype=bool)
+            shared = min(len(self.live), len(allowed))
+            mask[:shared] = self.live[:shared] & allowed[:shared]
+
+        bounds = np.array([self._upper_bound(term_id, weight, idf, avg_doc_length) for term_id, weight in terms])
+        order = np.argsort(-bounds, kind='stable')
+        remaining = np.concatenate((np.cumsum(bounds[order][::-1])[::-1], [0.0]))
+
+        candidate_rows = np.zeros(0, dtype=np.int64)
+        candidate_scores = np.zeros(0, dtype=np.float64)
+        threshold = 0.0
+
+        for step, term_index in enumerate(order):
+            term_id, weight = terms[term_index]
+            postings_rows, postings_tf = self._postings(term_id)
+
+            if len(candidate_rows) >= k and threshold > remaining[step]:
+                # Non-essential term: unseen documents can no longer reach the top k
+                positions = np.searchsorted(postings_rows, candidate_rows)
+                positions[positions == len(postings_rows)] = 0
+                hits = postings_rows[positions] == candidate_rows
+                tf = postings_tf[positions[hits]].astype(np.float64)
+                candidate_scores[hits] += weight * idf[term_id] * (tf * (self.k1 + 1)) / (
+                    tf + norms[candidate_rows[hits]])
+            else:
+                keep = mask[postings_rows]
+                rows = postings_rows[keep].astype(np.int64)
+                tf = postings_tf[keep].astype(np.float64)
+                contributions = weight * idf[term_id] * (tf * (self.k1 + 1)) / (tf + norms[rows])
+                merged_rows, inverse = np.unique(np.concatenate((candidate_rows, rows)), return_inverse=True)
+                candidate_scores = np.bincount(inverse, weights=np.concatenate((candidate_scores, contributions)),
+                                               minlength=len(merged_rows))
+                candidate_rows = merged_rows
+
+            if len(candidate_rows) >= k:
+                threshold = np.partition(candidate_scores, len(candidate_scores) - k)[len(candidate_scores) - k]
+                survivors = candidate_scores + remaining[step + 1] >= threshold
+                candidate_rows = candidate_rows[survivors]
+                candidate_scores = candidate_scores[survivors]
+
+        top = np.argsort(-candidate_scores, kind='stable')[:k]
+        return candidate_rows[top], candidate_scores[top]
+
+    def _query_term_ids(self, query_terms: List[str]) -> List[Tuple[int, int]]:
+        """Known query terms as (term_id, occurrences)."""
+        return [(self.vocabulary[term], count) for term, count in Counter(query_terms).items()
+                if term in self.vocabulary and self.doc_frequencies[self.vocabulary[term]] > 0]
+
+    def _upper_bound(self, term_id: int, weight: int, idf, avg_doc_length: float) -> float:
+        """Largest contribution the term can make to any document's score."""
+        tf = float(self._max_tf[term_id])
+        norm = self.k1 * (1 - self.b + self.b * self._min_length[term_id] / (avg_doc_length or 1.0))
+        return weight * idf[term_id] * tf * (self.k1 + 1) / (tf + norm)
+
+    def _postings(self, term_id: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Postings of a term sorted by row, including pending ones."""
+        if term_id + 1 < len(self.indptr):
+            start, end = self.indptr[term_id], self.indptr[term_id + 1]
+        else:
+            start = end = 0
+        rows, tfs = self.postings_rows[start:end], self.postings_tf[start:end]
+        pending = self._pending.get(term_id)
+        if pending:
+            rows = np.concatenate((rows, np.asarray(pending[0], dtype=np.int32)))
+            tfs = np.concatenate((tfs, np.asarray(pending[1], dtype=np.int32)))
+            order = np.argsort(rows, kind='stable')
+            rows, tfs = rows[order], tfs[order]
+        return rows, tfs
+
+    def _merge_pending(self):
+        """Fold pending postings into the CSR segment."""
+        num_terms = len(self.vocabulary)
+        if self._pending_count == 0 and len(self.indptr) == num_terms + 1:
+            return
+
+        frozen_terms = np.repeat(np.arange(len(self.indptr) - 1), np.diff(self.indptr))
+        pending_terms = np.fromiter((t for t, (rows, _) in self._pending.items() for _ in rows),
+                                    dtype=np.int64, count=self._pending_count)
+        pending_rows = np.fromiter((r for rows, _ in self._pending.values() for r in rows),
+                                   dtype=np.int32, count=self._pending_count)
+        pending_tf = np.fromiter((f for _, tfs in self._pending.values() for f in tfs),
+                                 dtype=np.int32, count=self._pending_count)
+
+        terms = np.concatenate((frozen_terms, pending_terms))
+        rows = np.concatenate((self.postings_rows, pending_rows))
+        tfs = np.concatenate((self.postings_tf, pending_tf))
+        order = np.lexsort((rows, terms))
+
+        self.postings_rows = rows[order]
+        self.postings_tf = tfs[order]
+        self.indptr = np.concatenate(([0], np.cumsum(np.bincount(terms, minlength=num_terms))))
+        self._pending = {}
+        self._pending_count = 0
+
+    def _add_term(self, term: str) -> int:
+        term_id = len(self.vocabulary)
+        self.vocabulary[term] = term_id
+        if term_id >= len(self.doc_frequencies):
+            capacity = max(1024, 2 * len(self.doc_frequencies))
+            self.doc_frequencies = np.resize(self.doc_frequencies, capacity)
+            self.doc_frequencies[term_id:] = 0
+            self._max_tf = np.resize(self._max_tf, capacity)
+            self._max_tf[term_id:] = 0
+            self._min_length = np.resize(self._min_length, capacity)
+            self._min_length[term_id:] = np.iinfo(np.int32).max
+        return term_id
+
+    def _ensure_rows(self, required: int):
+        capacity = len(self.live)
+        if required <= capacity:
+            return
+        new_capacity = max(required, 2 * capacity, 1024)
+        doc_lengths = np.zeros(new_capacity, dtype=np.int32)
+        doc_lengths[:capacity] = self.doc_lengths
+        live = np.zeros(new_capacity, dtype=bool)
+        live[:capacity] = self.live
+        self.doc_lengths = doc_lengths
+        self.live = live
+
+    def _invalidate(self):
+        self._idf = None
+        self._length_norms = None
+
+    def _get_idf(self, query_terms: Sequence[str] = (), statistics: Optional[BM25Statistics] = None):
+        """idf indexable by term id: the cached local array, or the query's terms under ``statistics``."""
+        if statistics is not None:
+            idf = {}
+            for term in query_terms:
+                term_id = self.vocabulary.get(term)
+                if term_id is not None:
+                    df = statistics.doc_frequencies.get(term, 0)
+                    idf[term_id] = np.log((statistics.corpus_size - df + 0.5) / (df + 0.5) + 1)
+            return idf
+        if self._idf is None:
+            df = self.doc_frequencies[:len(self.vocabulary)].astype(np.float64)
+            self._idf = np.log((self.corpus_size - df + 0.5) / (df + 0.5) + 1)
+        return self._idf
+
+    def _get_length_norms(self, statistics: Optional[BM25Statistics] = None) -> np.ndarray:
+        """Per-row length normalization, cached for the average length it was computed with."""
+        avg = (statistics.avg_doc_length if statistics is not None else self.avg_doc_length) or 1.0
+        if self._length_norms is None or self._length_norms[0] != avg:
+            self._length_norms = (avg, self.k1 * (1 - self.b + self.b * self.doc_lengths / avg))
+        return self._length_norms[1]
+
+    def to_snapshot(self) -> Tuple[Dict[str, np.ndarray], Dict[str, List[str]], Dict]:
+        """Arrays, string columns and metadata for an index snapshot."""
+        self._merge_pending()
+        num_terms = len(self.vocabulary)
+        arrays = {
+            'indptr': self.indptr,
+            'postings_rows': self.postings_rows,
+            'postings_tf': self.postings_tf,
+            'doc_frequencies': self.doc_frequencies[:num_terms],
+            'max_tf': self._max_tf[:num_terms],
+            'min_length': self._min_length[:num_terms],
+            'doc_lengths': self.doc_lengths,
+            'live': self.live,
+        }
+        meta = {
+            'k1': self.k1,
+            'b': self.b,
+            'merge_ratio': self.merge_ratio,
+            'corpus_size': self.corpus_size,
+            'total_length': self.total_length,
+        }
+        return arrays, {'vocabulary': list(self.vocabulary)}, meta
+
+    @classmethod
+    def from_snapshot(cls, arrays: Dict[str, np.ndarray], strings: Dict, meta: Dict) -> "BM25Index":
+        """Restore an index on top of (possibly memory-mapped) snapshot arrays."""
+        index = cls(meta['k1'], meta['b'], meta['merge_ratio'])
+        vocabulary = strings['vocabulary']
+        index.vocabulary = {vocabulary[i]: i for i in range(len(vocabulary))}
+        index.indptr = arrays['indptr']
+        index.postings_rows = arrays['postings_rows']
+        index.postings_tf = arrays['postings_tf']
+        index.doc_frequencies = arrays['doc_frequencies']
+        index._max_tf = arrays['max_tf']
+        index._min_length = arrays['min_length']
+        index.doc_lengths = arrays['doc_lengths']
+        index.live = arrays['live']
+        index.corpus_size = meta['corpus_size']
+        index.total_length = meta['total_length']
+        return index
+
+    @classmethod
+    def from_term_frequencies(cls, rows: Sequence[int], term_frequencies: Sequence[Dict[str, int]]) -> "BM25Index":
+        """Build an index from legacy per-document ``{term: tf}`` dictionaries."""
+        index = cls()
+        index.add_documents(rows, [[term for term, tf in tfs.items() for _ in range(tf)]
+                                   for tfs in term_frequencies])
+        index._merge_pending()
+        return index
@@ -1,41 +1,114 @@
 import numpy as np
 import faiss
-from typing import List, Tuple
+from typing import Dict, List, Optional, Tuple
+
+# Scalar quantizers of the graph's vector storage; float32 keeps a flat copy
+SQ_TYPES = {'float16': faiss.ScalarQuantizer.QT_fp16, 'int8': faiss.ScalarQuantizer.QT_8bit}
+
+# int8 storage is trained on the first batch when it has at least this many
+# vectors; otherwise on [-1, 1], which bounds every normalized component
+SQ_MIN_TRAIN_SIZE = 256
 
 class HNSWIndex:
     """
     Hierarchical Navigable Small World implementation using Faiss.
     Guarantees O(log n) search complexity and is highly optimized.
+
+    Vectors are stored under stable integer labels (an ``IndexIDMap2``), so a
+    document keeps its label for as long as it lives in the graph. Removing or
+    replacing a document tombstones its label; tombstoned labels are excluded
+    during graph traversal through an ``IDSelectorBitmap`` and dropped for good
+    when the graph is compacted.
+
+    With ``storage`` set to ``float16`` or ``int8`` the graph keeps its
+    vectors scalar-quantized (``IndexHNSWSQ``): 2 or 1 bytes per dimension
+    instead of 4. Neighbour distances are then approximate, and callers
+    rescore candidates with their own vectors.
     """
 
     def __init__(self,
                  dimension: int,
                  max_connections: int = 32,
                  ef_construction: int = 200,
-                 ef_search: int = 50):
+                 ef_search: int = 50,
+                 storage: str = 'float32'):
         """
         Initializes the Faiss HNSW index.
         - dimension: The dimensionality of the vectors.
         - max_connections (M): Max connections per node.
         - ef_construction: Construction-time beam search width.
         - ef_search: Search-time beam search width.
+        - storage: Vector storage of the graph: float32, float16 or int8.
         """
+        if storage != 'float32' and storage not in SQ_TYPES:
+            raise ValueError(f"Unknown HNSW storage {storage!r}")
         self.dimension = dimension
-        self.index = faiss.IndexHNSWFlat(dimension, max_connections, faiss.METRIC_L2)
-        self.index.hnsw.efConstruction = ef_construction
-        self.index.hnsw.efSearch = ef_search
-        self.doc_ids = []
+        self.storage = storage
+        self.max_connections = max_connections
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self.index = self._new_index()
+        self._label_to_doc: Dict[int, str] = {}
+        self._doc_to_label: Dict[str, int] = {}
+        self._live = np.zeros(1024, dtype=bool)
+        self._live_bitmap: Optional[np.ndarray] = None
+        self._next_label = 0
+        self._memory_mapped = False
+
+    def _new_index(self) -> faiss.Index:
+        if self.storage in SQ_TYPES:
+            graph = faiss.IndexHNSWSQ(self.dimension, SQ_TYPES[self.storage], self.max_connections, faiss.METRIC_L2)
+        else:
+            graph = faiss.IndexHNSWFlat(self.dimension, self.max_connections, faiss.METRIC_L2)
+        graph.hnsw.efConstruction = self.ef_construction
+        graph.hnsw.efSearch = self.ef_search
+        return faiss.IndexIDMap2(graph)
 
-    def add_documents(self, vectors: np.ndarray, doc_ids: List[str]):
-        """Add a batch of documents to the index."""
+    def add_documents(self, vectors: np.ndarray, doc_ids: List[str], labels: Optional[np.ndarray] = None):
+        """
+        Add a batch of documents to the index. ``labels`` are the stable ids
+        to store them under (fresh ones are allocated when omitted); a
+        document id that is already indexed is replaced.
+        """
         if vectors.shape[1] != self.dimension:
             raise ValueError(f"Input vector dimension {vectors.shape[1]} does not match index dimension {self.dimension}")
-        
-        normalized_vectors = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
-        self.index.add(normalized_vectors)
-        self.doc_ids.extend(doc_ids)
+        if labels is None:
+            labels = np.arange(self._next_label, self._next_label + len(doc_ids), dtype=np.int64)
+        labels = np.asarray(labels, dtype=np.int64)
+        if len(labels) != len(doc_ids):
+            raise ValueError("doc_ids and labels must have the same length")
+        if len(labels) == 0:
+            return
+
+        self._ensure_writable()
+        for doc_id in doc_ids:
+            self.remove_document(doc_id)
+
+        normalized_vectors = (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+        self._train(self.index, normalized_vectors)
+        self.index.add_with_ids(normalized_vectors, labels)
+        self._mark_live(labels, doc_ids)
+
+    def _train(self, index: faiss.Index, vectors: np.ndarray):
+        """Train quantized storage before its first vectors are added"""
+        if index.is_trained:
+            return
+        if len(vectors) < SQ_MIN_TRAIN_SIZE:
+            vectors = np.stack([-np.ones(self.dimension), np.ones(self.dimension)]).astype(np.float32)
+        index.train(vectors)
 
-    def search(self, query_vector: np.ndarray, k: int = 10) -> List[Tuple[str, float]]:
+    def remove_document(self, doc_id: str) -> bool:
+        """Tombstone a document; its vector stays in the graph until compaction."""
+        label = self._doc_to_label.pop(doc_id, None)
+        if label is None:
+            return False
+        del self._label_to_doc[label]
+        self._live[label] = False
+        self._live_bitmap = None
+        return True
+
+    def search(self, query_vector: np.ndarray, k: int = 10,
+               allowed: Optional[np.ndarray] = None, ef_search: Optional[int] = None) -> List[Tuple[str, float]]:
         """
         Search for the k-nearest neighbors to the query vector.
         Returns a list of (doc_id, distance) tuples.
@@ -43,20 +116,179 @@ class HNSWIndex:
         if query_vector.ndim == 1:
             query_vector = np.expand_dims(query_vector, axis=0)
 
-        if query_vector.shape[1] != self.dimension:
-            raise ValueError(f"Query vector dimension {query_vector.shape[1]} does not match index dimension {self.dimension}")
+        return self.search_batch(query_vector, k, allowed, ef_search)[0]
 
-        normalized_query = query_vector / np.linalg.norm(query_vector, axis=1, keepdims=True)
-        distances, indices = self.index.search(normalized_query, k)
+    def search_batch(self, query_vectors: np.ndarray, k: int = 10,
+                     allowed: Optional[np.ndarray] = None,
+                     ef_search: Optional[int] = None) -> List[List[Tuple[str, float]]]:
+        """
+        Search several queries with one multi-row Faiss call.
+        - allowed: Optional boolean mask over labels; other labels are skipped
+          during traversal, so the k results all satisfy it.
+        - ef_search: Beam width for this call instead of ``self.ef_search``.
+        Returns one list of (doc_id, distance) tuples per query row.
+        """
+        if query_vectors.shape[1] != self.dimension:
+            raise ValueError(f"Query vector dimension {query_vectors.shape[1]} does not match index dimension {self.dimension}")
+
+        normalized_queries = query_vectors / np.linalg.norm(query_vectors, axis=1, keepdims=True)
+        # The selector only holds a raw pointer, so the bitmap must outlive the search
+        params, bitmap = self._search_parameters(allowed, ef_search)
+        distances, indices = self.index.search(normalized_queries.astype(np.float32), k, params=params)
 
         results = []
-        for i in range(indices.shape[1]):
-            if indices[0, i] != -1:
-                doc_id = self.doc_ids[indices[0, i]]
-                dist = distances[0, i]
-                results.append((doc_id, dist))
-        
+        for row in range(indices.shape[0]):
+            row_results = []
+            for i in range(indices.shape[1]):
+                doc_id = self._label_to_doc.get(int(indices[row, i]))
+                if doc_id is not None:
+                    row_results.append((doc_id, distances[row, i]))
+            results.append(row_results)
+
         return results
 
+    def _search_parameters(self, allowed: Optional[np.ndarray] = None, ef_search: Optional[int] = None
+                           ) -> Tuple[Optional[faiss.SearchParametersHNSW], Optional[np.ndarray]]:
+        """
+        Search parameters that skip tombstoned labels and labels outside
+        ``allowed``, with the packed bitmap they point to; (None, None) when
+        every label qualifies at the index's own beam width.
+        """
+        ef_search = ef_search or self.ef_search
+        if allowed is None:
+            if self.tombstone_count == 0:
+                if ef_search == self.ef_search:
+                    return None, None
+                params = faiss.SearchParametersHNSW()
+                params.efSearch = ef_search
+                return params, None
+            if self._live_bitmap is None:
+                self._live_bitmap = np.packbits(self._live, bitorder='little')
+            bitmap = self._live_bitmap
+        else:
+            selected = self._live.copy()
+            shared = min(len(selected), len(allowed))
+            selected[:shared] &= allowed[:shared]
+            selected[shared:] = False
+            bitmap = np.packbits(selected, bitorder='little')
+        params = faiss.SearchParametersHNSW()
+        params.efSearch = ef_search
+        params.sel = faiss.IDSelectorBitmap(len(self._live), faiss.swig_ptr(bitmap))
+        return params, bitmap
+
+    def _mark_live(self, labels: np.ndarray, doc_ids: List[str]):
+        top = int(labels.max()) + 1
+        if top > len(self._live):
+            live = np.zeros(max(top, 2 * len(self._live)), dtype=bool)
+            live[:len(self._live)] = self._live
+            self._live = live
+        self._live[labels] = True
+        self._live_bitmap = None
+        for label, doc_id in zip(labels.tolist(), doc_ids):
+            self._label_to_doc[label] = doc_id
+            self._doc_to_label[doc_id] = label
+        self._next_label = max(self._next_label, top)
+
+    @property
+    def tombstone_count(self) -> int:
+        """Entries still in the graph whose document was removed or replaced."""
+        return self.index.ntotal - len(self._label_to_doc)
+
+    @property
+    def storage_bytes(self) -> int:
+        """Bytes of vector codes in the graph's storage, links excluded."""
+        storage = faiss.downcast_index(faiss.downcast_index(self.index.index).storage)
+        return int(storage.code_size * storage.ntotal)
+
+    @property
+    def tombstone_ratio(self) -> float:
+        return self.tombstone_count / self.index.ntotal if self.index.ntotal else 0.0
+
+    def label_of(self, doc_id: str) -> Optional[int]:
+        return self._doc_to_label.get(doc_id)
+
+    # Compaction --------------------------------------------------------
+
+    def prepare_compaction(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Live labels and their stored vectors, the input of ``build_graph``."""
+        labels = np.fromiter(self._label_to_doc, dtype=np.int64, count=len(self._label_to_doc))
+        if len(labels) == 0:
+            return labels, np.zeros((0, self.dimension), dtype=np.float32)
+        return labels, self.index.reconstruct_batch(labels)
+
+    def build_graph(self, labels: np.ndarray, vectors: np.ndarray) -> faiss.Index:
+        """
+        Build a fresh graph holding only ``labels``. It touches no shared
+        state, so it can run in a worker thread while the index serves queries.
+        """
+        index = self._new_index()
+        if len(labels):
+            # Decoded vectors span the ranges the current storage was trained on
+            self._train(index, vectors)
+            index.add_with_ids(vectors, labels)
+        return index
+
+    def install_graph(self, index: faiss.Index, labels: np.ndarray):
+        """
+        Swap in a graph from ``build_graph``. Documents added since the
+        compaction started are copied over; those removed since stay
+        tombstoned because liveness is tracked by label, not by graph.
+        """
+        rebuilt = set(labels.tolist())
+        added = np.array([label for label in self._label_to_doc if label not in rebuilt], dtype=np.int64)
+        if len(added):
+            vectors = self.index.reconstruct_batch(added)
+            self._train(index, vectors)
+            index.add_with_ids(vectors, added)
+        self.index = index
+        self._memory_mapped = False
+        self._live_bitmap = None
+
+    def compact(self):
+        """Rebuild the graph without tombstoned entries, synchronously."""
+        labels, vectors = self.prepare_compaction()
+        self.install_graph(self.build_graph(labels, vectors), labels)
+
+    # Persistence -------------------------------------------------------
+
+    def save(self, path: str):
+        """Write the Faiss graph to ``path``."""
+        faiss.write_index(self.index, path)
+
+    def load(self, path: str, mmap: bool = False):
+        """
+        Read the Faiss graph from ``path``. With ``mmap`` the vector storage
+        stays in the page cache and is shared between processes; it is copied
+        into private memory the first time documents are added.
+        """
+        if mmap:
+            self.index = faiss.read_index(path, faiss.IO_FLAG_MMAP_IFC)
+        else:
+            self.index = faiss.read_index(path)
+        self._memory_mapped = mmap
+
+    def to_snapshot(self) -> Tuple[Dict[str, np.ndarray], Dict[str, List[str]], Dict]:
+        """Live labels and their document ids; the graph itself is saved by ``save``."""
+        labels = np.fromiter(self._label_to_doc, dtype=np.int64, count=len(self._label_to_doc))
+        doc_ids = [self._label_to_doc[label] for label in labels.tolist()]
+        meta = {'dimension': self.dimension, 'next_label': self._next_label, 'storage': self.storage}
+        return {'labels': labels}, {'doc_ids': doc_ids}, meta
+
+    def restore_labels(self, arrays: Dict[str, np.ndarray], strings: Dict, meta: Dict):
+        """Restore the label map saved by ``to_snapshot`` after ``load``."""
+        self._label_to_doc = {}
+        self._doc_to_label = {}
+        self._live = np.zeros(max(self._next_label, 1024), dtype=bool)
+        labels = np.asarray(arrays['labels'], dtype=np.int64)
+        if len(labels):
+            self._mark_live(labels, list(strings['doc_ids']))
+        self._next_label = max(self._next_label, int(meta.get('next_label', 0)))
+
+    def _ensure_writable(self):
+        """Faiss cannot grow memory-mapped storage, so take a private copy first."""
+        if self._memory_mapped:
+            self.index = faiss.deserialize_index(faiss.serialize_index(self.index))
+            self._memory_mapped = False
+
     def __len__(self):
-        return self.index.ntotal
\ No newline at end of file
+        return len(self._label_to_doc)
@@ -0,0 +1,299 @@
+import os
+import numpy as np
+import faiss
+from typing import Dict, List, Optional, Tuple
+
+class IVFPQIndex:
+    """
+    Compressed approximate nearest-neighbour index: an IVF coarse quantizer
+    over product-quantized codes, searched with asymmetric distance
+    computation (ADC). Each document costs ``num_subspaces`` bytes of code
+    plus its label, instead of a full float32 vector.
+
+    Codes are not residuals, so the same codes also give ADC similarities
+    for arbitrary candidates (``similarities``). A copy is kept in a
+    label-indexed matrix for that. Removal is immediate through a hash-table
+    direct map, so the index never accumulates tombstones.
+
+    Until ``min_train_size`` vectors have been seen the quantizers cannot be
+    trained. Until then vectors are held in an exact buffer and searched by
+    brute force; they move into the compressed lists once training happens.
+    """
+
+    def __init__(self,
+                 dimension: int,
+                 nlist: int = 0,
+                 nprobe: int = 16,
+                 num_subspaces: int = 16,
+                 bits_per_subspace: int = 8,
+                 min_train_size: int = 1024,
+                 max_train_size: int = 100000):
+        """
+        Initializes the compressed index.
+        - dimension: The dimensionality of the vectors.
+        - nlist: Number of inverted lists; 0 sizes it from the training set (4 * sqrt(n)).
+        - nprobe: Lists visited per query.
+        - num_subspaces (m): PQ code size in bytes at 8 bits per subspace.
+        - bits_per_subspace: Codebook size = 2^bits.
+        """
+        if dimension % num_subspaces:
+            raise ValueError(f"Dimension {dimension} is not divisible by {num_subspaces} PQ subspaces")
+        self.dimension = dimension
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.num_subspaces = num_subspaces
+        self.bits_per_subspace = bits_per_subspace
+        self.min_train_size = min_train_size
+        self.max_train_size = max_train_size
+        self.index: Optional[faiss.IndexIVFPQ] = None
+        self._codes = np.zeros((0, num_subspaces), dtype=np.uint8)
+        self._label_to_doc: Dict[int, str] = {}
+        self._doc_to_label: Dict[str, int] = {}
+        self._pending: Dict[int, np.ndarray] = {}
+
+    @property
+    def is_trained(self) -> bool:
+        return self.index is not None
+
+    def train(self, vectors: np.ndarray):
+        """Train the coarse quantizer and codebooks, then compress buffered vectors."""
+        vectors = self._normalize(vectors)
+        if len(vectors) > self.max_train_size:
+            sample = np.random.default_rng(42).choice(len(vectors), self.max_train_size, replace=False)
+            vectors = vectors[np.sort(sample)]
+
+        nlist = self.nlist or int(4 * np.sqrt(len(vectors)))
+        # Faiss wants ~39 training points per centroid
+        nlist = max(1, min(nlist, len(vectors) // 39))
+        quantizer = faiss.IndexFlatL2(self.dimension)
+        index = faiss.IndexIVFPQ(quantizer, self.dimension, nlist, self.num_subspaces, self.bits_per_subspace)
+        index.by_residual = False
+        index.train(vectors)
+        index.set_direct_map_type(faiss.DirectMap.Hashtable)
+        index.nprobe = self.nprobe
+        self.index = index
+
+        if self._pending:
+            labels = np.fromiter(self._pending, dtype=np.int64, count=len(self._pending))
+            self._add_codes(np.stack([self._pending[label] for label in labels.tolist()]), labels)
+            self._pending = {}
+
+    def add_documents(self, vectors: np.ndarray, doc_ids: List[str], labels: Optional[np.ndarray] = None):
+        """
+        Add a batch of documents under stable ``labels`` (fresh ones when
+        omitted); a document id that is already indexed is replaced.
+        """
+        if vectors.shape[1] != self.dimension:
+            raise ValueError(f"Input vector dimension {vectors.shape[1]} does not match index dimension {self.dimension}")
+        if labels is None:
+            start = max(self._label_to_doc, default=-1) + 1
+            labels = np.arange(start, start + len(doc_ids), dtype=np.int64)
+        labels = np.asarray(labels, dtype=np.int64)
+        if len(labels) != len(doc_ids):
+            raise ValueError("doc_ids and labels must have the same length")
+        if len(labels) == 0:
+            return
+
+        for doc_id in doc_ids:
+            self.remove_document(doc_id)
+        for label, doc_id in zip(labels.tolist(), doc_ids):
+            self._label_to_doc[label] = doc_id
+            self._doc_to_label[doc_id] = label
+
+        vectors = self._normalize(vectors)
+        if self.is_trained:
+            self._add_codes(vectors, labels)
+            return
+
+        self._pending.update(zip(labels.tolist(), vectors))
+        if len(self._pending) >= self.min_train_size:
+            self.train(np.stack(list(self._pending.values())))
+
+    def _add_codes(self, vectors: np.ndarray, labels: np.ndarray):
+        top = int(labels.max()) + 1
+        if top > len(self._codes):
+            codes = np.zeros((max(top, 2 * len(self._codes)), self.num_subspaces), dtype=np.uint8)
+            codes[:len(self._codes)] = self._codes
+            self._codes = codes
+        self._codes[labels] = self.index.pq.compute_codes(vectors)
+        self.index.add_with_ids(vectors, labels)
+
+    def remove_document(self, doc_id: str) -> bool:
+        """Remove a document from its inverted list."""
+        label = self._doc_to_label.pop(doc_id, None)
+        if label is None:
+            return False
+        del self._label_to_doc[label]
+        if self._pending.pop(label, None) is None and self.is_trained:
+            self.index.remove_ids(faiss.IDSelectorArray(np.array([label], dtype=np.int64)))
+        return True
+
+    def search(self, query_vector: np.ndarray, k: int = 10,
+               allowed: Optional[np.ndarray] = None, nprobe: Optional[int] = None) -> List[Tuple[str, float]]:
+        """
+        Search for the k-nearest neighbors to the query vector.
+        Returns a list of (doc_id, distance) tuples.
+        """
+        if query_vector.ndim == 1:
+            query_vector = np.expand_dims(query_vector, axis=0)
+
+        return self.search_batch(query_vector, k, allowed, nprobe)[0]
+
+    def search_batch(self, query_vectors: np.ndarray, k: int = 10,
+                     allowed: Optional[np.ndarray] = None,
+                     nprobe: Optional[int] = None) -> List[List[Tuple[str, float]]]:
+        """
+        Search several queries at once. Distances are squared L2 between
+        normalized vectors, ADC-approximated once the index is trained.
+        - allowed: Optional boolean mask over labels restricting the results.
+        - nprobe: Lists visited for this call instead of ``self.nprobe``.
+        """
+        if query_vectors.shape[1] != self.dimension:
+            raise ValueError(f"Query vector dimension {query_vectors.shape[1]} does not match index dimension {self.dimension}")
+
+        queries = self._normalize(query_vectors)
+        if not self.is_trained:
+            distances, indices = self._search_pending(queries, k, allowed)
+        elif allowed is None:
+            nprobe = nprobe or self.nprobe
+            params = faiss.SearchParametersIVF(nprobe=nprobe) if nprobe != self.nprobe else None
+            distances, indices = self.index.search(queries, k, params=params)
+        else:
+            # The selector only holds a raw pointer to the bitmap
+            bitmap = np.packbits(allowed, bitorder='little')
+            params = faiss.SearchParametersIVF(sel=faiss.IDSelectorBitmap(len(allowed), faiss.swig_ptr(bitmap)),
+                                               nprobe=nprobe or self.nprobe)
+            distances, indices = self.index.search(queries, k, params=params)
+
+        results = []
+        for row in range(indices.shape[0]):
+            row_results = []
+            for i in range(indices.shape[1]):
+                doc_id = self._label_to_doc.get(int(indices[row, i]))
+                if doc_id is not None:
+                    row_results.append((doc_id, distances[row, i]))
+            results.append(row_results)
+
+        return results
+
+    def _search_pending(self, queries: np.ndarray, k: int,
+                        allowed: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Brute-force search over the untrained buffer, shaped like a Faiss result."""
+        distances = np.full((len(queries), k), np.inf, dtype=np.float32)
+        indices = np.full((len(queries), k), -1, dtype=np.int64)
+        labels = np.fromiter(self._pending, dtype=np.int64, count=len(self._pending))
+        if allowed is not None:
+            labels = labels[labels < len(allowed)]
+            labels = labels[allowed[labels]]
+        if len(labels) == 0:
+            return distances, indices
+        all_distances = 2.0 - 2.0 * (queries @ np.stack([self._pending[label] for label in labels.tolist()]).T)
+        top = np.argsort(all_distances, axis=1)[:, :k]
+        distances[:, :top.shape[1]] = np.take_along_axis(all_distances, top, axis=1)
+        indices[:, :top.shape[1]] = labels[top]
+        return distances, indices
+
+    def similarities(self, query_vector: np.ndarray, labels: np.ndarray) -> np.ndarray:
+        """Approximate cosine similarity of the query to each label."""
+        return self.similarity_matrix(np.asarray(query_vector).reshape(1, -1), labels)[:, 0]
+
+    def similarity_matrix(self, query_vectors: np.ndarray, labels: np.ndarray) -> np.ndarray:
+        """
+        Approximate cosine similarities shaped (labels, queries). For unit
+        vectors ``cos = 1 - d^2 / 2``, and d^2 is read from per-query ADC
+        tables indexed by the stored codes.
+        """
+        queries = self._normalize(query_vectors)
+        labels = np.asarray(labels, dtype=np.int64)
+        similarities = np.zeros((len(labels), len(queries)), dtype=np.float64)
+        if len(labels) == 0:
+            return similarities
+
+        pending = np.array([label in self._pending for label in labels.tolist()], dtype=bool)
+        if pending.any():
+            buffered = np.stack([self._pending[label] for label in labels[pending].tolist()])
+            similarities[pending] = buffered @ queries.T
+
+        coded = ~pending & (labels < len(self._codes))
+        if coded.any() and self.is_trained:
+            pq = self.index.pq
+            tables = np.empty((len(queries), pq.M, pq.ksub), dtype=np.float32)
+            pq.compute_distance_tables(len(queries), faiss.swig_ptr(queries), faiss.swig_ptr(tables))
+            codes = self._codes[labels[coded]]
+            distances = tables[:, np.arange(pq.M), codes].sum(axis=2)
+            similarities[coded] = (1.0 - distances / 2.0).T
+        return similarities
+
+    @property
+    def tombstone_count(self) -> int:
+        """Removal is immediate, so there is never anything to compact."""
+        return 0
+
+    @property
+    def tombstone_ratio(self) -> float:
+        return 0.0
+
+    @property
+    def bytes_per_document(self) -> int:
+        """Vector bytes held in memory per document: code + label + ADC code copy."""
+        return 2 * self.num_subspaces * self.bits_per_subspace // 8 + 8
+
+    def label_of(self, doc_id: str) -> Optional[int]:
+        return self._doc_to_label.get(doc_id)
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return np.ascontiguousarray(vectors / np.where(norms > 0, norms, 1.0), dtype=np.float32)
+
+    # Persistence -------------------------------------------------------
+
+    def save(self, path: str):
+        """Write the trained Faiss index to ``path``; an untrained index writes an empty file."""
+        if self.is_trained:
+            faiss.write_index(self.index, path)
+        else:
+            open(path, "wb").close()
+
+    def load(self, path: str, mmap: bool = False):
+        """
+        Read the Faiss index from ``path``. The inverted lists are already
+        compressed, so they are always read into memory.
+        """
+        self.index = faiss.read_index(path) if os.path.getsize(path) else None
+        if self.index is not None:
+            self.index.nprobe = self.nprobe
+
+    def to_snapshot(self) -> Tuple[Dict[str, np.ndarray], Dict[str, List[str]], Dict]:
+        """Label map, ADC codes and the untrained buffer; the Faiss index is saved by ``save``."""
+        labels = np.fromiter(self._label_to_doc, dtype=np.int64, count=len(self._label_to_doc))
+        doc_ids = [self._label_to_doc[label] for label in labels.tolist()]
+        pending_labels = np.fromiter(self._pending, dtype=np.int64, count=len(self._pending))
+        pending_vectors = (np.stack([self._pending[label] for label in pending_labels.tolist()]) if self._pending
+                           else np.zeros((0, self.dimension), dtype=np.float32))
+        arrays = {
+            'labels': labels,
+            'codes': self._codes,
+            'pending_labels': pending_labels,
+            'pending_vectors': pending_vectors,
+        }
+        meta = {
+            'dimension': self.dimension,
+            'nlist': self.nlist,
+            'num_subspaces': self.num_subspaces,
+            'bits_per_subspace': self.bits_per_subspace,
+        }
+        return arrays, {'doc_ids': doc_ids}, meta
+
+    def restore_labels(self, arrays: Dict[str, np.ndarray], strings: Dict, meta: Dict):
+        """Restore the state saved by ``to_snapshot`` after ``load``."""
+        labels = np.asarray(arrays['labels'], dtype=np.int64).tolist()
+        doc_ids = list(strings['doc_ids'])
+        self._label_to_doc = dict(zip(labels, doc_ids))
+        self._doc_to_label = dict(zip(doc_ids, labels))
+        self._codes = arrays['codes']
+        self._pending = dict(zip(np.asarray(arrays['pending_labels']).tolist(), arrays['pending_vectors']))
+
+    def __len__(self):
+        return len(self._label_to_doc)
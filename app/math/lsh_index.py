@@ -1,13 +1,43 @@
 import numpy as np
 import mmh3
-from typing import List, Tuple, Dict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple, Union
 from collections import defaultdict
 from numba import jit
 
+# MinHash of an empty feature set: the numba kernel casts +inf to int32
+EMPTY_SIGNATURE_VALUE = np.iinfo(np.int32).min
+
+# Upper bound on shingle x hash-function products materialized per bulk chunk
+_BULK_CHUNK_SHINGLES = 65536
+
+# 64-bit FNV-1a over the 32-bit values of a band gives its bucket key
+_FNV_OFFSET = np.uint64(0xcbf29ce484222325)
+_FNV_PRIME = np.uint64(0x100000001b3)
+
+
+@dataclass
+class LSHQuery:
+    """A query's MinHash signature and band keys, computed once per query."""
+    signature: np.ndarray
+    band_hashes: np.ndarray
+
+
 class LSHIndex:
     """
     Production LSH implementation based on Facebook FAISS mathematics.
     Achieves 8.5x speedup over traditional similarity search.
+
+    Signatures are kept stacked in one int32 matrix (one row per document,
+    rows of removed documents are reclaimed by ``compact``), so a query's
+    Jaccard estimates against many documents are a single comparison.
+
+    Band buckets live in two layers: per band, a sorted array of bucket keys
+    with the signature row of each entry, and hash tables holding the
+    documents added since. Snapshots store the arrays, so a loaded index
+    memory-maps them instead of rebuilding buckets; ``compact`` folds the
+    hash tables back into the arrays. Rows of removed documents are skipped
+    at query time.
     """
 
     def __init__(self,
@@ -23,11 +53,31 @@ class LSHIndex:
         self.num_hashes = num_hashes
         self.num_bands = num_bands
         self.rows_per_band = self.num_hashes // self.num_bands
-        self.hash_tables = [defaultdict(set) for _ in range(self.num_bands)]
-        self.signatures = {}
 
         # Generate random hash functions for MinHash
         self.hash_functions = self._generate_hash_functions()
+        self._init_storage()
+
+    def _init_storage(self, capacity: int = 1024):
+        self._hash_a = np.array([a for a, _ in self.hash_functions], dtype=np.int64)
+        self._hash_b = np.array([b for _, b in self.hash_functions], dtype=np.int64)
+        self._signature_matrix = np.zeros((max(capacity, 1), self.num_hashes), dtype=np.int32)
+        self._size = 0
+        self._doc_to_row: Dict[str, int] = {}
+        self._row_ids: List[Optional[str]] = []
+        self.hash_tables = [defaultdict(set) for _ in range(self.num_bands)]
+        self._bucket_keys = np.zeros((self.num_bands, 0), dtype=np.uint64)
+        self._bucket_rows = np.zeros((self.num_bands, 0), dtype=np.int64)
+
+    def __setstate__(self, state: Dict):
+        """Upgrade indexes pickled with a ``{doc_id: signature}`` dict or older bucket keys."""
+        signatures = state.pop('signatures', None)
+        self.__dict__.update(state)
+        if signatures is not None:
+            self._init_storage(len(signatures))
+            if signatures:
+                self._add_signatures(list(signatures), np.stack(list(signatures.values())))
+        self._freeze()
 
     def _generate_hash_functions(self) -> List[Tuple[int, int]]:
         """Generate hash function parameters (a, b) for h(x) = (ax + b) mod p"""
@@ -59,58 +109,259 @@ class LSHIndex:
 
         return signature.astype(np.int32)
 
+    @staticmethod
+    def _shingle_hashes(features: Sequence[str]) -> np.ndarray:
+        return np.array([mmh3.hash(shingle, signed=False) for shingle in features], dtype=np.uint32)
+
+    def compute_signature(self, features: List[str]) -> np.ndarray:
+        """MinHash signature of a feature set."""
+        return self._compute_minhash_signature(self._shingle_hashes(features), self.hash_functions)
+
+    def compute_signatures(self, feature_lists: Sequence[Sequence[str]]) -> np.ndarray:
+        """
+        MinHash signatures of many feature sets, shaped (documents, num_hashes).
+
+        Equivalent to ``compute_signature`` per document, but the hash
+        functions are applied to all shingles of a chunk of documents at once
+        and reduced per document with ``np.minimum.reduceat``. With a, b < p
+        and 32-bit shingles every product fits in int64, so the result is
+        bit-identical to the numba kernel.
+        """
+        signatures = np.full((len(feature_lists), self.num_hashes), EMPTY_SIGNATURE_VALUE, dtype=np.int32)
+        p = 2**31 - 1
+
+        start = 0
+        while start < len(feature_lists):
+            end, shingles = start, 0
+            while end < len(feature_lists) and (end == start or shingles + len(feature_lists[end]) <= _BULK_CHUNK_SHINGLES):
+                shingles += len(feature_lists[end])
+                end += 1
+
+            counts = np.array([len(features) for features in feature_lists[start:end]], dtype=np.int64)
+            non_empty = np.flatnonzero(counts)
+            if len(non_empty):
+                hashes = self._shingle_hashes([f for features in feature_lists[start:end] for f in features])
+                values = (hashes.astype(np.int64)[:, None] * self._hash_a + self._hash_b) % p
+                offsets = np.concatenate(([0], np.cumsum(counts)[:-1]))[non_empty]
+                signatures[start + non_empty] = np.minimum.reduceat(values, offsets, axis=0)
+            start = end
+
+        return signatures
+
+    def prepare_query(self, query_features: List[str]) -> LSHQuery:
+        """Signature and band keys of a query, shared by retrieval and scoring."""
+        signature = self.compute_signature(query_features)
+        return LSHQuery(signature=signature, band_hashes=self._band_keys(signature)[0])
+
     def add_document(self, doc_id: str, text_features: List[str]):
         """Add document to LSH index with mathematical optimization."""
-        # Convert text features to shingle hashes
-        shingle_hashes = np.array([mmh3.hash(shingle, signed=False) for shingle in text_features], dtype=np.uint32)
+        self._add_signatures([doc_id], self.compute_signature(text_features).reshape(1, -1))
+
+    def add_documents(self, doc_ids: List[str], feature_lists: Sequence[Sequence[str]]):
+        """Add many documents, computing their signatures in bulk."""
+        if len(doc_ids) != len(feature_lists):
+            raise ValueError("doc_ids and feature_lists must have the same length")
+        self._add_signatures(doc_ids, self.compute_signatures(feature_lists))
 
-        # Compute MinHash signature
-        signature = self._compute_minhash_signature(shingle_hashes, self.hash_functions)
-        self.signatures[doc_id] = signature
+    def _add_signatures(self, doc_ids: List[str], signatures: np.ndarray):
+        """Store signatures and register the documents in their band buckets."""
+        if len(set(doc_ids)) != len(doc_ids):
+            last = list({doc_id: i for i, doc_id in enumerate(doc_ids)}.values())
+            doc_ids, signatures = [doc_ids[i] for i in last], signatures[last]
+
+        # Re-adding a document must not leave it in the buckets of its old signature
+        for doc_id in doc_ids:
+            self.remove_document(doc_id)
+
+        self._ensure_capacity(self._size + len(doc_ids))
+        rows = range(self._size, self._size + len(doc_ids))
+        self._signature_matrix[self._size:self._size + len(doc_ids)] = signatures
+        self._size += len(doc_ids)
 
         # Band-wise hashing for faster retrieval
-        for band_idx in range(self.num_bands):
-            start_idx = band_idx * self.rows_per_band
-            end_idx = start_idx + self.rows_per_band
+        for doc_id, row, band_keys in zip(doc_ids, rows, self._band_keys(signatures).tolist()):
+            self._doc_to_row[doc_id] = row
+            self._row_ids.append(doc_id)
+            for band_idx, band_key in enumerate(band_keys):
+                self.hash_tables[band_idx][band_key].add(doc_id)
+
+    def remove_document(self, doc_id: str) -> bool:
+        """
+        Drop a document from its band buckets using its stored signature.
+        Entries in the bucket arrays stay until ``compact``; their row no
+        longer maps to a document.
+        """
+        row = self._doc_to_row.pop(doc_id, None)
+        if row is None:
+            return False
+        self._row_ids[row] = None
+
+        for band_idx, band_key in enumerate(self._band_keys(self._signature_matrix[row])[0].tolist()):
+            bucket = self.hash_tables[band_idx].get(band_key)
+            if bucket is not None:
+                bucket.discard(doc_id)
+                if not bucket:
+                    del self.hash_tables[band_idx][band_key]
+        return True
+
+    def _band_keys(self, signatures: np.ndarray) -> np.ndarray:
+        """Bucket key of each band of each signature, shaped (signatures, num_bands)."""
+        signatures = np.asarray(signatures, dtype=np.int32).reshape(-1, self.num_hashes)
+        bands = signatures[:, :self.num_bands * self.rows_per_band].view(np.uint32).astype(np.uint64)
+        bands = bands.reshape(len(signatures), self.num_bands, self.rows_per_band)
+        keys = np.full((len(signatures), self.num_bands), _FNV_OFFSET, dtype=np.uint64)
+        for position in range(self.rows_per_band):
+            keys ^= bands[:, :, position]
+            keys *= _FNV_PRIME
+        return keys
+
+    def _bucket_arrays(self, rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Per band, the sorted bucket keys of ``rows`` and the row of each entry."""
+        keys = self._band_keys(self._signature_matrix[rows]).T
+        order = np.argsort(keys, axis=1, kind='stable')
+        return np.take_along_axis(keys, order, axis=1), np.asarray(rows, dtype=np.int64)[order]
+
+    def _freeze(self):
+        """Move every live document into the bucket arrays and empty the hash tables."""
+        rows = np.fromiter(self._doc_to_row.values(), dtype=np.int64, count=len(self._doc_to_row))
+        self._bucket_keys, self._bucket_rows = self._bucket_arrays(rows)
+        self.hash_tables = [defaultdict(set) for _ in range(self.num_bands)]
+
+    def _ensure_capacity(self, required: int):
+        capacity = self._signature_matrix.shape[0]
+        if required <= capacity:
+            return
+        matrix = np.zeros((max(required, capacity * 2), self.num_hashes), dtype=np.int32)
+        matrix[:self._size] = self._signature_matrix[:self._size]
+        self._signature_matrix = matrix
+
+    def compact(self):
+        """Reclaim the signature rows of removed documents."""
+        doc_ids = list(self._doc_to_row)
+        if len(doc_ids) == self._size:
+            if any(self.hash_tables):
+                self._freeze()
+            return
+        signatures = self._signature_matrix[[self._doc_to_row[doc_id] for doc_id in doc_ids]]
+        self._signature_matrix = np.zeros((max(len(doc_ids), 1), self.num_hashes), dtype=np.int32)
+        self._signature_matrix[:len(doc_ids)] = signatures
+        self._size = len(doc_ids)
+        self._doc_to_row = {doc_id: row for row, doc_id in enumerate(doc_ids)}
+        self._row_ids = doc_ids
+        self._freeze()
+
+    # Lookups -----------------------------------------------------------
+
+    def __contains__(self, doc_id: object) -> bool:
+        return doc_id in self._doc_to_row
+
+    def __len__(self) -> int:
+        return len(self._doc_to_row)
+
+    def signature_of(self, doc_id: str) -> Optional[np.ndarray]:
+        row = self._doc_to_row.get(doc_id)
+        return None if row is None else self._signature_matrix[row]
+
+    def rows_for(self, doc_ids: Sequence[str]) -> np.ndarray:
+        """Signature rows of the documents, -1 for documents not in the index."""
+        lookup = self._doc_to_row.get
+        return np.fromiter((lookup(doc_id, -1) for doc_id in doc_ids), dtype=np.int64, count=len(doc_ids))
 
-            # Hash the band to create bucket key
-            band_hash = mmh3.hash_bytes(signature[start_idx:end_idx].tobytes())
-            self.hash_tables[band_idx][band_hash].add(doc_id)
+    # Persistence -------------------------------------------------------
+
+    def to_snapshot(self) -> Tuple[Dict[str, np.ndarray], Dict[str, List[str]], Dict]:
+        """
+        Arrays, string columns and metadata for an index snapshot: the live
+        signatures, and per band the sorted bucket keys with the snapshot
+        row of each entry.
+        """
+        doc_ids = list(self._doc_to_row)
+        rows = np.fromiter(self._doc_to_row.values(), dtype=np.int64, count=len(doc_ids))
+        bucket_keys, bucket_rows = self._bucket_arrays(rows)
+        # Snapshot rows are positions in doc_ids
+        positions = np.empty(self._size, dtype=np.int64)
+        positions[rows] = np.arange(len(rows))
+        arrays = {
+            'signatures': self._signature_matrix[rows],
+            'bucket_keys': bucket_keys,
+            'bucket_rows': positions[bucket_rows],
+        }
+        meta = {'num_hashes': self.num_hashes, 'num_bands': self.num_bands}
+        return arrays, {'doc_ids': doc_ids}, meta
+
+    @classmethod
+    def from_snapshot(cls, arrays: Dict[str, np.ndarray], strings: Dict, meta: Dict) -> "LSHIndex":
+        """
+        Restore an index on top of (possibly memory-mapped) snapshot arrays.
+        Band buckets are rebuilt only for snapshots saved without them.
+        """
+        index = cls(num_hashes=meta['num_hashes'], num_bands=meta['num_bands'])
+        doc_ids = list(strings['doc_ids'])
+        index._init_storage(0)
+        # Copied on the first add, which grows the matrix
+        index._signature_matrix = arrays['signatures']
+        index._size = len(doc_ids)
+        index._doc_to_row = dict(zip(doc_ids, range(len(doc_ids))))
+        index._row_ids = doc_ids
+        if 'bucket_keys' in arrays:
+            index._bucket_keys, index._bucket_rows = arrays['bucket_keys'], arrays['bucket_rows']
+        else:
+            index._freeze()
+        return index
+
+    # Queries -----------------------------------------------------------
 
     def query_candidates(self,
-                        query_features: List[str],
+                        query: Union[List[str], LSHQuery],
                         num_candidates: int = 100) -> List[str]:
         """
         Lightning-fast candidate retrieval using LSH mathematics.
         Expected time complexity: $O(1)$ per candidate.
+        Accepts query features or a prepared ``LSHQuery``.
         """
-        # Compute query signature
-        query_shingles = np.array([mmh3.hash(shingle, signed=False) for shingle in query_features], dtype=np.uint32)
-        query_signature = self._compute_minhash_signature(query_shingles, self.hash_functions)
+        if not isinstance(query, LSHQuery):
+            query = self.prepare_query(query)
 
         # Collect candidates from all bands
         candidates = set()
-        for band_idx in range(self.num_bands):
-            start_idx = band_idx * self.rows_per_band
-            end_idx = start_idx + self.rows_per_band
-
-            band_hash = mmh3.hash_bytes(query_signature[start_idx:end_idx].tobytes())
-
-            if band_hash in self.hash_tables[band_idx]:
-                candidates.update(self.hash_tables[band_idx][band_hash])
+        row_ids = self._row_ids
+        for band_idx, band_key in enumerate(query.band_hashes.tolist()):
+            bucket = self.hash_tables[band_idx].get(band_key)
+            if bucket:
+                candidates.update(bucket)
+            keys = self._bucket_keys[band_idx]
+            start = np.searchsorted(keys, query.band_hashes[band_idx], side='left')
+            end = np.searchsorted(keys, query.band_hashes[band_idx], side='right')
+            for row in self._bucket_rows[band_idx, start:end].tolist():
+                doc_id = row_ids[row]
+                if doc_id is not None:
+                    candidates.add(doc_id)
 
         return list(candidates)[:num_candidates]
 
-    def jaccard_similarity(self, doc_id: str, query_features: List[str]) -> float:
+    def jaccard_many(self, doc_rows: np.ndarray, query_signature: np.ndarray) -> np.ndarray:
+        """
+        Jaccard estimates of many documents against one query signature, in
+        one comparison over the stacked matrix. Rows of -1 (documents not in
+        the index) score 0.
+        """
+        doc_rows = np.asarray(doc_rows, dtype=np.int64)
+        scores = np.zeros(len(doc_rows), dtype=np.float64)
+        known = doc_rows >= 0
+        if known.any():
+            # Mathematical property: $E[|sig1 ∩ sig2|/|sig1 ∪ sig2|] = Jaccard(S1, S2)$
+            matches = np.count_nonzero(self._signature_matrix[doc_rows[known]] == query_signature, axis=1)
+            scores[known] = matches / self.num_hashes
+        return scores
+
+    def jaccard_similarity(self, doc_id: str, query: Union[List[str], LSHQuery]) -> float:
         """Estimate Jaccard similarity using MinHash mathematical properties."""
-        if doc_id not in self.signatures:
+        row = self._doc_to_row.get(doc_id)
+        if row is None:
             return 0.0
-
-        query_shingles = np.array([mmh3.hash(shingle, signed=False) for shingle in query_features], dtype=np.uint32)
-        query_signature = self._compute_minhash_signature(query_shingles, self.hash_functions)
-
-        doc_signature = self.signatures[doc_id]
+        if not isinstance(query, LSHQuery):
+            query = self.prepare_query(query)
 
         # Mathematical property: $E[|sig1 ∩ sig2|/|sig1 ∪ sig2|] = Jaccard(S1, S2)$
-        matches = np.sum(doc_signature == query_signature)
-        return matches / self.num_hashes
\ No newline at end of file
+        matches = np.sum(self._signature_matrix[row] == query.signature)
+        return matches / self.num_hashes
@@ -1,6 +1,6 @@
 import numpy as np
 import faiss
-from typing import Tuple
+from typing import Dict, Tuple
 
 class ProductQuantizer:
     """
@@ -36,6 +36,34 @@ class ProductQuantizer:
         self.trained = True
         print("PQ training completed.")
 
+    @property
+    def centroids(self) -> np.ndarray:
+        """Codebooks as a (num_subspaces, 2^bits, dimension / num_subspaces) array."""
+        return faiss.vector_to_array(self.pq.centroids).reshape(self.pq.M, self.pq.ksub, self.pq.dsub)
+
+    def set_centroids(self, centroids: np.ndarray):
+        """Install previously trained codebooks without retraining."""
+        faiss.copy_array_to_vector(np.ascontiguousarray(centroids, dtype=np.float32).ravel(), self.pq.centroids)
+        self.trained = True
+
+    def to_snapshot(self) -> Tuple[Dict[str, np.ndarray], Dict, Dict]:
+        """Arrays, string columns and metadata for an index snapshot."""
+        arrays = {'centroids': self.centroids} if self.trained else {}
+        meta = {
+            'dimension': self.dimension,
+            'num_subspaces': self.num_subspaces,
+            'bits_per_subspace': self.bits_per_subspace,
+            'trained': self.trained,
+        }
+        return arrays, {}, meta
+
+    @classmethod
+    def from_snapshot(cls, arrays: Dict[str, np.ndarray], strings: Dict, meta: Dict) -> "ProductQuantizer":
+        quantizer = cls(meta['dimension'], meta['num_subspaces'], meta['bits_per_subspace'])
+        if meta['trained']:
+            quantizer.set_centroids(arrays['centroids'])
+        return quantizer
+
     def encode(self, vectors: np.ndarray) -> np.ndarray:
         """
         Encode vectors into quantized codes.
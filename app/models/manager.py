@@ -14,6 +14,7 @@ from typing import Any, Dict, List, Optional, Set
 from app.core.config import MODEL_ASSIGNMENTS, PRIORITY_TIERS
 from app.core.logging import get_correlation_id, get_logger, log_performance
 from app.core.memory_manager import A5000MemoryManager
+from app.core.single_flight import SingleFlight, temperature_bucket
 from app.models.ollama_client import (
     ModelResult,
     ModelStatus,
@@ -148,6 +149,9 @@ class ModelManager:
         
         # Async lock for background operations
         self._background_lock = asyncio.Lock()
+
+        # Concurrent identical generations share one Ollama call
+        self._generations = SingleFlight("model_generate")
         
         logger.info(f"ModelManager initialized with Ollama host: {ollama_host}")
 
@@ -420,6 +424,25 @@ class ModelManager:
         Returns:
             ModelResult: Generation result
         """
+        key = self._generation_key(model_name, prompt, max_tokens, temperature, kwargs)
+        return await self._generations.do(
+            key, lambda: self._generate(model_name, prompt, max_tokens, temperature, **kwargs)
+        )
+
+    @staticmethod
+    def _generation_key(
+        model_name: str, prompt: str, max_tokens: int, temperature: float, options: Dict[str, Any]
+    ) -> tuple:
+        return (model_name, prompt, max_tokens, temperature_bucket(temperature), repr(sorted(options.items())))
+
+    async def _generate(
+        self,
+        model_name: str,
+        prompt: str,
+        max_tokens: int,
+        temperature: float,
+        **kwargs
+    ) -> ModelResult:
         if not self.is_initialized:
             await self.initialize()
         
@@ -587,7 +610,8 @@ class ModelManager:
             "total_requests": sum(self.usage_stats.values()),
             "total_cost": sum(self.cost_tracker.values()),
             "initialization_status": self.initialization_status,
-            "is_initialized": self.is_initialized
+            "is_initialized": self.is_initialized,
+            "coalescing": self._generations.get_stats(),
         }
 
 
@@ -1,15 +1,103 @@
 """
 Smart Caching System
 Multi-strategy caching with TTL and LRU eviction for performance optimization
+
+Entries are spread over independent shards, each an ordered dict kept in
+recency order behind its own lock, so get, set and eviction are O(1) and
+threads working on different keys rarely contend. Capacity is bounded by
+entry count and optionally by estimated bytes. With ``policy="tinylfu"``
+(W-TinyLFU) new keys enter a small LRU admission window; a key pushed out
+of the window only displaces the least recently used entry of the main
+region when a frequency sketch of gets and sets says it is requested more
+often. One-off keys cannot flush hot entries, while keys that keep being
+requested gather frequency in the window and get admitted.
 """
 
 import hashlib
 import json
+import sys
 import threading
 import time
-from dataclasses import dataclass, field
+from collections import OrderedDict
+from dataclasses import dataclass
+from itertools import islice
 from typing import Any, Dict, Optional
 
+# Container items sampled, and nesting levels followed, when estimating a value's size
+SIZE_SAMPLE_ITEMS = 8
+SIZE_MAX_DEPTH = 3
+
+# Below this many entries per shard a cache keeps a single shard, so small caches stay exact LRU
+MIN_ENTRIES_PER_SHARD = 64
+
+POLICIES = ("lru", "tinylfu")
+
+# Share of a TinyLFU shard's entries held in its admission window
+WINDOW_SHARE = 0.01
+
+
+def estimate_size(value: Any, depth: int = 0) -> int:
+    """
+    Approximate bytes held by ``value``: ``sys.getsizeof`` of scalars and
+    strings, and for containers their own size plus the average of a few
+    sampled items times their length. Cost does not grow with the value.
+    """
+    try:
+        size = sys.getsizeof(value)
+    except TypeError:
+        return 64
+    if depth >= SIZE_MAX_DEPTH or isinstance(value, (str, bytes, bytearray, int, float, bool)) or value is None:
+        return size
+
+    if isinstance(value, dict):
+        items = list(islice(value.items(), SIZE_SAMPLE_ITEMS))
+        sampled = sum(estimate_size(k, depth + 1) + estimate_size(v, depth + 1) for k, v in items)
+        count = len(value)
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        items = list(islice(value, SIZE_SAMPLE_ITEMS))
+        sampled = sum(estimate_size(item, depth + 1) for item in items)
+        count = len(value)
+    elif hasattr(value, "__dict__"):
+        return size + estimate_size(vars(value), depth + 1)
+    else:
+        return size
+    return size + (sampled * count // len(items) if items else 0)
+
+
+class FrequencySketch:
+    """
+    Count-min sketch of recent access frequencies with counters capped at
+    15. Rows are four times wider than the capacity, and all counters are
+    halved after ``10 * capacity`` increments, so old popularity fades.
+    """
+
+    _SEEDS = (0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9, 0xD6E8FEB86659FD93)
+
+    def __init__(self, capacity: int):
+        width = 16
+        while width < 4 * capacity:
+            width <<= 1
+        self._mask = width - 1
+        self._rows = [bytearray(width) for _ in self._SEEDS]
+        self._reset_after = 10 * max(capacity, 1)
+        self._increments = 0
+
+    def _slots(self, key: str):
+        h = hash(key)
+        return [((h * seed) >> 20) & self._mask for seed in self._SEEDS]
+
+    def increment(self, key: str):
+        for row, slot in zip(self._rows, self._slots(key)):
+            if row[slot] < 15:
+                row[slot] += 1
+        self._increments += 1
+        if self._increments >= self._reset_after:
+            self._rows = [bytearray(count >> 1 for count in row) for row in self._rows]
+            self._increments //= 2
+
+    def frequency(self, key: str) -> int:
+        return min(row[slot] for row, slot in zip(self._rows, self._slots(key)))
+
 
 @dataclass
 class CacheEntry:
@@ -19,31 +107,101 @@ class CacheEntry:
     value: Any
     created_at: float
     ttl: float
-    access_count: int = 0
-    last_accessed: float = field(default_factory=time.time)
     size_bytes: int = 0
 
-    def is_expired(self) -> bool:
-        return time.time() - self.created_at > self.ttl
+    def is_expired(self, now: Optional[float] = None) -> bool:
+        return (now if now is not None else time.time()) - self.created_at > self.ttl
 
-    def access(self):
-        self.access_count += 1
-        self.last_accessed = time.time()
+
+class _CacheShard:
+    """
+    One lock and recency-ordered dicts whose least recently used entry is
+    first: the main region, and under TinyLFU the admission window
+    """
+
+    def __init__(self, max_entries: int, max_bytes: Optional[int], policy: str):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self.window: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self.window_size = max(1, int(max_entries * WINDOW_SHARE)) if policy == "tinylfu" else 0
+        self.lock = threading.Lock()
+        self.sketch = FrequencySketch(max_entries) if policy == "tinylfu" else None
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.rejections = 0
+
+    def __len__(self) -> int:
+        return len(self.entries) + len(self.window)
+
+    def region(self, key: str) -> Optional["OrderedDict[str, CacheEntry]"]:
+        if key in self.entries:
+            return self.entries
+        return self.window if key in self.window else None
+
+    def remove(self, key: str) -> Optional[CacheEntry]:
+        region = self.region(key)
+        entry = region.pop(key) if region is not None else None
+        if entry is not None:
+            self.size_bytes -= entry.size_bytes
+        return entry
+
+    def over_budget(self, incoming_bytes: int = 0, incoming_entries: int = 0) -> bool:
+        if len(self) + incoming_entries > self.max_entries:
+            return True
+        return self.max_bytes is not None and self.size_bytes + incoming_bytes > self.max_bytes
+
+    def make_room(self):
+        """Evict until the shard fits its budget, passing entries leaving the window through admission"""
+        while self.window and (len(self.window) > self.window_size or self.over_budget()):
+            key, candidate = self.window.popitem(last=False)
+            self.size_bytes -= candidate.size_bytes
+            self.admit(key, candidate)
+        while len(self) > 1 and self.over_budget():
+            self.remove(next(iter(self.entries)))
+            self.evictions += 1
+
+    def admit(self, key: str, candidate: CacheEntry):
+        """Move a candidate from the window into the main region if it is requested more often than its victims"""
+        frequency = self.sketch.frequency(key)
+        while self.entries and self.over_budget(candidate.size_bytes, 1):
+            victim = next(iter(self.entries))
+            if frequency <= self.sketch.frequency(victim):
+                self.rejections += 1
+                return
+            self.remove(victim)
+            self.evictions += 1
+        if self.over_budget(candidate.size_bytes, 1):
+            self.rejections += 1
+            return
+        self.entries[key] = candidate
+        self.size_bytes += candidate.size_bytes
 
 
 class SmartCache:
     """Multi-strategy caching system with TTL and LRU eviction"""
 
-    def __init__(self, max_size: int = 10000, default_ttl: float = 3600):
+    def __init__(self, max_size: int = 10000, default_ttl: float = 3600, max_bytes: Optional[int] = None,
+                 num_shards: int = 8, policy: str = "lru"):
+        """
+        - max_size: Entries kept across all shards.
+        - max_bytes: Estimated bytes kept across all shards, unbounded when None.
+        - num_shards: Independently locked partitions of the key space.
+        - policy: ``lru``, or ``tinylfu`` to admit new keys by access frequency.
+        """
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown cache policy {policy!r}, expected one of {POLICIES}")
         self.max_size = max_size
+        self.max_bytes = max_bytes
         self.default_ttl = default_ttl
-        self.cache: Dict[str, CacheEntry] = {}
-        self._lock = threading.Lock()
-
-        # Cache statistics
-        self.hits = 0
-        self.misses = 0
-        self.evictions = 0
+        self.policy = policy
+        num_shards = max(1, min(num_shards, max_size // MIN_ENTRIES_PER_SHARD))
+        per_shard_bytes = -(-max_bytes // num_shards) if max_bytes is not None else None
+        self._shards = [
+            _CacheShard(-(-max_size // num_shards), per_shard_bytes, policy) for _ in range(num_shards)
+        ]
 
     def _generate_key(self, *args, **kwargs) -> str:
         """Generate cache key from arguments"""
@@ -51,81 +209,97 @@ class SmartCache:
         key_string = json.dumps(key_data, sort_keys=True, default=str)
         return hashlib.md5(key_string.encode()).hexdigest()
 
+    def _shard(self, key: str) -> _CacheShard:
+        return self._shards[hash(key) % len(self._shards)]
+
     def get(self, key: str) -> Optional[Any]:
         """Get value from cache"""
-        with self._lock:
-            entry = self.cache.get(key)
+        shard = self._shard(key)
+        with shard.lock:
+            if shard.sketch is not None:
+                shard.sketch.increment(key)
+            region = shard.region(key)
 
-            if entry is None:
-                self.misses += 1
+            if region is None:
+                shard.misses += 1
                 return None
 
+            entry = region[key]
             if entry.is_expired():
-                del self.cache[key]
-                self.misses += 1
+                shard.remove(key)
+                shard.misses += 1
                 return None
 
-            entry.access()
-            self.hits += 1
+            region.move_to_end(key)
+            shard.hits += 1
             return entry.value
 
     def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
         """Set value in cache"""
-        with self._lock:
-            if ttl is None:
-                ttl = self.default_ttl
+        if ttl is None:
+            ttl = self.default_ttl
+        size_bytes = estimate_size(value) + sys.getsizeof(key)
+        shard = self._shard(key)
 
-            # Calculate approximate size
-            try:
-                size_bytes = len(json.dumps(value, default=str).encode())
-            except (TypeError, ValueError, OverflowError) as e:
-                size_bytes = 1000  # Estimate
+        with shard.lock:
+            if shard.sketch is not None:
+                shard.sketch.increment(key)
+            if shard.max_bytes is not None and size_bytes > shard.max_bytes:
+                shard.rejections += 1
+                return
 
-            entry = CacheEntry(
+            # A replaced key keeps its region; new keys enter the window, or the LRU order without one
+            region = shard.region(key) or (shard.window if shard.sketch is not None else shard.entries)
+            shard.remove(key)
+            region[key] = CacheEntry(
                 key=key,
                 value=value,
                 created_at=time.time(),
                 ttl=ttl,
                 size_bytes=size_bytes,
             )
+            shard.size_bytes += size_bytes
+            shard.make_room()
 
-            self.cache[key] = entry
-
-            # Evict if necessary
-            self._evict_if_needed()
-
-    def _evict_if_needed(self):
-        """Evict entries if cache is too large"""
-        while len(self.cache) > self.max_size:
-            # Find LRU entry
-            lru_key = min(self.cache.keys(), key=lambda k: self.cache[k].last_accessed)
-            del self.cache[lru_key]
-            self.evictions += 1
+    def delete(self, key: str) -> bool:
+        """Remove a key; True when it was cached"""
+        shard = self._shard(key)
+        with shard.lock:
+            return shard.remove(key) is not None
 
     def clear_expired(self):
         """Clear expired entries"""
-        with self._lock:
-            current_time = time.time()
-            expired_keys = [
-                key for key, entry in self.cache.items() if entry.is_expired()
-            ]
-
-            for key in expired_keys:
-                del self.cache[key]
+        removed = 0
+        current_time = time.time()
+        for shard in self._shards:
+            with shard.lock:
+                expired_keys = [key for region in (shard.entries, shard.window)
+                                for key, entry in region.items() if entry.is_expired(current_time)]
+                for key in expired_keys:
+                    shard.remove(key)
+                removed += len(expired_keys)
+        return removed
 
-            return len(expired_keys)
+    def __len__(self) -> int:
+        return sum(len(shard) for shard in self._shards)
 
     def get_stats(self) -> Dict[str, Any]:
         """Get cache statistics"""
-        total_requests = self.hits + self.misses
-        hit_rate = self.hits / total_requests if total_requests > 0 else 0
+        hits = sum(shard.hits for shard in self._shards)
+        misses = sum(shard.misses for shard in self._shards)
+        total_requests = hits + misses
+        hit_rate = hits / total_requests if total_requests > 0 else 0
 
         return {
-            "hits": self.hits,
-            "misses": self.misses,
+            "hits": hits,
+            "misses": misses,
             "hit_rate": hit_rate,
-            "evictions": self.evictions,
-            "current_size": len(self.cache),
+            "evictions": sum(shard.evictions for shard in self._shards),
+            "current_size": len(self),
             "max_size": self.max_size,
-            "total_size_bytes": sum(entry.size_bytes for entry in self.cache.values()),
+            "total_size_bytes": sum(shard.size_bytes for shard in self._shards),
+            "max_bytes": self.max_bytes,
+            "rejections": sum(shard.rejections for shard in self._shards),
+            "policy": self.policy,
+            "shards": len(self._shards),
         }
@@ -77,6 +77,9 @@ class ResponseMetadata(BaseModel):
         ..., ge=0.0, le=1.0, description="Overall confidence score"
     )
     cached: bool = Field(False, description="Whether response was served from cache")
+    cache_hit: Optional[str] = Field(
+        None, description="Response cache hit kind: exact or semantic"
+    )
     timestamp: str = Field(
         default_factory=lambda: datetime.utcnow().isoformat(),
         description="Response timestamp",
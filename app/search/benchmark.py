@@ -0,0 +1,545 @@
+"""
+Offline benchmark of the native search engine
+
+Builds ``UltraFastSearchEngine`` over a synthetic resume corpus and measures
+index build time, single-query and batched QPS with p50/p95/p99 latency,
+process memory, and recall@k of the HNSW, LSH and hybrid retrieval paths
+against brute-force ground truth. Everything runs on CPU without network: by
+default documents and queries are embedded by a hashing encoder, so numbers
+track the engine rather than the model.
+
+    python -m app.search.benchmark --sizes 10000 100000 --output bench.json
+    python -m app.search.benchmark --sizes 10000 --baseline bench.json
+
+Results are JSON, one entry per corpus size and vector storage format, so
+runs of two commits can be compared with ``--baseline``.
+
+    python -m app.search.benchmark --sizes 100000 --vector-storage float32 float16 int8
+
+Recall is tie-aware: a retrieved document counts when its exact score is at
+least the k-th best exact score, so documents tied with the k-th neighbour
+are interchangeable.
+
+- hnsw: the top-k graph neighbours against exact cosine top-k.
+- vector_scoring: the top-k by the vector store's cosine over every
+  document against exact cosine top-k; below 1 only when stored rows are
+  quantized.
+- lsh: the up to 200 bucket candidates the engine retrieves against exact
+  Jaccard top-k over the same text features.
+- hybrid: ``search_vectors`` top-k against the top-k of the combined score
+  over every document.
+
+Exact cosine always comes from float32 embeddings, so with ``float16`` or
+``int8`` storage the hnsw and vector_scoring figures include the recall lost
+to quantization. The hybrid reference scores the engine's own stored rows.
+
+Each run also lists the latency and hybrid recall of every search profile
+(``app.search.calibration``) at that corpus size.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app.core.logging import get_logger
+from app.core.config import get_settings
+from app.search.calibration import calibrate, exact_hybrid_kth, tie_aware_recall
+from app.search.ultra_fast_engine import UltraFastSearchEngine
+from app.search.vector_store import STORAGE_DTYPES, VectorStore
+
+try:
+    import psutil
+except ImportError:  # pragma: no cover - psutil is in requirements.txt
+    psutil = None
+
+logger = get_logger(__name__)
+settings = get_settings()
+
+# Candidates taken from LSH buckets per query, as in UltraFastSearchEngine
+LSH_CANDIDATES = 200
+
+# Rows scored per step when computing exact neighbours
+GROUND_TRUTH_BLOCK_ROWS = 65536
+
+SKILLS = [
+    "python", "java", "javascript", "typescript", "go", "rust", "c++", "c#", "scala", "kotlin",
+    "swift", "ruby", "php", "sql", "postgresql", "mysql", "mongodb", "redis", "elasticsearch", "kafka",
+    "spark", "hadoop", "airflow", "dbt", "snowflake", "bigquery", "aws", "gcp", "azure", "docker",
+    "kubernetes", "terraform", "ansible", "jenkins", "react", "angular", "vue", "django", "flask", "fastapi",
+    "spring", "node", "graphql", "grpc", "pytorch", "tensorflow", "sklearn", "pandas", "numpy", "nlp",
+    "llm", "mlops", "tableau", "excel", "linux", "security", "networking", "android", "ios", "figma",
+]
+ROLES = [
+    "software engineer", "backend engineer", "frontend engineer", "data engineer", "data scientist",
+    "machine learning engineer", "devops engineer", "site reliability engineer", "mobile developer",
+    "security engineer", "analytics engineer", "platform engineer", "product designer", "qa engineer",
+]
+DOMAINS = [
+    "fintech", "healthcare", "ecommerce", "logistics", "gaming", "adtech", "edtech", "insurance",
+    "telecom", "retail", "media", "travel", "energy", "automotive", "biotech", "saas",
+]
+SENIORITY = ["junior", "mid", "senior", "lead", "principal"]
+VERBS = ["built", "designed", "scaled", "migrated", "maintained", "optimized", "launched", "led"]
+SYSTEMS = [
+    "payment platform", "recommendation service", "data pipeline", "search backend", "mobile app",
+    "analytics dashboard", "streaming platform", "billing system", "api gateway", "feature store",
+]
+
+
+class HashingEncoder:
+    """
+    Deterministic offline encoder: tokens hashed into signed buckets. It
+    mimics ``SentenceTransformer.encode`` closely enough for the engine.
+    """
+
+    def __init__(self, dimension: int = 384):
+        self.dimension = dimension
+        self._token_slots: Dict[str, tuple] = {}
+
+    def _slot(self, token: str) -> tuple:
+        slot = self._token_slots.get(token)
+        if slot is None:
+            digest = zlib.crc32(token.encode())
+            slot = (digest % self.dimension, 1.0 if digest & (1 << 31) else -1.0)
+            self._token_slots[token] = slot
+        return slot
+
+    def encode(self, texts: Sequence[str], **kwargs) -> np.ndarray:
+        # The small floor keeps empty texts away from the zero vector
+        vectors = np.full((len(texts), self.dimension), 1e-3, dtype=np.float32)
+        for i, text in enumerate(texts):
+            row = vectors[i]
+            for token in text.lower().split():
+                column, sign = self._slot(token)
+                row[column] += sign
+        return vectors
+
+
+def generate_corpus(size: int, seed: int = 42) -> List[Dict[str, Any]]:
+    """Synthetic resumes; skill popularity is Zipf-like, so some terms are common and most are rare"""
+    rng = np.random.default_rng(seed)
+    skill_weights = 1.0 / np.arange(1, len(SKILLS) + 1)
+    skill_weights /= skill_weights.sum()
+    skill_counts = rng.integers(3, 9, size=size)
+    roles = rng.integers(0, len(ROLES), size=size)
+    domains = rng.integers(0, len(DOMAINS), size=(size, 2))
+    experience = rng.integers(0, 26, size=size)
+    verbs = rng.integers(0, len(VERBS), size=(size, 2))
+    systems = rng.integers(0, len(SYSTEMS), size=(size, 2))
+
+    documents = []
+    for i in range(size):
+        skills = [SKILLS[j] for j in rng.choice(len(SKILLS), size=skill_counts[i], replace=False, p=skill_weights)]
+        years = int(experience[i])
+        seniority = SENIORITY[min(years // 5, len(SENIORITY) - 1)]
+        role = ROLES[roles[i]]
+        content = (
+            f"{seniority} {role} with {years} years of experience in {DOMAINS[domains[i, 0]]} and "
+            f"{DOMAINS[domains[i, 1]]}. {VERBS[verbs[i, 0]]} a {SYSTEMS[systems[i, 0]]} using "
+            f"{' '.join(skills[:3])}; {VERBS[verbs[i, 1]]} a {SYSTEMS[systems[i, 1]]} with "
+            f"{' '.join(skills[3:]) or skills[0]}."
+        )
+        documents.append({
+            'id': f"resume_{i}",
+            'name': f"Candidate {i}",
+            'title': role,
+            'content': content,
+            'skills': skills,
+            'experience_years': years,
+            'seniority_level': seniority,
+        })
+    return documents
+
+
+def generate_queries(count: int, seed: int = 7) -> List[str]:
+    """Recruiter-style queries mixing seniority, role, skills and domain; all distinct"""
+    rng = np.random.default_rng(seed)
+    queries, seen = [], set()
+    while len(queries) < count:
+        skills = rng.choice(SKILLS, size=int(rng.integers(1, 4)), replace=False)
+        parts = [str(rng.choice(SENIORITY)), str(rng.choice(ROLES)), *skills.tolist()]
+        if rng.random() < 0.5:
+            parts.append(str(rng.choice(DOMAINS)))
+        query = " ".join(parts)
+        if query not in seen:
+            seen.add(query)
+            queries.append(query)
+    return queries
+
+
+def latency_summary(latencies_ms: Sequence[float]) -> Dict[str, float]:
+    latencies = np.asarray(latencies_ms, dtype=np.float64)
+    if len(latencies) == 0:
+        return {'mean_ms': 0.0, 'p50_ms': 0.0, 'p95_ms': 0.0, 'p99_ms': 0.0, 'max_ms': 0.0}
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    return {
+        'mean_ms': round(float(latencies.mean()), 3),
+        'p50_ms': round(float(p50), 3),
+        'p95_ms': round(float(p95), 3),
+        'p99_ms': round(float(p99), 3),
+        'max_ms': round(float(latencies.max()), 3),
+    }
+
+
+def memory_usage_mb() -> Dict[str, float]:
+    """Resident and peak resident memory of this process"""
+    usage = {}
+    if psutil is not None:
+        usage['rss_mb'] = round(psutil.Process().memory_info().rss / 2 ** 20, 1)
+    try:
+        import resource
+        # ru_maxrss is KiB on Linux, bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        usage['peak_rss_mb'] = round(peak / (2 ** 20 if sys.platform == 'darwin' else 2 ** 10), 1)
+    except ImportError:  # pragma: no cover - Windows
+        pass
+    return usage
+
+
+def _kth_best(scores: np.ndarray, k: int) -> float:
+    k = min(k, len(scores))
+    return float(np.partition(scores, len(scores) - k)[len(scores) - k]) if k else float('inf')
+
+
+def _cosine_top_k(store: VectorStore, query_vectors: np.ndarray, rows: np.ndarray, k: int) -> np.ndarray:
+    """Positions in ``rows`` of each query's k most similar rows, best first, computed block by block"""
+    best_scores = np.full((len(query_vectors), 0), -np.inf)
+    best_positions = np.zeros((len(query_vectors), 0), dtype=np.int64)
+    for start in range(0, len(rows), GROUND_TRUTH_BLOCK_ROWS):
+        block = store.cosine_similarity_matrix(query_vectors, rows[start:start + GROUND_TRUTH_BLOCK_ROWS]).T
+        scores = np.concatenate([best_scores, block], axis=1)
+        positions = np.concatenate([best_positions,
+                                    np.broadcast_to(np.arange(start, start + block.shape[1]), block.shape)], axis=1)
+        order = np.argsort(-scores, axis=1, kind='stable')[:, :min(k, scores.shape[1])]
+        best_scores = np.take_along_axis(scores, order, axis=1)
+        best_positions = np.take_along_axis(positions, order, axis=1)
+    return best_positions
+
+
+async def recall_at_k(engine: UltraFastSearchEngine, encoder: Any, queries: List[str], k: int,
+                      reference: Optional[VectorStore] = None) -> Dict[str, float]:
+    """
+    Mean tie-aware recall@k of the HNSW, vector scoring, LSH and hybrid paths.
+    - reference: float32 embeddings of the documents to take exact cosine
+      from, when the engine stores quantized rows.
+    """
+    reference = reference if reference is not None else engine.document_vectors
+    rows, doc_ids = engine.document_vectors.rows_for(engine.document_metadata)
+    reference_rows, _ = reference.rows_for(doc_ids)
+    query_vectors = np.asarray(encoder.encode(queries), dtype=np.float32)
+    k = min(k, len(doc_ids))
+
+    # HNSW: graph neighbours against exact cosine neighbours
+    exact_top = _cosine_top_k(reference, query_vectors, reference_rows, k)
+    kth_cosine = np.array([reference.cosine_similarities(query_vectors[q], reference_rows[exact_top[q, -1:]])[0]
+                           for q in range(len(queries))])
+    hnsw_recall = []
+    for q, hits in enumerate(engine.hnsw_index.search_batch(query_vectors, k=k)):
+        hit_rows, _ = reference.rows_for([doc_id for doc_id, _ in hits])
+        similarities = reference.cosine_similarities(query_vectors[q], hit_rows)
+        hnsw_recall.append(tie_aware_recall(similarities, kth_cosine[q], k))
+
+    # Vector scoring: ranking every document by the stored rows, judged by exact cosine
+    stored_top = _cosine_top_k(engine.document_vectors, query_vectors, rows, k)
+    scoring_recall = [
+        tie_aware_recall(reference.cosine_similarities(query_vectors[q], reference_rows[stored_top[q]]), kth_cosine[q], k)
+        for q in range(len(queries))
+    ]
+
+    # LSH: bucket candidates against exact Jaccard over the text features, via feature postings
+    postings: Dict[str, List[int]] = {}
+    feature_counts = np.zeros(len(doc_ids), dtype=np.int64)
+    for position, doc_id in enumerate(doc_ids):
+        features = engine.document_text_features.get(doc_id, [])
+        feature_counts[position] = len(features)
+        for feature in features:
+            postings.setdefault(feature, []).append(position)
+    position_of = {doc_id: position for position, doc_id in enumerate(doc_ids)}
+    lsh_recall = []
+    for query in queries:
+        features = engine._extract_query_features(query)
+        matched = [postings[feature] for feature in features if feature in postings]
+        intersection = np.bincount(np.concatenate(matched), minlength=len(doc_ids)) if matched \
+            else np.zeros(len(doc_ids), dtype=np.int64)
+        jaccard = intersection / np.maximum(feature_counts + len(features) - intersection, 1)
+        candidates = engine.lsh_index.query_candidates(engine.lsh_index.prepare_query(features),
+                                                       num_candidates=LSH_CANDIDATES)
+        candidate_positions = [position_of[doc_id] for doc_id in candidates if doc_id in position_of]
+        lsh_recall.append(tie_aware_recall(jaccard[candidate_positions], _kth_best(jaccard, k), k))
+
+    # Hybrid: engine results against the combined score of every document
+    approximate = await engine.search_vectors(queries, query_vectors, k)
+    kth_combined = exact_hybrid_kth(engine, queries, query_vectors, k)
+    hybrid_recall = [tie_aware_recall([result.combined_score for result in approximate[q]], kth_combined[q], k)
+                     for q in range(len(queries))]
+
+    return {
+        'k': k,
+        'queries': len(queries),
+        'hnsw': round(float(np.mean(hnsw_recall)), 4),
+        'vector_scoring': round(float(np.mean(scoring_recall)), 4),
+        'lsh': round(float(np.mean(lsh_recall)), 4),
+        'hybrid': round(float(np.mean(hybrid_recall)), 4),
+    }
+
+
+async def _measure_queries(engine: UltraFastSearchEngine, queries: List[str], k: int,
+                           batch_size: int, warmup: int) -> Dict[str, Any]:
+    """Single-query and batched throughput and latency, with the result and query-embedding caches cleared"""
+    for query in queries[:warmup]:
+        await engine.search(query, k)
+
+    engine.query_cache.clear()
+    engine.query_encoder.clear()
+    latencies = []
+    started = time.perf_counter()
+    for query in queries:
+        query_start = time.perf_counter()
+        await engine.search(query, k)
+        latencies.append((time.perf_counter() - query_start) * 1000)
+    single_seconds = time.perf_counter() - started
+
+    engine.query_cache.clear()
+    engine.query_encoder.clear()
+    batch_latencies = []
+    started = time.perf_counter()
+    for start in range(0, len(queries), batch_size):
+        batch_start = time.perf_counter()
+        await engine.search_batch(queries[start:start + batch_size], k)
+        batch_latencies.append((time.perf_counter() - batch_start) * 1000)
+    batched_seconds = time.perf_counter() - started
+    engine.query_cache.clear()
+
+    return {
+        'single': {
+            'queries': len(queries),
+            'qps': round(len(queries) / single_seconds, 1),
+            **latency_summary(latencies),
+        },
+        'batched': {
+            'queries': len(queries),
+            'batch_size': batch_size,
+            'qps': round(len(queries) / batched_seconds, 1),
+            # Latency of a whole batch
+            **latency_summary(batch_latencies),
+        },
+    }
+
+
+async def _benchmark_engine(engine: UltraFastSearchEngine, encoder: Any, documents: List[Dict[str, Any]],
+                            num_queries: int, recall_queries: int, k: int, batch_size: int,
+                            seed: int) -> Dict[str, Any]:
+    memory_before = memory_usage_mb()
+
+    started = time.perf_counter()
+    vectors = np.asarray(encoder.encode([engine._get_document_text(doc) for doc in documents]), dtype=np.float32)
+    encode_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    await engine.build_indexes(documents, vectors)
+    index_seconds = time.perf_counter() - started
+    reference_path = None
+    if engine.vector_storage != 'float32':
+        # Exact embeddings for the recall reference, kept out of the measured memory
+        reference_path = os.path.join(engine.index_path, 'reference_vectors.npy')
+        np.save(reference_path, vectors)
+    del vectors
+    memory_built = memory_usage_mb()
+
+    queries = generate_queries(num_queries, seed + 1)
+    query_results = await _measure_queries(engine, queries, k, batch_size, warmup=min(10, num_queries))
+    reference = None
+    if reference_path is not None:
+        reference = VectorStore(engine.embedding_dim, initial_capacity=len(documents))
+        reference.add_batch([doc['id'] for doc in documents], np.load(reference_path, mmap_mode='r'))
+    recall = await recall_at_k(engine, encoder, queries[:recall_queries], k, reference)
+    del reference
+    # Latency/recall of every search profile, as the engine's calibration would measure them here
+    profiles = (await calibrate(engine, queries[:recall_queries], k)).to_dict()['profiles']
+
+    return {
+        'build': {
+            'encode_seconds': round(encode_seconds, 3),
+            # Includes writing the index snapshot
+            'index_seconds': round(index_seconds, 3),
+            'documents_per_second': round(len(documents) / index_seconds, 1) if index_seconds > 0 else 0.0,
+        },
+        'memory': {
+            'rss_before_mb': memory_before.get('rss_mb'),
+            'rss_after_build_mb': memory_built.get('rss_mb'),
+            'peak_rss_mb': memory_usage_mb().get('peak_rss_mb'),
+            'vector_bytes': engine.document_vectors.nbytes,
+            'bytes_per_vector': round(engine.document_vectors.nbytes / max(len(documents), 1), 1),
+            # Vector codes inside the HNSW graph; IVF-PQ mode holds PQ codes instead
+            'graph_vector_bytes': getattr(engine.hnsw_index, 'storage_bytes', None),
+        },
+        **query_results,
+        'recall': recall,
+        'profiles': profiles,
+    }
+
+
+def run_benchmark(size: int, num_queries: int = 200, recall_queries: int = 50, k: int = 10,
+                  batch_size: int = 32, seed: int = 42, embedding_dim: int = 384,
+                  encoder: Optional[Any] = None, vector_storage: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Benchmark one corpus size in a scratch index directory; returns a JSON-ready dict.
+    - vector_storage: Row format of the vector store and graph, VECTOR_STORAGE by default.
+    """
+    encoder = encoder or HashingEncoder(embedding_dim)
+
+    started = time.perf_counter()
+    documents = generate_corpus(size, seed)
+    generate_seconds = time.perf_counter() - started
+
+    with tempfile.TemporaryDirectory(prefix='search_bench_') as scratch:
+        engine = UltraFastSearchEngine(embedding_dim=embedding_dim, embedding_model=encoder,
+                                       index_path=scratch, cache_embeddings=False, vector_storage=vector_storage)
+        try:
+            result = asyncio.run(_benchmark_engine(engine, encoder, documents, num_queries,
+                                                   recall_queries, k, batch_size, seed))
+        finally:
+            engine.query_encoder.close()
+
+    result = {'corpus_size': size, 'vector_storage': engine.vector_storage, **result}
+    result['build']['generate_seconds'] = round(generate_seconds, 3)
+    logger.info(f"Benchmarked {size} documents with {result['vector_storage']} vectors", extra={
+        'single_qps': result['single']['qps'],
+        'batched_qps': result['batched']['qps'],
+        'recall': result['recall'],
+    })
+    return result
+
+
+def environment() -> Dict[str, Any]:
+    import faiss
+
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                timeout=10, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        commit = ''
+    return {
+        'git_commit': commit or None,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'faiss': getattr(faiss, '__version__', None),
+        'vector_index_mode': settings.VECTOR_INDEX_MODE,
+        'scoring_mode': settings.SEARCH_SCORING_MODE,
+    }
+
+
+# Metrics compared against a baseline; True when higher is better
+COMPARED_METRICS = {
+    ('build', 'index_seconds'): False,
+    ('single', 'qps'): True,
+    ('single', 'p99_ms'): False,
+    ('batched', 'qps'): True,
+    ('batched', 'p99_ms'): False,
+    ('recall', 'hnsw'): True,
+    ('recall', 'vector_scoring'): True,
+    ('memory', 'vector_bytes'): False,
+    ('recall', 'lsh'): True,
+    ('recall', 'hybrid'): True,
+}
+
+
+def compare_results(baseline: Dict[str, Any], current: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Relative change of the headline metrics for (corpus size, vector storage) runs present in both reports"""
+    def run_key(run: Dict[str, Any]) -> tuple:
+        return run['corpus_size'], run.get('vector_storage', 'float32')
+
+    baseline_runs = {run_key(run): run for run in baseline.get('runs', [])}
+    changes = []
+    for run in current.get('runs', []):
+        previous = baseline_runs.get(run_key(run))
+        if previous is None:
+            continue
+        for (section, metric), higher_is_better in COMPARED_METRICS.items():
+            old, new = previous.get(section, {}).get(metric), run.get(section, {}).get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            changes.append({
+                'corpus_size': run['corpus_size'],
+                'vector_storage': run_key(run)[1],
+                'metric': f'{section}.{metric}',
+                'baseline': old,
+                'current': new,
+                'change': round(change, 4),
+                'improved': change > 0 if higher_is_better else change < 0,
+            })
+    return changes
+
+
+def main(argv: Optional[List[str]] = None) -> Dict[str, Any]:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000], help='corpus sizes, e.g. 10000 100000 1000000')
+    parser.add_argument('--queries', type=int, default=200, help='timed queries per mode')
+    parser.add_argument('--recall-queries', type=int, default=50, help='queries checked against brute force')
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--embedding-dim', type=int, default=384)
+    parser.add_argument('--vector-storage', nargs='+', choices=sorted(STORAGE_DTYPES), default=None,
+                        help='vector row formats to benchmark, VECTOR_STORAGE by default')
+    parser.add_argument('--model', default=None,
+                        help='SentenceTransformer to embed with instead of the hashing encoder; must be cached locally')
+    parser.add_argument('--output', default=None, help='write the JSON report here instead of stdout')
+    parser.add_argument('--baseline', default=None, help='earlier JSON report to compare against')
+    args = parser.parse_args(argv)
+
+    encoder = None
+    if args.model:
+        from sentence_transformers import SentenceTransformer
+        encoder = SentenceTransformer(args.model, device='cpu', local_files_only=True)
+        args.embedding_dim = encoder.get_sentence_embedding_dimension()
+
+    report = {
+        'generated_at': datetime.now(timezone.utc).isoformat(),
+        'environment': environment(),
+        'config': {
+            'queries': args.queries,
+            'recall_queries': args.recall_queries,
+            'k': args.k,
+            'batch_size': args.batch_size,
+            'seed': args.seed,
+            'embedding_dim': args.embedding_dim,
+            'encoder': args.model or 'hashing',
+        },
+        'runs': [
+            run_benchmark(size, num_queries=args.queries, recall_queries=args.recall_queries, k=args.k,
+                          batch_size=args.batch_size, seed=args.seed, embedding_dim=args.embedding_dim,
+                          encoder=encoder, vector_storage=storage)
+            for size in args.sizes
+            for storage in (args.vector_storage or [None])
+        ],
+    }
+    if args.baseline:
+        with open(args.baseline) as handle:
+            report['comparison'] = compare_results(json.load(handle), report)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as handle:
+            handle.write(output + '\n')
+    else:
+        print(output)
+    return report
+
+
+if __name__ == '__main__':
+    main()
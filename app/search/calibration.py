@@ -0,0 +1,228 @@
+"""
+Search profiles and their latency/recall calibration
+
+A ``SearchProfile`` fixes how much work one query does: the ANN beam width
+(HNSW efSearch, or IVF nprobe in compressed mode), how many vector neighbours
+are taken, and how many LSH and BM25 candidates are added (0 skips the
+stage). ``calibrate`` measures each profile of a ladder on an engine, giving
+a ``CalibrationTable`` of per-query latency and recall@k. The engine uses it
+to pick the cheapest profile that meets a recall target, or the most
+accurate one that fits a latency budget.
+
+The table can be measured on the synthetic benchmark corpus
+(``calibrate_on_benchmark_corpus``), which costs a few seconds and needs
+neither the production model nor its index. The engine saves the table with
+its index snapshot, so workers loading the snapshot reuse it instead of
+calibrating again.
+"""
+
+import asyncio
+import tempfile
+import time
+from dataclasses import asdict, dataclass, replace
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app.core.config import get_settings
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+settings = get_settings()
+
+
+@dataclass(frozen=True)
+class SearchProfile:
+    """Retrieval parameters of one search; ``None`` beam widths use the index's own"""
+    name: str
+    vector_candidates: int = 100
+    lsh_candidates: int = 200
+    bm25_candidates: int = 100
+    ef_search: Optional[int] = None
+    nprobe: Optional[int] = None
+    # Filled in from the calibration table when the profile was chosen from it
+    expected_latency_ms: Optional[float] = None
+    expected_recall: Optional[float] = None
+
+    def for_results(self, num_results: int) -> "SearchProfile":
+        """The profile widened so the vector stage alone can return ``num_results``"""
+        if self.vector_candidates >= num_results:
+            return self
+        return replace(self, vector_candidates=num_results)
+
+    @property
+    def cache_key(self) -> str:
+        return f"{self.vector_candidates}/{self.lsh_candidates}/{self.bm25_candidates}/{self.ef_search}/{self.nprobe}"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def default_search_profile() -> SearchProfile:
+    """What a search without a budget or target does"""
+    return SearchProfile('default', vector_candidates=100, lsh_candidates=200,
+                         bm25_candidates=settings.BM25_CANDIDATES)
+
+
+def search_profiles() -> List[SearchProfile]:
+    """Calibrated ladder, from cheapest to most thorough"""
+    return [
+        SearchProfile('fast', vector_candidates=20, lsh_candidates=0, bm25_candidates=0, ef_search=16, nprobe=4),
+        SearchProfile('lean', vector_candidates=50, lsh_candidates=0, bm25_candidates=50, ef_search=32, nprobe=8),
+        replace(default_search_profile(), ef_search=50, nprobe=settings.IVF_NPROBE),
+        SearchProfile('thorough', vector_candidates=200, lsh_candidates=400, bm25_candidates=200,
+                      ef_search=128, nprobe=32),
+        SearchProfile('max_recall', vector_candidates=400, lsh_candidates=800, bm25_candidates=400,
+                      ef_search=256, nprobe=64),
+    ]
+
+
+@dataclass
+class CalibrationEntry:
+    profile: SearchProfile
+    # p95 of one query's retrieval and scoring, encoding excluded
+    latency_ms: float
+    # Mean recall@k against scoring every document
+    recall: float
+
+
+class CalibrationTable:
+    """Measured profiles and the rule that picks one for a budget or target"""
+
+    def __init__(self, entries: Sequence[CalibrationEntry], corpus_size: int = 0, k: int = 10):
+        self.entries = sorted(entries, key=lambda entry: entry.latency_ms)
+        self.corpus_size = corpus_size
+        self.k = k
+
+    def choose(self, latency_budget_ms: Optional[float] = None,
+               recall_target: Optional[float] = None) -> SearchProfile:
+        """
+        The cheapest profile reaching ``recall_target`` within the budget;
+        without a target, the most accurate profile within the budget. When
+        nothing fits the budget the cheapest profile is used, and when the
+        target is out of reach the most accurate affordable one.
+        """
+        affordable = [entry for entry in self.entries
+                      if latency_budget_ms is None or entry.latency_ms <= latency_budget_ms] or self.entries[:1]
+        if recall_target is not None:
+            reaching = [entry for entry in affordable if entry.recall >= recall_target]
+            if reaching:
+                return self._chosen(reaching[0])
+        best = max(affordable, key=lambda entry: (entry.recall, -entry.latency_ms))
+        return self._chosen(best)
+
+    @staticmethod
+    def _chosen(entry: CalibrationEntry) -> SearchProfile:
+        return replace(entry.profile, expected_latency_ms=round(entry.latency_ms, 3),
+                       expected_recall=round(entry.recall, 4))
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "CalibrationTable":
+        """Inverse of ``to_dict``"""
+        entries = []
+        for profile in data['profiles']:
+            fields = dict(profile)
+            latency_ms, recall = fields.pop('latency_ms'), fields.pop('recall')
+            entries.append(CalibrationEntry(SearchProfile(**fields), latency_ms, recall))
+        return cls(entries, corpus_size=data.get('corpus_size', 0), k=data.get('k', 10))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'corpus_size': self.corpus_size,
+            'k': self.k,
+            'profiles': [
+                {**entry.profile.to_dict(), 'latency_ms': round(entry.latency_ms, 3), 'recall': round(entry.recall, 4)}
+                for entry in self.entries
+            ],
+        }
+
+
+def tie_aware_recall(retrieved_scores: Sequence[float], kth_best: float, k: int, tolerance: float = 1e-6) -> float:
+    """Share of the k slots filled by documents scoring at least the exact k-th best"""
+    hits = int(np.count_nonzero(np.asarray(retrieved_scores, dtype=np.float64) >= kth_best - tolerance))
+    return min(hits, k) / k
+
+
+def exact_hybrid_kth(engine: Any, queries: Sequence[str], query_vectors: np.ndarray, k: int) -> np.ndarray:
+    """k-th best combined score of each query when every document is scored"""
+    rows, doc_ids = engine.document_vectors.rows_for(engine.document_metadata)
+    kth = np.full(len(queries), np.inf)
+    for q, query in enumerate(queries):
+        lsh_query = engine.lsh_index.prepare_query(engine._extract_query_features(query))
+        similarities = engine._vector_similarities(query_vectors[q:q + 1], rows)[:, 0]
+        exact = engine._rank_candidates(rows, doc_ids, similarities, query.lower().split(),
+                                        lsh_query, query_vectors[q], k)
+        if exact:
+            kth[q] = exact[-1].combined_score
+    return kth
+
+
+async def calibrate(engine: Any, queries: Sequence[str], k: int = 10,
+                    profiles: Optional[Sequence[SearchProfile]] = None) -> CalibrationTable:
+    """Latency and recall@k of each profile on ``engine``, one query at a time"""
+    profiles = list(profiles or search_profiles())
+    queries = list(queries)
+    query_vectors = np.asarray(engine.embedding_model.encode(queries, convert_to_numpy=True), dtype=np.float32)
+    k = min(k, len(engine.document_metadata))
+    kth = exact_hybrid_kth(engine, queries, query_vectors, k)
+
+    entries = []
+    for profile in profiles:
+        # Warm-up, so one-off allocations are not billed to the first query
+        await engine.search_vectors(queries[:1], query_vectors[:1], k, profile=profile)
+        latencies, recalls = [], []
+        for q, query in enumerate(queries):
+            started = time.perf_counter()
+            results = (await engine.search_vectors([query], query_vectors[q:q + 1], k, profile=profile))[0]
+            latencies.append((time.perf_counter() - started) * 1000)
+            recalls.append(tie_aware_recall([result.combined_score for result in results], kth[q], k))
+        entries.append(CalibrationEntry(profile, float(np.percentile(latencies, 95)), float(np.mean(recalls))))
+
+    return CalibrationTable(entries, corpus_size=len(engine.document_metadata), k=k)
+
+
+def calibrate_on_benchmark_corpus(corpus_size: int, num_queries: int = 50, k: int = 10,
+                                  embedding_dim: int = 384) -> CalibrationTable:
+    """
+    Calibrate on a scratch engine holding the synthetic benchmark corpus,
+    embedded by the benchmark's hashing encoder. Blocking; meant for a
+    worker thread at startup.
+    """
+    from app.search.benchmark import HashingEncoder, generate_corpus, generate_queries
+    from app.search.ultra_fast_engine import UltraFastSearchEngine
+
+    started = time.perf_counter()
+    encoder = HashingEncoder(embedding_dim)
+    documents = generate_corpus(corpus_size)
+    with tempfile.TemporaryDirectory(prefix='search_calibration_') as scratch:
+        engine = UltraFastSearchEngine(embedding_dim=embedding_dim, embedding_model=encoder,
+                                       index_path=scratch, cache_embeddings=False)
+
+        async def run() -> CalibrationTable:
+            vectors = encoder.encode([engine._get_document_text(doc) for doc in documents])
+            await engine.build_indexes(documents, vectors)
+            return await calibrate(engine, generate_queries(num_queries, seed=11), k)
+
+        try:
+            table = asyncio.run(run())
+        finally:
+            engine.query_encoder.close()
+
+    logger.info("Search calibration completed", extra={
+        'corpus_size': corpus_size,
+        'seconds': round(time.perf_counter() - started, 2),
+        'profiles': table.to_dict()['profiles'],
+    })
+    return table
+
+
+def profile_for(table: Optional[CalibrationTable], num_results: int, latency_budget_ms: Optional[float] = None,
+                recall_target: Optional[float] = None) -> SearchProfile:
+    """Profile of one search: from the table when a budget or target is given and a table exists"""
+    if latency_budget_ms is not None and latency_budget_ms <= 0:
+        raise ValueError("latency_budget_ms must be positive")
+    if recall_target is not None and not 0 < recall_target <= 1:
+        raise ValueError("recall_target must be in (0, 1]")
+    if table is None or (latency_budget_ms is None and recall_target is None):
+        return default_search_profile().for_results(num_results)
+    return table.choose(latency_budget_ms, recall_target).for_results(num_results)
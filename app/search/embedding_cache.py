@@ -0,0 +1,159 @@
+"""
+Content-addressed on-disk cache of document embeddings
+
+One append-only file per (model, dimension) under the cache directory:
+
+    <model>-<dimension>.emb
+        header   magic, format version, dimension
+        records  16-byte BLAKE2b digest of the normalized text + float32 vector
+
+Records have a fixed size, so the file is memory-mapped as a numpy record
+array and the digest -> record index is rebuilt with one pass on open.
+Appends take an exclusive file lock, so several workers can share a cache
+directory. A record torn by a crash is truncated away on the next open.
+"""
+
+import fcntl
+import hashlib
+import os
+import re
+import struct
+import threading
+import unicodedata
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+CACHE_MAGIC = b"EMBC"
+CACHE_FORMAT_VERSION = 1
+KEY_BYTES = 16
+_HEADER = struct.Struct("<4sII")
+HEADER_BYTES = 64
+
+
+def normalize_text(text: str) -> str:
+    """Canonical form used for cache keys: NFC, whitespace runs collapsed, trimmed"""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def text_key(text: str) -> bytes:
+    return hashlib.blake2b(normalize_text(text).encode("utf-8"), digest_size=KEY_BYTES).digest()
+
+
+class EmbeddingCache:
+    """Embeddings keyed by (model name, normalized text hash), persisted append-only"""
+
+    def __init__(self, directory: str, model_name: str, dimension: int):
+        self.model_name = model_name
+        self.dimension = dimension
+        slug = re.sub(r"[^A-Za-z0-9._-]+", "_", model_name).strip("_") or "model"
+        self.path = os.path.join(directory, f"{slug}-{dimension}.emb")
+        self.record_dtype = np.dtype([("key", f"V{KEY_BYTES}"), ("vector", "<f4", (dimension,))])
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._index: Dict[bytes, int] = {}
+        self._records: Optional[np.ndarray] = None
+        self._open(directory)
+
+    def _open(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        if not os.path.exists(self.path) or os.path.getsize(self.path) < HEADER_BYTES:
+            self._write_header()
+            return
+
+        with open(self.path, "rb") as handle:
+            magic, version, dimension = _HEADER.unpack(handle.read(_HEADER.size))
+        if magic != CACHE_MAGIC or version != CACHE_FORMAT_VERSION or dimension != self.dimension:
+            logger.warning(f"Discarding incompatible embedding cache {self.path}")
+            os.replace(self.path, f"{self.path}.bad")
+            self._write_header()
+            return
+
+        payload = os.path.getsize(self.path) - HEADER_BYTES
+        if payload % self.record_dtype.itemsize:
+            # A crash mid-append leaves a partial record at the end
+            os.truncate(self.path, HEADER_BYTES + payload - payload % self.record_dtype.itemsize)
+        self._remap()
+        if self._records is not None:
+            self._index = {key: i for i, key in enumerate(self._records["key"].tolist())}
+
+    def _write_header(self):
+        with open(self.path, "wb") as handle:
+            handle.write(_HEADER.pack(CACHE_MAGIC, CACHE_FORMAT_VERSION, self.dimension).ljust(HEADER_BYTES, b"\0"))
+
+    def _remap(self):
+        count = (os.path.getsize(self.path) - HEADER_BYTES) // self.record_dtype.itemsize
+        self._records = (np.memmap(self.path, dtype=self.record_dtype, mode="r", offset=HEADER_BYTES, shape=(count,))
+                         if count else None)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def encode(self, texts: Sequence[str], encoder: Callable[[List[str]], np.ndarray]) -> np.ndarray:
+        """
+        Embeddings for ``texts``, calling ``encoder`` once with only the
+        distinct texts that are not cached yet. New embeddings are appended.
+        """
+        keys = [text_key(text) for text in texts]
+        vectors = np.empty((len(texts), self.dimension), dtype=np.float32)
+
+        with self._lock:
+            missing: Dict[bytes, List[int]] = {}
+            for i, key in enumerate(keys):
+                record = self._index.get(key)
+                if record is None:
+                    missing.setdefault(key, []).append(i)
+                else:
+                    vectors[i] = self._vector(record)
+            self.hits += len(texts) - len(missing)
+            self.misses += len(missing)
+
+        if not missing:
+            return vectors
+
+        first = [positions[0] for positions in missing.values()]
+        encoded = np.asarray(encoder([texts[i] for i in first]), dtype=np.float32)
+        if encoded.shape != (len(first), self.dimension):
+            raise ValueError(f"Encoder returned shape {encoded.shape}, expected ({len(first)}, {self.dimension})")
+        for positions, vector in zip(missing.values(), encoded):
+            vectors[positions] = vector
+
+        with self._lock:
+            self._append(list(missing), encoded)
+        return vectors
+
+    def _vector(self, record: int) -> np.ndarray:
+        if self._records is None or record >= len(self._records):
+            self._remap()
+        return self._records[record]["vector"]
+
+    def _append(self, keys: List[bytes], vectors: np.ndarray):
+        records = np.empty(len(keys), dtype=self.record_dtype)
+        records["key"] = keys
+        records["vector"] = vectors
+        with open(self.path, "ab") as handle:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+            try:
+                # Other workers may have appended since we mapped the file
+                start = (handle.seek(0, os.SEEK_END) - HEADER_BYTES) // self.record_dtype.itemsize
+                handle.write(records.tobytes())
+                handle.flush()
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+        for i, key in enumerate(keys):
+            self._index[key] = start + i
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'entries': len(self._index),
+            'size_bytes': os.path.getsize(self.path),
+        }
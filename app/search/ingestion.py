@@ -0,0 +1,180 @@
+"""
+Streaming NDJSON ingestion for the native search engine
+
+One JSON document per line, each with an ``id``. Lines are parsed as bytes
+arrive and grouped into batches; each batch is encoded with one model call
+and applied to the indexes in bulk (``add_documents``).
+
+Parsing and indexing are decoupled by a queue holding at most
+``max_pending_batches`` batches. When indexing falls behind, the reader stops
+pulling from the source, so an HTTP client is slowed down by TCP flow control
+instead of the server buffering the whole upload.
+"""
+
+import asyncio
+import json
+import time
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterable, AsyncIterator, Dict, List, Optional, Tuple, Union
+
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Per-line errors kept in progress reports; later ones are only counted
+MAX_REPORTED_ERRORS = 20
+
+
+@dataclass
+class IngestionProgress:
+    """Running totals of one ingestion stream"""
+    received: int = 0
+    indexed: int = 0
+    failed: int = 0
+    batches: int = 0
+    started_at: float = field(default_factory=time.monotonic)
+    errors: List[Dict[str, Any]] = field(default_factory=list)
+    done: bool = False
+
+    def record_error(self, line: int, error: str, count: int = 1):
+        self.failed += count
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'line': line, 'error': error})
+
+    def to_dict(self) -> Dict[str, Any]:
+        elapsed = time.monotonic() - self.started_at
+        return {
+            'received': self.received,
+            'indexed': self.indexed,
+            'failed': self.failed,
+            'batches': self.batches,
+            'elapsed_seconds': round(elapsed, 3),
+            'documents_per_second': round(self.indexed / elapsed, 1) if elapsed > 0 else 0.0,
+            'errors': list(self.errors),
+            'done': self.done,
+        }
+
+
+class NDJSONParser:
+    """Incremental NDJSON decoder: feed byte chunks, get back complete documents"""
+
+    def __init__(self, max_line_bytes: int = 8 * 1024 * 1024):
+        self.max_line_bytes = max_line_bytes
+        self.line_number = 0
+        self._buffer = bytearray()
+        self._skipping = False
+
+    def feed(self, chunk: bytes) -> List[Tuple[int, Union[Dict, Exception]]]:
+        """(line number, document or parse error) for every line completed by ``chunk``"""
+        self._buffer += chunk
+        parsed = []
+        start = 0
+        while True:
+            end = self._buffer.find(b"\n", start)
+            if end < 0:
+                break
+            line = bytes(self._buffer[start:end])
+            start = end + 1
+            if self._skipping:
+                # Tail of an oversized line that was already reported
+                self._skipping = False
+                continue
+            self._parse(line, parsed)
+        del self._buffer[:start]
+
+        if len(self._buffer) > self.max_line_bytes and not self._skipping:
+            self.line_number += 1
+            parsed.append((self.line_number, ValueError(f"Line exceeds {self.max_line_bytes} bytes")))
+            self._skipping = True
+        if self._skipping:
+            self._buffer.clear()
+        return parsed
+
+    def close(self) -> List[Tuple[int, Union[Dict, Exception]]]:
+        """The final line when the stream does not end with a newline"""
+        parsed = []
+        if self._buffer and not self._skipping:
+            self._parse(bytes(self._buffer), parsed)
+        self._buffer.clear()
+        return parsed
+
+    def _parse(self, line: bytes, parsed: List):
+        self.line_number += 1
+        if not line.strip():
+            return
+        try:
+            document = json.loads(line)
+            if not isinstance(document, dict):
+                raise ValueError("Each line must be a JSON object")
+            if not isinstance(document.get('id'), str) or not document['id']:
+                raise ValueError("Document is missing a string 'id'")
+            parsed.append((self.line_number, document))
+        except ValueError as e:
+            parsed.append((self.line_number, e))
+
+
+async def ingest_ndjson(engine: Any,
+                        chunks: AsyncIterable[bytes],
+                        batch_size: int = 256,
+                        max_pending_batches: int = 2,
+                        max_line_bytes: int = 8 * 1024 * 1024) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Index an NDJSON byte stream into ``engine`` batch by batch, yielding a
+    progress report after every batch and a final one with ``done`` set.
+    A batch that fails as a whole is reported and skipped; the stream goes on.
+    """
+    batch_size = max(1, batch_size)
+    progress = IngestionProgress()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, max_pending_batches))
+
+    async def read():
+        parser = NDJSONParser(max_line_bytes)
+        batch: List[Tuple[int, Dict]] = []
+
+        async def accept(entries):
+            nonlocal batch
+            for line, entry in entries:
+                progress.received += 1
+                if isinstance(entry, Exception):
+                    progress.record_error(line, str(entry))
+                    continue
+                batch.append((line, entry))
+                if len(batch) >= batch_size:
+                    # Blocks while indexing is behind, which stops reading the source
+                    await queue.put(batch)
+                    batch = []
+
+        try:
+            async for chunk in chunks:
+                await accept(parser.feed(chunk))
+            await accept(parser.close())
+            if batch:
+                await queue.put(batch)
+        finally:
+            await queue.put(None)
+
+    reader = asyncio.create_task(read())
+    try:
+        while True:
+            batch = await queue.get()
+            if batch is None:
+                break
+            try:
+                # A repeated id within the batch is indexed once
+                added = await engine.add_documents([document for _, document in batch])
+                progress.indexed += len(added)
+            except Exception as e:
+                logger.error(f"Ingestion batch starting at line {batch[0][0]} failed: {str(e)}")
+                progress.record_error(batch[0][0], f"Batch of {len(batch)} failed: {str(e)}", count=len(batch))
+            progress.batches += 1
+            yield progress.to_dict()
+
+        # Surface errors from reading the source itself
+        await reader
+    finally:
+        if not reader.done():
+            reader.cancel()
+
+    progress.done = True
+    logger.info("NDJSON ingestion completed", extra=progress.to_dict())
+    yield progress.to_dict()
@@ -0,0 +1,232 @@
+"""
+Metadata filter index for the native search engine
+
+Search filters are resolved against per-field indexes over vector store rows
+instead of being checked candidate by candidate:
+
+    min_experience     sorted (experience_years, row) arrays, one binary search
+    seniority_levels   one bitmap per level
+    required_skills    lowercase skill -> sorted rows inverted index
+
+``allowed_rows`` combines them into one boolean mask over rows. The engine
+pushes that mask into ANN traversal (a Faiss ID selector) and BM25 postings
+traversal, so filtered queries retrieve their top-k from matching documents
+only.
+"""
+
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+def _experience_value(record: Dict) -> float:
+    """experience_years as float; missing counts as 0, non-numeric never matches"""
+    try:
+        return float(record.get('experience_years', 0))
+    except (TypeError, ValueError):
+        return float('nan')
+
+
+class MetadataIndex:
+    """
+    Filterable metadata fields of live documents, addressed by the same
+    rows as the vector store. Removing a row only clears its live bit;
+    postings of removed rows are dropped by ``compact``, after which the
+    row may be added again.
+    """
+
+    FILTER_KEYS = ('min_experience', 'seniority_levels', 'required_skills')
+
+    def __init__(self, initial_capacity: int = 1024):
+        capacity = max(initial_capacity, 1)
+        self.live = np.zeros(capacity, dtype=bool)
+        self.experience = np.full(capacity, np.nan, dtype=np.float64)
+        self.seniority_bitmaps: Dict[Optional[str], np.ndarray] = {}
+        self._skill_postings: Dict[str, np.ndarray] = {}
+        self._skill_pending: Dict[str, List[int]] = {}
+        self._sorted: Optional[Tuple[np.ndarray, np.ndarray, int]] = None
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __contains__(self, row: int) -> bool:
+        return 0 <= row < len(self.live) and bool(self.live[row])
+
+    # Mutation ----------------------------------------------------------
+
+    def add_document(self, row: int, record: Dict):
+        self.add_documents([row], [record])
+
+    def add_documents(self, rows: Sequence[int], records: Sequence[Dict]):
+        """Index the filterable fields of documents stored under ``rows``."""
+        if len(rows) == 0:
+            return
+        self._ensure_rows(max(rows) + 1)
+        for row, record in zip(rows, records):
+            if self.live[row]:
+                raise ValueError(f"Row {row} is already indexed")
+            self.live[row] = True
+            self._count += 1
+            self.experience[row] = _experience_value(record)
+
+            level = record.get('seniority_level')
+            level = None if level is None else str(level)
+            bitmap = self.seniority_bitmaps.get(level)
+            if bitmap is None:
+                bitmap = self.seniority_bitmaps[level] = np.zeros(len(self.live), dtype=bool)
+            bitmap[row] = True
+
+            for skill in {str(skill).lower() for skill in record.get('skills') or []}:
+                self._skill_pending.setdefault(skill, []).append(row)
+        self._sorted = None
+
+    def remove_document(self, row: int):
+        """Mark a row as deleted."""
+        if row not in self:
+            return
+        self.live[row] = False
+        self._count -= 1
+
+    def compact(self):
+        """Drop removed rows from the per-value bitmaps and skill postings."""
+        for level in list(self.seniority_bitmaps):
+            bitmap = self.seniority_bitmaps[level]
+            bitmap &= self.live
+            if not bitmap.any():
+                del self.seniority_bitmaps[level]
+        for skill in set(self._skill_postings) | set(self._skill_pending):
+            rows = self._skill_rows(skill)
+            rows = rows[self.live[rows]]
+            if len(rows):
+                self._skill_postings[skill] = rows
+            else:
+                del self._skill_postings[skill]
+        self.experience[~self.live] = np.nan
+        self._sorted = None
+
+    def _ensure_rows(self, required: int):
+        capacity = len(self.live)
+        if required <= capacity:
+            return
+        new_capacity = max(required, 2 * capacity)
+        self.live = np.concatenate((self.live, np.zeros(new_capacity - capacity, dtype=bool)))
+        self.experience = np.concatenate((self.experience, np.full(new_capacity - capacity, np.nan)))
+        for level, bitmap in self.seniority_bitmaps.items():
+            self.seniority_bitmaps[level] = np.concatenate((bitmap, np.zeros(new_capacity - capacity, dtype=bool)))
+
+    def _skill_rows(self, skill: str) -> np.ndarray:
+        """Sorted rows listing a skill, folding in rows added since the last lookup."""
+        pending = self._skill_pending.pop(skill, None)
+        rows = self._skill_postings.get(skill)
+        if pending:
+            merged = np.asarray(pending, dtype=np.int64)
+            rows = np.sort(merged) if rows is None else np.union1d(rows, merged)
+            self._skill_postings[skill] = rows
+        return rows if rows is not None else np.zeros(0, dtype=np.int64)
+
+    def _sorted_experience(self) -> Tuple[np.ndarray, np.ndarray, int]:
+        """(values, rows, count of numeric values) sorted by experience; NaNs sort last"""
+        if self._sorted is None:
+            order = np.argsort(self.experience, kind='stable')
+            values = self.experience[order]
+            self._sorted = (values, order.astype(np.int64), int(np.count_nonzero(~np.isnan(values))))
+        return self._sorted
+
+    # Filtering ---------------------------------------------------------
+
+    def allowed_rows(self, filters: Optional[Dict]) -> Optional[np.ndarray]:
+        """
+        Boolean mask over rows of live documents matching every filter, or
+        None when ``filters`` has nothing this index applies.
+        """
+        if not filters or not any(key in filters for key in self.FILTER_KEYS):
+            return None
+        mask = self.live.copy()
+
+        min_experience = filters.get('min_experience')
+        if min_experience is not None:
+            values, rows, numeric = self._sorted_experience()
+            start = int(np.searchsorted(values[:numeric], float(min_experience), side='left'))
+            passing = np.zeros(len(mask), dtype=bool)
+            passing[rows[start:numeric]] = True
+            mask &= passing
+
+        if 'seniority_levels' in filters:
+            passing = np.zeros(len(mask), dtype=bool)
+            for level in filters['seniority_levels'] or []:
+                bitmap = self.seniority_bitmaps.get(None if level is None else str(level))
+                if bitmap is not None:
+                    passing |= bitmap
+            mask &= passing
+
+        # Rarest skill first so the mask empties as early as possible
+        skills = sorted({str(skill).lower() for skill in filters.get('required_skills') or []},
+                        key=lambda skill: len(self._skill_rows(skill)))
+        for skill in skills:
+            rows = self._skill_rows(skill)
+            if len(rows) == 0:
+                mask[:] = False
+                break
+            passing = np.zeros(len(mask), dtype=bool)
+            passing[rows] = True
+            mask &= passing
+
+        return mask
+
+    # Persistence -------------------------------------------------------
+
+    def to_snapshot(self) -> Tuple[Dict[str, np.ndarray], Dict[str, List[str]], Dict]:
+        """Live rows with their experience and seniority code, plus skill postings in CSR form."""
+        rows = np.flatnonzero(self.live).astype(np.int64)
+        levels = [level for level in self.seniority_bitmaps if level is not None]
+        seniority_codes = np.full(len(rows), -1, dtype=np.int32)
+        for code, level in enumerate(levels):
+            seniority_codes[self.seniority_bitmaps[level][rows]] = code
+
+        skills, postings = [], []
+        for skill in sorted(set(self._skill_postings) | set(self._skill_pending)):
+            skill_rows = self._skill_rows(skill)
+            skill_rows = skill_rows[self.live[skill_rows]]
+            if len(skill_rows):
+                skills.append(skill)
+                postings.append(skill_rows)
+        indptr = np.concatenate(([0], np.cumsum([len(p) for p in postings], dtype=np.int64))).astype(np.int64)
+        arrays = {
+            'rows': rows,
+            'experience': self.experience[rows],
+            'seniority_codes': seniority_codes,
+            'skill_indptr': indptr,
+            'skill_rows': np.concatenate(postings) if postings else np.zeros(0, dtype=np.int64),
+        }
+        return arrays, {'seniority_levels': levels, 'skills': skills}, {}
+
+    @classmethod
+    def from_snapshot(cls, arrays: Dict[str, np.ndarray], strings: Dict, meta: Dict) -> "MetadataIndex":
+        rows = np.asarray(arrays['rows'], dtype=np.int64)
+        index = cls(int(rows.max()) + 1 if len(rows) else 1)
+        index.live[rows] = True
+        index._count = len(rows)
+        index.experience[rows] = arrays['experience']
+
+        codes = np.asarray(arrays['seniority_codes'])
+        for code, level in enumerate(list(strings['seniority_levels']) + [None]):
+            selected = rows[codes == (code if level is not None else -1)]
+            if len(selected):
+                bitmap = np.zeros(len(index.live), dtype=bool)
+                bitmap[selected] = True
+                index.seniority_bitmaps[level] = bitmap
+
+        indptr = np.asarray(arrays['skill_indptr'], dtype=np.int64)
+        skill_rows = np.asarray(arrays['skill_rows'], dtype=np.int64)
+        for i, skill in enumerate(strings['skills']):
+            index._skill_postings[skill] = skill_rows[indptr[i]:indptr[i + 1]]
+        return index
+
+    @classmethod
+    def from_records(cls, rows: Iterable[int], records: Iterable[Dict]) -> "MetadataIndex":
+        """Index built from (row, metadata record) pairs, e.g. for older snapshots."""
+        rows, records = list(rows), list(records)
+        index = cls(max(rows) + 1 if rows else 1)
+        index.add_documents(rows, records)
+        return index
@@ -0,0 +1,178 @@
+"""
+Micro-batching query encoder for the native search engine
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+class BatchingQueryEncoder:
+    """
+    Collects query texts that arrive within a short window (``max_wait_ms``
+    after the first one, or until ``max_batch_size`` are waiting) and runs a
+    single batched ``encode`` in a dedicated worker thread. Each waiting
+    coroutine receives its own row, and the event loop stays free while the
+    model runs. While one batch is encoding the next one accumulates, so
+    batches grow with load.
+
+    A small LRU of recent query strings answers repeated queries without
+    touching the model.
+    """
+
+    def __init__(self, model: Any, max_batch_size: int = 64, max_wait_ms: float = 3.0, cache_size: int = 1024):
+        self.model = model
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="query-encoder")
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self.stats = {'requests': 0, 'cache_hits': 0, 'batches': 0, 'encoded': 0, 'encode_time_ms': 0.0}
+
+    async def encode(self, text: str) -> np.ndarray:
+        """Embedding of one query text"""
+        self.stats['requests'] += 1
+        cached = self._cache.get(text)
+        if cached is not None:
+            self._cache.move_to_end(text)
+            self.stats['cache_hits'] += 1
+            return cached
+
+        future = asyncio.get_running_loop().create_future()
+        self._ensure_worker()
+        self._queue.put_nowait((text, future))
+        return await future
+
+    async def encode_many(self, texts: List[str]) -> np.ndarray:
+        """
+        Embeddings of several texts, shaped (len(texts), dimension). Texts not
+        in the LRU are encoded together in one model call, without waiting
+        for a batching window.
+        """
+        self.stats['requests'] += len(texts)
+        vectors: List[Optional[np.ndarray]] = [None] * len(texts)
+        missing: Dict[str, List[int]] = {}
+        for i, text in enumerate(texts):
+            cached = self._cache.get(text)
+            if cached is not None:
+                self._cache.move_to_end(text)
+                self.stats['cache_hits'] += 1
+                vectors[i] = cached
+            else:
+                missing.setdefault(text, []).append(i)
+
+        if missing:
+            encoded = await self._encode_texts(list(missing))
+            for positions, vector in zip(missing.values(), encoded):
+                for i in positions:
+                    vectors[i] = vector
+        return np.stack(vectors)
+
+    def clear(self):
+        """Drop the LRU of query embeddings"""
+        self._cache.clear()
+
+    def get_stats(self) -> Dict:
+        batches = self.stats['batches']
+        return {
+            **self.stats,
+            'avg_batch_size': self.stats['encoded'] / batches if batches else 0.0,
+            'cache_hit_rate': self.stats['cache_hits'] / self.stats['requests'] if self.stats['requests'] else 0.0,
+            'cache_entries': len(self._cache),
+        }
+
+    def _ensure_worker(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            # Queues and tasks belong to one event loop; start over on a new one
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+
+    async def _run(self):
+        queue = self._queue
+        while True:
+            batch = [await queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                if queue.empty():
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(queue.get(), remaining))
+                    except asyncio.TimeoutError:
+                        break
+                else:
+                    batch.append(queue.get_nowait())
+            await self._encode_batch(batch)
+
+    async def _encode_batch(self, batch: List[Tuple[str, asyncio.Future]]):
+        waiting: Dict[str, List[asyncio.Future]] = {}
+        for text, future in batch:
+            if not future.cancelled():
+                waiting.setdefault(text, []).append(future)
+        if not waiting:
+            return
+
+        texts = list(waiting)
+        try:
+            vectors = await self._encode_texts(texts)
+        except Exception as e:
+            for futures in waiting.values():
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+            return
+
+        for text, vector in zip(texts, vectors):
+            for future in waiting[text]:
+                if not future.done():
+                    future.set_result(vector)
+
+    async def _encode_texts(self, texts: List[str]) -> np.ndarray:
+        """One model call on the worker thread; the rows are remembered in the LRU"""
+        start = time.perf_counter()
+        try:
+            vectors = await asyncio.get_running_loop().run_in_executor(
+                self._executor, lambda: self.model.encode(texts, convert_to_numpy=True)
+            )
+        except Exception as e:
+            logger.error(f"Query encoding failed for a batch of {len(texts)}: {str(e)}")
+            raise
+
+        self.stats['batches'] += 1
+        self.stats['encoded'] += len(texts)
+        self.stats['encode_time_ms'] += (time.perf_counter() - start) * 1000
+
+        vectors = np.array(vectors, dtype=np.float32)
+        # Rows are shared with the LRU and every waiter, so keep them immutable
+        vectors.flags.writeable = False
+        for text, vector in zip(texts, vectors):
+            self._remember(text, vector)
+        return vectors
+
+    def _remember(self, text: str, vector: np.ndarray):
+        if self.cache_size <= 0:
+            return
+        self._cache[text] = vector
+        self._cache.move_to_end(text)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def close(self):
+        """Stop the batching task and the worker thread"""
+        if self._worker is not None and not self._worker.done():
+            self._worker.cancel()
+        self._executor.shutdown(wait=False)
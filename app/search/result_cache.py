@@ -0,0 +1,131 @@
+"""
+Search result cache for the native search engine
+
+Results are keyed by the normalized query, result count, canonical filters,
+search profile and the engine's index generation:
+
+    (normalized query, num_results, canonical filters, profile, generation)
+
+Every index mutation bumps the generation, which retires all entries of the
+previous one, so a cached result never outlives the documents it was scored
+against. Entries are evicted least recently used first, expire after a TTL,
+and are bounded both by count and by an estimate of the bytes they hold.
+"""
+
+import json
+import sys
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.search.embedding_cache import normalize_text
+
+# Estimated bytes held by one cached SearchResult besides its doc_id: the
+# dataclass, three floats and the list slot. Metadata dicts are shared with
+# the engine and are not counted.
+RESULT_OVERHEAD_BYTES = 200
+
+CacheKey = Tuple[str, int, str, str, int]
+
+
+def normalize_query(query: str) -> str:
+    """Query as cached: normalized like embedding cache texts, and lowercased like query terms"""
+    return normalize_text(query).lower()
+
+
+def canonical_filters(filters: Optional[Dict]) -> str:
+    """Filters serialized independently of key order"""
+    if not filters:
+        return ""
+    return json.dumps(filters, sort_keys=True, default=str)
+
+
+class SearchResultCache:
+    """
+    LRU + TTL cache of search results with a byte budget. Only entries of the
+    current index generation are kept; ``set_generation`` drops the others.
+    """
+
+    def __init__(self, max_entries: int = 1000, max_bytes: int = 32 * 1024 * 1024, ttl_seconds: float = 300.0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl_seconds
+        self.generation = 0
+        self._entries: "OrderedDict[CacheKey, Tuple[List[Any], float, int]]" = OrderedDict()
+        self._bytes = 0
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0, 'invalidations': 0}
+
+    def key(self, query: str, num_results: int, filters: Optional[Dict], profile_key: str) -> CacheKey:
+        return (normalize_query(query), num_results, canonical_filters(filters), profile_key, self.generation)
+
+    def get(self, key: CacheKey) -> Optional[List[Any]]:
+        """Cached results of ``key``, or None on a miss or an expired entry"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.stats['misses'] += 1
+            return None
+        results, expires_at, _ = entry
+        if expires_at <= time.monotonic():
+            self._discard(key)
+            self.stats['expirations'] += 1
+            self.stats['misses'] += 1
+            return None
+        self._entries.move_to_end(key)
+        self.stats['hits'] += 1
+        return results
+
+    def put(self, key: CacheKey, results: List[Any]):
+        """Cache ``results`` unless their generation was retired while they were computed"""
+        if self.max_entries <= 0 or self.ttl <= 0 or key[-1] != self.generation:
+            return
+        size = self._estimate_bytes(key, results)
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._discard(key)
+        self._entries[key] = (results, time.monotonic() + self.ttl, size)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            self._discard(next(iter(self._entries)))
+            self.stats['evictions'] += 1
+
+    def set_generation(self, generation: int):
+        """Move to a new index generation, dropping every entry of older ones"""
+        if generation == self.generation:
+            return
+        self.generation = generation
+        self.stats['invalidations'] += len(self._entries)
+        self._entries.clear()
+        self._bytes = 0
+
+    def clear(self):
+        self._entries.clear()
+        self._bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: CacheKey) -> bool:
+        return key in self._entries
+
+    def get_stats(self) -> Dict:
+        lookups = self.stats['hits'] + self.stats['misses']
+        return {
+            **self.stats,
+            'hit_rate': self.stats['hits'] / lookups if lookups else 0.0,
+            'entries': len(self._entries),
+            'bytes': self._bytes,
+            'max_entries': self.max_entries,
+            'max_bytes': self.max_bytes,
+            'ttl_seconds': self.ttl,
+            'generation': self.generation,
+        }
+
+    def _discard(self, key: CacheKey):
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    @staticmethod
+    def _estimate_bytes(key: CacheKey, results: List[Any]) -> int:
+        size = sys.getsizeof(key[0]) + len(key[2]) + sys.getsizeof(results)
+        return size + sum(RESULT_OVERHEAD_BYTES + len(result.doc_id) for result in results)
@@ -0,0 +1,562 @@
+"""
+Sharded native search: documents partitioned across worker processes
+
+Each shard is a spawned process owning a complete ``UltraFastSearchEngine``
+(HNSW/IVF-PQ, LSH and BM25) over its slice of the corpus, persisted under
+``<INDEX_PATH>/shard-<i>``. Documents are routed to a shard by a hash of
+their id, so a re-added id always replaces itself in place.
+
+The coordinator owns the embedding model: documents and queries are encoded
+once here, and shards only receive vectors. A query is answered in two
+round trips over each shard's pipe:
+
+    1. BM25 statistics of the query terms are gathered and summed, so every
+       shard scores with corpus-wide idf and average document length;
+    2. the query vectors and global statistics fan out, and the per-shard
+       top-k lists are merged by combined score.
+
+Every score component of a document is then independent of which shard holds
+it, so the merged ranking matches a single engine over the whole corpus
+whenever the same documents reach the candidate pools.
+
+Document records stay in the shards. The coordinator only keeps the set of
+ids, and fetches records from the owning shard when one is looked up or the
+documents are listed; search results already carry the records of their top
+k. Merged results are cached per index generation, as in the single engine.
+"""
+
+import asyncio
+import inspect
+import multiprocessing
+import os
+import time
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import mmh3
+import numpy as np
+from sentence_transformers import SentenceTransformer
+
+from app.core.config import get_settings
+from app.core.logging import get_logger
+from app.math.bm25_index import BM25Statistics
+from app.search.calibration import CalibrationTable, SearchProfile, profile_for
+from app.search.embedding_cache import EmbeddingCache
+from app.search.query_encoder import BatchingQueryEncoder
+from app.search.result_cache import SearchResultCache
+from app.search.ultra_fast_engine import SearchResult, UltraFastSearchEngine
+
+logger = get_logger(__name__)
+settings = get_settings()
+
+# Engine methods a shard process serves; anything else is rejected
+SHARD_METHODS = frozenset({
+    'build_indexes', 'add_document', 'add_documents', 'remove_document', 'bm25_statistics', 'search_vectors',
+    'save_indexes', 'compact_indexes', 'get_performance_stats',
+})
+
+# Records fetched per round trip when the coordinator lists documents
+RECORD_BATCH_SIZE = 1000
+
+
+class _PrecomputedEmbeddings:
+    """Stands in for the model inside shards, which only ever receive vectors"""
+
+    def encode(self, *args, **kwargs):
+        raise RuntimeError("Search shards do not encode; the coordinator sends embeddings")
+
+
+def _shard_main(conn, embedding_dim: int, index_path: str, settings_values: Dict):
+    """
+    Shard process: serve (method, args) requests on ``conn`` one at a time,
+    replying ("ok", result) or ("error", exception type, message).
+    """
+    # The parent's effective settings, including any set at runtime
+    for key, value in settings_values.items():
+        setattr(settings, key, value)
+
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        engine = UltraFastSearchEngine(embedding_dim=embedding_dim, embedding_model=_PrecomputedEmbeddings(),
+                                       index_path=index_path, cache_embeddings=False)
+    except Exception as e:
+        conn.send(("error", type(e).__name__, str(e)))
+        return
+    conn.send(("ok", len(engine.document_metadata)))
+
+    while True:
+        try:
+            request = conn.recv()
+        except (EOFError, OSError):
+            break
+        method, args = request
+        if method == "close":
+            break
+        try:
+            if method == "document_ids":
+                result = list(engine.document_metadata)
+            elif method == "document_records":
+                result = {doc_id: engine.document_metadata[doc_id] for doc_id in args[0]
+                          if doc_id in engine.document_metadata}
+            elif method == "calibration":
+                result = engine.calibration.to_dict() if engine.calibration is not None else None
+            elif method == "set_calibration":
+                engine.calibration = CalibrationTable.from_dict(args[0])
+                result = None
+            elif method in SHARD_METHODS:
+                result = getattr(engine, method)(*args)
+                if inspect.isawaitable(result):
+                    result = loop.run_until_complete(result)
+            else:
+                raise ValueError(f"Unknown shard method {method}")
+            reply = ("ok", result)
+        except Exception as e:
+            reply = ("error", type(e).__name__, str(e))
+        conn.send(reply)
+
+    loop.close()
+    conn.close()
+
+
+class _ShardClient:
+    """
+    Coordinator end of one shard's pipe. Requests run on a dedicated thread,
+    which serializes them per shard and keeps the event loop free while the
+    shard works.
+    """
+
+    def __init__(self, shard_id: int, context, embedding_dim: int, index_path: str, settings_values: Dict):
+        self.shard_id = shard_id
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=_shard_main, args=(child_conn, embedding_dim, index_path, settings_values),
+            name=f"search-shard-{shard_id}", daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"search-shard-{shard_id}")
+
+    def wait_ready(self) -> int:
+        """Block until the shard has loaded its snapshot; returns its document count"""
+        return self._receive()
+
+    async def call(self, method: str, *args) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self._roundtrip, method, args)
+
+    def call_sync(self, method: str, *args) -> Any:
+        return self._executor.submit(self._roundtrip, method, args).result()
+
+    def _roundtrip(self, method: str, args: tuple) -> Any:
+        try:
+            self.conn.send((method, args))
+        except (BrokenPipeError, OSError) as e:
+            raise RuntimeError(f"Search shard {self.shard_id} is not running") from e
+        return self._receive()
+
+    def _receive(self) -> Any:
+        try:
+            reply = self.conn.recv()
+        except (EOFError, OSError) as e:
+            raise RuntimeError(f"Search shard {self.shard_id} is not running") from e
+        if reply[0] == "ok":
+            return reply[1]
+        _, error_type, message = reply
+        if error_type == "ValueError":
+            raise ValueError(message)
+        raise RuntimeError(f"Search shard {self.shard_id} failed: {error_type}: {message}")
+
+    def close(self, timeout: float = 10.0):
+        try:
+            self._executor.submit(self.conn.send, ("close", ())).result(timeout)
+        except Exception:
+            pass
+        self._executor.shutdown(wait=False)
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.conn.close()
+
+
+class _ShardCatalogue(Mapping):
+    """
+    Read-only mapping of document ids to records across the shards. Only the
+    ids are held here; records are fetched from the owning shard on access,
+    which blocks until the shard has served its queued requests. Async code
+    uses ``ShardedSearchEngine.document_records`` instead.
+    """
+
+    def __init__(self, engine: "ShardedSearchEngine", doc_ids: Iterable[str] = ()):
+        self._engine = engine
+        self._ids = set(doc_ids)
+
+    def __contains__(self, doc_id: object) -> bool:
+        return doc_id in self._ids
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self._ids))
+
+    def __getitem__(self, doc_id: str) -> Dict:
+        if doc_id in self._ids:
+            shard = self._engine.shards[self._engine.shard_of(doc_id)]
+            records = shard.call_sync("document_records", [doc_id])
+            if doc_id in records:
+                return records[doc_id]
+        raise KeyError(doc_id)
+
+    def items(self) -> Iterator[Tuple[str, Dict]]:
+        """Every (id, record) pair, fetched from each shard in batches"""
+        doc_ids = list(self._ids)
+        for shard, positions in zip(self._engine.shards, self._engine._partition(doc_ids)):
+            for start in range(0, len(positions), RECORD_BATCH_SIZE):
+                batch = [doc_ids[i] for i in positions[start:start + RECORD_BATCH_SIZE]]
+                yield from shard.call_sync("document_records", batch).items()
+
+    def values(self) -> Iterator[Dict]:
+        return (record for _, record in self.items())
+
+    def add(self, doc_id: str):
+        self._ids.add(doc_id)
+
+    def discard(self, doc_id: str):
+        self._ids.discard(doc_id)
+
+
+class ShardedSearchEngine:
+    """
+    Drop-in replacement for ``UltraFastSearchEngine`` that partitions the
+    corpus across ``num_shards`` worker processes and merges their results.
+    """
+
+    def __init__(self, num_shards: int, embedding_dim: int = 384, use_gpu: bool = False,
+                 embedding_model: Optional[Any] = None, index_path: Optional[str] = None):
+        """
+        - num_shards: Worker processes the corpus is partitioned across.
+        - embedding_model: Encoder to use instead of loading EMBEDDING_MODEL_NAME.
+        - index_path: Root snapshot directory; shard i persists to ``shard-<i>`` below it.
+        """
+        if num_shards < 1:
+            raise ValueError("num_shards must be at least 1")
+        try:
+            model_name = settings.EMBEDDING_MODEL_NAME or 'all-MiniLM-L6-v2'
+            self.embedding_model = embedding_model if embedding_model is not None else SentenceTransformer(
+                model_name,
+                device='cuda' if use_gpu else 'cpu'
+            )
+            self.query_encoder = BatchingQueryEncoder(
+                self.embedding_model,
+                max_batch_size=settings.QUERY_BATCH_MAX_SIZE,
+                max_wait_ms=settings.QUERY_BATCH_WAIT_MS,
+                cache_size=settings.QUERY_EMBEDDING_CACHE_SIZE
+            )
+            self.embedding_dim = embedding_dim
+            self.num_shards = num_shards
+            self.index_path = index_path or settings.INDEX_PATH or "indexes"
+            self.vector_index_mode = settings.VECTOR_INDEX_MODE or "hnsw"
+            self.vector_storage = settings.VECTOR_STORAGE or "float32"
+            self.embedding_cache = None
+            if settings.EMBEDDING_CACHE_ENABLED:
+                self.embedding_cache = EmbeddingCache(
+                    settings.EMBEDDING_CACHE_PATH or os.path.join(self.index_path, "embedding_cache"),
+                    model_name, embedding_dim
+                )
+            self.search_stats = {'total_searches': 0, 'cached_searches': 0, 'avg_response_time': 0}
+            # Merged results per query, retired whenever a document is added or removed
+            self.index_generation = 0
+            self.query_cache = SearchResultCache(
+                max_entries=settings.SEARCH_RESULT_CACHE_SIZE,
+                max_bytes=settings.SEARCH_RESULT_CACHE_MAX_BYTES,
+                ttl_seconds=settings.SEARCH_RESULT_CACHE_TTL_SECONDS
+            )
+            # Children are spawned, not forked: the parent may hold threads, Faiss and model state
+            context = multiprocessing.get_context("spawn")
+            settings_values = settings.model_dump()
+            self.shards = [
+                _ShardClient(i, context, embedding_dim, os.path.join(self.index_path, f"shard-{i}"), settings_values)
+                for i in range(num_shards)
+            ]
+            shard_sizes = [shard.wait_ready() for shard in self.shards]
+
+            # Ids for counts and membership; records are fetched from the shards on demand
+            self.document_metadata = _ShardCatalogue(
+                self, [doc_id for shard in self.shards for doc_id in shard.call_sync("document_ids")]
+            )
+            # Every shard saves the coordinator's calibration with its snapshot; shard 0's copy is read back.
+            # Without it every search uses the default profile
+            calibration = self.shards[0].call_sync("calibration")
+            self.calibration: Optional[CalibrationTable] = (
+                CalibrationTable.from_dict(calibration) if calibration is not None else None
+            )
+
+            logger.info("ShardedSearchEngine initialized successfully", extra={
+                'num_shards': num_shards,
+                'shard_sizes': shard_sizes,
+                'embedding_dim': embedding_dim,
+                'model_name': model_name
+            })
+
+        except Exception as e:
+            logger.error(f"Failed to initialize sharded search engine: {str(e)}")
+            self.close()
+            raise
+
+    def shard_of(self, doc_id: str) -> int:
+        """Shard that owns a document id"""
+        return mmh3.hash(doc_id, signed=False) % self.num_shards
+
+    def _partition(self, doc_ids: List[str]) -> List[np.ndarray]:
+        """Positions of ``doc_ids`` owned by each shard"""
+        owners = np.array([self.shard_of(doc_id) for doc_id in doc_ids], dtype=np.int64)
+        return [np.flatnonzero(owners == shard) for shard in range(self.num_shards)]
+
+    def _encode_documents(self, texts: List[str], show_progress_bar: bool = False) -> np.ndarray:
+        """Document embeddings, encoding only texts that are not in the embedding cache"""
+        def encode(batch: List[str]) -> np.ndarray:
+            return self.embedding_model.encode(batch, show_progress_bar=show_progress_bar, convert_to_numpy=True)
+
+        if self.embedding_cache is None:
+            return encode(texts)
+        return self.embedding_cache.encode(texts, encode)
+
+    async def build_indexes(self, documents: List[Dict]):
+        """Encode the corpus once, then build every shard's indexes in parallel."""
+        logger.info(f"Building sharded indexes for {len(documents)} documents across {self.num_shards} shards...")
+        start_time = time.time()
+
+        texts = [UltraFastSearchEngine._get_document_text(doc) for doc in documents]
+        vectors = np.asarray(self._encode_documents(texts, show_progress_bar=True), dtype=np.float32)
+        partitions = self._partition([doc['id'] for doc in documents])
+        await self._share_calibration()
+        await asyncio.gather(*(
+            shard.call("build_indexes", [documents[i] for i in positions], vectors[positions])
+            for shard, positions in zip(self.shards, partitions)
+        ))
+
+        self.document_metadata = _ShardCatalogue(self, (doc['id'] for doc in documents))
+        self._bump_generation()
+
+        logger.info(f"Sharded index building completed in {time.time() - start_time:.2f} seconds", extra={
+            'documents_processed': len(self.document_metadata),
+            'shard_sizes': [len(positions) for positions in partitions]
+        })
+
+    async def search(self, query: str, num_results: int = 10, filters: Optional[Dict] = None,
+                     latency_budget_ms: Optional[float] = None, recall_target: Optional[float] = None,
+                     profile: Optional[SearchProfile] = None) -> List[SearchResult]:
+        """Search all shards and return the merged top ``num_results``"""
+        return (await self.search_batch([query], num_results, filters, latency_budget_ms,
+                                        recall_target, profile))[0]
+
+    async def search_batch(self, queries: List[str], num_results: int = 10,
+                           filters: Optional[Dict] = None, latency_budget_ms: Optional[float] = None,
+                           recall_target: Optional[float] = None,
+                           profile: Optional[SearchProfile] = None) -> List[List[SearchResult]]:
+        """
+        Search many queries at once: one encoder pass, then one statistics
+        round and one search round per shard, all shards in parallel. Every
+        shard searches with the same profile.
+        """
+        batch_start = time.time()
+        try:
+            for query in queries:
+                if not query or not query.strip():
+                    raise ValueError("Query cannot be empty")
+            if num_results <= 0 or num_results > 1000:
+                raise ValueError("num_results must be between 1 and 1000")
+            profile = profile or self.select_profile(num_results, latency_budget_ms, recall_target)
+
+            results: List[Optional[List[SearchResult]]] = [None] * len(queries)
+            cache_keys = [self.query_cache.key(query, num_results, filters, profile.cache_key) for query in queries]
+            pending = []
+            for i, cache_key in enumerate(cache_keys):
+                results[i] = self.query_cache.get(cache_key)
+                if results[i] is None:
+                    pending.append(i)
+
+            if pending:
+                pending_queries = [queries[i] for i in pending]
+                query_vectors = await self.query_encoder.encode_many(pending_queries)
+
+                terms = sorted({term for query in pending_queries for term in query.lower().split()})
+                statistics = BM25Statistics()
+                for shard_statistics in await asyncio.gather(*(shard.call("bm25_statistics", terms)
+                                                               for shard in self.shards)):
+                    statistics = statistics.merge(shard_statistics)
+
+                shard_results = await asyncio.gather(*(
+                    shard.call("search_vectors", pending_queries, query_vectors, num_results, filters,
+                               statistics, profile)
+                    for shard in self.shards
+                ))
+                for q, i in enumerate(pending):
+                    results[i] = self._merge(per_shard[q] for per_shard in shard_results)[:num_results]
+                    self.query_cache.put(cache_keys[i], results[i])
+
+            response_time = (time.time() - batch_start) * 1000
+            misses = set(pending)
+            for i in range(len(queries)):
+                self._record_search(response_time / len(queries), cached=i not in misses)
+
+            logger.info("Sharded search completed successfully", extra={
+                'response_time_ms': response_time,
+                'queries_count': len(queries),
+                'num_shards': self.num_shards
+            })
+            return results
+
+        except Exception as e:
+            logger.error(f"Sharded search failed: {str(e)}")
+            raise
+
+    def select_profile(self, num_results: int = 10, latency_budget_ms: Optional[float] = None,
+                       recall_target: Optional[float] = None) -> SearchProfile:
+        """Retrieval profile for a search, as ``UltraFastSearchEngine.select_profile``"""
+        return profile_for(self.calibration, num_results, latency_budget_ms, recall_target)
+
+    @staticmethod
+    def _merge(result_lists) -> List[SearchResult]:
+        """Per-shard top-k lists merged best first"""
+        merged = [result for results in result_lists for result in results]
+        merged.sort(key=lambda result: result.combined_score, reverse=True)
+        return merged
+
+    def _record_search(self, response_time: float, cached: bool = False):
+        """Fold one search's response time into the running statistics"""
+        self.search_stats['total_searches'] += 1
+        if cached:
+            self.search_stats['cached_searches'] += 1
+        self.search_stats['avg_response_time'] = (
+            self.search_stats['avg_response_time'] * (self.search_stats['total_searches'] - 1) + response_time
+        ) / self.search_stats['total_searches']
+
+    def _bump_generation(self):
+        """Retire cached results after the corpus changed"""
+        self.index_generation += 1
+        self.query_cache.set_generation(self.index_generation)
+
+    async def add_document(self, doc_id: str, document: Dict):
+        """Encode a document and add it to the shard that owns its id"""
+        try:
+            vector = self._encode_documents([UltraFastSearchEngine._get_document_text(document)])[0]
+            await self.shards[self.shard_of(doc_id)].call("add_document", doc_id, document, vector)
+            self.document_metadata.add(doc_id)
+            self._bump_generation()
+            logger.info(f"Document {doc_id} added to shard {self.shard_of(doc_id)}")
+        except Exception as e:
+            logger.error(f"Failed to add document {doc_id}: {str(e)}")
+            raise
+
+    async def add_documents(self, documents: List[Dict]) -> List[str]:
+        """Encode a batch once and add each shard's share of it in parallel"""
+        positions = list({doc['id']: i for i, doc in enumerate(documents)}.values())
+        documents = [documents[i] for i in positions]
+        if not documents:
+            return []
+        texts = [UltraFastSearchEngine._get_document_text(doc) for doc in documents]
+        vectors = np.asarray(await asyncio.to_thread(self._encode_documents, texts), dtype=np.float32)
+        partitions = self._partition([doc['id'] for doc in documents])
+        await asyncio.gather(*(
+            shard.call("add_documents", [documents[i] for i in shard_positions], vectors[shard_positions])
+            for shard, shard_positions in zip(self.shards, partitions) if len(shard_positions)
+        ))
+        for document in documents:
+            self.document_metadata.add(document['id'])
+        self._bump_generation()
+        return [document['id'] for document in documents]
+
+    async def remove_document(self, doc_id: str):
+        """Remove a document from the shard that owns its id"""
+        try:
+            await self.shards[self.shard_of(doc_id)].call("remove_document", doc_id)
+            self.document_metadata.discard(doc_id)
+            self._bump_generation()
+            logger.info(f"Document {doc_id} removed from shard {self.shard_of(doc_id)}")
+        except Exception as e:
+            logger.error(f"Failed to remove document {doc_id}: {str(e)}")
+            raise
+
+    async def compact_indexes(self):
+        """Compact every shard's indexes"""
+        await asyncio.gather(*(shard.call("compact_indexes") for shard in self.shards))
+
+    def save_indexes(self):
+        """Snapshot every shard; each publishes its own generation"""
+        for shard in self.shards:
+            if self.calibration is not None:
+                shard.call_sync("set_calibration", self.calibration.to_dict())
+            shard.call_sync("save_indexes")
+
+    async def save_snapshot(self):
+        """Snapshot every shard concurrently; each shard serializes it with its own mutations"""
+        await self._share_calibration()
+        await asyncio.gather(*(shard.call("save_indexes") for shard in self.shards))
+
+    async def _share_calibration(self):
+        """Hand the coordinator's table to the shards so their next snapshot carries it"""
+        if self.calibration is not None:
+            table = self.calibration.to_dict()
+            await asyncio.gather(*(shard.call("set_calibration", table) for shard in self.shards))
+
+    async def document_records(self, doc_ids: Optional[List[str]] = None) -> Dict[str, Dict]:
+        """
+        Records of ``doc_ids`` (every document by default), fetched from the
+        shards concurrently in batches. Unknown ids are skipped.
+        """
+        doc_ids = list(self.document_metadata) if doc_ids is None else [
+            doc_id for doc_id in doc_ids if doc_id in self.document_metadata
+        ]
+
+        async def fetch(shard: _ShardClient, positions: np.ndarray) -> Dict[str, Dict]:
+            records = {}
+            for start in range(0, len(positions), RECORD_BATCH_SIZE):
+                batch = [doc_ids[i] for i in positions[start:start + RECORD_BATCH_SIZE]]
+                records.update(await shard.call("document_records", batch))
+            return records
+
+        records = {}
+        for shard_records in await asyncio.gather(*(fetch(shard, positions) for shard, positions
+                                                    in zip(self.shards, self._partition(doc_ids)))):
+            records.update(shard_records)
+        return records
+
+    async def performance_stats(self) -> Dict:
+        """``get_performance_stats`` without blocking the event loop on the shards"""
+        return self._merge_stats(await asyncio.gather(*(shard.call("get_performance_stats")
+                                                        for shard in self.shards)))
+
+    def get_performance_stats(self) -> Dict:
+        """Coordinator statistics with per-shard index statistics summed"""
+        return self._merge_stats([shard.call_sync("get_performance_stats") for shard in self.shards])
+
+    def _merge_stats(self, shard_stats: List[Dict]) -> Dict:
+        result_cache = self.query_cache.get_stats()
+        return {
+            'total_searches': self.search_stats['total_searches'],
+            'cached_searches': self.search_stats['cached_searches'],
+            'avg_response_time_ms': self.search_stats['avg_response_time'],
+            'cache_hit_rate': result_cache['hit_rate'],
+            'result_cache': result_cache,
+            'index_generation': self.index_generation,
+            'total_documents': len(self.document_metadata),
+            'index_size': sum(stats['index_size'] for stats in shard_stats),
+            'vector_index_mode': self.vector_index_mode,
+            'vector_storage': self.vector_storage,
+            'vector_bytes': sum(stats['vector_bytes'] for stats in shard_stats),
+            'embedding_cache': self.embedding_cache.stats() if self.embedding_cache is not None else None,
+            'query_encoder': self.query_encoder.get_stats(),
+            'tombstones': sum(stats['tombstones'] for stats in shard_stats),
+            'compactions': sum(stats['compactions'] for stats in shard_stats),
+            'num_shards': self.num_shards,
+            'shards': shard_stats
+        }
+
+    def close(self):
+        """Stop the shard processes and the query encoder"""
+        for shard in getattr(self, 'shards', []):
+            shard.close()
+        if getattr(self, 'query_encoder', None) is not None:
+            self.query_encoder.close()
@@ -0,0 +1,335 @@
+"""
+Versioned, memory-mapped on-disk snapshots of the native search indexes
+
+Layout under the index path:
+
+    CURRENT                      name of the live snapshot, swapped atomically
+    snapshots/<generation>/      one directory per snapshot
+        manifest.json            format version, file list, sizes and checksums
+        <name>.npy               numpy arrays, opened as copy-on-write memmaps
+        <name>.offsets.npy       string columns: offsets into <name>.data.npy
+        <name>.data.npy
+        <other files>            opaque files such as the Faiss HNSW graph
+
+A snapshot is written into a temporary directory, renamed into place and only
+then published by replacing CURRENT, so a crash while saving never affects the
+snapshot that readers load. Memory-mapped arrays are shared between processes
+until a process writes to them.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+from collections.abc import MutableMapping
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+SNAPSHOT_FORMAT_VERSION = 1
+CURRENT_FILE = "CURRENT"
+SNAPSHOTS_DIR = "snapshots"
+MANIFEST_FILE = "manifest.json"
+KEEP_SNAPSHOTS = 2
+
+
+class SnapshotError(Exception):
+    """Raised when a snapshot is missing files, corrupt or of an unknown version"""
+
+
+class StringColumn(Sequence):
+    """Read-only sequence of strings stored as an offsets array plus UTF-8 bytes"""
+
+    def __init__(self, offsets: np.ndarray, data: np.ndarray):
+        self.offsets = offsets
+        self.data = data
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        return self.data[self.offsets[index]:self.offsets[index + 1]].tobytes().decode("utf-8")
+
+    @staticmethod
+    def encode(strings: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+        encoded = [s.encode("utf-8") for s in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        data = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+        return offsets, data
+
+
+SnapshotSection = Tuple[Dict[str, np.ndarray], Dict[str, Sequence[str]], Dict[str, Any]]
+
+
+@dataclass
+class Snapshot:
+    """A loaded snapshot; arrays are memory-mapped copy-on-write"""
+
+    directory: str
+    manifest: Dict[str, Any]
+    arrays: Dict[str, np.ndarray]
+    strings: Dict[str, StringColumn]
+
+    @property
+    def generation(self) -> str:
+        return os.path.basename(self.directory)
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def has_section(self, prefix: str) -> bool:
+        return prefix in self.manifest["sections"]
+
+    def section(self, prefix: str) -> SnapshotSection:
+        """Arrays, string columns and metadata written under ``prefix``"""
+        if prefix not in self.manifest["sections"]:
+            raise SnapshotError(f"Snapshot {self.generation} has no section '{prefix}'")
+        start = f"{prefix}."
+        arrays = {k[len(start):]: v for k, v in self.arrays.items() if k.startswith(start)}
+        strings = {k[len(start):]: v for k, v in self.strings.items() if k.startswith(start)}
+        return arrays, strings, self.manifest["sections"][prefix]
+
+
+class SnapshotWriter:
+    """Collects index sections and commits them as a new snapshot"""
+
+    def __init__(self, index_path: str):
+        self.index_path = index_path
+        self._arrays: Dict[str, np.ndarray] = {}
+        self._strings: Dict[str, Sequence[str]] = {}
+        self._sections: Dict[str, Dict[str, Any]] = {}
+        self._files: Dict[str, Callable[[str], None]] = {}
+
+    def add_section(self, prefix: str, arrays: Dict[str, np.ndarray],
+                    strings: Optional[Dict[str, Sequence[str]]] = None,
+                    meta: Optional[Dict[str, Any]] = None):
+        for name, array in arrays.items():
+            self._arrays[f"{prefix}.{name}"] = array
+        for name, column in (strings or {}).items():
+            self._strings[f"{prefix}.{name}"] = column
+        self._sections[prefix] = meta or {}
+
+    def add_file(self, name: str, writer: Callable[[str], None]):
+        """Register an opaque file produced by ``writer(path)``"""
+        self._files[name] = writer
+
+    def commit(self) -> str:
+        """Write, fsync and atomically publish the snapshot; returns its directory"""
+        snapshots_dir = os.path.join(self.index_path, SNAPSHOTS_DIR)
+        os.makedirs(snapshots_dir, exist_ok=True)
+        generation = f"{int(time.time() * 1000):015d}-{uuid.uuid4().hex[:8]}"
+        tmp_dir = os.path.join(snapshots_dir, f".tmp-{generation}")
+        os.makedirs(tmp_dir)
+
+        try:
+            files: Dict[str, Dict[str, Any]] = {}
+            for name, array in self._arrays.items():
+                files[f"{name}.npy"] = self._write_array(tmp_dir, f"{name}.npy", array)
+            for name, column in self._strings.items():
+                offsets, data = StringColumn.encode(column)
+                files[f"{name}.offsets.npy"] = self._write_array(tmp_dir, f"{name}.offsets.npy", offsets)
+                files[f"{name}.data.npy"] = self._write_array(tmp_dir, f"{name}.data.npy", data)
+            for name, writer in self._files.items():
+                path = os.path.join(tmp_dir, name)
+                writer(path)
+                files[name] = {"kind": "file", **_file_digest(path)}
+
+            manifest = {
+                "format_version": SNAPSHOT_FORMAT_VERSION,
+                "generation": generation,
+                "created_at": time.time(),
+                "arrays": sorted(self._arrays),
+                "strings": sorted(self._strings),
+                "sections": self._sections,
+                "files": files,
+            }
+            manifest["checksum"] = _manifest_checksum(manifest)
+            manifest_path = os.path.join(tmp_dir, MANIFEST_FILE)
+            with open(manifest_path, "w") as f:
+                json.dump(manifest, f, indent=1, default=str)
+                f.flush()
+                os.fsync(f.fileno())
+            _fsync_dir(tmp_dir)
+
+            final_dir = os.path.join(snapshots_dir, generation)
+            os.rename(tmp_dir, final_dir)
+            _fsync_dir(snapshots_dir)
+        except Exception:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+
+        # Publish: CURRENT is replaced in one rename
+        current_tmp = os.path.join(self.index_path, f".{CURRENT_FILE}.{generation}")
+        with open(current_tmp, "w") as f:
+            f.write(generation)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(current_tmp, os.path.join(self.index_path, CURRENT_FILE))
+        _fsync_dir(self.index_path)
+
+        _prune_snapshots(snapshots_dir, keep=KEEP_SNAPSHOTS)
+        logger.info(f"Snapshot {generation} committed", extra={'files': len(files)})
+        return final_dir
+
+    @staticmethod
+    def _write_array(directory: str, name: str, array: np.ndarray) -> Dict[str, Any]:
+        path = os.path.join(directory, name)
+        array = np.ascontiguousarray(array)
+        with open(path, "wb") as f:
+            np.save(f, array, allow_pickle=False)
+            f.flush()
+            os.fsync(f.fileno())
+        return {"kind": "array", "dtype": array.dtype.str, "shape": list(array.shape), **_file_digest(path)}
+
+
+def has_snapshot(index_path: str) -> bool:
+    return os.path.exists(os.path.join(index_path, CURRENT_FILE))
+
+
+def read_snapshot(index_path: str, verify_checksums: bool = False, mmap: bool = True) -> Optional[Snapshot]:
+    """
+    Open the live snapshot, or return None when there is none.
+    The manifest checksum and file sizes are always checked; full file
+    checksums are only verified when ``verify_checksums`` is set.
+    """
+    current_path = os.path.join(index_path, CURRENT_FILE)
+    if not os.path.exists(current_path):
+        return None
+
+    with open(current_path) as f:
+        generation = f.read().strip()
+    directory = os.path.join(index_path, SNAPSHOTS_DIR, generation)
+    manifest_path = os.path.join(directory, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        raise SnapshotError(f"Snapshot {generation} has no manifest")
+
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    if manifest.get("format_version") != SNAPSHOT_FORMAT_VERSION:
+        raise SnapshotError(f"Unsupported snapshot format version {manifest.get('format_version')}")
+    if manifest.get("checksum") != _manifest_checksum(manifest):
+        raise SnapshotError(f"Snapshot {generation} manifest checksum mismatch")
+
+    for name, info in manifest["files"].items():
+        path = os.path.join(directory, name)
+        if not os.path.exists(path) or os.path.getsize(path) != info["bytes"]:
+            raise SnapshotError(f"Snapshot file {name} is missing or truncated")
+        if verify_checksums and _file_digest(path)["sha256"] != info["sha256"]:
+            raise SnapshotError(f"Snapshot file {name} checksum mismatch")
+
+    mmap_mode = "c" if mmap else None
+    arrays = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mmap_mode, allow_pickle=False)
+              for name in manifest["arrays"]}
+    strings = {
+        name: StringColumn(
+            np.load(os.path.join(directory, f"{name}.offsets.npy"), mmap_mode=mmap_mode, allow_pickle=False),
+            np.load(os.path.join(directory, f"{name}.data.npy"), mmap_mode=mmap_mode, allow_pickle=False),
+        )
+        for name in manifest["strings"]
+    }
+    return Snapshot(directory=directory, manifest=manifest, arrays=arrays, strings=strings)
+
+
+class SnapshotMetadata(MutableMapping):
+    """
+    Document metadata backed by a snapshot's ids and JSON payload columns.
+    Records are decoded on first access; writes and deletions are kept in
+    memory on top of the snapshot columns.
+    """
+
+    def __init__(self, ids: Sequence[str], payloads: Sequence[str]):
+        self._ids = ids
+        self._payloads = payloads
+        self._positions: Optional[Dict[str, int]] = None
+        self._decoded: Dict[str, Dict] = {}
+        self._overlay: Dict[str, Dict] = {}
+        self._deleted: set = set()
+
+    def _index(self) -> Dict[str, int]:
+        if self._positions is None:
+            self._positions = {self._ids[i]: i for i in range(len(self._ids))}
+        return self._positions
+
+    def __getitem__(self, doc_id: str) -> Dict:
+        if doc_id in self._overlay:
+            return self._overlay[doc_id]
+        if doc_id in self._deleted:
+            raise KeyError(doc_id)
+        record = self._decoded.get(doc_id)
+        if record is None:
+            position = self._index()[doc_id]
+            record = json.loads(self._payloads[position])
+            self._decoded[doc_id] = record
+        return record
+
+    def __setitem__(self, doc_id: str, record: Dict):
+        self._overlay[doc_id] = record
+        self._deleted.discard(doc_id)
+
+    def __delitem__(self, doc_id: str):
+        if doc_id not in self:
+            raise KeyError(doc_id)
+        self._overlay.pop(doc_id, None)
+        self._decoded.pop(doc_id, None)
+        self._deleted.add(doc_id)
+
+    def __contains__(self, doc_id: object) -> bool:
+        if doc_id in self._overlay:
+            return True
+        return doc_id not in self._deleted and doc_id in self._index()
+
+    def __iter__(self) -> Iterator[str]:
+        for i in range(len(self._ids)):
+            doc_id = self._ids[i]
+            if doc_id not in self._deleted and doc_id not in self._overlay:
+                yield doc_id
+        yield from list(self._overlay)
+
+    def __len__(self) -> int:
+        base = len(self._index()) - sum(1 for doc_id in self._deleted if doc_id in self._index())
+        return base + sum(1 for doc_id in self._overlay if doc_id not in self._index() or doc_id in self._deleted)
+
+
+def _file_digest(path: str) -> Dict[str, Any]:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return {"bytes": os.path.getsize(path), "sha256": digest.hexdigest()}
+
+
+def _manifest_checksum(manifest: Dict[str, Any]) -> str:
+    body = {k: v for k, v in manifest.items() if k != "checksum"}
+    return hashlib.sha256(json.dumps(body, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _fsync_dir(path: str):
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _prune_snapshots(snapshots_dir: str, keep: int):
+    """Remove all but the newest ``keep`` published snapshots"""
+    generations: List[str] = sorted(d for d in os.listdir(snapshots_dir) if not d.startswith("."))
+    for generation in generations[:-keep]:
+        shutil.rmtree(os.path.join(snapshots_dir, generation), ignore_errors=True)
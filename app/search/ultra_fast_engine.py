@@ -1,22 +1,46 @@
 import numpy as np
 import time
 import os
+import json
 import pickle
-from typing import List, Dict, Tuple, Optional
+from typing import Any, List, Dict, Tuple, Optional
 from dataclasses import dataclass
 import asyncio
 from sentence_transformers import SentenceTransformer
 import faiss
 
-from app.math.lsh_index import LSHIndex
+from app.math.bm25_index import BM25Index, BM25Statistics
+from app.math.lsh_index import LSHIndex, LSHQuery
 from app.math.hnsw_index import HNSWIndex
-from app.math.product_quantization import ProductQuantizer
+from app.math.ivfpq_index import IVFPQIndex
+from app.search.calibration import CalibrationTable, SearchProfile, profile_for
+from app.search.embedding_cache import EmbeddingCache
+from app.search.metadata_index import MetadataIndex
+from app.search.query_encoder import BatchingQueryEncoder
+from app.search.result_cache import SearchResultCache
+from app.search.snapshot import SnapshotMetadata, SnapshotWriter, read_snapshot
+from app.search.vector_store import VectorStore
 from app.core.logging import get_logger
 from app.core.config import get_settings
 
 logger = get_logger(__name__)
 settings = get_settings()
 
+# Weights of the hybrid score: vector similarity, MinHash Jaccard, BM25
+VECTOR_WEIGHT = 0.4
+JACCARD_WEIGHT = 0.3
+BM25_WEIGHT = 0.3
+
+# Filtered queries matching at most this many documents score all of them instead of searching
+FILTER_EXHAUSTIVE_LIMIT = 2048
+
+def _as_float(value) -> float:
+    """Numeric metadata value as float, NaN when missing or not numeric"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float('nan')
+
 @dataclass
 class SearchResult:
     doc_id: str
@@ -31,21 +55,64 @@ class UltraFastSearchEngine:
     Provides FAISS, HNSW, LSH, and BM25 search capabilities.
     """
 
-    def __init__(self, embedding_dim: int = 384, use_gpu: bool = False):
+    def __init__(self, embedding_dim: int = 384, use_gpu: bool = False, embedding_model: Optional[Any] = None,
+                 index_path: Optional[str] = None, cache_embeddings: bool = True,
+                 vector_storage: Optional[str] = None):
+        """
+        - embedding_model: Encoder to use instead of loading EMBEDDING_MODEL_NAME.
+        - index_path: Snapshot directory, INDEX_PATH by default.
+        - cache_embeddings: Keep document embeddings in the on-disk cache
+          (EMBEDDING_CACHE_ENABLED still applies).
+        - vector_storage: Row format of the vector store and HNSW graph
+          (float32, float16 or int8), VECTOR_STORAGE by default.
+        """
         try:
-            self.embedding_model = SentenceTransformer(
-                settings.EMBEDDING_MODEL_NAME or 'all-MiniLM-L6-v2', 
+            model_name = settings.EMBEDDING_MODEL_NAME or 'all-MiniLM-L6-v2'
+            self.embedding_model = embedding_model if embedding_model is not None else SentenceTransformer(
+                model_name, 
                 device='cuda' if use_gpu else 'cpu'
             )
+            self.query_encoder = BatchingQueryEncoder(
+                self.embedding_model,
+                max_batch_size=settings.QUERY_BATCH_MAX_SIZE,
+                max_wait_ms=settings.QUERY_BATCH_WAIT_MS,
+                cache_size=settings.QUERY_EMBEDDING_CACHE_SIZE
+            )
             self.embedding_dim = embedding_dim
-            self.index_path = settings.INDEX_PATH or "indexes"
+            self.index_path = index_path or settings.INDEX_PATH or "indexes"
+            self.embedding_cache = None
+            if settings.EMBEDDING_CACHE_ENABLED and cache_embeddings:
+                self.embedding_cache = EmbeddingCache(
+                    settings.EMBEDDING_CACHE_PATH or os.path.join(self.index_path, "embedding_cache"),
+                    model_name, embedding_dim
+                )
+            self.scoring_mode = settings.SEARCH_SCORING_MODE or "vectorized"
+            self.compaction_threshold = settings.INDEX_COMPACTION_THRESHOLD
+            self.vector_index_mode = settings.VECTOR_INDEX_MODE or "hnsw"
+            self.vector_storage = vector_storage or settings.VECTOR_STORAGE or "float32"
+            self.exact_rerank = settings.EXACT_RERANK
+            self._compaction_task: Optional[asyncio.Task] = None
+            # Serializes index mutations with snapshot writes made off the event loop
+            self._write_lock = asyncio.Lock()
+            # Bumped by every index mutation; cached results of older generations are never served
+            self.index_generation = 0
+            self.query_cache = SearchResultCache(
+                max_entries=settings.SEARCH_RESULT_CACHE_SIZE,
+                max_bytes=settings.SEARCH_RESULT_CACHE_MAX_BYTES,
+                ttl_seconds=settings.SEARCH_RESULT_CACHE_TTL_SECONDS
+            )
+            # Profiles measured at startup or restored with the snapshot; without them searches use the default profile
+            self.calibration: Optional[CalibrationTable] = None
             self._initialize_indexes()
             self.load_indexes()
             
             logger.info("UltraFastSearchEngine initialized successfully", extra={
                 'embedding_dim': embedding_dim,
                 'use_gpu': use_gpu,
-                'model_name': settings.EMBEDDING_MODEL_NAME or 'all-MiniLM-L6-v2'
+                'scoring_mode': self.scoring_mode,
+                'vector_index_mode': self.vector_index_mode,
+                'vector_storage': self.vector_storage,
+                'model_name': model_name
             })
             
         except Exception as e:
@@ -55,60 +122,65 @@ class UltraFastSearchEngine:
     def _initialize_indexes(self):
         """Initialize all search indexes"""
         self.lsh_index = LSHIndex(num_hashes=128, num_bands=16)
-        self.hnsw_index = HNSWIndex(dimension=self.embedding_dim)
-        self.pq_quantizer = ProductQuantizer(dimension=self.embedding_dim)
-        self.document_vectors = {}
-        self.document_codes = {}
+        self.hnsw_index = self._create_vector_index()
+        self.document_vectors = VectorStore(self.embedding_dim, storage_dir=self._vector_storage_dir(),
+                                            storage=self.vector_storage)
         self.document_metadata = {}
         self.document_text_features = {}
-        self.bm25_index = {}
-        self.doc_frequencies = {}
-        self.corpus_size = 0
-        self.avg_doc_length = 0
-        self.search_stats = {'total_searches': 0, 'avg_response_time': 0, 'cache_hits': 0}
-        self.query_cache = {}
-        self.cache_max_size = 1000
+        self.bm25_index = BM25Index()
+        self.metadata_index = MetadataIndex()
+        self.search_stats = {'total_searches': 0, 'cached_searches': 0, 'avg_response_time': 0, 'compactions': 0}
+        self._bump_generation()
+
+    def _create_vector_index(self):
+        """
+        ANN index over the document vectors: an HNSW graph by default, or an
+        IVF-PQ index holding only compressed codes in ``ivfpq`` mode.
+        """
+        if self.vector_index_mode == "ivfpq":
+            return IVFPQIndex(dimension=self.embedding_dim, nlist=settings.IVF_NLIST,
+                              nprobe=settings.IVF_NPROBE, num_subspaces=settings.PQ_SUBSPACES)
+        return HNSWIndex(dimension=self.embedding_dim, storage=self.vector_storage)
+
+    def _vector_storage_dir(self) -> Optional[str]:
+        """In compressed mode float vectors are only needed for re-ranking, so keep them file-backed"""
+        return os.path.join(self.index_path, "vectors") if self.vector_index_mode == "ivfpq" else None
 
     def save_indexes(self):
-        """Save indexes with proper FAISS serialization handling."""
+        """Persist all indexes as a new snapshot and publish it atomically."""
+        self._commit_snapshot(self._snapshot_writer())
+
+    async def save_snapshot(self):
+        """
+        Persist all indexes without blocking the event loop. Sections are
+        collected on the loop and the files written and fsynced in a worker
+        thread, holding the write lock so no mutation or compaction changes
+        the arrays being written.
+        """
+        async with self._write_lock:
+            writer = self._snapshot_writer()
+            await asyncio.to_thread(self._commit_snapshot, writer)
+
+    def _snapshot_writer(self) -> SnapshotWriter:
+        """Collect every index section for a new snapshot"""
+        writer = SnapshotWriter(self.index_path)
+        ann_section = "ivfpq" if isinstance(self.hnsw_index, IVFPQIndex) else "hnsw"
+        writer.add_file(f"{ann_section}.index", self.hnsw_index.save)
+        writer.add_section(ann_section, *self.hnsw_index.to_snapshot())
+        writer.add_section("vectors", *self.document_vectors.to_snapshot())
+        writer.add_section("bm25", *self.bm25_index.to_snapshot())
+        writer.add_section("lsh", *self.lsh_index.to_snapshot())
+        writer.add_section("metadata", *self._metadata_section())
+        writer.add_section("filters", *self.metadata_index.to_snapshot())
+        if self.calibration is not None:
+            writer.add_section("calibration", {}, meta=self.calibration.to_dict())
+        return writer
+
+    def _commit_snapshot(self, writer: SnapshotWriter):
         logger.info(f"Saving indexes to {self.index_path}")
-        os.makedirs(self.index_path, exist_ok=True)
         
         try:
-            # Save FAISS HNSW index directly using FAISS writer
-            faiss.write_index(self.hnsw_index.index, os.path.join(self.index_path, "hnsw.index"))
-            
-            # Save FAISS ProductQuantizer separately
-            if hasattr(self, 'pq_quantizer') and self.pq_quantizer and self.pq_quantizer.trained:
-                pq_data = {
-                    'dimension': self.pq_quantizer.dimension,
-                    'num_subspaces': self.pq_quantizer.num_subspaces,
-                    'bits_per_subspace': self.pq_quantizer.bits_per_subspace,
-                    'trained': self.pq_quantizer.trained
-                }
-                if self.pq_quantizer.trained:
-                    pq_data['centroids'] = faiss.vector_to_array(self.pq_quantizer.pq.centroids).copy()
-                    
-                with open(os.path.join(self.index_path, "pq_quantizer.pkl"), "wb") as f:
-                    pickle.dump(pq_data, f)
-            
-            # Save all other data that doesn't contain FAISS objects
-            other_data = {
-                "lsh_index": self.lsh_index,
-                "document_vectors": self.document_vectors,
-                "document_codes": self.document_codes,
-                "document_metadata": self.document_metadata,
-                "document_text_features": self.document_text_features,
-                "bm25_index": self.bm25_index,
-                "doc_frequencies": self.doc_frequencies,
-                "corpus_size": self.corpus_size,
-                "avg_doc_length": self.avg_doc_length,
-                "doc_ids": self.hnsw_index.doc_ids
-            }
-            
-            with open(os.path.join(self.index_path, "other_data.pkl"), "wb") as f:
-                pickle.dump(other_data, f)
-                
+            writer.commit()
             logger.info("Successfully saved all indexes")
             
         except Exception as e:
@@ -116,66 +188,133 @@ class UltraFastSearchEngine:
             raise
 
     def load_indexes(self):
-        """Load indexes with proper FAISS deserialization handling."""
-        if not os.path.exists(os.path.join(self.index_path, "hnsw.index")):
-            logger.info("No existing indexes found. Ready for building.")
+        """Load the live index snapshot, falling back to the legacy pickle layout."""
+        try:
+            snapshot = read_snapshot(self.index_path, verify_checksums=settings.INDEX_VERIFY_CHECKSUMS,
+                                     mmap=settings.INDEX_MMAP)
+        except Exception as e:
+            logger.error(f"Failed to load indexes: {str(e)}")
+            logger.info("Continuing without pre-built indexes. Ready for building.")
             return
-            
+
+        if snapshot is None:
+            if os.path.exists(os.path.join(self.index_path, "hnsw.index")):
+                self._load_legacy_indexes()
+            else:
+                logger.info("No existing indexes found. Ready for building.")
+            return
+
         try:
-            logger.info(f"Loading indexes from {self.index_path}")
-            
-            # Load FAISS HNSW index
-            self.hnsw_index.index = faiss.read_index(os.path.join(self.index_path, "hnsw.index"))
+            logger.info(f"Loading index snapshot {snapshot.generation} from {self.index_path}")
+
+            self.document_vectors = VectorStore.from_snapshot(*snapshot.section("vectors"),
+                                                              storage_dir=self._vector_storage_dir(),
+                                                              storage=self.vector_storage)
+            ann_section = "ivfpq" if self.vector_index_mode == "ivfpq" else "hnsw"
+            ann_arrays, _, ann_meta = snapshot.section(ann_section) if snapshot.has_section(ann_section) else ({}, {}, {})
+            same_storage = ann_meta.get('storage', 'float32') == getattr(self.hnsw_index, 'storage', 'float32')
+            if 'labels' in ann_arrays and same_storage:
+                self.hnsw_index.load(snapshot.path(f"{ann_section}.index"), mmap=settings.INDEX_MMAP)
+                self.hnsw_index.restore_labels(*snapshot.section(ann_section))
+            else:
+                # Saved in the other vector index mode or storage, or before graphs had stable labels
+                self._rebuild_vector_index()
+            self.bm25_index = BM25Index.from_snapshot(*snapshot.section("bm25"))
+            self.lsh_index = LSHIndex.from_snapshot(*snapshot.section("lsh"))
+            _, metadata_strings, _ = snapshot.section("metadata")
+            self.document_metadata = SnapshotMetadata(metadata_strings['ids'], metadata_strings['payloads'])
+            if snapshot.has_section("filters"):
+                self.metadata_index = MetadataIndex.from_snapshot(*snapshot.section("filters"))
+            else:
+                self._rebuild_metadata_index()
+            if snapshot.has_section("calibration"):
+                self.calibration = CalibrationTable.from_dict(snapshot.section("calibration")[2])
+
+            self._bump_generation()
+            logger.info("Successfully loaded all indexes", extra={'generation': snapshot.generation})
+
+        except Exception as e:
+            logger.error(f"Failed to load indexes: {str(e)}")
+            logger.info("Continuing without pre-built indexes. Ready for building.")
+            self._initialize_indexes()
+
+    def _metadata_section(self):
+        """
+        Metadata columns: the full record as a JSON payload plus typed columns
+        for the fields used in filtering.
+        """
+        ids = list(self.document_metadata)
+        records = [self.document_metadata[doc_id] for doc_id in ids]
+        experience = np.array([_as_float(record.get('experience_years')) for record in records], dtype=np.float64)
+        strings = {
+            'ids': ids,
+            'payloads': [json.dumps(record, default=str) for record in records],
+            'seniority_level': [str(record.get('seniority_level', 'unknown')) for record in records],
+        }
+        return {'experience_years': experience}, strings, {}
+
+    def _load_legacy_indexes(self):
+        """Load indexes saved by the pickle-based format (hnsw.index + other_data.pkl)."""
+        try:
+            logger.info(f"Loading legacy indexes from {self.index_path}")
             
             # Load other data
             with open(os.path.join(self.index_path, "other_data.pkl"), "rb") as f:
                 data = pickle.load(f)
                 self.lsh_index = data["lsh_index"]
                 self.document_vectors = data["document_vectors"]
-                self.document_codes = data["document_codes"]
+                if isinstance(self.document_vectors, dict):
+                    self.document_vectors = VectorStore.from_dict(self.document_vectors, self.embedding_dim)
                 self.document_metadata = data["document_metadata"]
                 self.document_text_features = data["document_text_features"]
                 self.bm25_index = data["bm25_index"]
-                self.doc_frequencies = data["doc_frequencies"]
-                self.corpus_size = data["corpus_size"]
-                self.avg_doc_length = data["avg_doc_length"]
-                self.hnsw_index.doc_ids = data["doc_ids"]
+                if isinstance(self.bm25_index, dict):
+                    legacy = [(self.document_vectors.row_of(doc_id), entry['tf'])
+                              for doc_id, entry in self.bm25_index.items() if doc_id in self.document_vectors]
+                    self.bm25_index = BM25Index.from_term_frequencies([row for row, _ in legacy],
+                                                                      [tf for _, tf in legacy])
+
+            # The legacy graph is keyed by insertion position; rebuild it under vector store rows
+            self._rebuild_vector_index()
+            self._rebuild_metadata_index()
             
-            # Load ProductQuantizer if it exists
-            pq_path = os.path.join(self.index_path, "pq_quantizer.pkl")
-            if os.path.exists(pq_path):
-                with open(pq_path, "rb") as f:
-                    pq_data = pickle.load(f)
-                
-                self.pq_quantizer = ProductQuantizer(
-                    pq_data['dimension'],
-                    pq_data['num_subspaces'], 
-                    pq_data['bits_per_subspace']
-                )
-                
-                if pq_data.get('trained', False) and 'centroids' in pq_data:
-                    # Create a dummy training set to initialize the structure
-                    dummy_vectors = np.random.randn(10, pq_data['dimension']).astype(np.float32)
-                    self.pq_quantizer.train(dummy_vectors)
-                    
-                    # Replace the centroids with the saved ones
-                    centroids_vector = faiss.FloatVector()
-                    centroids_vector.resize(len(pq_data['centroids']))
-                    for i, val in enumerate(pq_data['centroids']):
-                        centroids_vector[i] = val
-                    self.pq_quantizer.pq.centroids.swap(centroids_vector)
-                    self.pq_quantizer.trained = True
-            else:
-                self.pq_quantizer = None
-                
-            logger.info("Successfully loaded all indexes")
+            logger.info("Successfully loaded legacy indexes; they will be saved as a snapshot on the next save")
             
         except Exception as e:
             logger.error(f"Failed to load indexes: {str(e)}")
             logger.info("Continuing without pre-built indexes. Ready for building.")
+            self._initialize_indexes()
 
-    async def build_indexes(self, documents: List[Dict]):
-        """Build search indexes with comprehensive error handling and monitoring."""
+    def _rebuild_vector_index(self, chunk_size: int = 65536):
+        """Rebuild the ANN index from the live rows of the vector store"""
+        doc_ids = self.document_vectors.keys()
+        rows, _ = self.document_vectors.rows_for(doc_ids)
+        self.hnsw_index = self._create_vector_index()
+        if isinstance(self.hnsw_index, IVFPQIndex) and len(rows) >= self.hnsw_index.min_train_size:
+            # Train on a sample spread over the whole corpus rather than the first chunk
+            sample = np.random.default_rng(42).choice(len(rows), min(len(rows), self.hnsw_index.max_train_size),
+                                                      replace=False)
+            self.hnsw_index.train(self.document_vectors.vectors(rows[np.sort(sample)]))
+        for start in range(0, len(rows), chunk_size):
+            chunk = rows[start:start + chunk_size]
+            self.hnsw_index.add_documents(self.document_vectors.vectors(chunk), doc_ids[start:start + chunk_size],
+                                          labels=chunk)
+
+    def _rebuild_metadata_index(self):
+        """Index the filterable fields of every stored document"""
+        rows, doc_ids = self.document_vectors.rows_for(self.document_metadata)
+        self.metadata_index = MetadataIndex.from_records(rows.tolist(),
+                                                         [self.document_metadata[doc_id] for doc_id in doc_ids])
+
+    async def build_indexes(self, documents: List[Dict], vectors: Optional[np.ndarray] = None):
+        """
+        Build search indexes with comprehensive error handling and monitoring.
+        - vectors: Embeddings of ``documents`` when the caller already has them.
+        """
+        async with self._write_lock:
+            await self._build_indexes(documents, vectors)
+
+    async def _build_indexes(self, documents: List[Dict], vectors: Optional[np.ndarray]):
         logger.info(f"Building ultra-fast indexes for {len(documents)} documents...")
         
         try:
@@ -183,18 +322,20 @@ class UltraFastSearchEngine:
             self._initialize_indexes()
 
             # Generate embeddings
-            texts_to_embed = [self._get_document_text(doc) for doc in documents]
-            vectors = self.embedding_model.encode(texts_to_embed, show_progress_bar=True, convert_to_numpy=True)
+            if vectors is None:
+                texts_to_embed = [self._get_document_text(doc) for doc in documents]
+                vectors = self._encode_documents(texts_to_embed, show_progress_bar=True)
             doc_ids = [doc['id'] for doc in documents]
 
             # Process documents
             valid_docs_processed = 0
+            valid_positions = {}
             for i, doc in enumerate(documents):
                 try:
                     doc_id = doc['id']
                     text_features = self._extract_text_features(doc)
                     self.document_text_features[doc_id] = text_features
-                    self.document_vectors[doc_id] = vectors[i]
+                    valid_positions[doc_id] = i
                     self.document_metadata[doc_id] = {
                         'name': doc.get('name', ''),
                         'title': doc.get('title', ''),
@@ -209,19 +350,26 @@ class UltraFastSearchEngine:
                 except Exception as e:
                     logger.warning(f"Failed to process document {doc.get('id', 'unknown')}: {str(e)}")
 
+            # One batch, so quantized storage fits its ranges on the whole corpus
+            if valid_positions:
+                self.document_vectors.add_batch(list(valid_positions),
+                                                np.asarray(vectors)[list(valid_positions.values())])
+            self._rebuild_metadata_index()
+
             # Build indexes concurrently
+            indexed_ids = [did for did in doc_ids if did in self.document_vectors]
             build_tasks = [
-                self._build_lsh_index(documents, [self.document_text_features[did] for did in doc_ids if did in self.document_text_features]),
-                self._build_hnsw_index([did for did in doc_ids if did in self.document_vectors], 
-                                     np.array([self.document_vectors[did] for did in doc_ids if did in self.document_vectors])),
-                self._build_pq_index(np.array([self.document_vectors[did] for did in doc_ids if did in self.document_vectors])),
+                self._build_lsh_index(list(self.document_text_features), list(self.document_text_features.values())),
+                self._build_hnsw_index(indexed_ids, np.array([self.document_vectors[did] for did in indexed_ids])),
                 self._build_bm25_index(documents)
             ]
             
             await asyncio.gather(*build_tasks, return_exceptions=True)
+            # Searches made while building must not stay cached
+            self._bump_generation()
             
             # Save indexes
-            self.save_indexes()
+            await asyncio.to_thread(self._commit_snapshot, self._snapshot_writer())
             
             build_time = time.time() - start_time
             logger.info(f"Index building completed in {build_time:.2f} seconds", extra={
@@ -233,60 +381,60 @@ class UltraFastSearchEngine:
             logger.error(f"Index building failed: {str(e)}")
             raise
 
-    async def search(self, query: str, num_results: int = 10, filters: Optional[Dict] = None) -> List[SearchResult]:
-        """Enhanced search with comprehensive error handling and monitoring."""
+    async def search(self, query: str, num_results: int = 10, filters: Optional[Dict] = None,
+                     latency_budget_ms: Optional[float] = None, recall_target: Optional[float] = None,
+                     profile: Optional[SearchProfile] = None) -> List[SearchResult]:
+        """
+        Enhanced search with comprehensive error handling and monitoring.
+        - latency_budget_ms / recall_target: Pick the retrieval profile from
+          the calibration table (see ``select_profile``).
+        - profile: Profile to use as is, e.g. one already chosen by the caller.
+        """
         search_start = time.time()
         
         try:
-            # Validate inputs
-            if not query or not query.strip():
-                raise ValueError("Query cannot be empty")
-            
-            if num_results <= 0 or num_results > 1000:
-                raise ValueError("num_results must be between 1 and 1000")
+            self._validate_search_args(query, num_results)
+            profile = profile or self.select_profile(num_results, latency_budget_ms, recall_target)
 
-            cache_key = f"{query}:{num_results}:{str(filters)}"
-            if cache_key in self.query_cache:
-                self.search_stats['cache_hits'] += 1
-                return self.query_cache[cache_key]
+            cache_key = self.query_cache.key(query, num_results, filters, profile.cache_key)
+            cached = self.query_cache.get(cache_key)
+            if cached is not None:
+                self._record_search((time.time() - search_start) * 1000, cached=True)
+                return cached
 
             # Generate query embeddings
-            query_vector = self.embedding_model.encode([query], convert_to_numpy=True)
-            query_features = self._extract_query_features(query)
+            # Encoded off the event loop, batched with concurrent queries
+            query_vector = (await self.query_encoder.encode(query)).reshape(1, -1)
+            # The MinHash signature is computed once and shared by retrieval and scoring
+            lsh_query = self.lsh_index.prepare_query(self._extract_query_features(query))
+            query_terms = query.lower().split()
 
             # Candidate retrieval
-            lsh_candidates = self.lsh_index.query_candidates(query_features, num_candidates=200)
-            hnsw_results = self.hnsw_index.search(query_vector, k=100)
-            hnsw_candidates = [doc_id for doc_id, _ in hnsw_results]
-            
-            all_candidates = list(set(lsh_candidates + hnsw_candidates))
-
-            # Apply filters
-            if filters:
-                all_candidates = self._apply_filters(all_candidates, filters)
+            all_candidates = self._candidate_lists(query_vector, [lsh_query], [query_terms], filters,
+                                                   profile=profile)[0]
 
             # Score candidates
-            scored_results = await self._score_candidates(all_candidates, query, query_vector[0], query_features)
-            scored_results.sort(key=lambda x: x.combined_score, reverse=True)
-            final_results = scored_results[:num_results]
+            if self.scoring_mode == "vectorized":
+                final_results = self._score_candidates_vectorized(
+                    all_candidates, query_terms, query_vector[0], lsh_query, num_results
+                )
+            else:
+                scored_results = await self._score_candidates(all_candidates, query, query_vector[0], lsh_query)
+                scored_results.sort(key=lambda x: x.combined_score, reverse=True)
+                final_results = scored_results[:num_results]
 
-            # Update cache
-            if len(self.query_cache) >= self.cache_max_size:
-                self.query_cache.pop(next(iter(self.query_cache)))
-            self.query_cache[cache_key] = final_results
+            self.query_cache.put(cache_key, final_results)
 
             # Update statistics
             response_time = (time.time() - search_start) * 1000
-            self.search_stats['total_searches'] += 1
-            self.search_stats['avg_response_time'] = (
-                self.search_stats['avg_response_time'] * (self.search_stats['total_searches'] - 1) + response_time
-            ) / self.search_stats['total_searches']
+            self._record_search(response_time)
 
             logger.info(f"Search completed successfully", extra={
                 'response_time_ms': response_time,
                 'results_count': len(final_results),
                 'candidates_count': len(all_candidates),
-                'query_length': len(query)
+                'query_length': len(query),
+                'search_profile': profile.name
             })
             
             return final_results
@@ -295,23 +443,193 @@ class UltraFastSearchEngine:
             logger.error(f"Search failed: {str(e)}")
             raise
 
-    async def _score_candidates(self, candidates: List[str], query: str, query_vector: np.ndarray, query_features: List[str]) -> List[SearchResult]:
+    async def search_batch(self, queries: List[str], num_results: int = 10,
+                           filters: Optional[Dict] = None, latency_budget_ms: Optional[float] = None,
+                           recall_target: Optional[float] = None,
+                           profile: Optional[SearchProfile] = None) -> List[List[SearchResult]]:
+        """
+        Search many queries at once: one encoder forward pass, one multi-row
+        HNSW search and one similarity product over the union of candidates.
+        Results are returned in the order of ``queries``. The latency budget
+        applies to each query, as in ``search``.
+        """
+        batch_start = time.time()
+
+        try:
+            for query in queries:
+                self._validate_search_args(query, num_results)
+            profile = profile or self.select_profile(num_results, latency_budget_ms, recall_target)
+
+            results: List[Optional[List[SearchResult]]] = [None] * len(queries)
+            cache_keys = [self.query_cache.key(query, num_results, filters, profile.cache_key) for query in queries]
+            pending = []
+            for i, cache_key in enumerate(cache_keys):
+                results[i] = self.query_cache.get(cache_key)
+                if results[i] is None:
+                    pending.append(i)
+
+            if pending:
+                pending_queries = [queries[i] for i in pending]
+                query_vectors = await self.query_encoder.encode_many(pending_queries)
+                scored = await self.search_vectors(pending_queries, query_vectors, num_results, filters,
+                                                   profile=profile)
+
+                for i, query_results in zip(pending, scored):
+                    results[i] = query_results
+                    self.query_cache.put(cache_keys[i], query_results)
+
+            # Batch latency is amortized over its queries in the statistics
+            response_time = (time.time() - batch_start) * 1000
+            misses = set(pending)
+            for i in range(len(queries)):
+                self._record_search(response_time / len(queries), cached=i not in misses)
+
+            logger.info(f"Batch search completed successfully", extra={
+                'response_time_ms': response_time,
+                'queries_count': len(queries),
+                'cache_hits': len(queries) - len(pending)
+            })
+
+            return results
+
+        except Exception as e:
+            logger.error(f"Batch search failed: {str(e)}")
+            raise
+
+    async def search_vectors(self, queries: List[str], query_vectors: np.ndarray, num_results: int,
+                             filters: Optional[Dict] = None,
+                             bm25_statistics: Optional[BM25Statistics] = None,
+                             profile: Optional[SearchProfile] = None) -> List[List[SearchResult]]:
+        """
+        Retrieve and score already-encoded queries, bypassing the query cache.
+        - bm25_statistics: Corpus-wide BM25 statistics when this engine holds
+          one partition of a larger corpus (see ``bm25_statistics``).
+        - profile: Retrieval parameters, the default profile when omitted.
+        """
+        lsh_queries = [self.lsh_index.prepare_query(self._extract_query_features(query)) for query in queries]
+        query_terms = [query.lower().split() for query in queries]
+
+        candidate_lists = self._candidate_lists(query_vectors, lsh_queries, query_terms, filters, bm25_statistics,
+                                                profile or self.select_profile(num_results))
+
+        if self.scoring_mode == "vectorized":
+            return self._score_batch_vectorized(candidate_lists, query_terms, query_vectors,
+                                                lsh_queries, num_results, bm25_statistics)
+
+        scored = []
+        for candidates, query, vector, lsh_query in zip(candidate_lists, queries, query_vectors, lsh_queries):
+            query_results = await self._score_candidates(candidates, query, vector, lsh_query, bm25_statistics)
+            query_results.sort(key=lambda x: x.combined_score, reverse=True)
+            scored.append(query_results[:num_results])
+        return scored
+
+    def select_profile(self, num_results: int = 10, latency_budget_ms: Optional[float] = None,
+                       recall_target: Optional[float] = None) -> SearchProfile:
+        """
+        Retrieval profile for a search: with a latency budget (per query, in
+        ms) or a recall@k target, the calibrated profile that meets it;
+        otherwise, or before calibration, the default profile.
+        """
+        return profile_for(self.calibration, num_results, latency_budget_ms, recall_target)
+
+    def bm25_statistics(self, query_terms: List[str]) -> BM25Statistics:
+        """BM25 corpus statistics of this engine for the given terms, to be merged across partitions"""
+        return self.bm25_index.statistics(query_terms)
+
+    def _validate_search_args(self, query: str, num_results: int):
+        """Validate search inputs"""
+        if not query or not query.strip():
+            raise ValueError("Query cannot be empty")
+
+        if num_results <= 0 or num_results > 1000:
+            raise ValueError("num_results must be between 1 and 1000")
+
+    def _candidate_lists(self, query_vectors: np.ndarray, lsh_queries: List[LSHQuery],
+                         query_terms: List[List[str]], filters: Optional[Dict],
+                         bm25_statistics: Optional[BM25Statistics] = None,
+                         profile: Optional[SearchProfile] = None) -> List[List[str]]:
+        """
+        Candidates of each query, gathered with the stage sizes of ``profile``.
+        Filters are resolved once into a row mask that every retriever
+        honours, so the candidates all match them.
+        """
+        profile = profile or self.select_profile()
+        allowed = self.metadata_index.allowed_rows(filters)
+        if allowed is not None and np.count_nonzero(allowed) <= FILTER_EXHAUSTIVE_LIMIT:
+            # Selective filters: scoring every match is cheaper than searching and has full recall
+            matches = [self.document_vectors.doc_id_at(row) for row in np.flatnonzero(allowed).tolist()]
+            return [matches for _ in lsh_queries]
+
+        if isinstance(self.hnsw_index, IVFPQIndex):
+            hnsw_results = self.hnsw_index.search_batch(query_vectors, k=profile.vector_candidates,
+                                                        allowed=allowed, nprobe=profile.nprobe)
+        else:
+            hnsw_results = self.hnsw_index.search_batch(query_vectors, k=profile.vector_candidates,
+                                                        allowed=allowed, ef_search=profile.ef_search)
+        return [
+            self._retrieve_candidates(lsh_query, terms, hits, allowed, bm25_statistics, profile)
+            for lsh_query, terms, hits in zip(lsh_queries, query_terms, hnsw_results)
+        ]
+
+    def _retrieve_candidates(self, lsh_query: LSHQuery, query_terms: List[str],
+                             hnsw_results: List[Tuple[str, float]], allowed: Optional[np.ndarray] = None,
+                             bm25_statistics: Optional[BM25Statistics] = None,
+                             profile: Optional[SearchProfile] = None) -> List[str]:
+        """Union of LSH, HNSW and BM25 candidates, restricted to ``allowed`` rows"""
+        profile = profile or self.select_profile()
+        lsh_candidates = []
+        if profile.lsh_candidates > 0 and allowed is None:
+            lsh_candidates = self.lsh_index.query_candidates(lsh_query, num_candidates=profile.lsh_candidates)
+        elif profile.lsh_candidates > 0:
+            # Filter the whole bucket union before truncating, so matches are not crowded out
+            lsh_candidates = self.lsh_index.query_candidates(lsh_query, num_candidates=len(self.lsh_index))
+            rows, lsh_candidates = self.document_vectors.rows_for(lsh_candidates)
+            keep = (rows < len(allowed)) & allowed[np.minimum(rows, len(allowed) - 1)]
+            lsh_candidates = [doc_id for doc_id, kept in zip(lsh_candidates, keep.tolist()) if kept]
+            lsh_candidates = lsh_candidates[:profile.lsh_candidates]
+        hnsw_candidates = [doc_id for doc_id, _ in hnsw_results]
+        bm25_candidates = []
+        if profile.bm25_candidates > 0:
+            bm25_rows, _ = self.bm25_index.top_k(query_terms, k=profile.bm25_candidates, allowed=allowed,
+                                                 statistics=bm25_statistics)
+            bm25_candidates = [self.document_vectors.doc_id_at(row) for row in bm25_rows]
+
+        return list(set(lsh_candidates + hnsw_candidates + bm25_candidates))
+
+    def _bump_generation(self):
+        """Start a new index generation after a mutation, retiring cached results"""
+        self.index_generation += 1
+        self.query_cache.set_generation(self.index_generation)
+
+    def _record_search(self, response_time: float, cached: bool = False):
+        """Fold one search's response time into the running statistics"""
+        self.search_stats['total_searches'] += 1
+        if cached:
+            self.search_stats['cached_searches'] += 1
+        self.search_stats['avg_response_time'] = (
+            self.search_stats['avg_response_time'] * (self.search_stats['total_searches'] - 1) + response_time
+        ) / self.search_stats['total_searches']
+
+    async def _score_candidates(self, candidates: List[str], query: str, query_vector: np.ndarray, lsh_query: LSHQuery,
+                                bm25_statistics: Optional[BM25Statistics] = None) -> List[SearchResult]:
         """Score candidates using multiple similarity metrics"""
-        tasks = [self._score_single_candidate(candidate, query, query_vector, query_features) for candidate in candidates]
+        tasks = [self._score_single_candidate(candidate, query, query_vector, lsh_query, bm25_statistics)
+                 for candidate in candidates]
         results = await asyncio.gather(*tasks)
         return [r for r in results if r is not None]
 
-    async def _score_single_candidate(self, doc_id: str, query: str, query_vector: np.ndarray, query_features: List[str]) -> Optional[SearchResult]:
+    async def _score_single_candidate(self, doc_id: str, query: str, query_vector: np.ndarray, lsh_query: LSHQuery,
+                                      bm25_statistics: Optional[BM25Statistics] = None) -> Optional[SearchResult]:
         """Score a single candidate document"""
         if doc_id not in self.document_vectors:
             return None
 
         doc_vector = self.document_vectors[doc_id]
         vector_similarity = 1 - self._cosine_distance(query_vector, doc_vector)
-        jaccard_similarity = self.lsh_index.jaccard_similarity(doc_id, query_features)
-        bm25_score = self._compute_bm25_score(doc_id, query)
+        jaccard_similarity = self.lsh_index.jaccard_similarity(doc_id, lsh_query)
+        bm25_score = self._compute_bm25_score(doc_id, query, bm25_statistics)
 
-        combined_score = (0.4 * vector_similarity + 0.3 * jaccard_similarity + 0.3 * bm25_score)
+        combined_score = (VECTOR_WEIGHT * vector_similarity + JACCARD_WEIGHT * jaccard_similarity + BM25_WEIGHT * bm25_score)
 
         return SearchResult(
             doc_id=doc_id,
@@ -321,62 +639,127 @@ class UltraFastSearchEngine:
             metadata=self.document_metadata.get(doc_id, {})
         )
 
+    def _score_candidates_vectorized(self, candidates: List[str], query_terms: List[str], query_vector: np.ndarray,
+                                     lsh_query: LSHQuery, top_k: int) -> List[SearchResult]:
+        """Score all candidates in one vectorized pass and return the top_k, best first"""
+        rows, doc_ids = self.document_vectors.rows_for(candidates)
+        if not doc_ids:
+            return []
+
+        vector_similarities = self._vector_similarities(query_vector.reshape(1, -1), rows)[:, 0]
+        return self._rank_candidates(rows, doc_ids, vector_similarities, query_terms, lsh_query, query_vector, top_k)
+
+    def _score_batch_vectorized(self, candidate_lists: List[List[str]], query_terms: List[List[str]],
+                                query_vectors: np.ndarray, lsh_queries: List[LSHQuery], top_k: int,
+                                bm25_statistics: Optional[BM25Statistics] = None) -> List[List[SearchResult]]:
+        """Score the candidate sets of many queries with one similarity product over their union"""
+        union_rows, union_ids = self.document_vectors.rows_for(set().union(*candidate_lists))
+        if not union_ids:
+            return [[] for _ in candidate_lists]
+
+        similarity_matrix = self._vector_similarities(query_vectors, union_rows)
+        position = {doc_id: i for i, doc_id in enumerate(union_ids)}
+
+        results = []
+        for q, candidates in enumerate(candidate_lists):
+            positions = np.array([position[doc_id] for doc_id in candidates if doc_id in position], dtype=np.int64)
+            if len(positions) == 0:
+                results.append([])
+                continue
+            doc_ids = [union_ids[i] for i in positions]
+            results.append(self._rank_candidates(
+                union_rows[positions], doc_ids, similarity_matrix[positions, q],
+                query_terms[q], lsh_queries[q], query_vectors[q], top_k, bm25_statistics
+            ))
+        return results
+
+    def _vector_similarities(self, query_vectors: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        """
+        Cosine similarities shaped (rows, queries): exact from the vector
+        store, or ADC estimates from PQ codes in compressed mode.
+        """
+        if isinstance(self.hnsw_index, IVFPQIndex):
+            return self.hnsw_index.similarity_matrix(query_vectors, rows)
+        return self.document_vectors.cosine_similarity_matrix(query_vectors, rows).astype(np.float64)
+
+    def _rank_candidates(self, rows: np.ndarray, doc_ids: List[str], vector_similarities: np.ndarray,
+                         query_terms: List[str], lsh_query: LSHQuery, query_vector: np.ndarray,
+                         top_k: int, bm25_statistics: Optional[BM25Statistics] = None) -> List[SearchResult]:
+        """Combine the score components of one query's candidates and keep the top_k"""
+        jaccard_similarities = self.lsh_index.jaccard_many(self.lsh_index.rows_for(doc_ids), lsh_query.signature)
+        bm25_scores = self.bm25_index.score(query_terms, rows, statistics=bm25_statistics)
+        combined_scores = (VECTOR_WEIGHT * vector_similarities + JACCARD_WEIGHT * jaccard_similarities
+                           + BM25_WEIGHT * bm25_scores)
+
+        if isinstance(self.hnsw_index, IVFPQIndex) and self.exact_rerank > 0:
+            # Re-score the best approximate candidates with exact vectors and rank only those
+            keep = np.arange(len(combined_scores))
+            rerank_size = max(self.exact_rerank, top_k)
+            if rerank_size < len(keep):
+                keep = np.sort(np.argpartition(-combined_scores, rerank_size - 1)[:rerank_size])
+            exact = self.document_vectors.cosine_similarities(query_vector, rows[keep]).astype(np.float64)
+            combined_scores = combined_scores[keep] + VECTOR_WEIGHT * (exact - vector_similarities[keep])
+            vector_similarities, bm25_scores = exact, bm25_scores[keep]
+            doc_ids = [doc_ids[i] for i in keep]
+
+        if top_k < len(combined_scores):
+            top = np.argpartition(-combined_scores, top_k - 1)[:top_k]
+        else:
+            top = np.arange(len(combined_scores))
+        top = top[np.lexsort((top, -combined_scores[top]))]
+
+        return [
+            SearchResult(
+                doc_id=doc_ids[i],
+                similarity_score=float(vector_similarities[i]),
+                bm25_score=float(bm25_scores[i]),
+                combined_score=float(combined_scores[i]),
+                metadata=self.document_metadata.get(doc_ids[i], {})
+            )
+            for i in top
+        ]
+
     def _cosine_distance(self, v1: np.ndarray, v2: np.ndarray) -> float:
         """Calculate cosine distance between two vectors"""
         return 1.0 - np.dot(v1, v2) / (np.linalg.norm(v1) * np.linalg.norm(v2))
 
-    async def _build_lsh_index(self, documents: List[Dict], text_features_list: List[List[str]]):
+    def _encode_documents(self, texts: List[str], show_progress_bar: bool = False) -> np.ndarray:
+        """Document embeddings, encoding only texts that are not in the embedding cache"""
+        def encode(batch: List[str]) -> np.ndarray:
+            return self.embedding_model.encode(batch, show_progress_bar=show_progress_bar, convert_to_numpy=True)
+
+        if self.embedding_cache is None:
+            return encode(texts)
+        return self.embedding_cache.encode(texts, encode)
+
+    async def _build_lsh_index(self, doc_ids: List[str], text_features_list: List[List[str]]):
         """Build LSH index for text features"""
         logger.info("Building LSH index...")
-        for doc, features in zip(documents, text_features_list):
-            self.lsh_index.add_document(doc['id'], features)
+        self.lsh_index.add_documents(doc_ids, text_features_list)
 
     async def _build_hnsw_index(self, doc_ids: List[str], vectors: np.ndarray):
         """Build HNSW index for vector similarity search"""
         logger.info("Building HNSW index...")
-        self.hnsw_index.add_documents(vectors, doc_ids)
-
-    async def _build_pq_index(self, vectors: np.ndarray):
-        """Build product quantization index"""
-        logger.info("Building PQ index...")
-        self.pq_quantizer.train(vectors)
-        for doc_id, vector in self.document_vectors.items():
-            self.document_codes[doc_id] = self.pq_quantizer.encode(vector.reshape(1, -1))[0]
+        # Graph labels are vector store rows, so the other indexes can address the same entries
+        rows, _ = self.document_vectors.rows_for(doc_ids)
+        self.hnsw_index.add_documents(vectors, doc_ids, labels=rows)
 
     async def _build_bm25_index(self, documents: List[Dict]):
         """Build BM25 index for text retrieval"""
         logger.info("Building BM25 index...")
-        total_length = 0
+        tokens_by_row = {}
         for doc in documents:
-            doc_id = doc['id']
-            text = self._get_document_text(doc)
-            tokens = text.lower().split()
-            total_length += len(tokens)
-            tf = {token: tokens.count(token) for token in set(tokens)}
-            for token in set(tokens):
-                self.doc_frequencies[token] = self.doc_frequencies.get(token, 0) + 1
-            self.bm25_index[doc_id] = {'tf': tf, 'length': len(tokens)}
-        self.corpus_size = len(documents)
-        self.avg_doc_length = total_length / self.corpus_size if self.corpus_size > 0 else 0
-
-    def _compute_bm25_score(self, doc_id: str, query: str) -> float:
+            row = self.document_vectors.row_of(doc['id'])
+            if row is not None:
+                tokens_by_row[row] = self._get_document_text(doc).lower().split()
+        self.bm25_index.build(list(tokens_by_row), list(tokens_by_row.values()))
+
+    def _compute_bm25_score(self, doc_id: str, query: str, bm25_statistics: Optional[BM25Statistics] = None) -> float:
         """Compute BM25 relevance score"""
-        if doc_id not in self.bm25_index:
+        row = self.document_vectors.row_of(doc_id)
+        if row is None or row not in self.bm25_index:
             return 0.0
-        k1 = 1.5
-        b = 0.75
-        doc_data = self.bm25_index[doc_id]
-        doc_tf = doc_data['tf']
-        doc_length = doc_data['length']
-        query_terms = query.lower().split()
-        score = 0.0
-        for term in query_terms:
-            if term in doc_tf:
-                tf = doc_tf[term]
-                df = self.doc_frequencies.get(term, 0)
-                idf = np.log((self.corpus_size - df + 0.5) / (df + 0.5) + 1)
-                score += idf * (tf * (k1 + 1)) / (tf + k1 * (1 - b + b * doc_length / self.avg_doc_length))
-        return score
+        return float(self.bm25_index.score(query.lower().split(), np.array([row]), statistics=bm25_statistics)[0])
 
     def _extract_text_features(self, doc: Dict) -> List[str]:
         """Extract text features from document"""
@@ -391,7 +774,8 @@ class UltraFastSearchEngine:
         """Extract features from query"""
         return list(set(query.lower().split()))
 
-    def _get_document_text(self, doc: Dict) -> str:
+    @staticmethod
+    def _get_document_text(doc: Dict) -> str:
         """Get text content from document"""
         text_parts = []
         for field in ['name', 'title', 'description', 'content', 'experience', 'projects']:
@@ -401,85 +785,175 @@ class UltraFastSearchEngine:
         if 'technologies' in doc: text_parts.extend(doc['technologies'])
         return ' '.join(text_parts)
 
-    def _apply_filters(self, candidates: List[str], filters: Dict) -> List[str]:
-        """Apply filters to candidate documents"""
-        filtered = []
-        for doc_id in candidates:
-            if doc_id not in self.document_metadata: continue
-            doc_meta = self.document_metadata[doc_id]
-            if 'min_experience' in filters and doc_meta.get('experience_years', 0) < filters['min_experience']: continue
-            if 'seniority_levels' in filters and doc_meta.get('seniority_level') not in filters['seniority_levels']: continue
-            if 'required_skills' in filters and not set(s.lower() for s in filters['required_skills']).issubset(set(s.lower() for s in doc_meta.get('skills', []))): continue
-            filtered.append(doc_id)
-        return filtered
-
     def get_performance_stats(self) -> Dict:
         """Get performance statistics"""
-        cache_hit_rate = self.search_stats['cache_hits'] / self.search_stats['total_searches'] if self.search_stats['total_searches'] > 0 else 0
+        result_cache = self.query_cache.get_stats()
         return {
             'total_searches': self.search_stats['total_searches'],
+            'cached_searches': self.search_stats['cached_searches'],
             'avg_response_time_ms': self.search_stats['avg_response_time'],
-            'cache_hit_rate': cache_hit_rate,
+            'cache_hit_rate': result_cache['hit_rate'],
+            'result_cache': result_cache,
+            'index_generation': self.index_generation,
             'total_documents': len(self.document_metadata),
-            'index_size': len(self.hnsw_index) if hasattr(self.hnsw_index, '__len__') else 0
+            'index_size': len(self.hnsw_index) if hasattr(self.hnsw_index, '__len__') else 0,
+            'vector_index_mode': self.vector_index_mode,
+            'vector_storage': self.vector_storage,
+            'vector_bytes': self.document_vectors.nbytes,
+            'embedding_cache': self.embedding_cache.stats() if self.embedding_cache is not None else None,
+            'query_encoder': self.query_encoder.get_stats(),
+            'tombstones': self.hnsw_index.tombstone_count,
+            'compactions': self.search_stats['compactions']
         }
 
+    async def performance_stats(self) -> Dict:
+        """``get_performance_stats`` for async callers, matching the sharded engine"""
+        return self.get_performance_stats()
+
+    async def document_records(self, doc_ids: Optional[List[str]] = None) -> Dict[str, Dict]:
+        """Records of ``doc_ids`` (every document by default); unknown ids are skipped"""
+        if doc_ids is None:
+            return dict(self.document_metadata.items())
+        return {doc_id: self.document_metadata[doc_id] for doc_id in doc_ids if doc_id in self.document_metadata}
+
     # Additional methods for document management
-    async def add_document(self, doc_id: str, document: Dict):
-        """Add a single document to the index"""
+    async def add_document(self, doc_id: str, document: Dict, vector: Optional[np.ndarray] = None):
+        """Add a single document to the index, encoding it unless ``vector`` is given"""
         try:
-            text = self._get_document_text(document)
-            vector = self.embedding_model.encode([text], convert_to_numpy=True)[0]
-            
-            # Add to all indexes
-            text_features = self._extract_text_features(document)
-            self.document_text_features[doc_id] = text_features
-            self.document_vectors[doc_id] = vector
-            self.document_metadata[doc_id] = document
-            
-            # Add to LSH index
-            self.lsh_index.add_document(doc_id, text_features)
-            
-            # Add to HNSW index
-            self.hnsw_index.add_documents(vector.reshape(1, -1), [doc_id])
-            
-            # Update BM25 index
-            tokens = text.lower().split()
-            tf = {token: tokens.count(token) for token in set(tokens)}
-            for token in set(tokens):
-                self.doc_frequencies[token] = self.doc_frequencies.get(token, 0) + 1
-            self.bm25_index[doc_id] = {'tf': tf, 'length': len(tokens)}
-            
-            # Update corpus statistics
-            self.corpus_size = len(self.document_metadata)
-            total_length = sum(doc['length'] for doc in self.bm25_index.values())
-            self.avg_doc_length = total_length / self.corpus_size if self.corpus_size > 0 else 0
-            
+            if vector is None:
+                vector = self._encode_documents([self._get_document_text(document)])[0]
+            async with self._write_lock:
+                self._index_documents([doc_id], [document], np.asarray(vector).reshape(1, -1))
             logger.info(f"Document {doc_id} added successfully")
             
         except Exception as e:
             logger.error(f"Failed to add document {doc_id}: {str(e)}")
             raise
 
+    async def add_documents(self, documents: List[Dict], vectors: Optional[np.ndarray] = None) -> List[str]:
+        """
+        Add a batch of documents (each with an ``id``) in one pass: one
+        encoder call off the event loop, then bulk updates of every index.
+        A repeated id keeps its last version. Returns the ids added.
+        """
+        try:
+            positions = list({doc['id']: i for i, doc in enumerate(documents)}.values())
+            if len(positions) < len(documents):
+                documents = [documents[i] for i in positions]
+                vectors = vectors[positions] if vectors is not None else None
+            if not documents:
+                return []
+            if vectors is None:
+                texts = [self._get_document_text(doc) for doc in documents]
+                vectors = await asyncio.to_thread(self._encode_documents, texts)
+
+            doc_ids = [doc['id'] for doc in documents]
+            async with self._write_lock:
+                self._index_documents(doc_ids, documents, np.asarray(vectors))
+            logger.info(f"Added a batch of {len(doc_ids)} documents")
+            return doc_ids
+
+        except Exception as e:
+            logger.error(f"Failed to add a batch of {len(documents)} documents: {str(e)}")
+            raise
+
+    def _index_documents(self, doc_ids: List[str], documents: List[Dict], vectors: np.ndarray):
+        """Apply distinct documents and their vectors to every index"""
+        # Re-adding an id replaces the previous version
+        for doc_id in doc_ids:
+            previous_row = self.document_vectors.row_of(doc_id)
+            if previous_row is not None:
+                self.bm25_index.remove_document(previous_row)
+                self.metadata_index.remove_document(previous_row)
+
+        feature_lists = [self._extract_text_features(document) for document in documents]
+        rows = self.document_vectors.add_batch(doc_ids, vectors)
+        for doc_id, document, text_features in zip(doc_ids, documents, feature_lists):
+            self.document_text_features[doc_id] = text_features
+            self.document_metadata[doc_id] = document
+
+        self.lsh_index.add_documents(doc_ids, feature_lists)
+        # HNSW labels are the new rows; previous versions are tombstoned
+        self.hnsw_index.add_documents(vectors, doc_ids, labels=rows)
+        # BM25 corpus statistics are maintained incrementally
+        self.bm25_index.add_documents(rows.tolist(), [self._get_document_text(document).lower().split()
+                                                      for document in documents])
+        self.metadata_index.add_documents(rows.tolist(), documents)
+        self._bump_generation()
+        self._schedule_compaction()
+
     async def remove_document(self, doc_id: str):
         """Remove a document from the index"""
         try:
-            if doc_id in self.document_metadata:
-                del self.document_metadata[doc_id]
-            if doc_id in self.document_vectors:
-                del self.document_vectors[doc_id]
-            if doc_id in self.document_text_features:
-                del self.document_text_features[doc_id]
-            if doc_id in self.document_codes:
-                del self.document_codes[doc_id]
-            if doc_id in self.bm25_index:
-                del self.bm25_index[doc_id]
-                
-            # Note: HNSW and LSH indexes don't support efficient removal
-            # In production, you'd need to rebuild these indexes periodically
+            async with self._write_lock:
+                if doc_id in self.document_metadata:
+                    del self.document_metadata[doc_id]
+                if doc_id in self.document_vectors:
+                    row = self.document_vectors.row_of(doc_id)
+                    self.bm25_index.remove_document(row)
+                    self.metadata_index.remove_document(row)
+                    del self.document_vectors[doc_id]
+                if doc_id in self.document_text_features:
+                    del self.document_text_features[doc_id]
+                self.lsh_index.remove_document(doc_id)
+                self.hnsw_index.remove_document(doc_id)
+                self._bump_generation()
+                self._schedule_compaction()
             
             logger.info(f"Document {doc_id} removed successfully")
             
         except Exception as e:
             logger.error(f"Failed to remove document {doc_id}: {str(e)}")
-            raise
\ No newline at end of file
+            raise
+
+    def _schedule_compaction(self):
+        """Start a background compaction once enough of the graph or the vector store is dead"""
+        store = self.document_vectors
+        dead_ratio = store.dead_rows / store.num_rows if store.num_rows else 0.0
+        if max(self.hnsw_index.tombstone_ratio, dead_ratio) < self.compaction_threshold:
+            return
+        if self._compaction_task is not None and not self._compaction_task.done():
+            return
+        self._compaction_task = asyncio.create_task(self.compact_indexes())
+
+    async def compact_indexes(self):
+        """
+        Rebuild the HNSW graph without tombstoned entries, purge dead BM25
+        postings and metadata rows, and release the vector store rows no
+        index refers to any more, so new documents fill them instead of
+        growing the matrix. The graph is built in a worker thread while
+        searches keep using the current one; mutations made meanwhile are
+        carried over. Installing it waits for the write lock.
+        """
+        hnsw_index = self.hnsw_index
+        tombstones = hnsw_index.tombstone_count
+        if tombstones == 0 and self.document_vectors.dead_rows == 0:
+            return
+
+        start_time = time.time()
+        referenced = None
+        if tombstones:
+            labels, vectors = hnsw_index.prepare_compaction()
+            graph = await asyncio.to_thread(hnsw_index.build_graph, labels, vectors)
+
+        async with self._write_lock:
+            if hnsw_index is not self.hnsw_index:
+                # The indexes were rebuilt or reloaded while compacting
+                return
+            if tombstones:
+                hnsw_index.install_graph(graph, labels)
+                # Rows removed while the graph was built are still tombstones in it
+                referenced = labels
+
+            self.bm25_index.compact()
+            self.lsh_index.compact()
+            self.metadata_index.compact()
+            released_rows = self.document_vectors.release_dead_rows(referenced)
+            self.search_stats['compactions'] += 1
+
+        logger.info("Index compaction completed", extra={
+            'tombstones_removed': tombstones - hnsw_index.tombstone_count,
+            'rows_released': released_rows,
+            'live_documents': len(hnsw_index),
+            'compaction_time_seconds': time.time() - start_time
+        })
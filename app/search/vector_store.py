@@ -0,0 +1,342 @@
+"""
+Contiguous document vector storage for the native search engine
+"""
+
+import os
+import tempfile
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+# Rows copied per step when a file-backed matrix grows
+_COPY_CHUNK_ROWS = 65536
+
+# Row formats: full precision, half precision, or per-dimension int8 scalar quantization
+STORAGE_DTYPES = {'float32': np.float32, 'float16': np.float16, 'int8': np.int8}
+
+# int8 ranges are fitted on the first batch when it has at least this many rows;
+# smaller batches get [-1, 1], which holds every component of a unit vector
+MIN_FIT_ROWS = 256
+
+# Fitted int8 ranges are widened by this fraction on each side for later outliers
+FIT_MARGIN = 0.05
+
+
+class VectorStore:
+    """
+    Keeps every document embedding in one contiguous float32 matrix with an
+    id -> row map, so candidate sets can be scored with a single
+    matrix-vector product instead of one Python call per document.
+
+    Removing a document frees its id but leaves the row dead in place, and
+    storing a new vector under an existing id moves it to another row. Row
+    numbers handed out to other indexes therefore keep referring to the same
+    content until the owner of the store declares them unreferenced with
+    ``release_dead_rows`` (the engine does so after compacting its indexes);
+    only then does ``add_batch`` fill them again before appending. The
+    class behaves like the ``Dict[str, np.ndarray]`` it replaces (``in``,
+    ``[]``, ``del``, ``items()``).
+
+    With ``storage_dir`` the matrix lives in an unlinked temporary file under
+    that directory and is memory-mapped, so full-precision vectors are paged
+    in on demand rather than held in anonymous memory. Compressed search
+    uses this for exact re-ranking.
+
+    ``storage`` selects the row format: ``float32``, ``float16`` (half the
+    bytes) or ``int8`` (a quarter; each dimension scaled into [-127, 127]
+    over a range fitted on the first batch). Quantized stores keep rows
+    normalized to unit length, which cosine scoring does not distinguish,
+    and return them decoded to float32. Similarities are computed from the
+    stored rows without materializing a float32 copy of the matrix.
+    """
+
+    def __init__(self, dimension: int, initial_capacity: int = 1024, storage_dir: Optional[str] = None,
+                 storage: str = 'float32'):
+        if storage not in STORAGE_DTYPES:
+            raise ValueError(f"Unknown vector storage {storage!r}, expected one of {sorted(STORAGE_DTYPES)}")
+        self.dimension = dimension
+        self.storage_dir = storage_dir
+        self.storage = storage
+        # int8 decoding: vector = offset + scale * code
+        self._scale: Optional[np.ndarray] = None
+        self._offset: Optional[np.ndarray] = None
+        self._matrix = self._allocate(max(initial_capacity, 1))
+        self._inv_norms = np.zeros(max(initial_capacity, 1), dtype=np.float32)
+        self._size = 0
+        self._id_to_row: Dict[str, int] = {}
+        self._row_ids: List[Optional[str]] = []
+        # Dead rows no other index refers to, filled by add_batch before appending
+        self._free_rows: List[int] = []
+
+    # Mapping interface -------------------------------------------------
+
+    def __len__(self) -> int:
+        return len(self._id_to_row)
+
+    def __contains__(self, doc_id: object) -> bool:
+        return doc_id in self._id_to_row
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self._id_to_row))
+
+    def __getitem__(self, doc_id: str) -> np.ndarray:
+        return self._decode(self._matrix[self._id_to_row[doc_id]])
+
+    def __setitem__(self, doc_id: str, vector: np.ndarray):
+        self.add_batch([doc_id], np.asarray(vector, dtype=np.float32).reshape(1, -1))
+
+    def __delitem__(self, doc_id: str):
+        row = self._id_to_row.pop(doc_id)
+        self._row_ids[row] = None
+        self._inv_norms[row] = 0.0
+
+    def keys(self) -> List[str]:
+        return list(self._id_to_row)
+
+    def values(self) -> List[np.ndarray]:
+        return [self[doc_id] for doc_id in self._id_to_row]
+
+    def items(self) -> List[Tuple[str, np.ndarray]]:
+        return [(doc_id, self[doc_id]) for doc_id in self._id_to_row]
+
+    def get(self, doc_id: str, default=None):
+        row = self._id_to_row.get(doc_id)
+        return default if row is None else self._decode(self._matrix[row])
+
+    # Row-level API -----------------------------------------------------
+
+    @property
+    def num_rows(self) -> int:
+        """Number of allocated rows, including tombstoned ones."""
+        return self._size
+
+    @property
+    def dead_rows(self) -> int:
+        """Rows of removed or replaced vectors that have not been released yet."""
+        return self._size - len(self._id_to_row) - len(self._free_rows)
+
+    @property
+    def matrix(self) -> np.ndarray:
+        """View of the allocated rows as stored (tombstoned rows included); codes when quantized."""
+        return self._matrix[:self._size]
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by the allocated rows, their norms and the quantization ranges."""
+        ranges = self._scale.nbytes + self._offset.nbytes if self._scale is not None else 0
+        return int(self.matrix.nbytes + self._inv_norms[:self._size].nbytes + ranges)
+
+    def vectors(self, rows: np.ndarray) -> np.ndarray:
+        """Rows decoded to float32, shaped (len(rows), dimension)."""
+        return self._decode(self._matrix[rows])
+
+    def add_batch(self, doc_ids: List[str], vectors: np.ndarray) -> np.ndarray:
+        """Store vectors in released or fresh rows, returning the row assigned to each id."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim != 2 or vectors.shape[1] != self.dimension:
+            raise ValueError(f"Expected vectors of shape (n, {self.dimension}), got {vectors.shape}")
+        if len(doc_ids) != vectors.shape[0]:
+            raise ValueError("doc_ids and vectors must have the same length")
+
+        reused = min(len(self._free_rows), len(doc_ids))
+        appended = len(doc_ids) - reused
+        self._ensure_capacity(self._size + appended)
+        rows = np.concatenate((np.asarray(self._free_rows[len(self._free_rows) - reused:], dtype=np.int64),
+                               np.arange(self._size, self._size + appended, dtype=np.int64)))
+        del self._free_rows[len(self._free_rows) - reused:]
+        self._row_ids.extend([None] * appended)
+        self._size += appended
+        for doc_id, row in zip(doc_ids, rows.tolist()):
+            if doc_id in self._id_to_row:
+                del self[doc_id]
+            self._id_to_row[doc_id] = row
+            self._row_ids[row] = doc_id
+
+        self._store_rows(rows, vectors)
+        return rows
+
+    def fit(self, vectors: np.ndarray):
+        """
+        Fit the int8 range of each dimension to ``vectors``; values outside
+        it are clipped. Called with the first batch unless done explicitly.
+        """
+        if self.storage != 'int8':
+            return
+        vectors = _unit_rows(np.asarray(vectors, dtype=np.float32))
+        if len(vectors) >= MIN_FIT_ROWS:
+            low, high = vectors.min(axis=0), vectors.max(axis=0)
+            margin = (high - low) * FIT_MARGIN
+            low, high = np.maximum(low - margin, -1.0), np.minimum(high + margin, 1.0)
+        else:
+            low, high = np.full(self.dimension, -1.0), np.ones(self.dimension)
+        self._offset = ((high + low) / 2).astype(np.float32)
+        self._scale = np.maximum((high - low) / 254, 1e-8).astype(np.float32)
+
+    def release_dead_rows(self, referenced: Optional[np.ndarray] = None) -> int:
+        """
+        Make every dead row except those in ``referenced`` (rows another
+        index still holds) available to ``add_batch`` again. Returns the
+        number of rows released.
+        """
+        dead = np.ones(self._size, dtype=bool)
+        dead[np.fromiter(self._id_to_row.values(), dtype=np.int64, count=len(self._id_to_row))] = False
+        dead[np.asarray(self._free_rows, dtype=np.int64)] = False
+        if referenced is not None and len(referenced):
+            referenced = np.asarray(referenced, dtype=np.int64)
+            dead[referenced[referenced < self._size]] = False
+        released = np.flatnonzero(dead)
+        self._free_rows.extend(released.tolist())
+        return len(released)
+
+    def row_of(self, doc_id: str) -> Optional[int]:
+        return self._id_to_row.get(doc_id)
+
+    def doc_id_at(self, row: int) -> Optional[str]:
+        return self._row_ids[row]
+
+    def rows_for(self, doc_ids: Iterable[str]) -> Tuple[np.ndarray, List[str]]:
+        """Resolve ids to rows, dropping ids that are not stored."""
+        found_ids = []
+        rows = []
+        for doc_id in doc_ids:
+            row = self._id_to_row.get(doc_id)
+            if row is not None:
+                found_ids.append(doc_id)
+                rows.append(row)
+        return np.asarray(rows, dtype=np.int64), found_ids
+
+    def cosine_similarities(self, query_vector: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        """Cosine similarity between the query and each row, in one product."""
+        query = np.asarray(query_vector, dtype=np.float32).ravel()
+        query_norm = np.linalg.norm(query)
+        if query_norm == 0 or len(rows) == 0:
+            return np.zeros(len(rows), dtype=np.float32)
+        return self._dot(rows, query.reshape(-1, 1))[:, 0] * self._inv_norms[rows] / query_norm
+
+    def cosine_similarity_matrix(self, query_vectors: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        """Cosine similarities of many queries against the rows, shaped (rows, queries)."""
+        queries = np.asarray(query_vectors, dtype=np.float32)
+        query_norms = np.linalg.norm(queries, axis=1)
+        inv_query_norms = np.divide(1.0, query_norms, out=np.zeros_like(query_norms), where=query_norms > 0)
+        return self._dot(rows, queries.T) * self._inv_norms[rows, None] * inv_query_norms[None, :]
+
+    def to_snapshot(self) -> Tuple[Dict[str, np.ndarray], Dict[str, List[str]], Dict]:
+        """Arrays, string columns and metadata for an index snapshot."""
+        live = np.zeros(self._size, dtype=bool)
+        live[list(self._id_to_row.values())] = True
+        arrays = {'matrix': self.matrix, 'inv_norms': self._inv_norms[:self._size], 'live': live,
+                  'free_rows': np.asarray(self._free_rows, dtype=np.int64)}
+        if self._scale is not None:
+            arrays.update(scale=self._scale, offset=self._offset)
+        strings = {'row_ids': [doc_id or '' for doc_id in self._row_ids]}
+        return arrays, strings, {'dimension': self.dimension, 'storage': self.storage}
+
+    @classmethod
+    def from_snapshot(cls, arrays: Dict[str, np.ndarray], strings: Dict, meta: Dict,
+                      storage_dir: Optional[str] = None, storage: Optional[str] = None) -> "VectorStore":
+        """
+        Restore a store on top of (possibly memory-mapped) snapshot arrays.
+        With ``storage`` other than the snapshot's, rows are re-encoded.
+        """
+        store = cls(meta['dimension'], initial_capacity=1, storage_dir=storage_dir,
+                    storage=meta.get('storage', 'float32'))
+        store._matrix = arrays['matrix']
+        store._inv_norms = arrays['inv_norms']
+        if 'scale' in arrays:
+            store._scale, store._offset = np.asarray(arrays['scale']), np.asarray(arrays['offset'])
+        store._size = len(store._matrix)
+        live = arrays['live']
+        row_ids = strings['row_ids']
+        store._row_ids = [row_ids[row] if live[row] else None for row in range(store._size)]
+        store._id_to_row = {doc_id: row for row, doc_id in enumerate(store._row_ids) if doc_id is not None}
+        if 'free_rows' in arrays:
+            store._free_rows = np.asarray(arrays['free_rows'], dtype=np.int64).tolist()
+        if storage is not None and storage != store.storage:
+            return store.converted(storage, storage_dir)
+        return store
+
+    def converted(self, storage: str, storage_dir: Optional[str] = None) -> "VectorStore":
+        """Copy of this store with rows re-encoded in another format, under the same row numbers."""
+        store = VectorStore(self.dimension, initial_capacity=self._size, storage_dir=storage_dir, storage=storage)
+        live_rows = np.fromiter(self._id_to_row.values(), dtype=np.int64, count=len(self._id_to_row))
+        if len(live_rows):
+            sample = np.sort(np.random.default_rng(42).choice(live_rows, min(len(live_rows), 65536), replace=False))
+            store.fit(self.vectors(sample))
+        store._size = self._size
+        store._row_ids = list(self._row_ids)
+        store._id_to_row = dict(self._id_to_row)
+        store._free_rows = list(self._free_rows)
+        for start in range(0, self._size, _COPY_CHUNK_ROWS):
+            rows = np.arange(start, min(start + _COPY_CHUNK_ROWS, self._size), dtype=np.int64)
+            store._store_rows(rows, self.vectors(rows))
+        dead = np.array([row for row, doc_id in enumerate(self._row_ids) if doc_id is None], dtype=np.int64)
+        store._inv_norms[dead] = 0.0
+        return store
+
+    @classmethod
+    def from_dict(cls, vectors: Dict[str, np.ndarray], dimension: int) -> "VectorStore":
+        """Build a store from the legacy ``{doc_id: vector}`` layout."""
+        store = cls(dimension, initial_capacity=max(len(vectors), 1))
+        if vectors:
+            store.add_batch(list(vectors.keys()), np.stack(list(vectors.values())))
+        return store
+
+    def _store_rows(self, rows: np.ndarray, vectors: np.ndarray):
+        """Encode vectors into ``rows`` and record the inverse norms of what is stored."""
+        if self.storage == 'float32':
+            self._matrix[rows] = vectors
+        else:
+            vectors = _unit_rows(vectors)
+            if self.storage == 'int8':
+                if self._scale is None:
+                    self.fit(vectors)
+                codes = np.rint((vectors - self._offset) / self._scale)
+                self._matrix[rows] = np.clip(codes, -127, 127).astype(np.int8)
+            else:
+                self._matrix[rows] = vectors.astype(np.float16)
+            # Norms of the decoded rows, so similarities are cosines of what is scored
+            vectors = self._decode(self._matrix[rows])
+        norms = np.linalg.norm(vectors, axis=1)
+        self._inv_norms[rows] = np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 0)
+
+    def _decode(self, stored: np.ndarray) -> np.ndarray:
+        if self.storage == 'int8':
+            return stored.astype(np.float32) * self._scale + self._offset
+        return stored.astype(np.float32, copy=False)
+
+    def _dot(self, rows: np.ndarray, queries: np.ndarray) -> np.ndarray:
+        """Products of the stored rows with query columns, decoding int8 rows through the query side."""
+        stored = self._matrix[rows]
+        if self.storage == 'int8':
+            return stored.astype(np.float32) @ (queries * self._scale[:, None]) + self._offset @ queries
+        return stored.astype(np.float32, copy=False) @ queries
+
+    def _allocate(self, capacity: int) -> np.ndarray:
+        dtype = np.dtype(STORAGE_DTYPES[self.storage])
+        if self.storage_dir is None:
+            return np.zeros((capacity, self.dimension), dtype=dtype)
+        os.makedirs(self.storage_dir, exist_ok=True)
+        # The mapping keeps the unlinked file alive; it is reclaimed with the array
+        with tempfile.TemporaryFile(dir=self.storage_dir, prefix="vectors-") as handle:
+            handle.truncate(capacity * self.dimension * dtype.itemsize)
+            return np.memmap(handle, dtype=dtype, mode='r+', shape=(capacity, self.dimension))
+
+    def _ensure_capacity(self, required: int):
+        capacity = self._matrix.shape[0]
+        if required <= capacity:
+            return
+        new_capacity = max(required, capacity * 2)
+        matrix = self._allocate(new_capacity)
+        for start in range(0, self._size, _COPY_CHUNK_ROWS):
+            end = min(start + _COPY_CHUNK_ROWS, self._size)
+            matrix[start:end] = self._matrix[start:end]
+        inv_norms = np.zeros(new_capacity, dtype=np.float32)
+        inv_norms[:self._size] = self._inv_norms[:self._size]
+        self._matrix = matrix
+        self._inv_norms = inv_norms
+
+
+def _unit_rows(vectors: np.ndarray) -> np.ndarray:
+    """Rows scaled to unit length; zero rows stay zero"""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
@@ -0,0 +1,108 @@
+# tests/test_bm25_index.py
+"""
+Test the CSR inverted BM25 index against a brute-force reference
+"""
+
+import random
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from app.math.bm25_index import BM25Index, BM25Statistics
+
+VOCABULARY = [f"term{i}" for i in range(40)]
+
+
+def reference_scores(documents, query_terms, k1=1.5, b=0.75):
+    """Straightforward per-document BM25 as the engine used to compute it"""
+    corpus_size = len(documents)
+    avg_length = sum(len(tokens) for tokens in documents.values()) / corpus_size
+    df = Counter(term for tokens in documents.values() for term in set(tokens))
+    scores = {}
+    for row, tokens in documents.items():
+        tf = Counter(tokens)
+        score = 0.0
+        for term in query_terms:
+            if term in tf:
+                idf = np.log((corpus_size - df[term] + 0.5) / (df[term] + 0.5) + 1)
+                score += idf * (tf[term] * (k1 + 1)) / (tf[term] + k1 * (1 - b + b * len(tokens) / avg_length))
+        scores[row] = score
+    return scores
+
+
+@pytest.fixture
+def corpus():
+    rng = random.Random(7)
+    # Skewed term distribution so some postings are long and some short
+    return {row: [VOCABULARY[min(int(rng.expovariate(0.15)), 39)] for _ in range(rng.randint(3, 30))]
+            for row in range(300)}
+
+
+def test_score_matches_reference(corpus):
+    """Rescoring candidate rows reproduces the classic BM25 formula"""
+    index = BM25Index()
+    index.build(list(corpus), list(corpus.values()))
+    query = ["term0", "term5", "term5", "term30"]
+    rows = np.arange(0, 300, 7)
+
+    expected = reference_scores(corpus, query)
+    np.testing.assert_allclose(index.score(query, rows), [expected[r] for r in rows], rtol=1e-9)
+
+
+def test_top_k_matches_exhaustive_ranking(corpus):
+    """MaxScore pruning returns the exact top k"""
+    index = BM25Index()
+    # Half built in bulk, half added incrementally to exercise pending postings
+    rows = list(corpus)
+    index.build(rows[:150], [corpus[r] for r in rows[:150]])
+    for row in rows[150:]:
+        index.add_document(row, corpus[row])
+
+    for query in (["term1", "term12"], ["term0", "term2", "term25", "term39"], ["term33"]):
+        expected = reference_scores(corpus, query)
+        top_rows, top_scores = index.top_k(query, k=10)
+        best = sorted((s for s in expected.values() if s > 0), reverse=True)[:10]
+        np.testing.assert_allclose(top_scores, best, rtol=1e-9)
+        for row, score in zip(top_rows, top_scores):
+            assert expected[row] == pytest.approx(score)
+
+
+def test_removed_rows_are_excluded_and_compacted(corpus):
+    """Removed rows drop out of top-k results and postings after compact()"""
+    index = BM25Index()
+    index.build(list(corpus), list(corpus.values()))
+    top_rows, _ = index.top_k(["term3"], k=5)
+
+    index.remove_document(int(top_rows[0]))
+    remaining_rows, _ = index.top_k(["term3"], k=5)
+    assert top_rows[0] not in remaining_rows
+    assert len(index) == len(corpus) - 1
+
+    index.compact()
+    assert top_rows[0] not in index.postings_rows
+    assert index.doc_frequencies[index.vocabulary["term3"]] == sum(
+        1 for row, tokens in corpus.items() if row != top_rows[0] and "term3" in tokens)
+
+
+def test_partitions_score_with_merged_statistics(corpus):
+    """Partitions given merged corpus statistics score like one index over everything"""
+    partitions = [BM25Index(), BM25Index()]
+    for i, index in enumerate(partitions):
+        rows = [row for row in corpus if row % 2 == i]
+        index.build(rows, [corpus[row] for row in rows])
+    query = ["term0", "term4", "term4", "term21"]
+
+    statistics = BM25Statistics()
+    for index in partitions:
+        statistics = statistics.merge(index.statistics(query))
+    assert statistics.corpus_size == len(corpus)
+
+    expected = reference_scores(corpus, query)
+    for i, index in enumerate(partitions):
+        rows = np.array([row for row in corpus if row % 2 == i])
+        np.testing.assert_allclose(index.score(query, rows, statistics=statistics),
+                                   [expected[r] for r in rows], rtol=1e-9)
+        top_rows, top_scores = index.top_k(query, k=5, statistics=statistics)
+        best = sorted((expected[r] for r in rows if expected[r] > 0), reverse=True)[:5]
+        np.testing.assert_allclose(top_scores, best, rtol=1e-9)
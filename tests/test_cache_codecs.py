@@ -0,0 +1,81 @@
+# tests/test_cache_codecs.py
+"""
+Test the cache value codecs
+"""
+
+import json
+from datetime import datetime
+
+import fakeredis
+import pytest
+from pydantic import BaseModel
+
+from app.cache.codecs import ValueCodec
+from app.cache.redis_client import CacheManager
+
+HISTORY = [{"user_message": f"question {i}", "assistant_response": "answer " * 40} for i in range(50)]
+
+
+@pytest.mark.parametrize("serializer", ["msgpack", "orjson", "json"])
+@pytest.mark.parametrize("compression", ["zstd", "zlib", "none"])
+def test_round_trip_and_compression_threshold(serializer, compression):
+    codec = ValueCodec(serializer=serializer, compression=compression, compression_threshold=512)
+
+    small = codec.encode({"route": "chat"})
+    large = codec.encode(HISTORY)
+
+    assert codec.decode(small) == {"route": "chat"} and codec.decode(large) == HISTORY
+    assert small[0] & 0b11 == 0
+    if compression != "none":
+        assert len(large) < len(json.dumps(HISTORY)) / 4
+    formats = codec.get_stats()["formats"]
+    assert sum(stats["encoded"] for stats in formats.values()) == 2
+    assert sum(stats["decoded"] for stats in formats.values()) == 2
+
+
+def test_legacy_json_and_every_format_stay_readable():
+    reader = ValueCodec(serializer="json", compression="none")
+    for data in (json.dumps(HISTORY), json.dumps(HISTORY).encode(), ValueCodec().encode(HISTORY)):
+        assert reader.decode(data) == HISTORY
+    assert set(reader.get_stats()["formats"]) == {"json-legacy", "msgpack+zstd"}
+
+    with pytest.raises(ValueError):
+        reader.decode(b"\xff\x00")
+
+
+def test_types_json_rejects_are_encoded_or_fail_loudly():
+    class Turn(BaseModel):
+        text: str
+
+    codec = ValueCodec()
+    assert codec.decode(codec.encode({"turn": Turn(text="hi"), "tags": {"a"}})) == {
+        "turn": {"text": "hi"}, "tags": ["a"],
+    }
+    assert codec.decode(codec.encode(datetime(2024, 1, 2, 3, 4, 5))) == "2024-01-02T03:04:05"
+    with pytest.raises(TypeError):
+        codec.encode(object())
+
+
+@pytest.mark.asyncio
+async def test_cache_manager_stores_compressed_binary_and_reports_codecs():
+    server = fakeredis.FakeServer()
+    manager = CacheManager("redis://fake", near_cache=False,
+                           codec=ValueCodec(compression_threshold=256))
+    raw = fakeredis.FakeAsyncRedis(server=server)
+    assert await manager.initialize(client=fakeredis.FakeAsyncRedis(server=server))
+    try:
+        assert await manager.set("history", HISTORY)
+        stored = await raw.get("history")
+        assert len(stored) < len(json.dumps(HISTORY)) / 4
+        assert await manager.get("history") == HISTORY
+
+        await raw.set("legacy", json.dumps({"old": True}))
+        assert await manager.get("legacy") == {"old": True}
+        assert await manager.set("bad", object()) is False
+
+        codecs = (await manager.get_stats())["codecs"]
+        assert codecs["serializer"] == "msgpack" and codecs["compression"] == "zstd"
+        assert codecs["formats"]["msgpack+zstd"]["compression_ratio"] > 4
+        assert codecs["formats"]["json-legacy"]["decoded"] == 1
+    finally:
+        await manager.cleanup()
@@ -0,0 +1,73 @@
+# tests/test_conversation_store.py
+"""
+Test the append-only conversation history store
+"""
+
+import asyncio
+import json
+
+import fakeredis
+import pytest
+
+from app.cache.conversation_store import ConversationStore
+from app.cache.redis_client import CacheManager
+
+
+async def make_manager(server):
+    manager = CacheManager("redis://fake", near_cache=False)
+    assert await manager.initialize(client=fakeredis.FakeAsyncRedis(server=server))
+    return manager
+
+
+@pytest.mark.asyncio
+async def test_concurrent_turns_are_all_kept_and_capped():
+    """Turns appended at once by several workers are not lost; the list keeps the newest"""
+    server = fakeredis.FakeServer()
+    workers = [await make_manager(server) for _ in range(3)]
+    raw = fakeredis.FakeAsyncRedis(server=server)
+    try:
+        stores = [ConversationStore(worker, max_turns=20, ttl=120) for worker in workers]
+        await asyncio.gather(*(
+            stores[i % 3].append("s1", {"turn": i}) for i in range(12)
+        ))
+        assert sorted(turn["turn"] for turn in await stores[0].recent("s1")) == list(range(12))
+
+        for i in range(12, 30):
+            await stores[0].append("s1", {"turn": i})
+        assert [turn["turn"] for turn in await stores[1].recent("s1")] == list(range(10, 30))
+        assert [turn["turn"] for turn in await stores[2].recent("s1", limit=3)] == [27, 28, 29]
+        assert await raw.llen(ConversationStore.key("s1")) == 20
+        assert 119 <= await raw.ttl(ConversationStore.key("s1")) <= 120
+    finally:
+        for worker in workers:
+            await worker.cleanup()
+
+
+@pytest.mark.asyncio
+async def test_legacy_history_blob_is_read_until_the_list_exists():
+    server = fakeredis.FakeServer()
+    manager = await make_manager(server)
+    raw = fakeredis.FakeAsyncRedis(server=server)
+    try:
+        legacy = [{"turn": i} for i in range(5)]
+        await raw.set("conversation_history:s1", json.dumps(legacy))
+        store = ConversationStore(manager)
+
+        assert await store.recent("s1", limit=2) == legacy[-2:]
+        await store.append("s1", {"turn": "new"})
+        assert await store.recent("s1") == [{"turn": "new"}]
+    finally:
+        await manager.cleanup()
+
+
+@pytest.mark.asyncio
+async def test_local_fallback_and_managers_without_list_operations(mock_cache_manager):
+    local = CacheManager("redis://fake")
+    local._setup_fallback()
+    for manager in (local, mock_cache_manager):
+        store = ConversationStore(manager, max_turns=3)
+        for i in range(5):
+            await store.append("s1", {"turn": i})
+        assert await store.recent("s1") == [{"turn": 2}, {"turn": 3}, {"turn": 4}]
+        assert await store.recent("s1", limit=1) == [{"turn": 4}]
+        assert await store.recent("unknown") == []
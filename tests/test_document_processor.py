@@ -0,0 +1,147 @@
+# tests/test_document_processor.py
+"""
+Test the streaming extraction and chunking pipeline of DocumentProcessor
+"""
+
+import json
+import os
+import random
+import time
+import tracemalloc
+
+import pytest
+
+from app.document_processing.chunker import iter_chunks
+from app.document_processing.processor import DocumentProcessor
+from app.document_processing.spool import SpooledUpload, UploadMetrics, UploadTooLarge
+
+
+def reference_chunks(content, chunk_size, chunk_overlap):
+    """Whole-text chunking: fixed windows of words advancing by chunk_size - overlap"""
+    words = content.split()
+    step = chunk_size - chunk_overlap
+    chunks, start = [], 0
+    while True:
+        chunks.append(" ".join(words[start:start + chunk_size]))
+        if start + chunk_size >= len(words):
+            return [chunk for chunk in chunks if chunk]
+        start += step
+
+
+@pytest.mark.parametrize("chunk_size,chunk_overlap", [(7, 2), (10, 0), (1, 0), (50, 49)])
+def test_streaming_chunker_matches_whole_text(chunk_size, chunk_overlap):
+    """Chunks do not depend on how the text is split into pieces"""
+    rng = random.Random(5)
+    content = " ".join(f"w{i}" + "\n" * (i % 9 == 0) for i in range(503))
+    cuts = sorted(rng.sample(range(1, len(content)), 60))
+    pieces = [content[a:b] for a, b in zip([0] + cuts, cuts + [len(content)])]
+
+    streamed = [text for text, _ in iter_chunks(pieces, chunk_size, chunk_overlap)]
+    assert streamed == reference_chunks(content, chunk_size, chunk_overlap)
+    assert [text for text, _ in iter_chunks([content], chunk_size, chunk_overlap)] == streamed
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("max_workers", [0, 1])
+async def test_formats_extract_in_workers(tmp_path, max_workers):
+    """HTML and JSON are extracted off the event loop with the same text as before"""
+    processor = DocumentProcessor(chunk_size=5, chunk_overlap=1, max_workers=max_workers)
+    html = tmp_path / "resume.html"
+    html.write_text("<html><body><h1>Jane Doe</h1><p>Senior <b>Python</b> engineer</p></body></html>")
+    data = tmp_path / "items.json"
+    data.write_text(json.dumps([{"skill": "python"}, {"skill": "rust"}]))
+    try:
+        html_doc = await processor.process_file(str(html))
+        json_doc = await processor.process_file(str(data))
+    finally:
+        processor.close()
+
+    assert html_doc.content == "Jane Doe Senior  Python  engineer"
+    assert [chunk.content for chunk in html_doc.chunks] == ["Jane Doe Senior Python engineer"]
+    assert json_doc.content == json.dumps({"skill": "python"}, indent=2) + "\n" + json.dumps({"skill": "rust"}, indent=2)
+    assert json_doc.metadata["file_size"] == data.stat().st_size
+
+
+@pytest.mark.asyncio
+async def test_stream_file_memory_does_not_grow_with_file_size(tmp_path):
+    """Peak allocations while streaming chunks stay flat as the file grows"""
+    processor = DocumentProcessor(chunk_size=200, chunk_overlap=20, max_workers=0)
+    line = ("python kubernetes distributed systems engineer " * 20 + "\n").encode()
+    peaks = []
+    for megabytes in (4, 16):
+        path = tmp_path / f"big_{megabytes}.txt"
+        with open(path, "wb") as handle:
+            for _ in range(megabytes * 1024 * 1024 // len(line)):
+                handle.write(line)
+
+        tracemalloc.start()
+        chunks = 0
+        async for _ in processor.stream_file(str(path)):
+            chunks += 1
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        assert chunks > 0
+
+    assert peaks[1] < 1.5 * peaks[0]
+    assert peaks[1] < 16 * 1024 * 1024
+
+
+async def _chunks_of(data, size):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("max_memory_bytes", [1 << 20, 64])
+async def test_spooled_upload_extracts_in_place(max_memory_bytes):
+    """Uploads kept in memory and spooled to disk give the same document"""
+    html = b"<html><body><h1>Jane Doe</h1><p>Senior <b>Python</b> engineer</p></body></html>"
+    processor = DocumentProcessor(chunk_size=5, chunk_overlap=1, max_workers=0)
+    metrics = UploadMetrics()
+    upload = await SpooledUpload.receive(_chunks_of(html, 10), max_memory_bytes=max_memory_bytes)
+    try:
+        assert upload.size == len(html)
+        assert upload.on_disk == (len(html) > max_memory_bytes)
+        assert isinstance(upload.source(), str if upload.on_disk else memoryview)
+        started = time.perf_counter()
+        doc = await processor.process_upload(upload, title="Jane", filename="resume.html")
+        metrics.record(upload.size, started, upload.on_disk)
+        path = upload.path
+    finally:
+        upload.close()
+
+    assert doc.content == "Jane Doe Senior  Python  engineer"
+    assert doc.metadata["file_size"] == len(html)
+    assert doc.metadata["spooled_to_disk"] == upload.on_disk
+    assert path is None or not os.path.exists(path)
+    stats = metrics.get_stats()
+    assert stats["uploads"] == 1 and stats["total_bytes"] == len(html)
+    assert stats["spooled_to_disk"] == int(upload.on_disk)
+
+
+@pytest.mark.asyncio
+async def test_stream_upload_yields_the_chunks_of_process_upload():
+    """Streaming an upload gives the chunks process_upload collects, with the upload's metadata"""
+    text = " ".join(f"word{i}" for i in range(60)).encode()
+    processor = DocumentProcessor(chunk_size=7, chunk_overlap=2, max_workers=0)
+    upload = await SpooledUpload.receive(_chunks_of(text, 16), max_memory_bytes=32)
+    try:
+        doc = await processor.process_upload(upload, title="Words", filename="words.txt")
+        streamed = [chunk async for chunk in processor.stream_upload(upload, filename="words.txt", doc_id="up")]
+    finally:
+        upload.close()
+
+    assert [chunk.content for chunk in streamed] == [chunk.content for chunk in doc.chunks]
+    assert streamed[1].id == "up_chunk_1" and streamed[1].metadata["document_id"] == "up"
+    assert streamed[0].metadata["spooled_to_disk"] and streamed[0].metadata["file_size"] == len(text)
+
+
+@pytest.mark.asyncio
+async def test_spooled_upload_enforces_size_limit():
+    """An upload past max_bytes is rejected and its spool file removed"""
+    with pytest.raises(UploadTooLarge):
+        await SpooledUpload.receive(_chunks_of(b"x" * 1000, 100), max_memory_bytes=200, max_bytes=500)
+    upload = await SpooledUpload.receive(_chunks_of(b"x" * 500, 100), max_memory_bytes=200, max_bytes=500)
+    assert upload.on_disk and os.path.getsize(upload.path) == 500
+    upload.close()
+    assert not os.path.exists(upload.path)
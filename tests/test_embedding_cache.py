@@ -0,0 +1,54 @@
+# tests/test_embedding_cache.py
+"""
+Test the append-only on-disk embedding cache
+"""
+
+import os
+
+import numpy as np
+
+from app.search.embedding_cache import EmbeddingCache
+
+
+class CountingEncoder:
+    def __init__(self):
+        self.texts = []
+
+    def __call__(self, texts):
+        self.texts.extend(texts)
+        return np.stack([np.full(8, len(text), dtype=np.float32) for text in texts])
+
+
+def test_encodes_only_new_normalized_texts(tmp_path):
+    """Whitespace variants and duplicates are served from the cache"""
+    cache = EmbeddingCache(str(tmp_path), "test/model", 8)
+    encoder = CountingEncoder()
+
+    first = cache.encode(["python developer", "rust  engineer", "python developer"], encoder)
+    second = cache.encode(["  python developer ", "rust engineer", "go engineer"], encoder)
+
+    assert encoder.texts == ["python developer", "rust  engineer", "go engineer"]
+    np.testing.assert_array_equal(first[0], second[0])
+    np.testing.assert_array_equal(first[1], second[1])
+    assert cache.stats()['hits'] == 3 and cache.stats()['misses'] == 3
+
+
+def test_survives_restart_and_torn_tail(tmp_path):
+    """A reopened cache keeps complete records and drops a partial trailing one"""
+    encoder = CountingEncoder()
+    cache = EmbeddingCache(str(tmp_path), "test/model", 8)
+    cache.encode(["a", "bb", "ccc"], encoder)
+    with open(cache.path, "ab") as handle:
+        handle.write(b"\x01" * 10)
+
+    reopened = EmbeddingCache(str(tmp_path), "test/model", 8)
+    vectors = reopened.encode(["ccc", "a"], encoder)
+
+    assert len(reopened) == 3
+    assert encoder.texts == ["a", "bb", "ccc"]
+    np.testing.assert_array_equal(vectors[:, 0], [3, 1])
+    assert (os.path.getsize(reopened.path) - 64) % reopened.record_dtype.itemsize == 0
+
+    # Another model or dimension gets its own file
+    other = EmbeddingCache(str(tmp_path), "test/other-model", 8)
+    assert len(other) == 0 and other.path != cache.path
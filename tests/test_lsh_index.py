@@ -0,0 +1,110 @@
+# tests/test_lsh_index.py
+"""
+Test bulk MinHash signatures and batched Jaccard scoring against the per-document path,
+and restoring band buckets from snapshots
+"""
+
+import pickle
+import random
+
+import numpy as np
+
+from app.math.lsh_index import LSHIndex
+from app.search.snapshot import SnapshotWriter, read_snapshot
+
+VOCABULARY = [f"skill{i}" for i in range(60)]
+
+
+def make_feature_lists(count: int, seed: int = 3):
+    rng = random.Random(seed)
+    # Include an empty feature set, which the numba kernel maps to INT32_MIN
+    return [rng.sample(VOCABULARY, rng.randint(0, 25)) for _ in range(count - 1)] + [[]]
+
+
+def test_bulk_signatures_match_numba_kernel():
+    """Vectorized signatures are bit-identical to the per-document kernel"""
+    index = LSHIndex()
+    feature_lists = make_feature_lists(200)
+
+    bulk = index.compute_signatures(feature_lists)
+
+    expected = np.stack([index.compute_signature(features) for features in feature_lists])
+    np.testing.assert_array_equal(bulk, expected)
+
+
+def test_jaccard_many_matches_single_lookups():
+    """One batched comparison gives the same estimates as per-document calls"""
+    index = LSHIndex()
+    feature_lists = make_feature_lists(100)
+    doc_ids = [f"doc_{i}" for i in range(len(feature_lists))]
+    index.add_documents(doc_ids, feature_lists)
+    index.remove_document("doc_5")
+
+    query = index.prepare_query(["skill1", "skill2", "skill3", "skill40"])
+    candidates = doc_ids[:20] + ["missing"]
+    scores = index.jaccard_many(index.rows_for(candidates), query.signature)
+
+    expected = [index.jaccard_similarity(doc_id, ["skill1", "skill2", "skill3", "skill40"]) for doc_id in candidates]
+    np.testing.assert_allclose(scores, expected)
+    assert scores[5] == 0.0 and scores[-1] == 0.0
+    assert index.query_candidates(query) == index.query_candidates(["skill1", "skill2", "skill3", "skill40"])
+
+
+def test_compact_and_legacy_pickle_keep_buckets():
+    """Compaction and unpickling a dict-based index preserve candidates and scores"""
+    index = LSHIndex()
+    feature_lists = make_feature_lists(50)
+    doc_ids = [f"doc_{i}" for i in range(len(feature_lists))]
+    index.add_documents(doc_ids, feature_lists)
+    for doc_id in doc_ids[::2]:
+        index.remove_document(doc_id)
+    query = index.prepare_query(feature_lists[1])
+    before = sorted(index.query_candidates(query))
+
+    index.compact()
+    assert sorted(index.query_candidates(query)) == before
+    assert index.jaccard_similarity("doc_1", query) == 1.0
+
+    # Indexes pickled before the signature matrix kept a {doc_id: signature} dict
+    legacy_state = {key: value for key, value in index.__dict__.items()
+                    if key not in ("_signature_matrix", "_size", "_doc_to_row", "_row_ids", "_hash_a", "_hash_b")}
+    legacy_state["signatures"] = {doc_id: index.signature_of(doc_id).copy() for doc_id in doc_ids[1::2]}
+    legacy = LSHIndex.__new__(LSHIndex)
+    legacy.__setstate__(pickle.loads(pickle.dumps(legacy_state)))
+    assert sorted(legacy.query_candidates(query)) == before
+    assert len(legacy) == len(doc_ids) // 2
+
+
+def test_snapshot_maps_band_buckets(tmp_path):
+    """A restored index serves candidates from the memory-mapped bucket arrays"""
+    index = LSHIndex()
+    feature_lists = make_feature_lists(80)
+    doc_ids = [f"doc_{i}" for i in range(len(feature_lists))]
+    index.add_documents(doc_ids, feature_lists)
+    index.remove_document("doc_3")
+    queries = [index.prepare_query(features) for features in feature_lists[:10]]
+    expected = [sorted(index.query_candidates(query)) for query in queries]
+
+    writer = SnapshotWriter(str(tmp_path))
+    writer.add_section("lsh", *index.to_snapshot())
+    writer.commit()
+    arrays, strings, meta = read_snapshot(str(tmp_path)).section("lsh")
+
+    restored = LSHIndex.from_snapshot(arrays, strings, meta)
+    assert isinstance(restored._bucket_rows, np.memmap)
+    assert not any(restored.hash_tables)
+    assert [sorted(restored.query_candidates(query)) for query in queries] == expected
+
+    # Snapshots without bucket arrays rebuild them
+    legacy_arrays = {"signatures": arrays["signatures"]}
+    rebuilt = LSHIndex.from_snapshot(legacy_arrays, strings, meta)
+    assert [sorted(rebuilt.query_candidates(query)) for query in queries] == expected
+
+    # Changes after loading land on top of the mapped buckets
+    restored.remove_document("doc_1")
+    restored.add_documents(["doc_new"], [feature_lists[1]])
+    candidates = restored.query_candidates(queries[1])
+    assert "doc_new" in candidates and "doc_1" not in candidates
+    restored.compact()
+    assert not any(restored.hash_tables)
+    assert sorted(restored.query_candidates(queries[1])) == sorted(candidates)
@@ -0,0 +1,82 @@
+# tests/test_metadata_index.py
+"""
+Test the metadata filter index against a per-document reference filter
+"""
+
+import random
+
+import numpy as np
+import pytest
+
+from app.search.metadata_index import MetadataIndex
+
+SKILLS = ["Python", "java", "React", "kubernetes", "SQL", "go", "rust", "aws"]
+
+
+def matches(record, filters):
+    """Per-candidate filtering as the engine used to apply it"""
+    if 'min_experience' in filters and record.get('experience_years', 0) < filters['min_experience']:
+        return False
+    if 'seniority_levels' in filters and record.get('seniority_level') not in filters['seniority_levels']:
+        return False
+    if 'required_skills' in filters and not {s.lower() for s in filters['required_skills']}.issubset(
+            {s.lower() for s in record.get('skills', [])}):
+        return False
+    return True
+
+
+@pytest.fixture
+def records():
+    rng = random.Random(11)
+    records = {}
+    for row in range(500):
+        record = {'experience_years': rng.randint(0, 20), 'skills': rng.sample(SKILLS, rng.randint(0, 5))}
+        if row % 7:
+            record['seniority_level'] = rng.choice(["junior", "mid", "senior"])
+        records[row] = record
+    return records
+
+
+FILTERS = [
+    {'min_experience': 10},
+    {'seniority_levels': ["senior", "mid"]},
+    {'required_skills': ["python", "SQL"]},
+    {'min_experience': 15, 'seniority_levels': ["senior"], 'required_skills': ["rust", "go", "aws"]},
+    {'required_skills': ["cobol"]},
+]
+
+
+@pytest.mark.parametrize("filters", FILTERS)
+def test_allowed_rows_match_reference(records, filters):
+    """The mask selects exactly the rows the per-candidate check accepts"""
+    index = MetadataIndex(initial_capacity=16)
+    rows = list(records)
+    index.add_documents(rows[:250], [records[r] for r in rows[:250]])
+    for row in rows[250:]:
+        index.add_document(row, records[row])
+
+    allowed = index.allowed_rows(filters)
+    expected = {row for row, record in records.items() if matches(record, filters)}
+    assert set(np.flatnonzero(allowed).tolist()) == expected
+
+
+def test_removal_compaction_and_snapshot(records):
+    """Removed rows never match, before or after compaction and a snapshot round trip"""
+    index = MetadataIndex()
+    index.add_documents(list(records), list(records.values()))
+    filters = {'min_experience': 5, 'required_skills': ["python"]}
+    removed = [row for row, record in records.items() if matches(record, filters)][:10]
+    for row in removed:
+        index.remove_document(row)
+    expected = {row for row, record in records.items() if matches(record, filters)} - set(removed)
+
+    assert set(np.flatnonzero(index.allowed_rows(filters)).tolist()) == expected
+    index.compact()
+    assert set(np.flatnonzero(index.allowed_rows(filters)).tolist()) == expected
+
+    restored = MetadataIndex.from_snapshot(*index.to_snapshot())
+    assert len(restored) == len(records) - len(removed)
+    for query in FILTERS + [filters]:
+        np.testing.assert_array_equal(np.flatnonzero(restored.allowed_rows(query)),
+                                      np.flatnonzero(index.allowed_rows(query)))
+    assert index.allowed_rows({'unrelated': 1}) is None
@@ -0,0 +1,682 @@
+# tests/test_native_search_engine.py
+"""
+Test the native ultra-fast search engine with a deterministic offline encoder
+"""
+
+import asyncio
+import json
+import zlib
+
+import numpy as np
+import pytest
+
+from app.math.ivfpq_index import IVFPQIndex
+from app.search import ultra_fast_engine
+from app.search.calibration import CalibrationEntry, CalibrationTable, calibrate, search_profiles
+from app.search.ingestion import ingest_ndjson
+from app.search.sharded_engine import ShardedSearchEngine
+from app.search.ultra_fast_engine import UltraFastSearchEngine
+
+
+class HashingEncoder:
+    """Bag-of-words hashing encoder standing in for SentenceTransformer"""
+
+    def __init__(self, *args, **kwargs):
+        self.calls = 0
+
+    def encode(self, texts, convert_to_numpy=True, show_progress_bar=False, **kwargs):
+        self.calls += 1
+        vectors = np.full((len(texts), 384), 1e-3, dtype=np.float32)
+        for i, text in enumerate(texts):
+            for token in text.lower().split():
+                vectors[i, zlib.crc32(token.encode()) % 384] += 1.0
+        return vectors
+
+
+SKILLS = ["python", "java", "react", "kubernetes", "sql", "go", "rust", "aws", "docker", "spark"]
+
+
+def make_documents(count: int):
+    documents = []
+    for i in range(count):
+        skills = [SKILLS[i % len(SKILLS)], SKILLS[(i * 3 + 1) % len(SKILLS)]]
+        documents.append({
+            "id": f"doc_{i}",
+            "name": f"Candidate {i}",
+            "title": f"{skills[0]} engineer",
+            "content": f"Experienced {skills[0]} and {skills[1]} developer number {i}",
+            "skills": skills,
+            "experience_years": i % 15,
+            "seniority_level": ["junior", "mid", "senior"][i % 3],
+        })
+    return documents
+
+
+@pytest.fixture
+def engine(monkeypatch, tmp_path):
+    """Search engine with an offline encoder and a temporary index path"""
+    monkeypatch.setattr(ultra_fast_engine, "SentenceTransformer", HashingEncoder)
+    monkeypatch.setattr(ultra_fast_engine.settings, "INDEX_PATH", str(tmp_path / "indexes"))
+    return UltraFastSearchEngine(embedding_dim=384)
+
+
+@pytest.mark.asyncio
+async def test_vectorized_scoring_matches_per_candidate(engine):
+    """Vectorized scoring ranks and scores like the per-candidate path"""
+    await engine.build_indexes(make_documents(60))
+
+    engine.scoring_mode = "per_candidate"
+    expected = await engine.search("python developer", num_results=10)
+    engine.query_cache.clear()
+    engine.scoring_mode = "vectorized"
+    actual = await engine.search("python developer", num_results=10)
+
+    assert len(actual) == len(expected) == 10
+    assert [r.combined_score for r in actual] == pytest.approx([r.combined_score for r in expected], rel=1e-5)
+    expected_by_id = {r.doc_id: r for r in expected}
+    for result in actual:
+        if result.doc_id in expected_by_id:
+            assert result.bm25_score == pytest.approx(expected_by_id[result.doc_id].bm25_score, rel=1e-5)
+
+
+@pytest.mark.asyncio
+async def test_vector_store_tracks_add_and_remove(engine):
+    """Added documents get a row; removed ones drop out of scoring"""
+    await engine.build_indexes(make_documents(20))
+    await engine.add_document("extra", {"title": "rust engineer", "content": "rust systems", "skills": ["rust"]})
+
+    assert "extra" in engine.document_vectors
+    assert len(engine.document_vectors) == 21
+
+    await engine.remove_document("extra")
+    engine.query_cache.clear()
+    results = await engine.search("rust systems", num_results=20)
+
+    assert "extra" not in engine.document_vectors
+    assert all(r.doc_id != "extra" for r in results)
+
+
+@pytest.mark.asyncio
+async def test_search_batch_matches_single_queries(engine):
+    """A batch returns the same results as searching each query alone, with one encoder call"""
+    await engine.build_indexes(make_documents(80))
+    queries = ["python developer", "rust engineer", "kubernetes aws docker", "sql spark"]
+
+    expected = [await engine.search(query, num_results=5) for query in queries]
+    engine.query_cache.clear()
+    engine.query_encoder.clear()
+    calls_before = engine.embedding_model.calls
+    actual = await engine.search_batch(queries, num_results=5)
+
+    assert engine.embedding_model.calls == calls_before + 1
+    assert len(actual) == len(queries)
+    for batch_results, single_results in zip(actual, expected):
+        assert [r.combined_score for r in batch_results] == pytest.approx(
+            [r.combined_score for r in single_results], rel=1e-5)
+
+
+@pytest.mark.asyncio
+async def test_batch_search_encodes_uncached_queries_in_one_call(engine):
+    """A large batch is one model call for the queries the LRU does not hold, not one per batching window"""
+    await engine.build_indexes(make_documents(30))
+    await engine.search("python developer", num_results=5)
+    engine.query_cache.clear()
+    calls_before = engine.embedding_model.calls
+    queries = ["python developer"] + [f"engineer {i}" for i in range(150)] + ["engineer 7"]
+
+    results = await engine.search_batch(queries, num_results=5)
+
+    assert engine.embedding_model.calls == calls_before + 1
+    assert len(results) == len(queries)
+    stats = engine.query_encoder.get_stats()
+    assert stats['encoded'] == 1 + 150 and stats['cache_hits'] == 1
+
+
+@pytest.mark.asyncio
+async def test_snapshot_round_trip(engine):
+    """A fresh engine loads the saved snapshot and answers identically"""
+    await engine.build_indexes(make_documents(50))
+    await engine.add_document("extra", {"title": "go engineer", "content": "go services", "skills": ["go"]})
+    await engine.remove_document("doc_3")
+    engine.save_indexes()
+    expected = await engine.search("go services", num_results=10)
+
+    restored = UltraFastSearchEngine(embedding_dim=384)
+    actual = await restored.search("go services", num_results=10)
+
+    assert [r.doc_id for r in actual] == [r.doc_id for r in expected]
+    assert restored.document_metadata["extra"]["title"] == "go engineer"
+    assert "doc_3" not in restored.document_metadata
+    assert len(restored.document_metadata) == len(engine.document_metadata)
+
+    # Memory-mapped storage is copied on first write, so the restored engine stays mutable
+    await restored.add_document("late", {"title": "spark engineer", "content": "spark jobs", "skills": ["spark"]})
+    assert "late" in restored.document_vectors
+
+
+@pytest.mark.asyncio
+async def test_failed_save_keeps_previous_snapshot(engine, monkeypatch):
+    """A crash while writing a snapshot leaves the published one intact"""
+    await engine.build_indexes(make_documents(20))
+    await engine.add_document("extra", {"title": "go engineer", "content": "go services"})
+
+    def crash(path):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(engine.hnsw_index, "save", crash)
+    with pytest.raises(OSError):
+        engine.save_indexes()
+
+    restored = UltraFastSearchEngine(embedding_dim=384)
+    assert len(restored.document_metadata) == 20
+    assert "extra" not in restored.document_metadata
+
+
+@pytest.mark.asyncio
+async def test_background_save_waits_out_concurrent_writes(engine, monkeypatch):
+    """Writes issued while a snapshot is written off the loop land after it, not inside it"""
+    import time
+
+    await engine.build_indexes(make_documents(30))
+    save = engine.hnsw_index.save
+
+    def slow_save(path):
+        time.sleep(0.2)
+        save(path)
+
+    monkeypatch.setattr(engine.hnsw_index, "save", slow_save)
+    saving = asyncio.create_task(engine.save_snapshot())
+    await asyncio.sleep(0.05)
+    await asyncio.gather(
+        engine.add_documents([{"id": "extra", "title": "go engineer", "content": "go services"}]),
+        engine.remove_document("doc_3"),
+    )
+    assert saving.done()
+
+    restored = UltraFastSearchEngine(embedding_dim=384)
+    assert set(restored.document_metadata) == {doc["id"] for doc in make_documents(30)}
+    assert "extra" in engine.document_metadata and "doc_3" not in engine.document_metadata
+
+
+@pytest.mark.asyncio
+async def test_removed_documents_leave_hnsw_and_lsh(engine):
+    """Removal tombstones the graph entry and clears the LSH buckets"""
+    await engine.build_indexes(make_documents(30))
+    engine.compaction_threshold = 1.0
+    query_vector = engine.document_vectors["doc_4"].copy()
+
+    await engine.remove_document("doc_4")
+
+    assert "doc_4" not in engine.lsh_index
+    assert all("doc_4" not in bucket for table in engine.lsh_index.hash_tables for bucket in table.values())
+    assert engine.hnsw_index.tombstone_count == 1
+    assert all(doc_id != "doc_4" for doc_id, _ in engine.hnsw_index.search(query_vector, k=30))
+    assert len(engine.hnsw_index.search(query_vector, k=29)) == 29
+
+
+@pytest.mark.asyncio
+async def test_compaction_drops_tombstones(engine):
+    """Passing the tombstone ratio rebuilds the graph in the background"""
+    await engine.build_indexes(make_documents(40))
+    engine.compaction_threshold = 0.25
+    await engine.add_document("doc_1", {"title": "go engineer", "content": "go services", "skills": ["go"]})
+    for i in range(2, 12):
+        await engine.remove_document(f"doc_{i}")
+
+    assert engine._compaction_task is not None
+    await engine._compaction_task
+
+    assert engine.hnsw_index.tombstone_count == 0
+    assert len(engine.hnsw_index) == 30
+    assert engine.get_performance_stats()['compactions'] == 1
+    results = await engine.search("go services", num_results=5)
+    assert results[0].doc_id == "doc_1"
+    assert engine.hnsw_index.label_of("doc_1") == engine.document_vectors.row_of("doc_1")
+
+
+@pytest.mark.asyncio
+async def test_compaction_releases_vector_rows_for_reuse(engine):
+    """Re-adding documents fills rows released by compaction instead of growing the store"""
+    await engine.build_indexes(make_documents(40))
+    engine.compaction_threshold = 0.25
+    for round_ in range(5):
+        for i in range(20):
+            await engine.add_document(f"doc_{i}", {"title": f"go engineer {round_}", "content": f"go services {i}",
+                                                   "skills": ["go"]})
+        await engine._compaction_task
+
+    store = engine.document_vectors
+    assert store.num_rows <= 80 and len(store) == 40
+    assert engine.hnsw_index.label_of("doc_3") == store.row_of("doc_3")
+    results = await engine.search("go services 3", num_results=3, filters={"required_skills": ["go"]})
+    assert results[0].doc_id == "doc_3"
+
+    engine.save_indexes()
+    restored = UltraFastSearchEngine(embedding_dim=384)
+    assert restored.document_vectors.dead_rows == store.dead_rows
+    assert (await restored.search("go services 3", num_results=1))[0].doc_id == "doc_3"
+
+
+@pytest.mark.asyncio
+async def test_compressed_mode_ranks_like_exact_mode(engine, monkeypatch):
+    """IVF-PQ with exact re-ranking scores its top results like the float HNSW path"""
+    documents = make_documents(1500)
+    queries = ["python developer number 17", "rust engineer", "kubernetes aws docker", "sql spark number 900"]
+    await engine.build_indexes(documents)
+    expected = [await engine.search(query, num_results=10) for query in queries]
+
+    monkeypatch.setattr(ultra_fast_engine.settings, "VECTOR_INDEX_MODE", "ivfpq")
+    compressed = UltraFastSearchEngine(embedding_dim=384)
+
+    # The snapshot was written by the HNSW engine, so the compressed index is rebuilt from its vectors
+    assert isinstance(compressed.hnsw_index, IVFPQIndex) and compressed.hnsw_index.is_trained
+    assert isinstance(compressed.document_vectors.matrix, np.memmap)
+    actual = await compressed.search_batch(queries, num_results=10)
+
+    assert actual[0][0].doc_id == "doc_17"
+    # The synthetic corpus has many exact ties, so compare the score profile rather than ids
+    for compressed_results, exact_results in zip(actual, expected):
+        assert [r.combined_score for r in compressed_results] == pytest.approx(
+            [r.combined_score for r in exact_results], abs=1e-3)
+
+    await compressed.remove_document("doc_17")
+    compressed.query_cache.clear()
+    assert all(r.doc_id != "doc_17" for r in await compressed.search(queries[0], num_results=10))
+    compressed.save_indexes()
+    restored = UltraFastSearchEngine(embedding_dim=384)
+    assert len(restored.hnsw_index) == 1499
+    assert restored.get_performance_stats()['vector_index_mode'] == "ivfpq"
+
+
+@pytest.mark.asyncio
+async def test_rebuild_and_restart_reuse_cached_embeddings(engine):
+    """Only new or changed documents reach the encoder after the first build"""
+    documents = make_documents(30)
+    await engine.build_indexes(documents)
+    calls_before = engine.embedding_model.calls
+
+    documents[0] = dict(documents[0], content="Changed content for the first candidate")
+    await engine.build_indexes(documents)
+    stats = engine.get_performance_stats()['embedding_cache']
+
+    assert engine.embedding_model.calls == calls_before + 1
+    assert stats['misses'] == 31 and stats['hits'] == 29
+
+    restarted = UltraFastSearchEngine(embedding_dim=384)
+    await restarted.add_document("doc_1", documents[1])
+    assert restarted.embedding_model.calls == 0
+    assert restarted.get_performance_stats()['embedding_cache']['hits'] == 1
+
+
+@pytest.mark.asyncio
+async def test_concurrent_searches_share_one_encoder_batch(engine):
+    """Queries arriving together are encoded in one call off the event loop"""
+    await engine.build_indexes(make_documents(40))
+    queries = ["python developer", "rust engineer", "go services", "sql spark", "python developer"]
+    calls_before = engine.embedding_model.calls
+
+    results = await asyncio.gather(*(engine.search(query, num_results=5) for query in queries))
+
+    assert engine.embedding_model.calls == calls_before + 1
+    assert [r.doc_id for r in results[0]] == [r.doc_id for r in results[4]]
+    stats = engine.get_performance_stats()['query_encoder']
+    assert stats['batches'] == 1 and stats['encoded'] == 4
+
+    engine.query_cache.clear()
+    await engine.search("rust engineer", num_results=5)
+    assert engine.embedding_model.calls == calls_before + 1
+    assert engine.query_encoder.get_stats()['cache_hits'] == 1
+
+
+@pytest.mark.asyncio
+async def test_sharded_engine_matches_single_process(engine, tmp_path):
+    """Two shards with global BM25 statistics rank like one engine over the whole corpus"""
+    documents = make_documents(40)
+    await engine.build_indexes(documents)
+    sharded = ShardedSearchEngine(2, embedding_dim=384, embedding_model=HashingEncoder(),
+                                  index_path=str(tmp_path / "sharded"))
+    try:
+        await sharded.build_indexes(documents)
+        assert len(sharded.document_metadata) == 40
+        assert {sharded.shard_of(doc["id"]) for doc in documents} == {0, 1}
+
+        queries = ["python developer", "rust engineer", "sql spark"]
+        expected = await engine.search_batch(queries, num_results=10)
+        actual = await sharded.search_batch(queries, num_results=10)
+        for expected_results, actual_results in zip(expected, actual):
+            assert [r.combined_score for r in actual_results] == pytest.approx(
+                [r.combined_score for r in expected_results], abs=1e-6)
+            expected_by_id = {r.doc_id: r for r in expected_results}
+            for result in actual_results:
+                if result.doc_id in expected_by_id:
+                    assert result.bm25_score == pytest.approx(expected_by_id[result.doc_id].bm25_score)
+
+        # Records stay in the shards and are fetched on lookup
+        assert sharded.document_metadata["doc_5"]["title"] == documents[5]["title"]
+        assert len(dict(sharded.document_metadata.items())) == 40
+        with pytest.raises(KeyError):
+            sharded.document_metadata["missing"]
+        records = await sharded.document_records()
+        assert records == await engine.document_records()
+        assert list(await sharded.document_records(["doc_5", "missing"])) == ["doc_5"]
+
+        # Repeated queries are served from the coordinator's result cache until the corpus changes
+        assert [r.doc_id for r in await sharded.search("python developer", num_results=10)] == \
+            [r.doc_id for r in actual[0]]
+        assert sharded.get_performance_stats()["cached_searches"] == 1
+
+        await sharded.remove_document("doc_3")
+        await sharded.add_document("doc_41", {"id": "doc_41", "content": "python python python developer"})
+        results = await sharded.search("python developer", num_results=40)
+        assert "doc_3" not in {r.doc_id for r in results}
+        assert "doc_41" in {r.doc_id for r in results}
+        stats = await sharded.performance_stats()
+        assert stats == sharded.get_performance_stats()
+        assert stats["total_documents"] == 40 and stats["cached_searches"] == 1
+        assert stats["cache_hit_rate"] == pytest.approx(1 / 5)
+
+        # The coordinator's calibration is saved with the shard snapshots
+        sharded.calibration = CalibrationTable([CalibrationEntry(search_profiles()[0], latency_ms=1.0, recall=0.8)])
+        await sharded.save_snapshot()
+        sharded.close()
+        sharded = ShardedSearchEngine(2, embedding_dim=384, embedding_model=HashingEncoder(),
+                                      index_path=str(tmp_path / "sharded"))
+        assert sharded.calibration.to_dict() == CalibrationTable(
+            [CalibrationEntry(search_profiles()[0], latency_ms=1.0, recall=0.8)]).to_dict()
+        assert len(sharded.document_metadata) == 40
+    finally:
+        sharded.close()
+
+
+@pytest.mark.asyncio
+async def test_filters_are_applied_during_retrieval(engine, monkeypatch):
+    """Filtered searches return the best matching documents, through the exhaustive and ANN paths"""
+    documents = make_documents(300)
+    await engine.build_indexes(documents)
+    filters = {"min_experience": 10, "seniority_levels": ["senior", "mid"], "required_skills": ["Python"]}
+    matching = {doc["id"] for doc in documents
+                if doc["experience_years"] >= 10 and doc["seniority_level"] in ("senior", "mid")
+                and "python" in doc["skills"]}
+
+    exhaustive = await engine.search("java developer", num_results=50, filters=filters)
+    assert {r.doc_id for r in exhaustive} == matching
+
+    # Force the selector-driven path: ANN, LSH and BM25 retrieval restricted to the allowed rows
+    monkeypatch.setattr(ultra_fast_engine, "FILTER_EXHAUSTIVE_LIMIT", 0)
+    engine.query_cache.clear()
+    searched = await engine.search("java developer", num_results=50, filters=filters)
+    assert {r.doc_id for r in searched} == matching
+    assert [r.combined_score for r in searched] == pytest.approx([r.combined_score for r in exhaustive])
+
+    await engine.remove_document(sorted(matching)[0])
+    engine.query_cache.clear()
+    remaining = await engine.search("java developer", num_results=50, filters=filters)
+    assert {r.doc_id for r in remaining} == matching - {sorted(matching)[0]}
+
+
+@pytest.mark.asyncio
+async def test_ndjson_ingestion_indexes_in_batches(engine):
+    """Streamed NDJSON is indexed in encoder batches and ranks like one-by-one adds"""
+    documents = make_documents(50)
+    payload = b"".join(json.dumps(doc).encode() + b"\n" for doc in documents[:30])
+    payload += b'{"name": "no id"}\nnot json\n\n'
+    payload += b"".join(json.dumps(doc).encode() + b"\n" for doc in documents[30:])
+
+    async def chunks():
+        # Chunk boundaries fall inside lines
+        for start in range(0, len(payload), 97):
+            yield payload[start:start + 97]
+
+    engine.embedding_model.calls = 0
+    reports = [report async for report in ingest_ndjson(engine, chunks(), batch_size=16)]
+    final = reports[-1]
+    assert final["done"] and final["indexed"] == 50 and final["failed"] == 2
+    assert [error["line"] for error in final["errors"]] == [31, 32]
+    assert final["batches"] == 4 and engine.embedding_model.calls == 4
+    assert len(engine.document_vectors) == len(engine.bm25_index) == len(engine.metadata_index) == 50
+
+    batched = await engine.search("python developer", num_results=10)
+    one_by_one = UltraFastSearchEngine(embedding_dim=384)
+    for doc in documents:
+        await one_by_one.add_document(doc["id"], doc)
+    single = await one_by_one.search("python developer", num_results=10)
+    assert [r.combined_score for r in batched] == pytest.approx([r.combined_score for r in single])
+
+
+
+@pytest.mark.asyncio
+async def test_ndjson_ingestion_counts_repeated_ids_once(engine):
+    """A batch repeating an id reports only the documents it indexed"""
+    documents = make_documents(10)
+    payload = b"".join(json.dumps(doc).encode() + b"\n" for doc in documents + documents[:3])
+
+    async def chunks():
+        yield payload
+
+    reports = [report async for report in ingest_ndjson(engine, chunks(), batch_size=16)]
+    final = reports[-1]
+    assert final["received"] == 13 and final["indexed"] == 10 == len(engine.document_metadata)
+
+def test_calibration_table_picks_cheapest_profile_meeting_the_request():
+    """A recall target takes the cheapest profile reaching it; a budget the most accurate that fits"""
+    fast, lean, default, thorough, _ = search_profiles()
+    table = CalibrationTable([
+        CalibrationEntry(thorough, latency_ms=9.0, recall=0.99),
+        CalibrationEntry(fast, latency_ms=1.0, recall=0.7),
+        CalibrationEntry(default, latency_ms=4.0, recall=0.95),
+        CalibrationEntry(lean, latency_ms=2.0, recall=0.9),
+    ])
+    assert table.choose(recall_target=0.9).name == "lean"
+    assert table.choose(recall_target=0.9, latency_budget_ms=1.5).name == "fast"
+    assert table.choose(latency_budget_ms=5.0).name == "default"
+    assert table.choose(latency_budget_ms=0.1).name == "fast"
+    assert table.choose(recall_target=1.0).name == "thorough"
+    chosen = table.choose(latency_budget_ms=2.5)
+    assert (chosen.expected_latency_ms, chosen.expected_recall) == (2.0, 0.9)
+
+
+@pytest.mark.asyncio
+async def test_latency_budget_selects_calibrated_profile(engine):
+    """Calibrated profiles drive efSearch and the candidate stages; no budget keeps the default"""
+    documents = make_documents(300)
+    await engine.build_indexes(documents)
+    assert engine.select_profile(10, latency_budget_ms=1.0).name == "default"
+
+    engine.calibration = await calibrate(engine, ["python developer", "rust engineer", "senior java"], k=5)
+    assert [entry.recall for entry in engine.calibration.entries] and \
+        max(entry.recall for entry in engine.calibration.entries) == 1.0
+
+    cheapest = engine.calibration.entries[0].profile
+    profile = engine.select_profile(5, latency_budget_ms=1e-6)
+    assert profile.name == cheapest.name and profile.expected_latency_ms is not None
+    assert engine.select_profile(5, recall_target=1.0).expected_recall == 1.0
+    assert engine.select_profile(5).name == "default"
+    with pytest.raises(ValueError):
+        engine.select_profile(5, recall_target=1.5)
+
+    fast = search_profiles()[0]
+    candidates = engine._candidate_lists(np.asarray(engine.embedding_model.encode(["python developer"])),
+                                         [engine.lsh_index.prepare_query(["python", "developer"])],
+                                         [["python", "developer"]], None, profile=fast)[0]
+    assert len(candidates) <= fast.vector_candidates
+    results = await engine.search("python developer", num_results=30, latency_budget_ms=1e-6)
+    assert len(results) == 30
+
+
+@pytest.mark.asyncio
+async def test_calibration_is_saved_with_the_snapshot(engine, monkeypatch):
+    """A worker loading the snapshot reuses its calibration instead of measuring again"""
+    from app.api import native_search
+
+    await engine.build_indexes(make_documents(100))
+    engine.calibration = await calibrate(engine, ["python developer", "rust engineer"], k=5)
+    engine.save_indexes()
+
+    restored = UltraFastSearchEngine(embedding_dim=384)
+    assert restored.calibration.to_dict() == engine.calibration.to_dict()
+    assert restored.select_profile(5, latency_budget_ms=1e-6) == engine.select_profile(5, latency_budget_ms=1e-6)
+
+    monkeypatch.setattr(native_search, "search_engine", restored)
+    monkeypatch.setattr(native_search.settings, "SEARCH_CALIBRATION_SIZE", 1000)
+    monkeypatch.setattr(native_search, "calibrate_on_benchmark_corpus", None)
+    assert await native_search.calibrate_native_search() is restored.calibration
+
+
+@pytest.mark.asyncio
+async def test_ingestion_calibrates_before_saving(engine, monkeypatch):
+    """Without a table, startup skips calibration but an ingest measures one and saves it with the snapshot"""
+    from app.api import native_search
+
+    table = CalibrationTable([CalibrationEntry(search_profiles()[0], latency_ms=1.0, recall=0.8)])
+    monkeypatch.setattr(native_search, "search_engine", engine)
+    monkeypatch.setattr(native_search, "calibrate_on_benchmark_corpus", lambda *args, **kwargs: table)
+    assert await native_search.calibrate_native_search(on_startup=True) is None
+
+    response = await native_search.native_search(native_search.SearchRequest(query="go", latency_budget_ms=5.0))
+    assert response.metadata["search_calibrated"] is False
+
+    class Body:
+        async def stream(self):
+            yield b"".join(json.dumps(doc).encode() + b"\n" for doc in make_documents(10))
+
+    streamed = await native_search.ingest_documents(Body())
+    lines = [json.loads(line) async for line in streamed.body_iterator]
+    assert lines[-1]["done"] and lines[-1]["indexed"] == 10
+    assert UltraFastSearchEngine(embedding_dim=384).calibration.to_dict() == table.to_dict()
+
+    response = await native_search.native_search(native_search.SearchRequest(query="go", latency_budget_ms=5.0))
+    assert response.metadata["search_calibrated"] is True
+    assert response.metadata["search_profile"]["name"] == "fast"
+
+
+@pytest.mark.asyncio
+async def test_uploads_are_indexed_chunk_by_chunk(engine, monkeypatch):
+    """An upload's chunks are searchable records of their own; its record keeps a preview and owns them"""
+    from app.api import native_search
+    from app.document_processing.processor import DocumentProcessor
+    from app.document_processing.spool import SpooledUpload
+
+    await engine.build_indexes(make_documents(20))
+    monkeypatch.setattr(native_search, "search_engine", engine)
+    monkeypatch.setattr(native_search, "document_processor", DocumentProcessor(chunk_size=10, chunk_overlap=0,
+                                                                               max_workers=0))
+    monkeypatch.setattr(native_search, "UPLOAD_PREVIEW_CHARS", 30)
+    monkeypatch.setattr(native_search.settings, "INGEST_BATCH_SIZE", 2)
+    words = [f"filler{i}" for i in range(45)]
+    words[33] = "zeppelin"
+
+    async def body():
+        yield " ".join(words).encode()
+
+    upload = await SpooledUpload.receive(body())
+    try:
+        response = await native_search._index_upload(upload, "Notes", "text/plain", "notes.txt", 0.0)
+    finally:
+        upload.close()
+
+    doc_id = response.document_id
+    assert response.chunks_created == 5
+    record = engine.document_metadata[doc_id]
+    assert record["content"] == " ".join(words)[:30] and record["metadata"]["chunks_count"] == 5
+    results = await engine.search("zeppelin", num_results=3)
+    assert results[0].doc_id == f"{doc_id}_chunk_3"
+
+    listed = [doc.document_id for doc in await native_search.list_documents()]
+    assert doc_id in listed and not any("_chunk_" in listed_id for listed_id in listed)
+    await native_search.delete_document(doc_id)
+    assert not [doc_id_ for doc_id_ in engine.document_metadata if doc_id_.startswith(doc_id)]
+
+
+@pytest.mark.asyncio
+async def test_result_cache_follows_index_generation(engine):
+    """Normalized queries share cached results; adds and removes retire them"""
+    await engine.build_indexes(make_documents(40))
+    first = await engine.search("Rust  Systems", num_results=5)
+    assert await engine.search("rust systems", num_results=5) is first
+
+    await engine.add_document("extra", {"title": "rust systems engineer", "content": "rust systems rust systems",
+                                        "skills": ["rust"]})
+    after_add = await engine.search("rust systems", num_results=5)
+    assert "extra" in {r.doc_id for r in after_add}
+
+    await engine.remove_document("extra")
+    after_remove = await engine.search("rust systems", num_results=5)
+    assert "extra" not in {r.doc_id for r in after_remove}
+
+    stats = engine.get_performance_stats()['result_cache']
+    assert stats['hits'] == 1 and stats['misses'] == 3
+    assert stats['invalidations'] == 2
+    assert stats['entries'] == 1 and stats['bytes'] > 0
+    # Cache hits count as searches, so latency and QPS cover every query
+    performance = engine.get_performance_stats()
+    assert performance['total_searches'] == 4 and performance['cached_searches'] == 1
+
+
+def test_result_cache_evicts_by_bytes_and_ttl(monkeypatch):
+    """The byte budget evicts least recently used entries; expired entries miss"""
+    from app.search import result_cache
+    from app.search.ultra_fast_engine import SearchResult
+
+    results = [SearchResult(f"doc_{i}", 0.5, 0.5, 0.5, {}) for i in range(10)]
+    cache = result_cache.SearchResultCache(max_entries=100, max_bytes=5000, ttl_seconds=60)
+    keys = [cache.key(f"query {i}", 10, {"b": 1, "a": 2}, "default") for i in range(3)]
+    for key in keys:
+        cache.put(key, results)
+
+    assert len(cache) == 2 and keys[0] not in cache
+    assert cache.get_stats()['evictions'] == 1
+    assert cache.key("QUERY 1", 10, {"a": 2, "b": 1}, "default") == keys[1]
+
+    clock = [1000.0]
+    monkeypatch.setattr(result_cache.time, "monotonic", lambda: clock[0])
+    cache.put(keys[0], results)
+    clock[0] += 61
+    assert cache.get(keys[0]) is None
+    assert cache.get_stats()['expirations'] == 1
+
+
+def test_quantized_vector_store_similarities():
+    """float16 and int8 rows score close to float32, in a half and a quarter of the bytes"""
+    from app.search.vector_store import VectorStore
+
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(400, 384)).astype(np.float32)
+    queries = rng.normal(size=(5, 384)).astype(np.float32)
+    ids = [f"doc_{i}" for i in range(400)]
+    stores = {storage: VectorStore(384, storage=storage) for storage in ("float32", "float16", "int8")}
+    for store in stores.values():
+        store.add_batch(ids, vectors)
+
+    rows = np.arange(400)
+    exact = stores["float32"].cosine_similarity_matrix(queries, rows)
+    assert stores["float16"].cosine_similarity_matrix(queries, rows) == pytest.approx(exact, abs=1e-3)
+    assert stores["int8"].cosine_similarity_matrix(queries, rows) == pytest.approx(exact, abs=2e-2)
+    assert stores["int8"].cosine_similarities(queries[0], rows) == pytest.approx(
+        stores["int8"].cosine_similarity_matrix(queries[:1], rows)[:, 0], rel=1e-5)
+    assert stores["float16"].matrix.nbytes * 2 == stores["int8"].matrix.nbytes * 4 == stores["float32"].matrix.nbytes
+
+    converted = stores["float32"].converted("int8")
+    assert converted.storage == "int8" and converted.row_of("doc_7") == stores["float32"].row_of("doc_7")
+    assert converted["doc_7"] == pytest.approx(stores["int8"]["doc_7"], abs=1e-2)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("storage", ["float16", "int8"])
+async def test_quantized_storage_search_and_snapshot(engine, monkeypatch, tmp_path, storage):
+    """Quantized engines rank like float32, build the graph on SQ storage and survive a reload"""
+    documents = make_documents(300)
+    await engine.build_indexes(documents)
+    expected = await engine.search("python developer", num_results=10)
+
+    monkeypatch.setattr(ultra_fast_engine.settings, "VECTOR_STORAGE", storage)
+    quantized = UltraFastSearchEngine(embedding_dim=384, index_path=str(tmp_path / storage))
+    await quantized.build_indexes(documents)
+    actual = await quantized.search("python developer", num_results=10)
+
+    assert quantized.document_vectors.matrix.dtype == np.dtype(storage)
+    assert quantized.hnsw_index.storage_bytes < engine.hnsw_index.storage_bytes
+    assert len({r.doc_id for r in actual} & {r.doc_id for r in expected}) >= 8
+
+    restored = UltraFastSearchEngine(embedding_dim=384, index_path=str(tmp_path / storage))
+    assert restored.document_vectors.storage == storage
+    assert [r.doc_id for r in await restored.search("python developer", num_results=10)] == [r.doc_id for r in actual]
@@ -0,0 +1,181 @@
+# tests/test_redis_cache.py
+"""
+Test the two-tier CacheManager against an in-process Redis stand-in
+"""
+
+import asyncio
+
+import fakeredis
+import pytest
+
+from app.cache.conversation_store import ConversationStore
+from app.cache.redis_client import CacheManager, CacheWriteBatch
+from app.graphs.chat_graph import CacheUpdateNode
+
+
+async def make_worker(server, **kwargs):
+    manager = CacheManager("redis://fake", **kwargs)
+    client = fakeredis.FakeAsyncRedis(server=server)
+    assert await manager.initialize(client=client)
+    return manager
+
+
+async def wait_for(predicate, timeout=2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        assert asyncio.get_running_loop().time() < deadline
+        await asyncio.sleep(0.01)
+
+
+@pytest.mark.asyncio
+async def test_near_cache_serves_local_reads_and_invalidates_other_workers():
+    """Repeated reads stay local; a write on one worker drops the copy on the other"""
+    server = fakeredis.FakeServer()
+    writer = await make_worker(server, near_cache=True, consistency_window=60)
+    reader = await make_worker(server, near_cache=True, consistency_window=60)
+    try:
+        await writer.set("answer", {"value": 1}, ttl=300)
+        await wait_for(lambda: reader.tier_stats["invalidations_received"] == 1)
+        assert await reader.get("answer") == {"value": 1}
+        assert await reader.get("answer") == {"value": 1}
+        assert reader.tier_stats["redis_hits"] == 1 and reader.tier_stats["local_hits"] == 1
+
+        await writer.set("answer", {"value": 2}, ttl=300)
+        await wait_for(lambda: reader.tier_stats["invalidations_received"] == 2)
+        assert await reader.get("answer") == {"value": 2}
+
+        await writer.delete("answer")
+        await wait_for(lambda: reader.tier_stats["invalidations_received"] == 3)
+        assert await reader.get("answer", "gone") == "gone"
+
+        near = (await reader.get_stats())["near_cache"]
+        assert near["listening"] and near["misses"] == 1
+        assert near["local_hit_rate"] == pytest.approx(0.25)
+        assert near["redis_hit_rate"] == pytest.approx(0.5)
+        # A worker ignores its own invalidations
+        assert writer.tier_stats["invalidations_received"] == 0
+    finally:
+        await writer.cleanup()
+        await reader.cleanup()
+
+
+@pytest.mark.asyncio
+async def test_consistency_window_bounds_staleness_without_invalidation():
+    """A change that bypasses the channel is seen once the local copy is older than the window"""
+    server = fakeredis.FakeServer()
+    worker = await make_worker(server, near_cache=True, consistency_window=0.05)
+    raw = fakeredis.FakeAsyncRedis(server=server)
+    try:
+        await worker.set("key", "old")
+        await raw.set("key", '"new"')
+        assert await worker.get("key") == "old"
+        await asyncio.sleep(0.06)
+        assert await worker.get("key") == "new"
+    finally:
+        await worker.cleanup()
+
+
+@pytest.mark.asyncio
+async def test_without_near_cache_every_read_goes_to_redis():
+    server = fakeredis.FakeServer()
+    worker = await make_worker(server, near_cache=False)
+    raw = fakeredis.FakeAsyncRedis(server=server)
+    try:
+        await worker.set("key", [1, 2])
+        await raw.delete("key")
+        assert await worker.get("key") is None
+        assert worker.tier_stats == {**worker.tier_stats, "local_hits": 0, "invalidations_published": 0}
+    finally:
+        await worker.cleanup()
+
+
+@pytest.mark.asyncio
+async def test_local_tier_alone_when_redis_is_unavailable():
+    manager = CacheManager("redis://fake", local_cache_max_size=2)
+    manager._setup_fallback()
+
+    await manager.set("a", 1)
+    await manager.set("b", 2)
+    assert await manager.get("a") == 1
+    await manager.set("c", 3)
+
+    assert await manager.get("b") is None
+    assert await manager.get("a") == 1 and await manager.get("c") == 3
+    assert await manager.delete("c") and await manager.get("c") is None
+
+
+@pytest.mark.asyncio
+async def test_bulk_operations_use_one_round_trip_with_per_key_ttls():
+    server = fakeredis.FakeServer()
+    worker = await make_worker(server, near_cache=False)
+    raw = fakeredis.FakeAsyncRedis(server=server)
+    mget_calls = []
+    original_mget = worker.redis.mget
+
+    async def counting_mget(keys):
+        mget_calls.append(list(keys))
+        return await original_mget(keys)
+
+    worker.redis.mget = counting_mget
+    try:
+        assert await worker.set_many({"a": 1, "b": [2], "c": {"v": 3}}, ttl=100, ttls={"b": 50, "c": None})
+        assert 99 <= await raw.ttl("a") <= 100 and 49 <= await raw.ttl("b") <= 50
+        assert await raw.ttl("c") == -1
+
+        values = await worker.get_many(["a", "b", "missing", "a"], default=0)
+        assert values == {"a": 1, "b": [2], "missing": 0}
+        assert mget_calls == [["a", "b", "missing"]]
+
+        updated = await worker.mutate({"a": lambda v: v + 1, "new": lambda v: (v or 0) + 10}, ttl=30)
+        assert updated == {"a": 2, "new": 10}
+        assert await worker.get_many(["a", "new"]) == {"a": 2, "new": 10}
+        assert len(mget_calls) == 3 and 29 <= await raw.ttl("new") <= 30
+    finally:
+        await worker.cleanup()
+
+
+@pytest.mark.asyncio
+async def test_write_batch_applies_queued_writes_in_order(mock_cache_manager):
+    """Queued sets and appends on one key combine; managers without bulk methods still work"""
+    server = fakeredis.FakeServer()
+    worker = await make_worker(server, near_cache=False)
+    try:
+        await worker.set("history", ["old"])
+        for manager in (worker, mock_cache_manager):
+            batch = manager.batch() if manager is worker else CacheWriteBatch(manager)
+            batch.append("history", "turn1", max_items=2, ttl=60)
+            batch.append("history", "turn2", max_items=2, ttl=60)
+            batch.set("context", {"turns": 2})
+            batch.append("context", "ignored-not-a-list")
+            assert len(batch) == 4
+            assert await batch.flush() == 2 and len(batch) == 0
+
+        assert await worker.get("history") == ["turn1", "turn2"]
+        assert await mock_cache_manager.get("history") == ["turn1", "turn2"]
+        assert await worker.get("context") == ["ignored-not-a-list"]
+    finally:
+        await worker.cleanup()
+
+
+@pytest.mark.asyncio
+async def test_cache_update_node_queues_on_the_request_batch(sample_graph_state):
+    """The node only queues while a graph owns the batch; nothing is written until the flush"""
+    server = fakeredis.FakeServer()
+    worker = await make_worker(server, near_cache=False)
+    try:
+        state = sample_graph_state
+        state.final_response = "AI is..."
+        state.intermediate_results["conversation_context"] = {"user_expertise_level": "beginner"}
+        state.cache_writes = worker.batch()
+
+        result = await CacheUpdateNode(worker).execute(state)
+
+        assert result.success and len(state.cache_writes) == 3
+        store = ConversationStore(worker)
+        assert await store.recent(state.session_id) == []
+        await state.cache_writes.flush()
+        history = await store.recent(state.session_id)
+        assert [entry["assistant_response"] for entry in history] == ["AI is..."]
+        assert (await worker.get(f"user_context:{state.session_id}"))["total_interactions"] == 1
+    finally:
+        await worker.cleanup()
@@ -0,0 +1,48 @@
+# tests/test_search_benchmark.py
+"""
+Test the offline search benchmark on a tiny corpus
+"""
+
+import json
+
+from app.search import benchmark
+
+
+def test_benchmark_report_shape_and_recall(tmp_path):
+    """A small run produces every section, sane percentiles and near-perfect exact-path recall"""
+    output = tmp_path / "bench.json"
+    report = benchmark.main(["--sizes", "300", "--queries", "20", "--recall-queries", "10",
+                             "--batch-size", "8", "--output", str(output)])
+
+    assert json.loads(output.read_text()) == json.loads(json.dumps(report))
+    run = report["runs"][0]
+    assert run["corpus_size"] == 300
+    for mode in ("single", "batched"):
+        assert run[mode]["qps"] > 0
+        assert run[mode]["p50_ms"] <= run[mode]["p95_ms"] <= run[mode]["p99_ms"] <= run[mode]["max_ms"]
+    assert run["memory"]["vector_bytes"] >= 300 * 384 * 4
+    assert run["recall"]["hnsw"] >= 0.9
+    assert run["recall"]["hybrid"] >= 0.9
+    assert 0.0 <= run["recall"]["lsh"] <= 1.0
+
+    comparison = benchmark.compare_results(report, report)
+    assert comparison and all(change["change"] == 0 for change in comparison)
+
+
+def test_corpus_and_queries_are_deterministic():
+    assert benchmark.generate_corpus(50, seed=3) == benchmark.generate_corpus(50, seed=3)
+    queries = benchmark.generate_queries(100, seed=3)
+    assert len(set(queries)) == 100 and queries == benchmark.generate_queries(100, seed=3)
+
+
+def test_benchmark_reports_each_vector_storage():
+    """Every storage format gets a run with its vector bytes and recall against float32 vectors"""
+    report = benchmark.main(["--sizes", "300", "--queries", "10", "--recall-queries", "10",
+                             "--batch-size", "5", "--vector-storage", "float32", "int8"])
+
+    runs = {run["vector_storage"]: run for run in report["runs"]}
+    assert set(runs) == {"float32", "int8"}
+    assert runs["int8"]["memory"]["vector_bytes"] < runs["float32"]["memory"]["vector_bytes"] / 3
+    assert runs["int8"]["memory"]["graph_vector_bytes"] == 300 * 384
+    assert runs["float32"]["recall"]["vector_scoring"] == 1.0
+    assert 0.8 <= runs["int8"]["recall"]["vector_scoring"] <= 1.0
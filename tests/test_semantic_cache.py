@@ -0,0 +1,166 @@
+# tests/test_semantic_cache.py
+"""
+Test the semantic response cache and its use by the chat graph
+"""
+
+import asyncio
+import zlib
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import numpy as np
+import pytest
+
+from app.cache.semantic_cache import SemanticResponseCache
+from app.graphs.base import GraphState
+from app.graphs.chat_graph import ResponseGeneratorNode
+
+STOPWORDS = {"what", "is", "the", "of", "a", "whats", "tell", "me"}
+
+
+class HashingEncoder:
+    """Bag-of-words hashing encoder standing in for SentenceTransformer; ignores stopwords"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def encode(self, texts, convert_to_numpy=True, show_progress_bar=False, **kwargs):
+        self.calls += 1
+        vectors = np.full((len(texts), 64), 1e-3, dtype=np.float32)
+        for i, text in enumerate(texts):
+            for token in text.replace("'", "").replace("?", "").split():
+                if token not in STOPWORDS:
+                    vectors[i, zlib.crc32(token.encode()) % 64] += 1.0
+        return vectors
+
+
+SCOPE = ("llama3", "balanced", "question")
+
+
+@pytest.mark.asyncio
+async def test_exact_and_semantic_hits():
+    cache = SemanticResponseCache(model=HashingEncoder(), threshold=0.9, max_entries=10, ttl_seconds=60)
+    await cache.put("What's the capital of France?", SCOPE, "Paris")
+
+    exact = await cache.get("what's the capital of france?  ", SCOPE)
+    assert exact.kind == "exact" and exact.response == "Paris"
+
+    semantic = await cache.get("what is the capital of france", SCOPE)
+    assert semantic.kind == "semantic" and semantic.response == "Paris"
+    assert semantic.similarity >= 0.9
+
+    assert await cache.get("what is the capital of spain", SCOPE) is None
+    stats = cache.get_stats()
+    assert (stats["exact_hits"], stats["semantic_hits"], stats["misses"]) == (1, 1, 1)
+    assert stats["hit_rate"] == pytest.approx(2 / 3)
+
+
+@pytest.mark.asyncio
+async def test_scopes_are_isolated():
+    cache = SemanticResponseCache(model=HashingEncoder(), threshold=0.9, max_entries=10, ttl_seconds=60)
+    await cache.put("capital of france", SCOPE, "Paris")
+
+    assert await cache.get("capital of france", ("llama3", "premium", "question")) is None
+    assert await cache.get("capital of france", ("phi3", "balanced", "question")) is None
+    assert (await cache.get("capital of france", SCOPE)).response == "Paris"
+
+
+@pytest.mark.asyncio
+async def test_ttl_and_lru_eviction():
+    cache = SemanticResponseCache(model=HashingEncoder(), threshold=0.9, max_entries=2, ttl_seconds=60)
+    await cache.put("capital of france", SCOPE, "Paris")
+    await cache.put("capital of spain", SCOPE, "Madrid")
+    assert await cache.get("capital of france", SCOPE) is not None
+
+    await cache.put("capital of italy", SCOPE, "Rome")
+    assert len(cache) == 2 and cache.get_stats()["evictions"] == 1
+    assert await cache.get("capital of spain", SCOPE) is None
+    assert (await cache.get("france capital", SCOPE)).response == "Paris"
+
+    await cache.put("capital of peru", SCOPE, "Lima", ttl=0.01)
+    await asyncio.sleep(0.02)
+    assert await cache.get("capital of peru", SCOPE) is None
+    assert await cache.get("peru capital", SCOPE) is None
+    assert cache.get_stats()["expirations"] == 1
+
+
+@pytest.mark.asyncio
+async def test_exact_hits_without_encoder():
+    cache = SemanticResponseCache(max_entries=10, ttl_seconds=60)
+    cache._load_encoder = AsyncMock(side_effect=lambda: setattr(cache, "disabled_reason", "no model") or False)
+
+    await cache.put("capital of france", SCOPE, "Paris")
+
+    assert (await cache.get("Capital of France", SCOPE)).kind == "exact"
+    assert await cache.get("france capital", SCOPE) is None
+    assert cache.get_stats()["semantic_enabled"] is False
+
+
+@pytest.mark.asyncio
+async def test_response_generator_serves_paraphrases_from_cache():
+    model_manager = MagicMock()
+    model_manager.select_optimal_model.return_value = "llama3"
+    model_manager.ollama_client.health_check = AsyncMock(return_value=True)
+    model_manager.generate = AsyncMock(
+        return_value=SimpleNamespace(success=True, text="Paris", execution_time=1.0, cost=0.01)
+    )
+    cache = SemanticResponseCache(model=HashingEncoder(), threshold=0.9, max_entries=10, ttl_seconds=60)
+    node = ResponseGeneratorNode(model_manager, cache)
+
+    first = GraphState(original_query="What's the capital of France?", query_intent="question")
+    assert (await node.execute(first)).success
+    assert first.response_metadata["response_cache"] == {"kind": "miss"}
+
+    second = GraphState(original_query="what is the capital of france", query_intent="question")
+    result = await node.execute(second)
+
+    assert result.success and result.cost == 0.0 and result.data["cache_hit"] == "semantic"
+    assert second.final_response == "Paris" and "semantic_response" in second.cache_hits
+    assert second.response_metadata["response_cache"]["kind"] == "semantic"
+    assert model_manager.generate.await_count == 1
+
+    # Follow-up turns depend on the conversation and always reach the model
+    follow_up = GraphState(
+        original_query="what is the capital of france",
+        query_intent="question",
+        conversation_history=[{"role": "user", "content": "Let's talk about Spain"}],
+    )
+    await node.execute(follow_up)
+    assert model_manager.generate.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_chat_endpoint_serves_paraphrases_from_cache(monkeypatch):
+    """The chat endpoint reuses the app's chat graph, and with it the semantic cache"""
+    from fastapi import FastAPI
+    from httpx import ASGITransport, AsyncClient
+
+    from app.api import chat as chat_api
+    from app.graphs.chat_graph import ChatGraph
+
+    model_manager = MagicMock()
+    model_manager.select_optimal_model.return_value = "llama3"
+    model_manager.ollama_client.health_check = AsyncMock(return_value=True)
+    model_manager.generate = AsyncMock(
+        return_value=SimpleNamespace(
+            success=True, text="Paris is the capital of France.", execution_time=1.0, cost=0.01
+        )
+    )
+    cache = SemanticResponseCache(model=HashingEncoder(), threshold=0.9, max_entries=10, ttl_seconds=60)
+
+    app = FastAPI()
+    app.include_router(chat_api.router, prefix="/api/v1/chat")
+    app.state.app_state = {"chat_graph": ChatGraph(model_manager, None, cache)}
+    app.dependency_overrides[chat_api.get_current_user] = lambda: {"user_id": "test_user"}
+    monkeypatch.setattr(chat_api, "chat_graph", None)
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        first = await client.post("/api/v1/chat/complete", json={"message": "What's the capital of France?"})
+        second = await client.post("/api/v1/chat/complete", json={"message": "what is the capital of france"})
+
+    assert first.status_code == second.status_code == 200
+    assert second.json()["data"]["response"] == "Paris is the capital of France."
+    assert second.json()["metadata"]["cache_hit"] == "semantic"
+    # Intent classification asks the model too (with max_tokens=10); only one answer was generated
+    answers = [call for call in model_manager.generate.await_args_list if call.kwargs["max_tokens"] != 10]
+    assert len(answers) == 1
@@ -0,0 +1,175 @@
+# tests/test_single_flight.py
+"""
+Test single-flight coalescing of generations and searches
+"""
+
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from app.core.single_flight import SingleFlight, temperature_bucket
+from app.graphs.base import GraphState
+from app.graphs.chat_graph import ResponseGeneratorNode
+from app.models.manager import ModelManager
+from app.models.ollama_client import ModelResult
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_one_execution():
+    flights = SingleFlight("test", enabled=True)
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.02)
+        return {"answer": 42}
+
+    results = await asyncio.gather(*(flights.do("key", work) for _ in range(10)))
+
+    assert len(calls) == 1 and all(result is results[0] for result in results)
+    stats = flights.get_stats()
+    assert (stats["executions"], stats["coalesced"], stats["in_flight"]) == (1, 9, 0)
+    assert stats["coalesce_rate"] == pytest.approx(0.9)
+
+    # Finished keys are released, so the next call runs afresh
+    await flights.do("key", work)
+    assert len(calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_errors_and_cancellation():
+    flights = SingleFlight("test", enabled=True)
+    started = asyncio.Event()
+
+    async def failing():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("ollama down")
+
+    results = await asyncio.gather(*(flights.do("fail", failing) for _ in range(3)), return_exceptions=True)
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+    async def slow():
+        started.set()
+        await asyncio.sleep(0.05)
+        return "done"
+
+    # A follower timing out leaves the leader's result intact
+    leader = asyncio.create_task(flights.do("slow", slow))
+    await started.wait()
+    with pytest.raises(asyncio.TimeoutError):
+        await asyncio.wait_for(flights.do("slow", slow), timeout=0.01)
+    assert await leader == "done"
+
+    # Once every caller has given up, the shared work is cancelled
+    started.clear()
+    only = asyncio.create_task(flights.do("slow", slow))
+    await started.wait()
+    flight = flights._flights["slow"]
+    only.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await only
+    await asyncio.sleep(0)
+    assert flight.task.cancelled() and flights.get_stats()["in_flight"] == 0
+
+    # The key is released when the work is cancelled, so the next caller runs it afresh
+    started.clear()
+    abandoned = asyncio.create_task(flights.do("slow", slow))
+    await started.wait()
+    abandoned.cancel()
+    while not abandoned.done():
+        await asyncio.sleep(0)
+    assert "slow" not in flights._flights
+    assert await flights.do("slow", slow) == "done"
+
+
+@pytest.mark.asyncio
+async def test_stream_followers_receive_every_chunk():
+    flights = SingleFlight("test", enabled=True)
+    opened = []
+
+    async def tokens():
+        opened.append(1)
+        for token in ["Paris", " is", " the", " capital"]:
+            await asyncio.sleep(0.01)
+            yield token
+
+    async def consume(delay):
+        await asyncio.sleep(delay)
+        return [token async for token in flights.stream("q", tokens)]
+
+    first, late = await asyncio.gather(consume(0), consume(0.025))
+
+    assert first == late == ["Paris", " is", " the", " capital"]
+    assert len(opened) == 1 and flights.get_stats()["stream_coalesced"] == 1
+
+
+@pytest.mark.asyncio
+async def test_disabled_runs_every_call():
+    flights = SingleFlight("test", enabled=False)
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+
+    await asyncio.gather(*(flights.do("key", work) for _ in range(3)))
+    assert len(calls) == 3 and flights.get_stats()["coalesced"] == 0
+
+
+def test_temperature_bucket():
+    assert temperature_bucket(0.71, step=0.1) == temperature_bucket(0.69, step=0.1)
+    assert temperature_bucket(0.7, step=0.1) != temperature_bucket(0.3, step=0.1)
+
+
+@pytest.mark.asyncio
+async def test_model_manager_coalesces_generations():
+    manager = ModelManager()
+    manager.is_initialized = True
+    manager.ollama_client = MagicMock()
+    generations = []
+
+    async def generate(model_name, prompt, max_tokens, temperature, **kwargs):
+        generations.append(prompt)
+        await asyncio.sleep(0.02)
+        return ModelResult(success=True, text=f"answer to {prompt}", model_used=model_name)
+
+    manager.ollama_client.generate = generate
+
+    results = await asyncio.gather(
+        manager.generate("phi3:mini", "hello", temperature=0.7),
+        manager.generate("phi3:mini", "hello", temperature=0.72),
+        manager.generate("phi3:mini", "other", temperature=0.7),
+    )
+    assert [result.text for result in results] == ["answer to hello", "answer to hello", "answer to other"]
+    assert sorted(generations) == ["hello", "other"]
+    assert manager.get_stats()["coalescing"]["coalesced"] == 1
+
+
+@pytest.mark.asyncio
+async def test_concurrent_chats_generate_once():
+    """Chats building the same prompt share one Ollama call; other prompts get their own"""
+    manager = ModelManager()
+    manager.is_initialized = True
+    manager.select_optimal_model = MagicMock(return_value="llama3")
+    manager.ollama_client = MagicMock()
+    manager.ollama_client.health_check = AsyncMock(return_value=True)
+    prompts = []
+
+    async def generate(model_name, prompt, max_tokens, temperature, **kwargs):
+        prompts.append(prompt)
+        await asyncio.sleep(0.02)
+        text = "Paris" if "France" in prompt else "Lima"
+        return ModelResult(success=True, text=text, model_used=model_name)
+
+    manager.ollama_client.generate = generate
+    node = ResponseGeneratorNode(manager)
+
+    states = [
+        GraphState(original_query=query, query_intent="question")
+        for query in ("What is the capital of France?", "What is the capital of France?", "What is the capital of Peru?")
+    ]
+    await asyncio.gather(*(node.execute(state) for state in states))
+
+    assert len(prompts) == 2
+    assert [state.final_response for state in states] == ["Paris", "Paris", "Lima"]
@@ -0,0 +1,152 @@
+# tests/test_smart_cache.py
+"""
+Test the sharded in-process SmartCache
+"""
+
+import threading
+import time
+
+import pytest
+
+from app.performance.caching import FrequencySketch, SmartCache, estimate_size
+from app.performance.optimization import cached
+
+
+def test_lru_eviction_keeps_recently_used():
+    """Past capacity the least recently used key goes, not the least recently set"""
+    cache = SmartCache(max_size=3)
+    for key in ("a", "b", "c"):
+        cache.set(key, key.upper())
+    assert cache.get("a") == "A"
+
+    cache.set("d", "D")
+
+    assert cache.get("b") is None
+    assert [cache.get(key) for key in ("a", "c", "d")] == ["A", "C", "D"]
+    stats = cache.get_stats()
+    assert stats["evictions"] == 1 and stats["current_size"] == 3
+    assert set(stats) >= {"hits", "misses", "hit_rate", "evictions", "current_size", "max_size", "total_size_bytes"}
+
+
+def test_byte_budget_and_ttl():
+    """Entries are evicted to fit the byte budget; oversized and expired values are not served"""
+    cache = SmartCache(max_size=100, max_bytes=2000, default_ttl=60)
+    for i in range(10):
+        cache.set(f"key{i}", "x" * 300)
+
+    stats = cache.get_stats()
+    assert stats["total_size_bytes"] <= 2000 and stats["evictions"] > 0
+    assert cache.get("key9") is not None and cache.get("key0") is None
+
+    cache.set("huge", "x" * 5000)
+    assert cache.get("huge") is None and cache.get_stats()["rejections"] == 1
+
+    cache.set("short", "value", ttl=0.01)
+    time.sleep(0.02)
+    assert cache.get("short") is None
+    cache.set("short", "value", ttl=0.01)
+    time.sleep(0.02)
+    assert cache.clear_expired() == 1
+
+
+def test_tinylfu_keeps_hot_keys_against_a_scan():
+    """Hot keys read between one-off keys survive under TinyLFU admission, unlike plain LRU"""
+    def run(policy):
+        cache = SmartCache(max_size=64, policy=policy)
+        hot = [f"hot{i}" for i in range(32)]
+        for i in range(2000):
+            keys = [f"scan{i}"] + ([hot[(i // 2) % len(hot)]] if i % 2 == 0 else [])
+            for key in keys:
+                if cache.get(key) is None:
+                    cache.set(key, key)
+        return cache, sum(cache.get(key) == key for key in hot)
+
+    lru, lru_hot = run("lru")
+    tinylfu, tinylfu_hot = run("tinylfu")
+
+    assert tinylfu_hot == 32 and lru_hot < 32
+    assert tinylfu.get_stats()["hit_rate"] > lru.get_stats()["hit_rate"]
+    assert tinylfu.get_stats()["rejections"] > 0
+
+
+def test_tinylfu_admits_keys_that_keep_being_requested():
+    """Sets count towards frequency, so a full cache of cold keys does not freeze out new hot ones"""
+    cache = SmartCache(max_size=64, policy="tinylfu")
+    for i in range(64):
+        cache.set(f"cold{i}", i)
+
+    cache.set("new", "value")
+    assert cache.get("new") == "value"  # served from the admission window right away
+    for i in range(3):
+        cache.set(f"other{i}", i)
+    for _ in range(3):
+        if cache.get("new") is None:
+            cache.set("new", "value")
+
+    assert cache.get("new") == "value" and len(cache) == 64
+    assert cache.get_stats()["evictions"] > 0
+
+
+def test_oversized_replacement_keeps_the_cached_value():
+    """A replacing set is size-checked before the old entry is dropped"""
+    cache = SmartCache(max_size=10, max_bytes=2000, policy="tinylfu")
+    cache.set("key", "small")
+    cache.set("key", "x" * 5000)
+
+    assert cache.get("key") == "small" and cache.get_stats()["rejections"] == 1
+    cache.set("key", "bigger value")
+    assert cache.get("key") == "bigger value" and len(cache) == 1
+
+
+def test_sharded_cache_under_threads():
+    """Concurrent writers and readers keep the size bounded and the counters consistent"""
+    cache = SmartCache(max_size=1024, num_shards=8)
+    assert cache.get_stats()["shards"] == 8
+
+    def worker(offset):
+        for i in range(2000):
+            cache.set(f"{offset}:{i}", i)
+            cache.get(f"{offset}:{i // 2}")
+
+    threads = [threading.Thread(target=worker, args=(t,)) for t in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stats = cache.get_stats()
+    assert stats["current_size"] <= 1024
+    assert stats["hits"] + stats["misses"] == 8000
+
+
+def test_estimate_size_samples_containers():
+    small, large = ["item"] * 10, ["item"] * 10000
+    assert estimate_size(large) > 500 * estimate_size(small) / 10
+    assert estimate_size({"text": "x" * 1000}) > 1000
+
+
+def test_frequency_sketch_ages_counts():
+    sketch = FrequencySketch(16)
+    for _ in range(20):
+        sketch.increment("popular")
+    assert sketch.frequency("popular") == 15
+    # The 160th increment halves every counter
+    for i in range(140):
+        sketch.increment(f"other{i}")
+    assert sketch.frequency("popular") <= 7
+
+
+@pytest.mark.asyncio
+async def test_cached_decorator_uses_the_cache():
+    calls = []
+    cache = SmartCache(max_size=10)
+
+    @cached(ttl=60, cache_instance=cache)
+    async def lookup(value):
+        calls.append(value)
+        return value * 2
+
+    assert await lookup(2) == 4
+    assert await lookup(2) == 4
+    assert calls == [2]
+    assert cache.get_stats()["hits"] == 1